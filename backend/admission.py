@@ -0,0 +1,454 @@
+"""
+Admission Control Module
+Per-model concurrency limits, RPM/TPM token buckets and a priority queue in front of model calls,
+so interactive chat is served ahead of blueprint generation and excess load is shed with a
+Retry-After instead of timing out
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+from metrics import metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Lower values are admitted first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+# Priority of model calls made on behalf of the current request (set per request from the endpoint)
+llm_priority: ContextVar[int] = ContextVar('llm_priority', default=BATCH)
+
+ADMISSION_WAIT_SECONDS = metrics_registry.histogram(
+    'evalbridge_llm_admission_wait_seconds',
+    'Time model calls spent queued for admission',
+    ['model', 'priority']
+)
+ADMISSION_REJECTIONS = metrics_registry.counter(
+    'evalbridge_llm_admission_rejections_total',
+    'Model calls shed by admission control (queue_full, timeout, preempted)',
+    ['model', 'priority', 'reason']
+)
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a model call is shed; surfaced to clients as 429 with Retry-After"""
+
+    def __init__(self, model: str, reason: str, retry_after: float):
+        super().__init__(f"{model} is at capacity ({reason}); retry in {retry_after:.0f}s")
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_seconds(self) -> int:
+        """Whole seconds for the Retry-After header"""
+        return max(1, math.ceil(self.retry_after))
+
+
+def usage_tokens(response) -> Optional[int]:
+    """Total tokens reported in a response's (or final stream chunk's) usage metadata"""
+    usage = getattr(response, 'usage_metadata', None)
+    total = getattr(usage, 'total_token_count', None) if usage is not None else None
+    return total if isinstance(total, int) else None
+
+
+class TokenBucket:
+    """Refills continuously at per_minute / 60 per second up to capacity (one minute's budget)"""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (requests above capacity wait for a full bucket)"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def give(self, amount: float):
+        """Return (or, when negative, charge) tokens after the actual usage is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelLimits:
+    """Admission limits for one model; 0 means unlimited"""
+
+    def __init__(self, max_concurrency: int = 0, rpm: float = 0, tpm: float = 0):
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+
+    def describe(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+def parse_model_limits(concurrency: str = '', rpm: str = '', tpm: str = '') -> Dict[str, Dict[str, float]]:
+    """Merge 'model=value,...' specs into {model: {'max_concurrency': ..., 'rpm': ..., 'tpm': ...}}"""
+    limits: Dict[str, Dict[str, float]] = {}
+    for field, spec in (('max_concurrency', concurrency), ('rpm', rpm), ('tpm', tpm)):
+        for item in (spec or '').split(','):
+            model, _, value = item.partition('=')
+            if model.strip() and value.strip():
+                limits.setdefault(model.strip(), {})[field] = float(value)
+    return limits
+
+
+class _Waiter:
+    """A queued call; wake() is a thread-safe nudge to re-check the queue"""
+
+    def __init__(self, priority: int, seq: int, tokens: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.wake = wake
+        self.granted = False
+        self.rejected: Optional[AdmissionRejected] = None
+
+    def __lt__(self, other: '_Waiter') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _ModelState:
+    def __init__(self, model: str, limits: ModelLimits):
+        self.model = model
+        self.limits = limits
+        self.in_flight = 0
+        self.queue: List[_Waiter] = []
+        self.requests = TokenBucket(limits.rpm) if limits.rpm else None
+        self.tokens = TokenBucket(limits.tpm) if limits.tpm else None
+        self.hold_seconds = 1.0  # moving average of how long a permit is held
+
+    def blocked_for(self, tokens: int) -> Optional[float]:
+        """None when a call can start now, else a hint (seconds) of when to look again"""
+        if self.limits.max_concurrency and self.in_flight >= self.limits.max_concurrency:
+            return self.hold_seconds
+        wait = max(self.requests.wait_time(1) if self.requests else 0.0,
+                   self.tokens.wait_time(tokens) if self.tokens else 0.0)
+        return wait or None
+
+    def start(self, tokens: int):
+        self.in_flight += 1
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(tokens)
+
+    def retry_after(self, tokens: int) -> float:
+        """Rough time until a new call would be admitted"""
+        concurrency = self.limits.max_concurrency or max(1, self.in_flight)
+        queued = self.hold_seconds * (len(self.queue) + 1) / concurrency
+        return max(queued, self.blocked_for(tokens) or 0.0, 1.0)
+
+
+class Permit:
+    """An admitted call; release() (or leaving the with-block) frees its slot"""
+
+    def __init__(self, controller: Optional['AdmissionController'], state: Optional[_ModelState], tokens: int):
+        self.controller = controller
+        self.state = state
+        self.tokens = tokens
+        self.used_tokens: Optional[int] = None
+        self.started = time.monotonic()
+        self.released = False
+
+    def record_usage(self, response):
+        """Remember the actual token usage so the TPM bucket is corrected on release"""
+        used = usage_tokens(response)
+        if used is not None:
+            self.used_tokens = used
+
+    def release(self):
+        if self.controller is not None and not self.released:
+            self.released = True
+            self.controller._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def _threadsafe_setter(loop: asyncio.AbstractEventLoop, event: asyncio.Event) -> Callable[[], None]:
+    """Wake an async waiter from any thread (no-op once its loop has closed)"""
+    def wake():
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass
+    return wake
+
+
+# Permit for calls made without admission control
+NO_PERMIT = Permit(None, None, 0)
+
+
+class AdmissionController:
+    """
+    Admits model calls against per-model limits in priority order
+
+    A call starts immediately when nothing is queued ahead of it and the model has a free
+    concurrency slot plus RPM/TPM budget; otherwise it queues (lower priority value first, FIFO
+    within a priority). The queue is bounded: when it is full, a new call displaces the newest
+    queued call of a lower priority, or is rejected. Queued calls give up after their priority's
+    max wait. Both raise AdmissionRejected with a Retry-After estimate. Sync (thread) and async
+    callers share the same queues.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, ModelLimits]] = None,
+                 default_limits: Optional[ModelLimits] = None, max_queue: int = 64,
+                 max_wait: Optional[Dict[int, float]] = None, output_tokens_estimate: int = 1000,
+                 enabled: bool = True):
+        """
+        Args:
+            limits: Per-model limits
+            default_limits: Limits for models not listed in limits
+            max_queue: Queued calls per model before new calls are shed
+            max_wait: Longest queue wait per priority, in seconds
+            output_tokens_estimate: Completion tokens reserved against TPM before the call
+            enabled: When False every call is admitted immediately
+        """
+        self.limits = dict(limits or {})
+        self.default_limits = default_limits or ModelLimits()
+        self.max_queue = max_queue
+        self.max_wait = {INTERACTIVE: 10.0, BATCH: 60.0}
+        self.max_wait.update(max_wait or {})
+        self.output_tokens_estimate = output_tokens_estimate
+        self.enabled = enabled
+        self._models: Dict[str, _ModelState] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(model, self.limits.get(model, self.default_limits))
+        return state
+
+    def reserve_tokens(self, prompt_tokens: int) -> int:
+        """Tokens reserved for a call: the prompt estimate plus the expected completion"""
+        return prompt_tokens + self.output_tokens_estimate
+
+    def _dispatch(self, state: _ModelState) -> Optional[float]:
+        """Start queued calls in order while capacity allows; returns a re-check hint"""
+        while state.queue:
+            head = state.queue[0]
+            hint = state.blocked_for(head.tokens)
+            if hint is not None:
+                return hint
+            heapq.heappop(state.queue)
+            state.start(head.tokens)
+            head.granted = True
+            head.wake()
+        return None
+
+    def _enqueue(self, model: str, tokens: int, priority: int, wake: Callable[[], None]):
+        """Admit immediately (returns a Permit) or queue (returns the waiter)"""
+        with self._lock:
+            state = self._state(model)
+            if not state.queue and state.blocked_for(tokens) is None:
+                state.start(tokens)
+                return Permit(self, state, tokens)
+            if len(state.queue) >= self.max_queue:
+                victim = max(state.queue)
+                if victim.priority <= priority:
+                    raise self._reject(state, priority, 'queue_full', tokens)
+                state.queue.remove(victim)
+                heapq.heapify(state.queue)
+                victim.rejected = self._reject(state, victim.priority, 'preempted', victim.tokens)
+                victim.wake()
+            waiter = _Waiter(priority, next(self._seq), tokens, wake)
+            heapq.heappush(state.queue, waiter)
+            return waiter
+
+    def _poll(self, model: str, waiter: _Waiter, give_up: bool) -> Optional[Permit]:
+        """Check a queued call: a Permit when granted, None to keep waiting; raises when shed"""
+        with self._lock:
+            state = self._state(model)
+            if not waiter.granted and waiter.rejected is None:
+                self._dispatch(state)
+            if waiter.granted:
+                return Permit(self, state, waiter.tokens)
+            if waiter.rejected is not None:
+                raise waiter.rejected
+            if give_up:
+                self._abandon(state, waiter)
+                raise self._reject(state, waiter.priority, 'timeout', waiter.tokens)
+            return None
+
+    def _hint(self, model: str) -> float:
+        with self._lock:
+            return self._dispatch(self._state(model)) or 0.05
+
+    def _abandon(self, state: _ModelState, waiter: _Waiter):
+        """Drop a waiter that stopped waiting (caller holds the lock)"""
+        if waiter in state.queue:
+            state.queue.remove(waiter)
+            heapq.heapify(state.queue)
+            self._dispatch(state)
+
+    def _reject(self, state: _ModelState, priority: int, reason: str, tokens: int) -> AdmissionRejected:
+        ADMISSION_REJECTIONS.inc(model=state.model, priority=PRIORITY_NAMES.get(priority, str(priority)),
+                                 reason=reason)
+        logger.warning("Model call shed by admission control", extra={
+            'model': state.model, 'reason': reason, 'queued': len(state.queue), 'in_flight': state.in_flight
+        })
+        return AdmissionRejected(state.model, reason, state.retry_after(tokens))
+
+    def _release(self, permit: Permit):
+        with self._lock:
+            state = permit.state
+            state.in_flight -= 1
+            held = time.monotonic() - permit.started
+            state.hold_seconds = 0.8 * state.hold_seconds + 0.2 * held
+            if state.tokens is not None and permit.used_tokens is not None:
+                state.tokens.give(permit.tokens - permit.used_tokens)
+            self._dispatch(state)
+
+    def _resolve(self, priority: Optional[int], max_wait: Optional[float]):
+        priority = llm_priority.get() if priority is None else priority
+        limit = self.max_wait.get(priority, self.max_wait[BATCH])
+        return priority, limit if max_wait is None else min(limit, max_wait)
+
+    def acquire(self, model: str, tokens: int = 0, priority: Optional[int] = None,
+                max_wait: Optional[float] = None) -> Permit:
+        """
+        Block until the call may start
+
+        Args:
+            model: Model name
+            tokens: Tokens to reserve against the TPM budget (see reserve_tokens)
+            priority: INTERACTIVE or BATCH; defaults to the request's llm_priority
+            max_wait: Cap on the queue wait, e.g. the caller's remaining timeout
+
+        Returns:
+            Permit to release when the call finishes
+        """
+        if not self.enabled:
+            return NO_PERMIT
+        priority, max_wait = self._resolve(priority, max_wait)
+        event = threading.Event()
+        queued = self._enqueue(model, tokens, priority, event.set)
+        if isinstance(queued, Permit):
+            return queued
+
+        started = time.monotonic()
+        deadline = started + max_wait
+        try:
+            while True:
+                permit = self._poll(model, queued, give_up=time.monotonic() >= deadline)
+                if permit is not None:
+                    ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started, model=model,
+                                                   priority=PRIORITY_NAMES.get(priority, str(priority)))
+                    return permit
+                event.wait(max(0.0, min(deadline - time.monotonic(), self._hint(model))))
+                event.clear()
+        except BaseException:
+            self._cancel(model, queued)
+            raise
+
+    async def aacquire(self, model: str, tokens: int = 0, priority: Optional[int] = None,
+                       max_wait: Optional[float] = None) -> Permit:
+        """Async variant of acquire(); cancellation while queued leaves the queue cleanly"""
+        if not self.enabled:
+            return NO_PERMIT
+        priority, max_wait = self._resolve(priority, max_wait)
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        queued = self._enqueue(model, tokens, priority, _threadsafe_setter(loop, wakeup))
+        if isinstance(queued, Permit):
+            return queued
+
+        started = time.monotonic()
+        deadline = started + max_wait
+        try:
+            while True:
+                permit = self._poll(model, queued, give_up=time.monotonic() >= deadline)
+                if permit is not None:
+                    ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started, model=model,
+                                                   priority=PRIORITY_NAMES.get(priority, str(priority)))
+                    return permit
+                try:
+                    await asyncio.wait_for(wakeup.wait(),
+                                           max(0.0, min(deadline - time.monotonic(), self._hint(model))))
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+        except BaseException:
+            self._cancel(model, queued)
+            raise
+
+    def _cancel(self, model: str, waiter: _Waiter):
+        """A waiter stopped waiting (timeout, rejection, cancellation); free a slot granted meanwhile"""
+        with self._lock:
+            state = self._state(model)
+            granted = waiter.granted
+            waiter.granted = False
+            self._abandon(state, waiter)
+        if granted:
+            self._release(Permit(self, state, waiter.tokens))
+
+    def iterate(self, model: str, open_stream: Callable[[], Iterable], tokens: int = 0,
+                priority: Optional[int] = None, max_wait: Optional[float] = None) -> Iterator:
+        """Hold a permit while a stream is consumed (acquired on the first next())"""
+        with self.acquire(model, tokens, priority, max_wait) as permit:
+            item = None
+            for item in open_stream():
+                yield item
+            permit.record_usage(item)
+
+    async def aiterate(self, model: str, open_stream: Callable[[], Any], tokens: int = 0,
+                       priority: Optional[int] = None, max_wait: Optional[float] = None) -> AsyncIterator:
+        """Async variant of iterate(); open_stream() returns an awaitable of an async iterator"""
+        async with await self.aacquire(model, tokens, priority, max_wait) as permit:
+            item = None
+            async for item in await open_stream():
+                yield item
+            permit.record_usage(item)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'max_queue': self.max_queue,
+                'max_wait_seconds': {PRIORITY_NAMES[p]: s for p, s in self.max_wait.items()},
+                'models': {
+                    model: {
+                        'limits': state.limits.describe(),
+                        'in_flight': state.in_flight,
+                        'queued': len(state.queue),
+                        'queued_interactive': sum(1 for w in state.queue if w.priority == INTERACTIVE),
+                    }
+                    for model, state in self._models.items()
+                },
+            }
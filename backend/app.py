@@ -1,26 +1,54 @@
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 import json
 from google import genai
 from typing import List, Dict, Any
+from functools import lru_cache
 import os
 from datetime import datetime
 import time
 import threading
+import uuid
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from prompt_manager import prompt_manager
-from workflow_dashboard import workflow_monitor
-from mock_data_generator import mock_generator
+from workflow_dashboard import workflow_monitor, make_execution_id
+from mock_data_generator import mock_generator, mock_seed, MOCK_SEED_HEADER
+from demo_latency import DemoLatency
+from llm_cache import LLMResponseCache, MemoryCacheTier, SQLiteCacheTier
+from llm_gateway import LLMGateway
+from call_policy import CallPolicy, CallPolicyEngine, http_timeout_config, parse_stage_seconds
+from model_router import (ModelRouter, current_tenant, latency_slo_ms, load_routing_rules, parse_stage_models,
+                          LATENCY_SLO_HEADER, TENANT_HEADER)
+from admission import (AdmissionController, AdmissionRejected, ModelLimits, INTERACTIVE, BATCH, llm_priority,
+                       parse_model_limits)
+from context_cache import ContextCacheManager
+from chat_sessions import ChatSessionStore
+from chat_history import ChatHistoryManager, estimate_tokens, model_summarizer, parse_token_budgets
+from pipeline_executor import BlueprintPipeline, PendingDomainContext
+from batch_blueprints import BlueprintBatch
+from blueprint_jobs import BlueprintJobQueue, BlueprintJobStore, JobQueueFull
+from json_extraction import JSONArrayStreamParser, JSONExtractionError, extract_json
+from metrics import metrics_registry, instrument_stream, PROMETHEUS_CONTENT_TYPE
+from structured_logging import (configure_logging, current_request_id, log_payload, new_request_id,
+                                REQUEST_ID_HEADER)
+from serving_core import SSE_HEADERS, run_steps, sse_event
 from dotenv import load_dotenv
+import logging
 
 # Load environment variables
 load_dotenv()
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 # Application mode configuration
 APP_MODE = os.getenv('APP_MODE', 'demo').lower()
-print(f"🚀 Application running in {APP_MODE.upper()} mode")
+logger.info("Application running in %s mode", APP_MODE.upper())
 
 # Gemini API configuration (only for production mode)
 client = None
@@ -28,16 +56,241 @@ if APP_MODE == 'production':
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     if not GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY environment variable is required for production mode")
-    client = genai.Client(api_key=GEMINI_API_KEY)
-    print("✅ Gemini API client initialized")
+    # GEMINI_BASE_URL points the client at another endpoint, e.g. fake_gemini_server.py for load tests
+    GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL')
+    client = genai.Client(api_key=GEMINI_API_KEY,
+                          http_options={'base_url': GEMINI_BASE_URL} if GEMINI_BASE_URL else None)
+    logger.info("Gemini API client initialized")
 else:
-    print("🎭 Running in demo mode with mock data")
+    logger.info("Running in demo mode with mock data")
+
+# LLM response cache configuration (memory LRU tier + optional SQLite tier)
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL_SECONDS', '86400'))
+LLM_CACHE_DB_PATH = os.getenv('LLM_CACHE_DB_PATH', 'llm_cache.db')  # empty disables the disk tier
+cache_tiers = [MemoryCacheTier(
+    max_entries=int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', '256')),
+    ttl_seconds=LLM_CACHE_TTL
+)]
+if LLM_CACHE_DB_PATH:
+    cache_tiers.append(SQLiteCacheTier(
+        db_path=LLM_CACHE_DB_PATH,
+        ttl_seconds=LLM_CACHE_TTL,
+        max_entries=int(os.getenv('LLM_CACHE_DISK_ENTRIES', '5000')),
+        max_bytes=int(os.getenv('LLM_CACHE_DISK_MAX_MB', '200')) * 1024 * 1024
+    ))
+llm_cache = LLMResponseCache(
+    tiers=cache_tiers,
+    enabled=os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+)
+
+# Provider-side context caching for long, stable prompt prefixes (production only)
+context_cache = ContextCacheManager(
+    client=client,
+    ttl_seconds=float(os.getenv('CONTEXT_CACHE_TTL_SECONDS', '3600')),
+    refresh_margin_seconds=float(os.getenv('CONTEXT_CACHE_REFRESH_MARGIN_SECONDS', '300')),
+    failure_backoff_seconds=float(os.getenv('CONTEXT_CACHE_FAILURE_BACKOFF_SECONDS', '600')),
+    min_chars=int(os.getenv('CONTEXT_CACHE_MIN_CHARS', '4096')),
+    enabled=os.getenv('CONTEXT_CACHE_ENABLED', 'true').lower() == 'true'
+)
+# Timeouts, retries, circuit breaking and hedging for every model call, tuned per pipeline stage
+LLM_STAGE_DEADLINES = parse_stage_seconds(os.getenv('LLM_STAGE_DEADLINES', 'extract=30,router=30,expert=120,chat=60,summary=30'))
+LLM_HEDGE_STAGES = {stage.strip() for stage in os.getenv('LLM_HEDGE_STAGES', '').split(',') if stage.strip()}
+default_call_policy = CallPolicy(
+    timeout_seconds=float(os.getenv('LLM_TIMEOUT_SECONDS', '60')),
+    deadline_seconds=float(os.getenv('LLM_DEADLINE_SECONDS', '120')),
+    max_attempts=int(os.getenv('LLM_MAX_ATTEMPTS', '3')),
+    backoff_base_seconds=float(os.getenv('LLM_BACKOFF_BASE_SECONDS', '0.5')),
+    backoff_max_seconds=float(os.getenv('LLM_BACKOFF_MAX_SECONDS', '8')),
+    hedge_quantile=float(os.getenv('LLM_HEDGE_QUANTILE', '0.95')),
+    hedge_min_delay_seconds=float(os.getenv('LLM_HEDGE_MIN_DELAY_SECONDS', '2'))
+)
+call_policy = CallPolicyEngine(
+    policies={
+        stage: default_call_policy.replace(
+            deadline_seconds=LLM_STAGE_DEADLINES.get(stage, default_call_policy.deadline_seconds),
+            timeout_seconds=min(default_call_policy.timeout_seconds,
+                                LLM_STAGE_DEADLINES.get(stage, default_call_policy.timeout_seconds)),
+            hedge=stage in LLM_HEDGE_STAGES
+        )
+        for stage in set(LLM_STAGE_DEADLINES) | LLM_HEDGE_STAGES
+    },
+    default=default_call_policy,
+    failure_threshold=int(os.getenv('LLM_CIRCUIT_FAILURE_THRESHOLD', '5')),
+    reset_timeout_seconds=float(os.getenv('LLM_CIRCUIT_RESET_SECONDS', '30'))
+)
+
+# Admission control in front of every model call: per-model concurrency and RPM/TPM budgets,
+# chat ahead of blueprint work, bounded queues that shed load with 429 + Retry-After
+admission = AdmissionController(
+    limits={
+        model: ModelLimits(max_concurrency=int(values.get('max_concurrency', os.getenv('LLM_MAX_CONCURRENCY', '16'))),
+                           rpm=values.get('rpm', 0), tpm=values.get('tpm', 0))
+        for model, values in parse_model_limits(os.getenv('LLM_MODEL_CONCURRENCY', ''),
+                                                os.getenv('LLM_MODEL_RPM', ''),
+                                                os.getenv('LLM_MODEL_TPM', '')).items()
+    },
+    default_limits=ModelLimits(max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '16'))),
+    max_queue=int(os.getenv('LLM_ADMISSION_MAX_QUEUE', '64')),
+    max_wait={INTERACTIVE: float(os.getenv('LLM_ADMISSION_MAX_WAIT_INTERACTIVE', '10')),
+              BATCH: float(os.getenv('LLM_ADMISSION_MAX_WAIT_BATCH', '60'))},
+    output_tokens_estimate=int(os.getenv('LLM_ADMISSION_OUTPUT_TOKENS', '1000')),
+    enabled=os.getenv('LLM_ADMISSION_ENABLED', 'true').lower() == 'true'
+)
+llm_gateway = LLMGateway(client=client, cache=llm_cache, context_cache=context_cache, policy=call_policy,
+                         admission=admission)
+
+# Template whose static head is registered as cached content for the dynamic expert call
+CAPABILITY_PROMPT_NAME = 'capability_dimensions_prompt'
+
+# Metrics (exposed on /metrics; model call latency and token counts are recorded by the gateway)
+STAGE_SECONDS = metrics_registry.histogram(
+    'evalbridge_pipeline_stage_seconds',
+    'Blueprint pipeline stage durations (extract, domain_router, dynamic_expert, json_parse, ...)',
+    ['stage']
+)
+HTTP_REQUESTS_IN_FLIGHT = metrics_registry.gauge(
+    'evalbridge_http_requests_in_flight',
+    'HTTP requests currently being handled',
+    ['endpoint']
+)
+HTTP_REQUEST_SECONDS = metrics_registry.histogram(
+    'evalbridge_http_request_seconds',
+    'Time to produce an HTTP response (streaming bodies are measured separately)',
+    ['endpoint', 'method', 'status']
+)
+SSE_CHUNK_INTERVAL = metrics_registry.histogram(
+    'evalbridge_sse_chunk_interval_seconds',
+    'Time between consecutive SSE events (the first is time to first event)',
+    ['endpoint'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+SSE_STREAMS_OPEN = metrics_registry.gauge(
+    'evalbridge_sse_streams_open',
+    'SSE responses currently streaming',
+    ['endpoint']
+)
+
+def observe_stage(stage: str, seconds: float):
+    """Pipeline observer feeding the stage histogram"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+def cache_metrics():
+    """Scrape-time samples from the response cache, single-flight counters, circuit breakers, admission queues and jobs"""
+    stats = llm_cache.get_stats()
+    for result, key in (('hit', 'hits'), ('miss', 'misses'), ('bypass', 'bypassed')):
+        yield ('evalbridge_llm_cache_lookups_total', 'counter', 'LLM response cache lookups by result',
+               {'result': result}, stats[key])
+    yield ('evalbridge_llm_cache_hit_ratio', 'gauge', 'Cache hits / (hits + misses)', {}, stats['hit_rate'])
+    flight = llm_gateway.single_flight.get_stats()
+    yield ('evalbridge_single_flight_shared_total', 'counter',
+           'Calls that joined an identical in-flight call', {}, flight['shared'])
+    yield ('evalbridge_single_flight_in_flight', 'gauge', 'Distinct deduplicated calls in flight',
+           {}, flight['in_flight'])
+    prefixes = context_cache.get_stats()
+    for result in ('hits', 'created', 'refreshed', 'fallbacks'):
+        yield ('evalbridge_context_cache_lookups_total', 'counter',
+               'Provider-side cached prefix lookups by result', {'result': result}, prefixes[result])
+    yield ('evalbridge_context_cache_entries', 'gauge', 'Live provider-side cached contents',
+           {}, prefixes['entries'])
+    for model, circuit in call_policy.get_stats()['circuits'].items():
+        yield ('evalbridge_llm_circuit_open', 'gauge', 'Whether calls to a model are failing fast (1 open, 0.5 half-open)',
+               {'model': model}, {'closed': 0, 'half_open': 0.5, 'open': 1}[circuit['state']])
+    for model, queue in admission.get_stats()['models'].items():
+        yield ('evalbridge_llm_admission_queued', 'gauge', 'Model calls waiting for admission',
+               {'model': model}, queue['queued'])
+        yield ('evalbridge_llm_admitted_in_flight', 'gauge', 'Admitted model calls holding a slot',
+               {'model': model}, queue['in_flight'])
+    jobs = blueprint_jobs.get_stats()
+    for state in ('pending', 'running'):
+        yield ('evalbridge_blueprint_jobs_active', 'gauge', 'Blueprint jobs in this process by state',
+               {'state': state}, jobs[state])
+
+metrics_registry.register_callback(cache_metrics)
+
+@app.before_request
+def bind_request_id():
+    # Not reset on teardown: streamed responses keep logging under this id after the view returns
+    g.request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+    current_request_id.set(g.request_id)
+
+@app.before_request
+def bind_llm_priority():
+    # Interactive chat is admitted ahead of blueprint generation when model capacity is short
+    llm_priority.set(INTERACTIVE if request.path.startswith('/api/chat') else BATCH)
+
+@app.errorhandler(AdmissionRejected)
+def handle_admission_rejected(error):
+    response = jsonify({'error': 'Model capacity exhausted, please retry later', 'reason': error.reason,
+                        'retryAfter': error.retry_after_seconds})
+    response.headers['Retry-After'] = str(error.retry_after_seconds)
+    return response, 429
+
+def overload_event(error: Exception) -> dict:
+    """Extra SSE error fields telling stream clients when to retry after load shedding"""
+    if isinstance(error, AdmissionRejected):
+        return {'status': 429, 'retryAfter': error.retry_after_seconds}
+    return {}
+
+@app.before_request
+def bind_routing_context():
+    current_tenant.set(request.headers.get(TENANT_HEADER))
+    try:
+        latency_slo_ms.set(float(request.headers.get(LATENCY_SLO_HEADER, '')))
+    except ValueError:
+        latency_slo_ms.set(None)
+
+@app.before_request
+def bind_mock_seed():
+    # Demo responses are reproducible per seed; without the header MOCK_DATA_SEED (if any) applies
+    mock_seed.set(request.headers.get(MOCK_SEED_HEADER))
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_endpoint = request.endpoint or 'unmatched'
+    g.metrics_started = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+
+@app.after_request
+def record_request_metrics(response):
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_started, endpoint=g.metrics_endpoint,
+                                 method=request.method, status=str(response.status_code))
+    response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is not None:
+        HTTP_REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
 
 class ChatMessage:
     def __init__(self, role: str, content: str):
         self.role = role
         self.content = content
 
+# Model per call: stage defaults, ordered routing rules (stage, input size, tenant, latency SLO) and
+# the stronger model an expert call escalates to when the routed model's output fails validation
+model_router = ModelRouter(
+    defaults=parse_stage_models(os.getenv(
+        'MODEL_STAGE_DEFAULTS',
+        'extract=gemini-2.0-flash-exp,router=gemini-2.0-flash-exp,expert=gemini-2.5-pro,chat=gemini-2.0-flash-exp'
+    )),
+    rules=load_routing_rules(os.getenv('MODEL_ROUTING_RULES', '')),
+    escalation=parse_stage_models(os.getenv('MODEL_ESCALATION', 'expert=gemini-2.5-pro'))
+)
+
+# Model behind the streaming chat sessions (a live session keeps its model) and chat history budgets
+CHAT_MODEL = model_router.default_for('chat')
+
+def route_expert(product_info: str, ideal_functions: str):
+    """Route a dynamic expert call by the size of the product description"""
+    return model_router.route('expert', input_tokens=estimate_tokens(product_info + ideal_functions))
+
+# Expert selection used when the client does not send one
+DEFAULT_EXPERTS = ('3d_graphics', 'ai_researcher', 'user_experience')
+# Distinct expert combinations whose rendered prompts are kept (7 profiles -> at most 127)
+EXPERT_PROMPT_CACHE_SIZE = 128
+
 class EvaluationConsultant:
     def __init__(self):
         # Individual expert profiles that can be combined
@@ -156,7 +409,14 @@ class EvaluationConsultant:
                 'business_context': 'B2B healthcare product requiring clinical validation and regulatory approval'
             }
         }
-        
+
+        # System prompts depend only on the role config or expert combination (never on the
+        # request), so they are rendered once: role configs up front, expert combinations on
+        # first use. Every request for the same selection then sends a byte-identical prefix.
+        self._legacy_prompts = {key: self._build_legacy_prompt(config) for key, config in self.role_configs.items()}
+        self._expert_prompts = lru_cache(maxsize=EXPERT_PROMPT_CACHE_SIZE)(self._build_multi_expert_prompt)
+        self._expert_prompts(self.expert_combination(DEFAULT_EXPERTS))
+
     def get_system_prompt(self, config_key='q_figurine_3d', context=None):
         # Check if context has selected experts (new multi-expert approach)
         if context and 'selected_experts' in context:
@@ -164,22 +424,29 @@ class EvaluationConsultant:
         
         # Otherwise use legacy approach for backward compatibility
         return self.get_system_prompt_legacy(config_key, context)
+
+    def expert_combination(self, selected_experts) -> tuple:
+        """Canonical cache key for a selection: known expert ids, deduplicated, in profile order"""
+        selected = {expert_id for expert_id in selected_experts if isinstance(expert_id, str)}
+        return tuple(expert_id for expert_id in self.expert_profiles if expert_id in selected)
         
     def get_multi_expert_prompt(self, selected_experts=None, context=None):
-        """Generate system prompt based on selected experts"""
+        """Get the system prompt for a set of selected experts (built once per combination)"""
         if not selected_experts:
-            selected_experts = ['3d_graphics', 'ai_researcher', 'user_experience']  # Default
-        
+            selected_experts = DEFAULT_EXPERTS
+        return self._expert_prompts(self.expert_combination(selected_experts))
+
+    def _build_multi_expert_prompt(self, experts: tuple) -> str:
+        """Render the multi-expert prompt for a canonical expert combination"""
         expert_sections = []
-        for expert_id in selected_experts:
-            if expert_id in self.expert_profiles:
-                expert = self.expert_profiles[expert_id]
-                expert_sections.append(f"""{expert['emoji']} **{expert['title']}**
+        for expert_id in experts:
+            expert = self.expert_profiles[expert_id]
+            expert_sections.append(f"""{expert['emoji']} **{expert['title']}**
 {expert['expertise']}""")
         
         experts_text = "\n\n".join(expert_sections)
         
-        return f"""You are an AI PM Capability Consultant with {len(selected_experts)} expert perspectives:
+        return f"""You are an AI PM Capability Consultant with {len(experts)} expert perspectives:
 
 {experts_text}
 
@@ -205,14 +472,17 @@ CONTENT MODIFICATION:
 • PRIORITIZING: Rank capabilities by user impact and technical feasibility
 
 EXPERT PERSPECTIVES:
-{chr(10).join([f'• {self.expert_profiles[eid]["emoji"]} {self.expert_profiles[eid]["title"]}: Focus on {self.expert_profiles[eid]["technical_focus"].split(",")[0].lower()}' for eid in selected_experts if eid in self.expert_profiles])}
+{chr(10).join([f'• {self.expert_profiles[eid]["emoji"]} {self.expert_profiles[eid]["title"]}: Focus on {self.expert_profiles[eid]["technical_focus"].split(",")[0].lower()}' for eid in experts])}
 
 Stay focused on identifying what AI models need to do, not how to test them."""
 
     def get_system_prompt_legacy(self, config_key='q_figurine_3d', context=None):
-        """Legacy method for backward compatibility"""
-        config = self.role_configs.get(config_key, self.role_configs['q_figurine_3d'])
-        
+        """Legacy method for backward compatibility (prompts precompiled per role config)"""
+        return self._legacy_prompts.get(config_key) or self._legacy_prompts['q_figurine_3d']
+
+    @staticmethod
+    def _build_legacy_prompt(config: dict) -> str:
+        """Render the three-role prompt for one role config"""
         return f"""You are a Multi-Role AI Evaluation Consultant with expertise across three critical perspectives:
 
 🎨 DOMAIN SPECIALIST - {config['domain_specialist']['title']}
@@ -262,124 +532,291 @@ CONVERSATION STYLE:
 • Use empathetic, value-focused language when discussing user aspects
 • Synthesize insights from all three perspectives for holistic recommendations"""
 
-    def create_chat_session(self):
+    def create_chat_session(self, system_prompt=None, history=None):
+        # The per-attempt timeout is fixed on the session: a per-message config would replace the system instruction
+        config = http_timeout_config({'system_instruction': system_prompt} if system_prompt else None,
+                                     call_policy.policy_for('chat').timeout_seconds)
         return client.chats.create(
-            model="gemini-2.0-flash-exp"
+            model=CHAT_MODEL,
+            config=config,
+            history=history or None
+        )
+
+    def create_async_chat_session(self, system_prompt=None, history=None):
+        config = http_timeout_config({'system_instruction': system_prompt} if system_prompt else None,
+                                     call_policy.policy_for('chat').timeout_seconds)
+        return client.aio.chats.create(
+            model=CHAT_MODEL,
+            config=config,
+            history=history or None
         )
 
 consultant = EvaluationConsultant()
 
+# Chat history is compacted to a per-model token budget: recent turns verbatim, older
+# turns folded into a rolling summary cached per conversation
+chat_history = ChatHistoryManager(
+    token_budgets=parse_token_budgets(os.getenv('CHAT_HISTORY_MODEL_BUDGETS', '')),
+    default_budget=int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '4000')),
+    summary_tokens=int(os.getenv('CHAT_HISTORY_SUMMARY_TOKENS', '500')),
+    summarizer=model_summarizer(
+        lambda prompt: llm_gateway.generate_text(model=CHAT_MODEL, contents=prompt, stage='summary')
+    ) if client and os.getenv('CHAT_HISTORY_SUMMARIZER', 'extractive') == 'model' else None,
+    max_conversations=int(os.getenv('CHAT_MAX_SESSIONS', '500'))
+)
+
+# Live chat sessions keyed by conversation id (streaming chat)
+CHAT_MAX_SESSIONS = int(os.getenv('CHAT_MAX_SESSIONS', '500'))
+CHAT_SESSION_IDLE_SECONDS = float(os.getenv('CHAT_SESSION_IDLE_SECONDS', '1800'))
+chat_sessions = ChatSessionStore(
+    factory=consultant.create_chat_session,
+    max_sessions=CHAT_MAX_SESSIONS,
+    idle_ttl_seconds=CHAT_SESSION_IDLE_SECONDS
+)
+
+def route_chat(message: str, history: list, context: dict):
+    """
+    Route a single-shot chat turn on its uncompacted size
+
+    The history is then compacted to the routed model's budget, so routing has to come first.
+    """
+    tokens = estimate_tokens(message) + (estimate_tokens(json.dumps(context)) if context else 0)
+    tokens += sum(estimate_tokens(msg.get('content') or '') for msg in history or [] if isinstance(msg, dict))
+    return model_router.route('chat', input_tokens=tokens)
+
+def chat_system_prompt(context: dict) -> str:
+    """Memoized consultant system prompt for the request's domain config"""
+    config_key = context.get('domain_config', 'q_figurine_3d') if context else 'q_figurine_3d'
+    return consultant.get_system_prompt(config_key, context)
+
+def build_chat_prompt_parts(message: str, history: list, context: dict, conversation_id: str = None,
+                            model: str = None) -> tuple:
+    """
+    Assemble the single-shot /api/chat prompt as (system prompt, request-specific suffix)
+
+    The system prompt is memoized per expert selection and sent as provider-side cached
+    content when available. History is compacted to the token budget of `model` (the
+    routed chat model; the chat stage default if omitted). Shared by the WSGI and ASGI apps.
+    """
+    parts = ["\n\n"]
+    
+    compacted = chat_history.compact(history, model or CHAT_MODEL, conversation_id)
+    if compacted.summary:
+        parts.append(f"Summary of earlier conversation:\n{compacted.summary}\n\n")
+    if compacted.messages:
+        parts.append("Previous conversation:\n")
+        for msg in compacted.messages:
+            parts.append(f"{msg['role']}: {msg['content']}\n")
+        parts.append("\n")
+    
+    if context:
+        parts.append(f"Current project context: {json.dumps(context)}\n\n")
+    
+    parts.append(f"User question: {message}\n\nPlease respond as the AI evaluation consultant:")
+    return chat_system_prompt(context), ''.join(parts)
+
+def build_chat_prompt(message: str, history: list, context: dict, conversation_id: str = None,
+                      model: str = None) -> str:
+    """Assemble the full single-shot /api/chat prompt"""
+    return ''.join(build_chat_prompt_parts(message, history, context, conversation_id, model))
+
+class ChatRequest:
+    """Fields of a /api/chat or /api/chat/stream body"""
+
+    def __init__(self, data: dict):
+        data = data or {}
+        self.message = data.get('message', '')
+        self.history = data.get('history', [])
+        self.context = data.get('context', {})
+        self.conversation_id = data.get('conversationId')
+        self.bypass_cache = bool(data.get('bypassCache', False))
+
+    def route(self):
+        return route_chat(self.message, self.history, self.context)
+
+    def prompt_parts(self, route) -> tuple:
+        """(system prompt, suffix) with history compacted for the routed model; may call the summarizer"""
+        return build_chat_prompt_parts(self.message, self.history, self.context, self.conversation_id, route.model)
+
+def chat_steps(chat_request: ChatRequest, route, system_prompt: str, chat_prompt: str):
+    """Single-shot chat turn as agent steps (see serving_core); returns the reply text"""
+    response = yield dict(
+        model=route.model,
+        contents=chat_prompt,
+        prefix=system_prompt,
+        bypass_cache=chat_request.bypass_cache,
+        stage='chat'
+    )
+    return response.text
+
+def chat_payload(response_text: str) -> dict:
+    """JSON body of a single-shot chat reply"""
+    return {
+        'response': response_text,
+        'timestamp': datetime.now().isoformat(),
+        'status': 'success',
+        'mode': APP_MODE
+    }
+
+class ChatStreamTurn:
+    """
+    One /api/chat/stream turn: SSE events and live-session bookkeeping
+
+    The live session for the conversation is reused; a new one is seeded from the client
+    history compacted to the token budget. Live sessions are bound to the model they were
+    created with, so streaming chat stays on the chat stage default (CHAT_MODEL) rather than
+    being routed per turn. The apps only differ in how they iterate the model stream.
+    """
+
+    def __init__(self, data: dict):
+        self.request = ChatRequest(data)
+        self.message = self.request.message
+        # Conversations without an id get one; the client should echo it on later messages
+        self.conversation_id = self.request.conversation_id or str(uuid.uuid4())
+        self.full_response = ""
+        self.compacted = None
+
+    def system_prompt(self) -> str:
+        return chat_system_prompt(self.request.context)
+
+    def seed_history(self) -> list:
+        """History for a newly created session (compaction may call the summarizer model)"""
+        self.compacted = chat_history.compact(self.request.history, CHAT_MODEL, self.conversation_id)
+        return self.compacted.as_messages()
+
+    def attach(self, session, created: bool):
+        if created:
+            session.tokens = self.compacted.tokens
+        return session
+
+    def reserve_tokens(self, session) -> int:
+        return admission.reserve_tokens(session.tokens + estimate_tokens(self.message))
+
+    def record(self, session):
+        """Account a completed turn on the live session"""
+        session.turns += 1
+        session.tokens += estimate_tokens(self.message) + estimate_tokens(self.full_response)
+
+    def outgrown(self, session) -> bool:
+        """The live session outgrew the budget; the next turn reseeds it compacted"""
+        return session.tokens > chat_history.budget_for(CHAT_MODEL)
+
+    def missing_message(self) -> str:
+        return sse_event({'error': 'Message is required'})
+
+    def chunk(self, text: str) -> str:
+        self.full_response += text
+        return sse_event({'type': 'chunk', 'content': text})
+
+    def complete(self) -> str:
+        return sse_event({'type': 'complete', 'fullResponse': self.full_response,
+                          'conversationId': self.conversation_id})
+
+    def error(self, error: Exception) -> str:
+        return sse_event({'type': 'error', 'error': str(error), **overload_event(error)})
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
-        data = request.get_json()
-        message = data.get('message', '')
-        history = data.get('history', [])
-        context = data.get('context', {})
+        chat_request = ChatRequest(request.get_json())
         
-        if not message:
+        if not chat_request.message:
             return jsonify({'error': 'Message is required'}), 400
 
-        # Get config from context or use default
-        config_key = context.get('domain_config', 'q_figurine_3d') if context else 'q_figurine_3d'
-        
-        # Create enhanced prompt with context
-        enhanced_prompt = f"{consultant.get_system_prompt(config_key, context)}\n\n"
-        
-        if history:
-            enhanced_prompt += "Previous conversation:\n"
-            for msg in history[-5:]:  # Only include last 5 messages for context
-                enhanced_prompt += f"{msg['role']}: {msg['content']}\n"
-            enhanced_prompt += "\n"
-        
-        if context:
-            enhanced_prompt += f"Current project context: {json.dumps(context)}\n\n"
-        
-        enhanced_prompt += f"User question: {message}\n\nPlease respond as the AI evaluation consultant:"
+        route = chat_request.route()
+        system_prompt, chat_prompt = chat_request.prompt_parts(route)
 
         if APP_MODE == 'demo':
-            # 演示模式：使用模拟响应
-            response_text = mock_generator.generate_chat_response(message)
+            # 演示模式：使用模拟响应（模拟延迟阻塞当前 WSGI 请求线程）
+            demo_latency.sleep('chat')
+            response_text = mock_generator.generate_chat_response(chat_request.message)
         else:
             # 生产模式：使用真实AI API
             if not client:
                 return jsonify({'error': 'AI client not initialized'}), 500
             
-            # Generate response using Gemini
-            response = client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=enhanced_prompt
-            )
-            
-            response_text = response.text
+            # Generate response using Gemini (identical prompts are served from cache)
+            response_text = run_steps(chat_steps(chat_request, route, system_prompt, chat_prompt),
+                                      llm_gateway.generate)
         
-        return jsonify({
-            'response': response_text,
-            'timestamp': datetime.now().isoformat(),
-            'status': 'success',
-            'mode': APP_MODE
-        })
+        return jsonify(chat_payload(response_text))
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        print(f"Chat error: {str(e)}")
+        logger.exception("Chat error")
         return jsonify({'error': f'Failed to process chat message: {str(e)}'}), 500
 
 @app.route('/api/chat/stream', methods=['POST'])
 def chat_stream():
+    turn = ChatStreamTurn(request.get_json())
+
     def generate():
         try:
-            data = request.get_json()
-            message = data.get('message', '')
-            history = data.get('history', [])
-            context = data.get('context', {})
-            
-            if not message:
-                yield f"data: {json.dumps({'error': 'Message is required'})}\n\n"
+            if not turn.message:
+                yield turn.missing_message()
                 return
 
-            # Create chat session
-            chat = consultant.create_chat_session()
-            
-            # Build context from history
-            if history:
-                for msg in history[-10:]:  # Include more history for better context
-                    try:
-                        if msg['role'] == 'user':
-                            chat.send_message(msg['content'])
-                        # Note: We can't add assistant messages to history in this way
-                        # This is a limitation of the current Gemini API
-                    except:
-                        pass  # Continue if adding history fails
-            
-            # Get config from context or use default
-            config_key = context.get('domain_config', 'q_figurine_3d') if context else 'q_figurine_3d'
-            
-            # Send current message and stream response
-            response_stream = chat.send_message_stream(f"{consultant.get_system_prompt(config_key, context)}\n\nUser: {message}")
-            
-            full_response = ""
-            for chunk in response_stream:
-                if chunk.text:
-                    full_response += chunk.text
-                    yield f"data: {json.dumps({'type': 'chunk', 'content': chunk.text, 'timestamp': datetime.now().isoformat()})}\n\n"
-            
+            if APP_MODE == 'demo':
+                # 演示模式：按模拟的首字延迟和分块间隔输出模拟响应
+                for text in demo_latency.stream(mock_generator.generate_chat_chunks(turn.message)):
+                    yield turn.chunk(text)
+                yield turn.complete()
+                return
+
+            if not client:
+                yield sse_event({'type': 'error', 'error': 'AI client not initialized'})
+                return
+
+            session = turn.attach(*chat_sessions.get_or_create(turn.conversation_id, turn.system_prompt(),
+                                                               turn.seed_history))
+
+            with session.lock:
+                try:
+                    # Retried only until the first chunk; the chat records history once the stream completes
+                    response_stream = call_policy.stream(CHAT_MODEL, lambda timeout: admission.iterate(
+                        CHAT_MODEL, lambda: session.chat.send_message_stream(turn.message),
+                        turn.reserve_tokens(session), max_wait=timeout
+                    ), stage='chat')
+
+                    for chunk in response_stream:
+                        if chunk.text:
+                            yield turn.chunk(chunk.text)
+                    turn.record(session)
+                except BaseException:
+                    # A failed or abandoned turn leaves the session history unreliable
+                    chat_sessions.drop(turn.conversation_id)
+                    raise
+
+            if turn.outgrown(session):
+                chat_sessions.drop(turn.conversation_id)
+
             # Send completion
-            yield f"data: {json.dumps({'type': 'complete', 'fullResponse': full_response, 'timestamp': datetime.now().isoformat()})}\n\n"
+            yield turn.complete()
             
         except Exception as e:
-            print(f"Streaming error: {str(e)}")
-            yield f"data: {json.dumps({'type': 'error', 'error': str(e), 'timestamp': datetime.now().isoformat()})}\n\n"
+            logger.exception("Streaming error")
+            yield turn.error(e)
 
     return Response(
-        generate(),
+        instrument_stream(generate(), SSE_CHUNK_INTERVAL, SSE_STREAMS_OPEN, endpoint='chat_stream'),
         content_type='text/event-stream',
-        headers={
-            'Cache-Control': 'no-cache',
-            'Connection': 'keep-alive',
-            'Access-Control-Allow-Origin': '*',
-        }
+        headers=SSE_HEADERS
     )
 
+@app.route('/api/chat/sessions', methods=['GET'])
+def get_chat_session_stats():
+    """Get live chat session and history compaction counters"""
+    stats = chat_sessions.get_stats()
+    stats['history'] = chat_history.get_stats()
+    return jsonify(stats)
+
+@app.route('/api/chat/sessions/<conversation_id>', methods=['DELETE'])
+def end_chat_session(conversation_id: str):
+    """End a conversation and release its live chat session"""
+    chat_history.forget(conversation_id)
+    return jsonify({'conversationId': conversation_id, 'released': chat_sessions.drop(conversation_id)})
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
@@ -417,7 +854,7 @@ def modify_capabilities():
         return jsonify(response_data)
         
     except Exception as e:
-        print(f"Capability modification error: {str(e)}")
+        logger.exception("Capability modification error")
         return jsonify({'error': f'Failed to modify capabilities: {str(e)}', 'success': False}), 500
 
 @app.route('/api/experts', methods=['GET'])
@@ -472,21 +909,45 @@ def get_domain_configs():
     except Exception as e:
         return jsonify({'error': f'Failed to get domain configs: {str(e)}'}), 500
 
-def extract_product_info_and_functions(user_input: str) -> dict:
-    """Step 0: Information Extraction Agent - Intelligently parse user input"""
-    
-    if APP_MODE == 'demo':
-        # 演示模式：使用模拟数据
-        return {
-            'productInfo': f"Demo product based on: {user_input}",
-            'idealFunctions': f"Demo functions based on: {user_input}"
-        }
-    
-    # 生产模式：使用真实AI API
-    if not client:
-        raise ValueError("AI client not initialized for production mode")
-    
-    extraction_prompt = f"""# ROLE: 产品需求信息提取专家 (Product Requirements Extraction Specialist)
+DEMO_DOMAIN_CONTEXT = {
+    'primary_domain': '3D Computer Vision',
+    'secondary_domains': ['Machine Learning', 'User Experience'],
+    'domain_config': 'q_figurine_3d'
+}
+
+def demo_extracted_info(user_input: str) -> dict:
+    """Demo-mode stand-in for the information extraction agent"""
+    return {
+        'productInfo': f"Demo product based on: {user_input}",
+        'idealFunctions': f"Demo functions based on: {user_input}"
+    }
+
+# 演示模式的模拟延迟：Flask 中阻塞调用线程（sleep），只有 ASGI 服务在事件循环上等待（asleep）
+demo_latency = DemoLatency.from_env()
+
+def demo_extract(user_input: str, bypass_cache: bool = False) -> dict:
+    """Demo Step 0: mock extraction after a simulated model delay (blocks the calling thread)"""
+    demo_latency.sleep('extract')
+    return demo_extracted_info(user_input)
+
+async def demo_extract_async(user_input: str, bypass_cache: bool = False) -> dict:
+    """Demo Step 0 for the event loop"""
+    await demo_latency.asleep('extract')
+    return demo_extracted_info(user_input)
+
+def demo_router(product_info: str, ideal_functions: str, bypass_cache: bool = False) -> dict:
+    """Demo Step A: mock domain routing after a simulated model delay (blocks the calling thread)"""
+    demo_latency.sleep('router')
+    return dict(DEMO_DOMAIN_CONTEXT)
+
+async def demo_router_async(product_info: str, ideal_functions: str, bypass_cache: bool = False) -> dict:
+    """Demo Step A for the event loop"""
+    await demo_latency.asleep('router')
+    return dict(DEMO_DOMAIN_CONTEXT)
+
+def build_extraction_prompt(user_input: str) -> str:
+    """Build the Step 0 information extraction prompt"""
+    return f"""# ROLE: 产品需求信息提取专家 (Product Requirements Extraction Specialist)
 
 # CONTEXT:
 你是一个专门从用户描述中提取结构化产品信息的AI助手。用户可能会用自然语言混合描述产品信息和期望功能，你的任务是将这些信息清晰地分离和组织。
@@ -520,55 +981,64 @@ def extract_product_info_and_functions(user_input: str) -> dict:
   "idealFunctions": "高质量3D模型生成、风格一致的卡通化处理、快速生成响应、支持多种照片输入格式、适合社交媒体分享的输出格式。"
 }}"""
 
+EXTRACTION_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'productInfo': {'type': 'string'},
+        'idealFunctions': {'type': 'string'},
+    },
+}
+
+def parse_extraction_response(response_text: str, user_input: str) -> dict:
+    """Parse the extraction agent's JSON object, falling back to the raw input"""
+    try:
+        with STAGE_SECONDS.time(stage='json_parse'):
+            return extract_json(response_text, expect='object', schema=EXTRACTION_SCHEMA)
+    except JSONExtractionError:
+        # Fallback: if extraction fails, use the original input for both
+        return {
+            "productInfo": user_input,
+            "idealFunctions": user_input
+        }
+
+def extraction_steps(user_input: str, bypass_cache: bool = False):
+    """Step 0 as agent steps (see serving_core): yields the extraction call, returns the parsed info"""
+    if not client:
+        raise ValueError("AI client not initialized for production mode")
+
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=extraction_prompt
+        response = yield dict(
+            model=model_router.route('extract', input_tokens=estimate_tokens(user_input)).model,
+            contents=build_extraction_prompt(user_input),
+            bypass_cache=bypass_cache,
+            stage='extract'
         )
         
-        response_text = response.text.strip()
-        
-        # Try to extract JSON from the response
-        import re
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            return json.loads(json_str)
-        else:
-            # Fallback: if extraction fails, use the original input for both
-            return {
-                "productInfo": user_input,
-                "idealFunctions": user_input
-            }
-            
+        return parse_extraction_response(response.text.strip(), user_input)
+
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        print(f"Information extraction error: {str(e)}")
+        logger.exception("Information extraction error")
         # Fallback: if extraction fails, use the original input for both
         return {
             "productInfo": user_input,
             "idealFunctions": user_input
         }
 
-def call_domain_router_agent(product_info: str, ideal_functions: str) -> dict:
-    """Step A: Domain Router Agent - Identifies required expert knowledge domains"""
+def extract_product_info_and_functions(user_input: str, bypass_cache: bool = False) -> dict:
+    """Step 0: Information Extraction Agent - Intelligently parse user input"""
     
     if APP_MODE == 'demo':
         # 演示模式：使用模拟数据
-        return {
-            'primary_domain': '3D Computer Vision',
-            'secondary_domains': ['Machine Learning', 'User Experience'],
-            'domain_config': 'q_figurine_3d'
-        }
+        return demo_extract(user_input, bypass_cache)
     
     # 生产模式：使用真实AI API
-    if not client:
-        raise ValueError("AI client not initialized for production mode")
-    
-    print(f"[DEBUG] Domain router called with product_info: {product_info[:50]}...")
-    print(f"[DEBUG] Domain router called with ideal_functions: {ideal_functions[:50]}...")
-    
-    print(f"[DEBUG] Building domain router prompt...")
-    domain_router_prompt = f"""# ROLE: 首席系统架构师 (Chief Systems Architect) & 专家调度中枢
+    return run_steps(extraction_steps(user_input, bypass_cache), llm_gateway.generate)
+
+def build_domain_router_prompt(product_info: str, ideal_functions: str) -> str:
+    """Build the Step A domain router prompt"""
+    return f"""# ROLE: 首席系统架构师 (Chief Systems Architect) & 专家调度中枢
 
 # CONTEXT:
 你是一个AI评测系统的"路由"中枢。你的任务是分析一个新产品的高阶需求，并准确判断：要"评测"这个产品，我们必须从哪些"专业领域"视角切入。
@@ -610,266 +1080,742 @@ def call_domain_router_agent(product_info: str, ideal_functions: str) -> dict:
   }}
 }}"""
 
+_DOMAIN_SCHEMA = {
+    'type': 'object',
+    'required': ['domainName', 'knowledgeDescription'],
+    'properties': {
+        'domainName': {'type': 'string'},
+        'knowledgeDescription': {'type': 'string'},
+    },
+}
+
+DOMAIN_CONTEXT_SCHEMA = {
+    'type': 'object',
+    'required': ['professionalDomain', 'technicalDomain', 'userDomain'],
+    'properties': {
+        'professionalDomain': _DOMAIN_SCHEMA,
+        'technicalDomain': _DOMAIN_SCHEMA,
+        'userDomain': _DOMAIN_SCHEMA,
+    },
+}
+
+def parse_domain_router_response(response_text: str) -> dict:
+    """Parse the domain router's JSON object (handles markdown code blocks)"""
+    with STAGE_SECONDS.time(stage='json_parse'):
+        return extract_json(response_text, expect='object', schema=DOMAIN_CONTEXT_SCHEMA)
+
+def domain_router_steps(product_info: str, ideal_functions: str, bypass_cache: bool = False):
+    """Step A as agent steps (see serving_core): yields the router call, returns the domain context"""
+    if not client:
+        raise ValueError("AI client not initialized for production mode")
+    
+    logger.debug("Domain router called", extra={'product_info_chars': len(product_info),
+                                                'ideal_functions_chars': len(ideal_functions)})
+
     try:
-        print("[DEBUG] Calling Gemini API for domain router...")
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=domain_router_prompt
+        result = yield dict(
+            model=model_router.route('router', input_tokens=estimate_tokens(product_info + ideal_functions)).model,
+            contents=build_domain_router_prompt(product_info, ideal_functions),
+            bypass_cache=bypass_cache,
+            stage='router'
         )
         
-        print(f"[DEBUG] API call successful. Response type: {type(response)}")
-        if hasattr(response, 'text'):
-            response_text = response.text.strip()
-            print(f"[DEBUG] Raw domain router response: {response_text}")
+        logger.debug("Domain router call succeeded", extra={'cache_hit': result.cache_hit})
+        if result.text:
+            response_text = result.text.strip()
+            log_payload(logger, "Domain router raw response", response_text)
         else:
-            print(f"[DEBUG] Response has no text attribute: {response}")
             raise ValueError("No text in API response")
         
-        # Try to extract JSON from the response (handle markdown code blocks)
-        import re
-        
-        # First try to remove markdown code block markers
-        if '```json' in response_text:
-            print("[DEBUG] Detected markdown code block in domain router response")
-            # Extract content between ```json and ```
-            json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1).strip()
-                print(f"[DEBUG] Extracted JSON string from domain router: {json_str[:100]}...")
-            else:
-                # Fallback to normal JSON extraction
-                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(0)
-                else:
-                    raise ValueError("No valid JSON found in domain router response")
-        else:
-            # Normal JSON extraction
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
-                raise ValueError("No valid JSON found in domain router response")
-        
-        return json.loads(json_str)
+        return parse_domain_router_response(response_text)
             
     except Exception as e:
-        print(f"Domain router error: {str(e)}")
+        logger.exception("Domain router error")
         raise e
 
-def call_dynamic_expert_agent(domain_context: dict, product_info: str, ideal_functions: str) -> list:
-    """重构后的能力维度生成 - 支持演示模式和真实模式"""
+def call_domain_router_agent(product_info: str, ideal_functions: str, bypass_cache: bool = False) -> dict:
+    """Step A: Domain Router Agent - Identifies required expert knowledge domains"""
     
-    # 生成执行ID
-    execution_id = f"capability_gen_{int(time.time())}"
+    if APP_MODE == 'demo':
+        # 演示模式：使用模拟数据
+        return demo_router(product_info, ideal_functions, bypass_cache)
     
-    # 开始监控执行
-    workflow_monitor.start_execution(execution_id, {
+    # 生产模式：使用真实AI API
+    return run_steps(domain_router_steps(product_info, ideal_functions, bypass_cache), llm_gateway.generate)
+
+CAPABILITY_DIMENSIONS_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'required': ['id', 'title'],
+        'properties': {
+            'id': {'type': 'string'},
+            'title': {'type': 'string'},
+        },
+    },
+    'minItems': 1,
+}
+
+def parse_capability_dimensions_response(response_text: str) -> list:
+    """Parse the dynamic expert's JSON array of capability dimensions (handles markdown code blocks)"""
+    with STAGE_SECONDS.time(stage='json_parse'):
+        return extract_json(response_text, expect='array', schema=CAPABILITY_DIMENSIONS_SCHEMA)
+
+def start_expert_execution(domain_context: dict, product_info: str, ideal_functions: str):
+    """Start a capability_gen execution; a pending domain context is recorded once the router resolves it"""
+    pending = isinstance(domain_context, PendingDomainContext)
+    execution = workflow_monitor.start_execution(make_execution_id('capability_gen'), {
         'product_info': product_info,
         'ideal_functions': ideal_functions,
-        'domain_context': domain_context,
+        'domain_context': None if pending else domain_context,
+        'mode': APP_MODE
+    })
+    if pending:
+        domain_context.on_resolve(lambda context, router_input: workflow_monitor.update_input(
+            execution.id, {'domain_context': context, 'domain_router_input': router_input}))
+    return execution
+
+def complete_expert_execution(execution, result: list):
+    """Finish a capability execution with the generated dimensions"""
+    execution.complete({
+        'capability_dimensions': result,
+        'total_dimensions': len(result),
+        'execution_time': datetime.now().isoformat(),
         'mode': APP_MODE
     })
+
+def recover_skipped_cards(parser: JSONArrayStreamParser, response_text: str) -> list:
+    """Cards the stream parser skipped as malformed, recovered from the whole response when it parses"""
+    if not parser.skipped:
+        return []
+    try:
+        cards = parse_capability_dimensions_response(response_text)
+    except JSONExtractionError:
+        cards = None
+    if cards is None or len(cards) != parser.elements:
+        logger.warning("Dropped %d malformed capability dimension(s) from the stream", len(parser.skipped))
+        return []
+    return [cards[index] for index in parser.skipped]
+
+def start_demo_expert_execution(domain_context: dict, product_info: str, ideal_functions: str):
+    """Open the monitored execution for a demo expert call (before its simulated delay)"""
+    execution = start_expert_execution(domain_context, product_info, ideal_functions)
+    execution.add_step("Demo Mode", {
+        'action': 'Generating mock capability dimensions',
+        'mode': 'demo',
+        'note': 'Using pre-generated realistic data for demonstration'
+    })
+    return execution
+
+def finish_demo_expert_execution(execution, product_info: str, ideal_functions: str, delay: float) -> list:
+    """Generate the mock capability dimensions once the simulated delay is over"""
+    try:
+        result = mock_generator.generate_capability_dimensions(product_info, ideal_functions)
+
+        execution.add_step("Mock Data Generated", {
+            'action': 'Mock capability dimensions generated',
+            'simulated_latency_ms': round(delay * 1000, 1),
+            'dimensions_count': len(result),
+            'dimensions': [{'id': dim.get('id'), 'title': dim.get('title')} for dim in result]
+        })
+
+        complete_expert_execution(execution, result)
+        return result
+
+    except Exception as e:
+        logger.exception("Dynamic expert error")
+        execution.complete(output_data=None, error=str(e))
+        raise e
+
+def demo_expert(domain_context: dict, product_info: str, ideal_functions: str, bypass_cache: bool = False) -> list:
+    """Demo Steps B & C: mock capability dimensions after a simulated delay (blocks the calling thread)"""
+    execution = start_demo_expert_execution(domain_context, product_info, ideal_functions)
+    # 模拟AI处理时间
+    delay = demo_latency.sleep('expert')
+    return finish_demo_expert_execution(execution, product_info, ideal_functions, delay)
+
+async def demo_expert_async(domain_context: dict, product_info: str, ideal_functions: str,
+                            bypass_cache: bool = False) -> list:
+    """Demo Steps B & C for the event loop"""
+    execution = start_demo_expert_execution(domain_context, product_info, ideal_functions)
+    delay = await demo_latency.asleep('expert')
+    return finish_demo_expert_execution(execution, product_info, ideal_functions, delay)
+
+def load_capability_prompt(execution, product_info: str, ideal_functions: str) -> tuple:
+    """Record the prompt step and format the capability dimensions prompt as (cached prefix, suffix)"""
+    execution.add_step("Load Prompt Template", {
+        'action': 'Loading capability dimensions prompt template',
+        'template_source': 'prompts/capability_dimensions_prompt.txt',
+        'prompt_id': prompt_manager.prompt_id(CAPABILITY_PROMPT_NAME)
+    })
+    
+    # 使用提示词管理器加载和格式化提示词
+    return prompt_manager.format_capability_dimensions_prompt_parts(
+        product_info=product_info,
+        ideal_functions=ideal_functions
+    )
+
+def expert_call(execution, route, prompt_prefix: str, dynamic_expert_prompt: str, bypass_cache: bool,
+                action: str = 'Calling') -> dict:
+    """Record the model step and return the gateway arguments of one dynamic expert call"""
+    execution.add_step("Call AI Model", {
+        'action': f'{action} {route.model} model',
+        'model': route.model,
+        'routing_rule': route.rule,
+        'prompt_length': len(prompt_prefix) + len(dynamic_expert_prompt)
+    })
+    return dict(
+        model=route.model,
+        contents=dynamic_expert_prompt,
+        prefix=prompt_prefix,
+        prefix_label=CAPABILITY_PROMPT_NAME,
+        bypass_cache=bypass_cache,
+        stage='expert'
+    )
+
+def dynamic_expert_steps(domain_context: dict, product_info: str, ideal_functions: str,
+                         bypass_cache: bool = False):
+    """Steps B & C as agent steps (see serving_core): yields each expert call, returns the dimensions"""
+    # 开始监控执行
+    execution = start_expert_execution(domain_context, product_info, ideal_functions)
     
     try:
-        if APP_MODE == 'demo':
-            # 演示模式：使用模拟数据
-            workflow_monitor.add_step("Demo Mode", {
-                'action': 'Generating mock capability dimensions',
-                'mode': 'demo',
-                'note': 'Using pre-generated realistic data for demonstration'
-            })
-            
-            # 模拟处理时间
-            import time
-            time.sleep(1)  # 模拟AI处理时间
-            
-            # 生成模拟数据
-            result = mock_generator.generate_capability_dimensions(product_info, ideal_functions)
-            
-            workflow_monitor.add_step("Mock Data Generated", {
-                'action': 'Mock capability dimensions generated',
-                'dimensions_count': len(result),
-                'dimensions': [{'id': dim.get('id'), 'title': dim.get('title')} for dim in result]
-            })
-            
-        else:
-            # 生产模式：使用真实AI API
-            # 步骤1: 加载提示词
-            workflow_monitor.add_step("Load Prompt Template", {
-                'action': 'Loading capability dimensions prompt template',
-                'template_source': 'prompts/capability_dimensions_prompt.txt'
-            })
-            
-            # 使用提示词管理器加载和格式化提示词
-            dynamic_expert_prompt = prompt_manager.format_capability_dimensions_prompt(
-                product_info=product_info,
-                ideal_functions=ideal_functions
-            )
-            
-            # 步骤2: 调用AI模型
-            workflow_monitor.add_step("Call AI Model", {
-                'action': 'Calling Gemini 2.5 Pro model',
-                'model': 'gemini-2.5-pro',
-                'prompt_length': len(dynamic_expert_prompt)
-            })
-            
-            response = client.models.generate_content(
-                model="gemini-2.5-pro",
-                contents=dynamic_expert_prompt
-            )
-            
+        # 步骤1: 加载提示词
+        prompt_prefix, dynamic_expert_prompt = load_capability_prompt(execution, product_info, ideal_functions)
+        
+        # 步骤2: 调用AI模型（按路由策略选择模型，输出无效时升级到更强的模型）
+        route = route_expert(product_info, ideal_functions)
+        while True:
+            response = yield expert_call(execution, route, prompt_prefix, dynamic_expert_prompt, bypass_cache)
+
             response_text = response.text.strip()
-            
+
             # 步骤3: 解析响应
-            workflow_monitor.add_step("Parse AI Response", {
+            execution.add_step("Parse AI Response", {
                 'action': 'Extracting JSON from AI response',
-                'response_length': len(response_text)
+                'response_length': len(response_text),
+                'cache_hit': response.cache_hit,
+                'shared_in_flight': response.shared
             })
-            
-            # Try to extract JSON from the response (handle markdown code blocks)
-            import re
-            
-            # First try to remove markdown code block markers
-            if '```json' in response_text:
-                # Extract content between ```json and ```
-                json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(1).strip()
-                else:
-                    # Fallback to normal JSON extraction
-                    json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-                    if json_match:
-                        json_str = json_match.group(0)
-                    else:
-                        raise ValueError("No valid JSON found in dynamic expert response")
-            else:
-                # Normal JSON extraction
-                json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(0)
-                else:
-                    raise ValueError("No valid JSON found in dynamic expert response")
-            
+
             # 步骤4: 验证和返回结果
-            result = json.loads(json_str)
-            
-            workflow_monitor.add_step("Validate Results", {
-                'action': 'Validating generated capability dimensions',
-                'dimensions_count': len(result),
-                'dimensions': [{'id': dim.get('id'), 'title': dim.get('title')} for dim in result]
-            })
+            try:
+                result = parse_capability_dimensions_response(response_text)
+                break
+            except JSONExtractionError as e:
+                if not route.can_escalate:
+                    raise
+                route = model_router.escalate(route, e)
         
-        # 完成执行
-        workflow_monitor.complete_execution({
-            'capability_dimensions': result,
-            'total_dimensions': len(result),
-            'execution_time': datetime.now().isoformat(),
-            'mode': APP_MODE
+        execution.add_step("Validate Results", {
+            'action': 'Validating generated capability dimensions',
+            'dimensions_count': len(result),
+            'dimensions': [{'id': dim.get('id'), 'title': dim.get('title')} for dim in result]
         })
+    
+        # 完成执行
+        complete_expert_execution(execution, result)
         
         return result
-            
+
+    except AdmissionRejected as e:
+        # Shed load is not a failure of the agent: record it and let the 429 handler answer
+        execution.complete(output_data=None, error=str(e))
+        raise
     except Exception as e:
-        print(f"Dynamic expert error: {str(e)}")
+        logger.exception("Dynamic expert error")
         
         # 记录错误
-        workflow_monitor.complete_execution(
+        execution.complete(
             output_data=None,
             error=str(e)
         )
         
         raise e
 
+def call_dynamic_expert_agent(domain_context: dict, product_info: str, ideal_functions: str,
+                              bypass_cache: bool = False) -> list:
+    """重构后的能力维度生成 - 支持演示模式和真实模式"""
+    
+    if APP_MODE == 'demo':
+        # 演示模式：模拟数据（模拟延迟阻塞调用线程）
+        return demo_expert(domain_context, product_info, ideal_functions, bypass_cache)
+    
+    # 生产模式：使用真实AI API
+    return run_steps(dynamic_expert_steps(domain_context, product_info, ideal_functions, bypass_cache),
+                     llm_gateway.generate)
+
+class CapabilityStream:
+    """
+    Transport-independent state of one streamed dynamic expert run
+
+    Cards are parsed out of the model stream as each array element closes. calls() yields the
+    gateway arguments of each attempt, feed() returns the cards a chunk completed and finish()
+    those left when the attempt's stream ends: malformed elements recovered from the full text,
+    or the whole response parsed when nothing streamed (e.g. unexpected layout). Unusable output
+    escalates to a stronger model, and calls() then yields another attempt.
+    """
+
+    def __init__(self, execution, product_info: str, ideal_functions: str, bypass_cache: bool = False):
+        self.execution = execution
+        self.product_info = product_info
+        self.ideal_functions = ideal_functions
+        self.bypass_cache = bypass_cache
+        self.cards = []
+        self.route = None
+        self.parser = None
+        self.parts = []
+        self._done = False
+
+    def demo_cards(self) -> list:
+        self.execution.add_step("Demo Mode", {
+            'action': 'Streaming mock capability dimensions',
+            'mode': 'demo'
+        })
+        return mock_generator.generate_capability_dimensions(self.product_info, self.ideal_functions)
+
+    def calls(self):
+        prompt_prefix, dynamic_expert_prompt = load_capability_prompt(self.execution, self.product_info,
+                                                                      self.ideal_functions)
+        self.route = route_expert(self.product_info, self.ideal_functions)
+        while not self._done:
+            self.parser = JSONArrayStreamParser()
+            self.parts = []
+            yield expert_call(self.execution, self.route, prompt_prefix, dynamic_expert_prompt, self.bypass_cache,
+                              action='Streaming')
+
+        self.execution.add_step("Validate Results", {
+            'action': 'Validating streamed capability dimensions',
+            'response_length': sum(len(part) for part in self.parts),
+            'skipped_elements': len(self.parser.skipped),
+            'dimensions_count': len(self.cards),
+            'dimensions': [{'id': dim.get('id'), 'title': dim.get('title')} for dim in self.cards]
+        })
+
+    def add(self, card: dict) -> dict:
+        self.cards.append(card)
+        return card
+
+    def feed(self, chunk: str) -> list:
+        self.parts.append(chunk)
+        return [self.add(card) for card in self.parser.feed(chunk)]
+
+    def finish(self) -> list:
+        response_text = ''.join(self.parts).strip()
+        if self.cards:
+            # Elements that failed to parse mid-stream get a second chance on the full text
+            self._done = True
+            return [self.add(card) for card in recover_skipped_cards(self.parser, response_text)]
+        try:
+            cards = parse_capability_dimensions_response(response_text)
+        except JSONExtractionError as e:
+            if not self.route.can_escalate:
+                raise
+            self.route = model_router.escalate(self.route, e)
+            return []
+        self._done = True
+        return [self.add(card) for card in cards]
+
+@contextmanager
+def monitored_capability_stream(product_info: str, ideal_functions: str, bypass_cache: bool = False):
+    """Run a CapabilityStream inside a capability_stream execution, completed with the streamed cards"""
+    execution = workflow_monitor.start_execution(make_execution_id('capability_stream'), {
+        'product_info': product_info,
+        'ideal_functions': ideal_functions,
+        'mode': APP_MODE,
+        'streaming': True
+    })
+    stream = CapabilityStream(execution, product_info, ideal_functions, bypass_cache)
+    try:
+        yield stream
+        complete_expert_execution(execution, stream.cards)
+    except (GeneratorExit, asyncio.CancelledError):
+        execution.complete(output_data=None, error='Client disconnected')
+        raise
+    except Exception as e:
+        logger.exception("Dynamic expert stream error")
+        execution.complete(output_data=None, error=str(e))
+        raise e
+
+def stream_dynamic_expert_agent(product_info: str, ideal_functions: str, bypass_cache: bool = False):
+    """Streaming variant of call_dynamic_expert_agent - yields each capability dimension as soon as it is parsed"""
+    with monitored_capability_stream(product_info, ideal_functions, bypass_cache) as stream:
+        if APP_MODE == 'demo':
+            # 演示模式：逐个输出模拟数据 (sleeps on this WSGI request thread between cards)
+            for card in demo_latency.stream(stream.demo_cards()):
+                yield stream.add(card)
+            return
+
+        for call in stream.calls():
+            for chunk in llm_gateway.generate_stream(**call):
+                yield from stream.feed(chunk)
+            yield from stream.finish()
+
+# Blueprint pipeline: router runs concurrently with extraction / the expert call
+blueprint_pipeline = BlueprintPipeline(
+    extract_fn=extract_product_info_and_functions,
+    router_fn=call_domain_router_agent,
+    expert_fn=call_dynamic_expert_agent,
+    executor=ThreadPoolExecutor(
+        max_workers=int(os.getenv('PIPELINE_MAX_WORKERS', '16')),
+        thread_name_prefix='pipeline'
+    ),
+    speculative_router=os.getenv('PIPELINE_SPECULATIVE_ROUTER', 'true').lower() == 'true',
+    observer=observe_stage
+)
+
+# Batch generation: pipelines run at once per batch request, and items accepted per request
+BATCH_MAX_PARALLEL = int(os.getenv('BATCH_MAX_PARALLEL', '4'))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '200'))
+
+def run_blueprint_pipeline(product_info: str = '', ideal_functions: str = '', user_input: str = '',
+                           bypass_cache: bool = False):
+    """Run the blueprint pipeline (each stage picks demo or production for the current mode)"""
+    return blueprint_pipeline.run(product_info, ideal_functions, user_input, bypass_cache)
+
+# Background blueprint jobs: submit returns a job id at once; results persist for polling/streaming
+JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', 'blueprint_jobs.db')  # empty keeps jobs in memory only
+blueprint_jobs = BlueprintJobQueue(
+    run_fn=lambda item, bypass_cache: run_blueprint_pipeline(item.product_info, item.ideal_functions,
+                                                             item.user_input, bypass_cache),
+    store=BlueprintJobStore(JOBS_DB_PATH),
+    max_workers=int(os.getenv('JOBS_MAX_WORKERS', '4')),
+    max_pending=int(os.getenv('JOBS_MAX_PENDING', '1000')),
+    retention_seconds=float(os.getenv('JOBS_RETENTION_SECONDS', '86400')),
+    stale_seconds=float(os.getenv('JOBS_STALE_SECONDS', '120')),
+    heartbeat_interval=float(os.getenv('JOBS_HEARTBEAT_SECONDS', '15'))
+)
+JOB_EVENTS_HEARTBEAT_SECONDS = 15
+
+def submit_domain_router(product_info: str, ideal_functions: str, bypass_cache: bool = False):
+    """Start the domain router in the background; returns a Future"""
+    # The router thread keeps the request's tenant, SLO, priority and request id
+    return blueprint_pipeline.executor.submit(contextvars.copy_context().run, call_domain_router_agent,
+                                              product_info, ideal_functions, bypass_cache)
+
+class BlueprintRequest:
+    """Fields of a blueprint generation request body"""
+
+    def __init__(self, data: dict):
+        data = data or {}
+        self.product_info = data.get('productInfo', '')
+        self.ideal_functions = data.get('idealFunctions', '')
+        self.user_input = data.get('userInput', '')
+        self.bypass_cache = bool(data.get('bypassCache', False))
+
+    @property
+    def needs_extraction(self) -> bool:
+        return not self.product_info or not self.ideal_functions
+
+def blueprint_payload(result, extracted_info: bool = False) -> dict:
+    """JSON body of a finished blueprint pipeline run"""
+    payload = {'blueprintCards': result.blueprint_cards}
+    if extracted_info:
+        payload['extractedInfo'] = {  # Return extracted info for debugging/verification
+            'productInfo': result.product_info,
+            'idealFunctions': result.ideal_functions
+        }
+    payload.update({
+        'domainContext': result.domain_context,  # Optional: Return for debugging
+        'stageTimings': result.timings_ms(),
+        'timestamp': datetime.now().isoformat(),
+        'status': 'success'
+    })
+    return payload
+
 @app.route('/api/generate-capability-dimensions', methods=['POST'])
 def generate_capability_dimensions():
     """V3: Three-stage AI workflow with intelligent input extraction"""
     try:
-        data = request.get_json()
-        
-        # Check if we have structured input or need to extract
-        product_info = data.get('productInfo', '')
-        ideal_functions = data.get('idealFunctions', '')
-        user_input = data.get('userInput', '')
+        data = BlueprintRequest(request.get_json())
         
         # If we don't have structured input, extract from userInput
-        if not product_info or not ideal_functions:
-            if not user_input:
-                return jsonify({'error': 'Either structured (productInfo + idealFunctions) or unstructured (userInput) input is required'}), 400
-            
-            # Step 0: Extract product info and ideal functions using AI
-            print("Step 0: Extracting product information and ideal functions...")
-            extracted_info = extract_product_info_and_functions(user_input)
-            product_info = extracted_info.get('productInfo', user_input)
-            ideal_functions = extracted_info.get('idealFunctions', user_input)
-            print(f"Extracted - Product Info: {product_info[:100]}...")
-            print(f"Extracted - Ideal Functions: {ideal_functions[:100]}...")
-
-        # Step A: Call Domain Router Agent
-        print("Step A: Calling Domain Router Agent...")
-        domain_context = call_domain_router_agent(product_info, ideal_functions)
-        print(f"Domain context identified: {domain_context}")
-        
-        # Step B & C: Call Dynamic Expert Agent with injected context
-        print("Step B & C: Calling Dynamic Expert Agent with injected expertise...")
-        blueprint_cards = call_dynamic_expert_agent(domain_context, product_info, ideal_functions)
-        print(f"Generated {len(blueprint_cards)} capability dimensions")
+        if data.needs_extraction and not data.user_input:
+            return jsonify({'error': 'Either structured (productInfo + idealFunctions) or unstructured (userInput) input is required'}), 400
+
+        # Steps 0, A and B & C with independent stages overlapped
+        result = run_blueprint_pipeline(data.product_info, data.ideal_functions, data.user_input, data.bypass_cache)
+        logger.info("Generated capability dimensions", extra={'cards': len(result.blueprint_cards),
+                                                               'timings_ms': result.timings_ms()})
         
-        return jsonify({
-            'blueprintCards': blueprint_cards,
-            'extractedInfo': {  # Return extracted info for debugging/verification
-                'productInfo': product_info,
-                'idealFunctions': ideal_functions
-            },
-            'domainContext': domain_context,  # Optional: Return for debugging
-            'timestamp': datetime.now().isoformat(),
-            'status': 'success'
-        })
+        return jsonify(blueprint_payload(result, extracted_info=True))
             
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        print(f"Capability dimensions generation error: {str(e)}")
+        logger.exception("Capability dimensions generation error")
         return jsonify({'error': f'Failed to generate capability dimensions: {str(e)}'}), 500
 
 @app.route('/api/generate-blueprint', methods=['POST'])
 def generate_blueprint():
     """Legacy endpoint - redirects to new two-stage workflow"""
     try:
-        data = request.get_json()
-        user_input = data.get('userInput', '')
+        data = BlueprintRequest(request.get_json())
         
-        if not user_input:
+        if not data.user_input:
             return jsonify({'error': 'User input is required'}), 400
         
-        # Step 0: Extract product info and ideal functions using AI
-        print("Step 0: Extracting product information and ideal functions...")
-        extracted_info = extract_product_info_and_functions(user_input)
-        product_info = extracted_info.get('productInfo', user_input)
-        ideal_functions = extracted_info.get('idealFunctions', user_input)
-        print(f"Extracted - Product Info: {product_info[:100]}...")
-        print(f"Extracted - Ideal Functions: {ideal_functions[:100]}...")
+        # Steps 0, A and B & C with independent stages overlapped
+        result = run_blueprint_pipeline(user_input=data.user_input, bypass_cache=data.bypass_cache)
+        logger.info("Blueprint pipeline finished", extra={'timings_ms': result.timings_ms()})
         
-        # Call the new three-stage workflow
-        return generate_capability_dimensions_internal(product_info, ideal_functions)
+        return jsonify(blueprint_payload(result))
             
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        print(f"Blueprint generation error: {str(e)}")
+        logger.exception("Blueprint generation error")
         return jsonify({'error': f'Failed to generate blueprint: {str(e)}'}), 500
 
-def generate_capability_dimensions_internal(product_info: str, ideal_functions: str):
-    """Internal function to avoid code duplication"""
-    try:
-        # Step A: Call Domain Router Agent
-        domain_context = call_domain_router_agent(product_info, ideal_functions)
-        
-        # Step B & C: Call Dynamic Expert Agent with injected context
-        blueprint_cards = call_dynamic_expert_agent(domain_context, product_info, ideal_functions)
-        
-        return jsonify({
-            'blueprintCards': blueprint_cards,
+class BlueprintStream:
+    """
+    SSE events and stage timings of one /api/generate-blueprint/stream run
+
+    The domain router overlaps extraction and the expert stream (see BlueprintPipeline); the apps
+    only differ in how they run the router concurrently and iterate the expert stream.
+    """
+
+    def __init__(self, data: dict):
+        self.request = BlueprintRequest(data)
+        self.needs_extraction = self.request.needs_extraction
+        self.info = {'productInfo': self.request.product_info, 'idealFunctions': self.request.ideal_functions}
+        self.cards = []
+        self.timings = {}
+        self.started = time.perf_counter()
+        self._extracted = False
+        self._expert_started = None
+
+    def invalid(self) -> bool:
+        return self.needs_extraction and not self.request.user_input
+
+    def missing_input(self) -> str:
+        return sse_event({'type': 'error', 'error': 'User input is required'})
+
+    def speculative_router(self, pipeline: BlueprintPipeline) -> bool:
+        """Start the router on the raw input before extraction finishes"""
+        return self.needs_extraction and pipeline.speculative_router
+
+    def router_args(self) -> tuple:
+        """Router input: the raw input until extraction has run, the structured fields after"""
+        if self.needs_extraction and not self._extracted:
+            return self.request.user_input, self.request.user_input, self.request.bypass_cache
+        return self.info['productInfo'], self.info['idealFunctions'], self.request.bypass_cache
+
+    def extract_args(self) -> tuple:
+        return self.request.user_input, self.request.bypass_cache
+
+    def extracted(self, extracted_info: dict) -> str:
+        user_input = self.request.user_input
+        self.info['productInfo'] = extracted_info.get('productInfo', user_input)
+        self.info['idealFunctions'] = extracted_info.get('idealFunctions', user_input)
+        self.timings['extract'] = time.perf_counter() - self.started
+        self._extracted = True
+        return sse_event({'type': 'extracted', 'extractedInfo': self.info})
+
+    def begin_expert(self) -> tuple:
+        self._expert_started = time.perf_counter()
+        return self.info['productInfo'], self.info['idealFunctions'], self.request.bypass_cache
+
+    def card(self, card: dict) -> str:
+        if not self.cards:
+            self.timings['first_card'] = time.perf_counter() - self.started
+        self.cards.append(card)
+        return sse_event({'type': 'card', 'index': len(self.cards) - 1, 'card': card})
+
+    def end_expert(self):
+        self.timings['dynamic_expert'] = time.perf_counter() - self._expert_started
+
+    def complete(self, domain_context: dict) -> str:
+        self.timings['total'] = time.perf_counter() - self.started
+        for stage, seconds in self.timings.items():
+            observe_stage(stage, seconds)
+
+        return sse_event({
+            'type': 'complete',
+            'blueprintCards': self.cards,
+            'totalCards': len(self.cards),
+            'extractedInfo': self.info,
             'domainContext': domain_context,
-            'timestamp': datetime.now().isoformat(),
+            'stageTimings': {stage: round(seconds * 1000, 1) for stage, seconds in self.timings.items()},
             'status': 'success'
         })
+
+    def error(self, error: Exception) -> str:
+        return sse_event({'type': 'error', 'error': f'Failed to generate blueprint: {str(error)}',
+                          **overload_event(error)})
+
+@app.route('/api/generate-blueprint/stream', methods=['POST'])
+def generate_blueprint_stream():
+    """SSE variant of the blueprint workflow - emits each capability card as soon as it is parsed"""
+    run = BlueprintStream(request.get_json())
+
+    def generate():
+        try:
+            if run.invalid():
+                yield run.missing_input()
+                return
+
+            router_future = None
+            if run.speculative_router(blueprint_pipeline):
+                router_future = submit_domain_router(*run.router_args())
+
+            if run.needs_extraction:
+                yield run.extracted(extract_product_info_and_functions(*run.extract_args()))
+
+            if router_future is None:
+                router_future = submit_domain_router(*run.router_args())
+
+            for card in stream_dynamic_expert_agent(*run.begin_expert()):
+                yield run.card(card)
+            run.end_expert()
+
+            yield run.complete(router_future.result())
+
+        except Exception as e:
+            logger.exception("Blueprint stream error")
+            yield run.error(e)
+
+    return Response(
+        instrument_stream(generate(), SSE_CHUNK_INTERVAL, SSE_STREAMS_OPEN, endpoint='generate_blueprint_stream'),
+        content_type='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
+class BlueprintBatchStream:
+    """Options and record encoding of one /api/generate-blueprint/batch response (SSE or JSON lines)"""
+
+    def __init__(self, data: dict):
+        """Raises TypeError / ValueError for invalid items or options"""
+        data = data or {}
+        self.bypass_cache = bool(data.get('bypassCache', False))
+        self.jsonl = data.get('format') == 'jsonl'
+        max_parallel = min(int(data.get('maxParallel') or BATCH_MAX_PARALLEL), BATCH_MAX_PARALLEL)
+        self.batch = BlueprintBatch(data.get('items') or [], max_parallel=max_parallel, max_items=BATCH_MAX_ITEMS)
+        self.content_type = 'application/x-ndjson' if self.jsonl else 'text/event-stream'
+
+    def encode(self, payload: dict) -> str:
+        if self.jsonl:
+            return json.dumps(payload, ensure_ascii=False) + '\n'
+        return sse_event(payload)
+
+    def item(self, record: dict) -> str:
+        return self.encode(record if self.jsonl else {'type': 'item', **record})
+
+    def complete(self) -> str:
+        summary = self.batch.summary()
+        logger.info("Blueprint batch finished", extra=summary)
+        return self.encode({'type': 'complete', **summary})
+
+    def error(self, error: Exception) -> str:
+        return self.encode({'type': 'error', 'error': f'Failed to generate blueprints: {str(error)}'})
+
+@app.route('/api/generate-blueprint/batch', methods=['POST'])
+def generate_blueprint_batch():
+    """Blueprints for many products - identical inputs run once, results stream as items complete"""
+    try:
+        stream = BlueprintBatchStream(request.get_json())
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        try:
+            records = stream.batch.run(lambda item: run_blueprint_pipeline(item.product_info, item.ideal_functions,
+                                                                           item.user_input, stream.bypass_cache))
+            for record in records:
+                yield stream.item(record)
+            yield stream.complete()
+        except Exception as e:
+            logger.exception("Blueprint batch error")
+            yield stream.error(e)
+
+    return Response(
+        instrument_stream(generate(), SSE_CHUNK_INTERVAL, SSE_STREAMS_OPEN, endpoint='generate_blueprint_batch'),
+        content_type=stream.content_type,
+        headers=SSE_HEADERS
+    )
+
+@app.errorhandler(JobQueueFull)
+def handle_job_queue_full(error):
+    response = jsonify({'error': 'Too many blueprint jobs queued, please retry later',
+                        'retryAfter': error.retry_after_seconds})
+    response.headers['Retry-After'] = str(error.retry_after_seconds)
+    return response, 429
+
+@app.route('/api/jobs/blueprint', methods=['POST'])
+def submit_blueprint_job():
+    """Queue blueprint generation and return a job id at once (poll /api/jobs/<id> or stream its events)"""
+    data = request.get_json() or {}
+    try:
+        job, created = blueprint_jobs.submit(
+            {field: data.get(field) for field in ('userInput', 'productInfo', 'idealFunctions')},
+            bypass_cache=bool(data.get('bypassCache', False))
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify({**job, 'deduplicated': not created,
+                        'statusUrl': f"/api/jobs/{job['jobId']}", 'eventsUrl': f"/api/jobs/{job['jobId']}/events"})
+    response.headers['Location'] = f"/api/jobs/{job['jobId']}"
+    return response, 202 if created else 200
+
+@app.route('/api/jobs', methods=['GET'])
+def list_blueprint_jobs():
+    """Recent jobs (newest first, without results) and queue counters"""
+    status = request.args.get('status')
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify({'jobs': blueprint_jobs.list_jobs(status, limit), 'stats': blueprint_jobs.get_stats()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_blueprint_job(job_id: str):
+    job = blueprint_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job not found: {job_id}'}), 404
+    return jsonify(job)
+
+def job_event(job: dict) -> dict:
+    """SSE payload for a job change: status updates, then complete (with the result) or error"""
+    if job['status'] == 'succeeded':
+        return {'type': 'complete', **job}
+    if job['status'] == 'failed':
+        return {'type': 'error', **job}
+    return {'type': 'status', **{field: value for field, value in job.items() if field != 'result'}}
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_blueprint_job(job_id: str):
+    """SSE feed of one job: its current state, each change, and the result once it finishes"""
+    job = blueprint_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job not found: {job_id}'}), 404
+
+    def generate():
+        current = job
+        yield sse_event(job_event(current))
+        while current['status'] not in ('succeeded', 'failed'):
+            changed = blueprint_jobs.wait_for_update(job_id, current['version'], JOB_EVENTS_HEARTBEAT_SECONDS)
+            if changed is None:
+                return
+            if changed['version'] == current['version']:
+                yield ": keepalive\n\n"
+                continue
+            current = changed
+            yield sse_event(job_event(current))
+
+    return Response(
+        instrument_stream(generate(), SSE_CHUNK_INTERVAL, SSE_STREAMS_OPEN, endpoint='stream_blueprint_job'),
+        content_type='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
+def generate_capability_dimensions_internal(product_info: str, ideal_functions: str, bypass_cache: bool = False):
+    """Internal function to avoid code duplication"""
+    try:
+        # Step A and Steps B & C run concurrently
+        result = run_blueprint_pipeline(product_info, ideal_functions, bypass_cache=bypass_cache)
+        
+        return jsonify(blueprint_payload(result))
         
     except Exception as e:
         raise e
@@ -880,7 +1826,9 @@ def get_mode():
     return jsonify({
         'mode': APP_MODE,
         'is_demo': APP_MODE == 'demo',
-        'is_production': APP_MODE == 'production'
+        'is_production': APP_MODE == 'production',
+        'demo_latency': demo_latency.describe() if APP_MODE == 'demo' else None,
+        'model_routing': model_router.get_stats()
     })
 
 @app.route('/api/mode', methods=['POST'])
@@ -903,6 +1851,36 @@ def set_mode():
     except Exception as e:
         return jsonify({'error': f'Failed to set mode: {str(e)}'}), 500
 
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get LLM response cache hit/miss counters, single-flight and context cache counters"""
+    stats = llm_cache.get_stats()
+    stats['single_flight'] = llm_gateway.single_flight.get_stats()
+    stats['context_cache'] = context_cache.get_stats()
+    return jsonify(stats)
+
+@app.route('/api/cache', methods=['DELETE'])
+def clear_cache():
+    """Clear every LLM response cache tier"""
+    llm_cache.clear()
+    return jsonify({'status': 'cleared'})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text-format metrics"""
+    return Response(metrics_registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/api/metrics/summary', methods=['GET'])
+def get_metrics_summary():
+    """Estimated p50/p95/p99 (seconds) for every latency histogram"""
+    return jsonify(metrics_registry.summary())
+
+@app.route('/api/prompts', methods=['GET'])
+def get_prompts():
+    """Get the active (hot-reloaded) prompt templates with their versioned ids"""
+    prompt_manager.get(CAPABILITY_PROMPT_NAME)
+    return jsonify({'prompts': prompt_manager.list_prompts(), 'stats': prompt_manager.get_stats()})
+
 @app.route('/api/templates', methods=['GET'])
 def get_templates():
     """Get evaluation templates for different scenarios"""
@@ -942,4 +1920,5 @@ if __name__ == '__main__':
         print(f"Gemini API configured: {'Yes' if GEMINI_API_KEY else 'No'}")
     else:
         print("Running in demo mode with mock data")
-    app.run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
+    app.run(debug=os.getenv('FLASK_DEBUG', 'True').lower() == 'true', host='0.0.0.0',
+            port=int(os.getenv('MAIN_APP_PORT', '8080')))
\ No newline at end of file
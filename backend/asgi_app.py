@@ -0,0 +1,481 @@
+"""
+Async Serving Mode (ASGI)
+Quart entry point that serves the same routes and JSON shapes as app.py, but awaits the
+Gemini async client in the chat, streaming chat and blueprint pipeline handlers so a single
+process can hold many in-flight LLM calls. Run with: hypercorn asgi_app:app --bind 0.0.0.0:8080
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from quart import Quart, request, jsonify, Response, g
+from quart.utils import run_sync
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.routing import RequestRedirect
+
+from app import (
+    app as flask_app,
+    APP_MODE,
+    client,
+    consultant,
+    call_policy,
+    admission,
+    llm_gateway,
+    mock_generator,
+    blueprint_pipeline,
+    chat_history,
+    CHAT_MODEL,
+    ChatRequest,
+    ChatStreamTurn,
+    chat_steps,
+    chat_payload,
+    demo_latency,
+    demo_extract_async,
+    demo_router_async,
+    demo_expert_async,
+    extraction_steps,
+    domain_router_steps,
+    dynamic_expert_steps,
+    monitored_capability_stream,
+    BlueprintRequest,
+    BlueprintStream,
+    BlueprintBatchStream,
+    blueprint_payload,
+    CHAT_MAX_SESSIONS,
+    CHAT_SESSION_IDLE_SECONDS,
+    HTTP_REQUESTS_IN_FLIGHT,
+    HTTP_REQUEST_SECONDS,
+    SSE_CHUNK_INTERVAL,
+    SSE_STREAMS_OPEN,
+    observe_stage,
+    blueprint_jobs,
+    job_event,
+    JOB_EVENTS_HEARTBEAT_SECONDS,
+)
+from admission import AdmissionRejected, INTERACTIVE, BATCH, llm_priority
+from model_router import current_tenant, latency_slo_ms, LATENCY_SLO_HEADER, TENANT_HEADER
+from chat_sessions import ChatSessionStore
+from mock_data_generator import mock_seed, MOCK_SEED_HEADER
+from pipeline_executor import BlueprintPipeline
+from metrics import ainstrument_stream
+from serving_core import SSE_HEADERS, arun_steps, sse_event
+from structured_logging import current_request_id, new_request_id, REQUEST_ID_HEADER
+
+logger = logging.getLogger(__name__)
+
+app = Quart(__name__)
+
+# Async chat sessions live in this process's event loop, separate from the WSGI store
+async_chat_sessions = ChatSessionStore(
+    factory=consultant.create_async_chat_session,
+    max_sessions=CHAT_MAX_SESSIONS,
+    idle_ttl_seconds=CHAT_SESSION_IDLE_SECONDS,
+    lock_factory=asyncio.Lock
+)
+
+
+@app.before_request
+async def bind_request_id():
+    g.request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+    current_request_id.set(g.request_id)
+
+
+@app.before_request
+async def bind_mock_seed():
+    mock_seed.set(request.headers.get(MOCK_SEED_HEADER))
+
+
+@app.before_request
+async def bind_llm_priority():
+    llm_priority.set(INTERACTIVE if request.path.startswith('/api/chat') else BATCH)
+
+
+@app.before_request
+async def bind_routing_context():
+    current_tenant.set(request.headers.get(TENANT_HEADER))
+    try:
+        latency_slo_ms.set(float(request.headers.get(LATENCY_SLO_HEADER, '')))
+    except ValueError:
+        latency_slo_ms.set(None)
+
+
+@app.errorhandler(AdmissionRejected)
+async def handle_admission_rejected(error):
+    response = jsonify({'error': 'Model capacity exhausted, please retry later', 'reason': error.reason,
+                        'retryAfter': error.retry_after_seconds})
+    response.headers['Retry-After'] = str(error.retry_after_seconds)
+    return response, 429
+
+
+@app.before_request
+async def start_request_metrics():
+    # Routes served by FlaskFallback are measured by the Flask app's own hooks
+    g.metrics_endpoint = request.endpoint or 'unmatched'
+    g.metrics_started = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+
+
+@app.after_request
+async def record_request_metrics(response):
+    if getattr(g, 'metrics_endpoint', None) is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_started, endpoint=g.metrics_endpoint,
+                                     method=request.method, status=str(response.status_code))
+    response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
+
+
+@app.teardown_request
+async def finish_request_metrics(error=None):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is not None:
+        HTTP_REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+
+
+@app.after_request
+async def add_cors_headers(response):
+    """Mirror flask-cors defaults for the natively async routes"""
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    if request.method == 'OPTIONS':
+        response.headers.setdefault(
+            'Access-Control-Allow-Headers',
+            request.headers.get('Access-Control-Request-Headers', '*')
+        )
+        response.headers.setdefault('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
+    return response
+
+
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    try:
+        chat_request = ChatRequest(await request.get_json())
+
+        if not chat_request.message:
+            return jsonify({'error': 'Message is required'}), 400
+
+        # Compaction may call the summarizer model, so it runs off the event loop
+        route = chat_request.route()
+        system_prompt, chat_prompt = await run_sync(chat_request.prompt_parts)(route)
+
+        if APP_MODE == 'demo':
+            await demo_latency.asleep('chat')
+            response_text = mock_generator.generate_chat_response(chat_request.message)
+        else:
+            if not client:
+                return jsonify({'error': 'AI client not initialized'}), 500
+
+            response_text = await arun_steps(chat_steps(chat_request, route, system_prompt, chat_prompt),
+                                             llm_gateway.agenerate)
+
+        return jsonify(chat_payload(response_text))
+
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.exception("Chat error")
+        return jsonify({'error': f'Failed to process chat message: {str(e)}'}), 500
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    turn = ChatStreamTurn(await request.get_json())
+
+    async def generate():
+        try:
+            if not turn.message:
+                yield turn.missing_message()
+                return
+
+            if APP_MODE == 'demo':
+                async for text in demo_latency.astream(mock_generator.generate_chat_chunks(turn.message)):
+                    yield turn.chunk(text)
+                yield turn.complete()
+                return
+
+            if not client:
+                yield sse_event({'type': 'error', 'error': 'AI client not initialized'})
+                return
+
+            # Only a newly created session is seeded, compacting off the event loop
+            async def seed_history():
+                return await run_sync(turn.seed_history)()
+
+            session = turn.attach(*await async_chat_sessions.aget_or_create(turn.conversation_id,
+                                                                            turn.system_prompt(), seed_history))
+
+            async with session.lock:
+                try:
+                    async for chunk in call_policy.astream(CHAT_MODEL, lambda timeout: admission.aiterate(
+                            CHAT_MODEL, lambda: session.chat.send_message_stream(turn.message),
+                            turn.reserve_tokens(session), max_wait=timeout
+                    ), stage='chat'):
+                        if chunk.text:
+                            yield turn.chunk(chunk.text)
+                    turn.record(session)
+                except BaseException:
+                    async_chat_sessions.drop(turn.conversation_id)
+                    raise
+
+            if turn.outgrown(session):
+                async_chat_sessions.drop(turn.conversation_id)
+
+            yield turn.complete()
+
+        except Exception as e:
+            logger.exception("Streaming error")
+            yield turn.error(e)
+
+    return Response(
+        ainstrument_stream(generate(), SSE_CHUNK_INTERVAL, SSE_STREAMS_OPEN, endpoint=request.endpoint),
+        content_type='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
+
+@app.route('/api/chat/sessions', methods=['GET'])
+async def get_chat_session_stats():
+    """Get live chat session and history compaction counters (this process's async sessions)"""
+    stats = async_chat_sessions.get_stats()
+    stats['history'] = chat_history.get_stats()
+    return jsonify(stats)
+
+
+@app.route('/api/chat/sessions/<conversation_id>', methods=['DELETE'])
+async def end_chat_session(conversation_id: str):
+    """End a conversation and release its live async chat session"""
+    chat_history.forget(conversation_id)
+    return jsonify({'conversationId': conversation_id, 'released': async_chat_sessions.drop(conversation_id)})
+
+
+async def extract_product_info_and_functions_async(user_input: str, bypass_cache: bool = False) -> dict:
+    """Async Step 0: Information Extraction Agent"""
+    if APP_MODE == 'demo':
+        return await demo_extract_async(user_input, bypass_cache)
+    return await arun_steps(extraction_steps(user_input, bypass_cache), llm_gateway.agenerate)
+
+
+async def call_domain_router_agent_async(product_info: str, ideal_functions: str,
+                                         bypass_cache: bool = False) -> dict:
+    """Async Step A: Domain Router Agent"""
+    if APP_MODE == 'demo':
+        return await demo_router_async(product_info, ideal_functions, bypass_cache)
+    return await arun_steps(domain_router_steps(product_info, ideal_functions, bypass_cache),
+                            llm_gateway.agenerate)
+
+
+async def call_dynamic_expert_agent_async(domain_context: dict, product_info: str, ideal_functions: str,
+                                          bypass_cache: bool = False) -> list:
+    """Async Steps B & C: capability dimension generation with workflow monitoring"""
+    if APP_MODE == 'demo':
+        return await demo_expert_async(domain_context, product_info, ideal_functions, bypass_cache)
+    return await arun_steps(dynamic_expert_steps(domain_context, product_info, ideal_functions, bypass_cache),
+                            llm_gateway.agenerate)
+
+
+async_blueprint_pipeline = BlueprintPipeline(
+    extract_fn=extract_product_info_and_functions_async,
+    router_fn=call_domain_router_agent_async,
+    expert_fn=call_dynamic_expert_agent_async,
+    speculative_router=blueprint_pipeline.speculative_router,
+    observer=observe_stage
+)
+
+
+@app.route('/api/generate-capability-dimensions', methods=['POST'])
+async def generate_capability_dimensions():
+    """V3 three-stage workflow, awaiting each model call with independent stages overlapped"""
+    try:
+        data = BlueprintRequest(await request.get_json())
+
+        if data.needs_extraction and not data.user_input:
+            return jsonify({'error': 'Either structured (productInfo + idealFunctions) or unstructured (userInput) input is required'}), 400
+
+        result = await async_blueprint_pipeline.arun(data.product_info, data.ideal_functions, data.user_input,
+                                                     data.bypass_cache)
+
+        return jsonify(blueprint_payload(result, extracted_info=True))
+
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.exception("Capability dimensions generation error")
+        return jsonify({'error': f'Failed to generate capability dimensions: {str(e)}'}), 500
+
+
+@app.route('/api/generate-blueprint', methods=['POST'])
+async def generate_blueprint():
+    """Legacy endpoint, awaiting each model call with independent stages overlapped"""
+    try:
+        data = BlueprintRequest(await request.get_json())
+
+        if not data.user_input:
+            return jsonify({'error': 'User input is required'}), 400
+
+        result = await async_blueprint_pipeline.arun(user_input=data.user_input, bypass_cache=data.bypass_cache)
+
+        return jsonify(blueprint_payload(result))
+
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        logger.exception("Blueprint generation error")
+        return jsonify({'error': f'Failed to generate blueprint: {str(e)}'}), 500
+
+
+async def stream_dynamic_expert_agent_async(product_info: str, ideal_functions: str, bypass_cache: bool = False):
+    """Async streaming variant of the dynamic expert - yields each capability dimension as soon as it is parsed"""
+    with monitored_capability_stream(product_info, ideal_functions, bypass_cache) as stream:
+        if APP_MODE == 'demo':
+            async for card in demo_latency.astream(stream.demo_cards()):
+                yield stream.add(card)
+            return
+
+        for call in stream.calls():
+            async for chunk in llm_gateway.agenerate_stream(**call):
+                for card in stream.feed(chunk):
+                    yield card
+            for card in stream.finish():
+                yield card
+
+
+@app.route('/api/generate-blueprint/stream', methods=['POST'])
+async def generate_blueprint_stream():
+    """SSE variant of the blueprint workflow - emits each capability card as soon as it is parsed"""
+    run = BlueprintStream(await request.get_json())
+
+    async def generate():
+        router_task = None
+        try:
+            if run.invalid():
+                yield run.missing_input()
+                return
+
+            if run.speculative_router(async_blueprint_pipeline):
+                router_task = asyncio.ensure_future(call_domain_router_agent_async(*run.router_args()))
+
+            if run.needs_extraction:
+                yield run.extracted(await extract_product_info_and_functions_async(*run.extract_args()))
+
+            if router_task is None:
+                router_task = asyncio.ensure_future(call_domain_router_agent_async(*run.router_args()))
+
+            async for card in stream_dynamic_expert_agent_async(*run.begin_expert()):
+                yield run.card(card)
+            run.end_expert()
+
+            yield run.complete(await router_task)
+
+        except Exception as e:
+            if router_task is not None:
+                router_task.cancel()
+            logger.exception("Blueprint stream error")
+            yield run.error(e)
+
+    return Response(
+        ainstrument_stream(generate(), SSE_CHUNK_INTERVAL, SSE_STREAMS_OPEN, endpoint=request.endpoint),
+        content_type='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
+@app.route('/api/generate-blueprint/batch', methods=['POST'])
+async def generate_blueprint_batch():
+    """Blueprints for many products - identical inputs run once, results stream as items complete"""
+    try:
+        stream = BlueprintBatchStream(await request.get_json())
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    async def generate():
+        try:
+            records = stream.batch.arun(lambda item: async_blueprint_pipeline.arun(
+                item.product_info, item.ideal_functions, item.user_input, stream.bypass_cache))
+            async for record in records:
+                yield stream.item(record)
+            yield stream.complete()
+        except Exception as e:
+            logger.exception("Blueprint batch error")
+            yield stream.error(e)
+
+    return Response(
+        ainstrument_stream(generate(), SSE_CHUNK_INTERVAL, SSE_STREAMS_OPEN, endpoint=request.endpoint),
+        content_type=stream.content_type,
+        headers=SSE_HEADERS
+    )
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+async def stream_blueprint_job(job_id: str):
+    """SSE feed of one job: its current state, each change, and the result once it finishes"""
+    job = await blueprint_jobs.aget(job_id)
+    if job is None:
+        return jsonify({'error': f'Job not found: {job_id}'}), 404
+
+    async def generate():
+        current = job
+        yield sse_event(job_event(current))
+        while current['status'] not in ('succeeded', 'failed'):
+            changed = await blueprint_jobs.await_update(job_id, current['version'], JOB_EVENTS_HEARTBEAT_SECONDS)
+            if changed is None:
+                return
+            if changed['version'] == current['version']:
+                yield ": keepalive\n\n"
+                continue
+            current = changed
+            yield sse_event(job_event(current))
+
+    return Response(
+        ainstrument_stream(generate(), SSE_CHUNK_INTERVAL, SSE_STREAMS_OPEN, endpoint=request.endpoint),
+        content_type='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
+
+class FlaskFallback:
+    """
+    ASGI middleware serving every path without a native Quart route with the Flask app
+
+    The remaining (fast, non-LLM) routes reuse the Flask views, so both serving modes expose
+    identical endpoints without duplicating handlers. Flask runs through Hypercorn's WSGI adapter
+    on a worker thread and each body chunk is sent as soon as Flask yields it, so a streamed Flask
+    response stays streamed.
+    """
+
+    def __init__(self, asgi_app, wsgi_app, url_map, max_body_size: int = 16 * 1024 * 1024):
+        self.asgi_app = asgi_app
+        self.wsgi_app = AsyncioWSGIMiddleware(self._buffered_input(wsgi_app), max_body_size=max_body_size)
+        self.url_map = url_map
+
+    @staticmethod
+    def _buffered_input(wsgi_app):
+        # The adapter hands Flask the whole body in memory, so it can be read without a
+        # Content-Length (chunked uploads, some ASGI clients)
+        def app(environ, start_response):
+            environ['wsgi.input_terminated'] = True
+            return wsgi_app(environ, start_response)
+        return app
+
+    def _is_native(self, scope) -> bool:
+        try:
+            self.url_map.bind('localhost').match(scope['path'], method=scope['method'])
+        except (NotFound, MethodNotAllowed):
+            return False
+        except RequestRedirect:
+            pass  # let Quart issue the redirect
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and not self._is_native(scope):
+            await self.wsgi_app(scope, receive, send)
+        else:
+            await self.asgi_app(scope, receive, send)
+
+
+app.asgi_app = FlaskFallback(app.asgi_app, flask_app, app.url_map)
+
+
+if __name__ == '__main__':
+    print("Starting AI Evaluation Consultant API (async mode)...")
+    print(f"Application mode: {APP_MODE.upper()}")
+    app.run(host='0.0.0.0', port=int(os.getenv('MAIN_APP_PORT', '8080')))
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Batch Blueprint Generation
+Runs the blueprint pipeline over many product inputs with bounded parallelism, deduplicating
+identical inputs and yielding per-item results as they complete. Used by the
+/api/generate-blueprint/batch endpoint and as a CLI that writes a JSONL results file.
+
+Examples:
+    python batch_blueprints.py products.txt -o results.jsonl --parallel 8
+    python batch_blueprints.py products.jsonl -o results.jsonl --url http://localhost:8080 --resume
+"""
+
+import argparse
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BatchItem:
+    """One product to generate a blueprint for: free-form user input or structured fields"""
+
+    def __init__(self, index: int, user_input: str = '', product_info: str = '', ideal_functions: str = '',
+                 item_id: Optional[str] = None):
+        self.index = index
+        self.user_input = user_input
+        self.product_info = product_info
+        self.ideal_functions = ideal_functions
+        self.id = item_id
+
+    @classmethod
+    def parse(cls, index: int, raw: Any) -> 'BatchItem':
+        """Accept a string or {'userInput'} / {'productInfo', 'idealFunctions'} with an optional 'id'"""
+        if isinstance(raw, str):
+            raw = {'userInput': raw}
+        if not isinstance(raw, dict):
+            raise ValueError(f"Item {index}: expected a string or an object")
+        item = cls(index, (raw.get('userInput') or '').strip(), (raw.get('productInfo') or '').strip(),
+                   (raw.get('idealFunctions') or '').strip(),
+                   str(raw['id']) if raw.get('id') is not None else None)
+        if not item.user_input and not (item.product_info and item.ideal_functions):
+            raise ValueError(f"Item {index}: userInput or productInfo + idealFunctions is required")
+        return item
+
+    @property
+    def key(self) -> str:
+        """Identity for deduplication: whitespace-normalized input fields"""
+        fields = [' '.join(value.split()) for value in (self.user_input, self.product_info, self.ideal_functions)]
+        return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def success_record(result) -> Dict[str, Any]:
+    """Result fields from a pipeline run (PipelineResult)"""
+    return {
+        'status': 'success',
+        'blueprintCards': result.blueprint_cards,
+        'extractedInfo': {'productInfo': result.product_info, 'idealFunctions': result.ideal_functions},
+        'domainContext': result.domain_context,
+        'stageTimings': result.timings_ms(),
+    }
+
+
+def error_record(error: Exception) -> Dict[str, Any]:
+    record = {'status': 'error', 'error': str(error)}
+    retry_after = getattr(error, 'retry_after_seconds', None)
+    if retry_after is not None:
+        record['retryAfter'] = retry_after
+    return record
+
+
+class BlueprintBatch:
+    """
+    A set of blueprint requests run with bounded parallelism
+
+    Identical inputs (same key) run once; every item still gets its own result record, with
+    duplicateOf pointing at the first item that carried the input. Records are produced in
+    completion order, each tagged with its item index.
+    """
+
+    def __init__(self, raw_items: Iterable[Any], max_parallel: int = 4, max_items: int = 200):
+        items = [BatchItem.parse(index, raw) for index, raw in enumerate(raw_items)]
+        if not items:
+            raise ValueError("At least one item is required")
+        if len(items) > max_items:
+            raise ValueError(f"At most {max_items} items per batch (got {len(items)})")
+        self.items = items
+        self.max_parallel = max(1, max_parallel)
+        self.groups: 'OrderedDict[str, List[BatchItem]]' = OrderedDict()
+        for item in items:
+            self.groups.setdefault(item.key, []).append(item)
+        self.started = time.perf_counter()
+        self.counts = {'succeeded': 0, 'failed': 0}
+
+    def _records(self, key: str, outcome: Dict[str, Any], seconds: float) -> List[Dict[str, Any]]:
+        """Fan one outcome out to every item sharing the input"""
+        group = self.groups[key]
+        records = []
+        for item in group:
+            record = {'index': item.index, 'id': item.id, 'key': key, 'elapsedMs': round(seconds * 1000, 1)}
+            if item is not group[0]:
+                record['duplicateOf'] = group[0].index
+            record.update(outcome)
+            self.counts['succeeded' if outcome['status'] == 'success' else 'failed'] += 1
+            records.append(record)
+        return records
+
+    @staticmethod
+    def _run_one(run_fn: Callable[[BatchItem], Any], item: BatchItem):
+        started = time.perf_counter()
+        try:
+            outcome = success_record(run_fn(item))
+        except Exception as e:
+            logger.warning("Batch item failed", extra={'index': item.index, 'error': str(e)})
+            outcome = error_record(e)
+        return outcome, time.perf_counter() - started
+
+    def run(self, run_fn: Callable[[BatchItem], Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield result records as items complete (thread pool of max_parallel workers)
+
+        Each task runs in a copy of the caller's context so request-scoped values (request id,
+        tenant, admission priority) follow it. Closing the iterator early cancels queued items.
+        """
+        pool = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='blueprint-batch')
+        pending = {
+            pool.submit(contextvars.copy_context().run, self._run_one, run_fn, group[0]): key
+            for key, group in self.groups.items()
+        }
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    outcome, seconds = future.result()
+                    yield from self._records(key, outcome, seconds)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def arun(self, arun_fn: Callable[[BatchItem], Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of run(): at most max_parallel pipelines awaited at once on the event loop"""
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def run_one(key: str, item: BatchItem):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    outcome = success_record(await arun_fn(item))
+                except Exception as e:
+                    logger.warning("Batch item failed", extra={'index': item.index, 'error': str(e)})
+                    outcome = error_record(e)
+                return key, outcome, time.perf_counter() - started
+
+        tasks = [asyncio.ensure_future(run_one(key, group[0])) for key, group in self.groups.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, outcome, seconds = await next_done
+                for record in self._records(key, outcome, seconds):
+                    yield record
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'total': len(self.items),
+            'unique': len(self.groups),
+            'succeeded': self.counts['succeeded'],
+            'failed': self.counts['failed'],
+            'elapsedMs': round((time.perf_counter() - self.started) * 1000, 1),
+        }
+
+
+# ---------------------------------------------------------------------------------------- CLI
+
+def read_inputs(path: str) -> List[Any]:
+    """Products from a .json list, a .jsonl file (strings or objects) or plain text (one per line)"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        lines = [line.strip() for line in f if line.strip()]
+    if path.endswith('.jsonl'):
+        return [json.loads(line) for line in lines]
+    return lines
+
+
+def completed_keys(path: str) -> set:
+    """Keys already written successfully to an output file (for --resume)"""
+    if not os.path.exists(path):
+        return set()
+    keys = set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('status') == 'success':
+                keys.add(record.get('key'))
+    return keys
+
+
+def remaining_inputs(raw_items: List[Any], done: set) -> List[Tuple[int, Any]]:
+    """(original index, raw item) for each input whose key is not in done, numbered before filtering"""
+    return [(index, raw) for index, raw in enumerate(raw_items) if BatchItem.parse(index, raw).key not in done]
+
+
+def run_local(raw_items: List[Any], parallel: int, bypass_cache: bool) -> Iterator[Dict[str, Any]]:
+    """Run the pipeline in this process (APP_MODE and the model configuration come from .env)"""
+    from app import run_blueprint_pipeline
+
+    batch = BlueprintBatch(raw_items, max_parallel=parallel, max_items=len(raw_items))
+    return batch.run(lambda item: run_blueprint_pipeline(item.product_info, item.ideal_functions,
+                                                         item.user_input, bypass_cache=bypass_cache))
+
+
+def run_remote(url: str, raw_items: List[Any], parallel: int, bypass_cache: bool,
+               timeout: float = 3600) -> Iterator[Dict[str, Any]]:
+    """Stream results from a running backend's batch endpoint"""
+    request = urllib.request.Request(
+        url.rstrip('/') + '/api/generate-blueprint/batch',
+        data=json.dumps({'items': raw_items, 'maxParallel': parallel, 'bypassCache': bypass_cache,
+                         'format': 'jsonl'}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        for line in response:
+            record = json.loads(line)
+            if record.get('type') == 'error':
+                raise RuntimeError(record.get('error'))
+            if record.get('type') != 'complete':
+                yield record
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Generate blueprints for many products at once')
+    parser.add_argument('inputs', help='Products: .txt (one per line), .jsonl or .json list')
+    parser.add_argument('-o', '--output', default='blueprints.jsonl', help='JSONL results file')
+    parser.add_argument('--parallel', type=int, default=int(os.getenv('BATCH_MAX_PARALLEL', '4')),
+                        help='Pipelines run at once')
+    parser.add_argument('--url', help='Backend base URL; runs in-process when omitted')
+    parser.add_argument('--bypass-cache', action='store_true', help='Skip response cache lookups')
+    parser.add_argument('--resume', action='store_true',
+                        help='Append to the output, skipping inputs that already succeeded there')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    inputs = read_inputs(args.inputs)
+    pending = remaining_inputs(inputs, completed_keys(args.output) if args.resume else set())
+    if len(pending) < len(inputs):
+        print(f"⏭️  Skipping {len(inputs) - len(pending)} inputs already in {args.output}", file=sys.stderr)
+    if not pending:
+        print("✅ Nothing to do", file=sys.stderr)
+        return
+    # The batch numbers the remaining items from 0; records carry the index in the input file
+    original_index = [index for index, _ in pending]
+    raw_items = [raw for _, raw in pending]
+
+    started = time.perf_counter()
+    records = (run_remote(args.url, raw_items, args.parallel, args.bypass_cache) if args.url
+               else run_local(raw_items, args.parallel, args.bypass_cache))
+    failed = 0
+    with open(args.output, 'a' if args.resume else 'w', encoding='utf-8') as out:
+        for count, record in enumerate(records, 1):
+            record['index'] = original_index[record['index']]
+            if 'duplicateOf' in record:
+                record['duplicateOf'] = original_index[record['duplicateOf']]
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            ok = record['status'] == 'success'
+            failed += not ok
+            print(f"{'✅' if ok else '❌'} [{count}/{len(raw_items)}] item {record['index']} "
+                  f"({record['elapsedMs'] / 1000:.1f}s){'' if ok else ' ' + record.get('error', '')}",
+                  file=sys.stderr)
+
+    print(f"\n💾 {len(raw_items)} results written to {args.output} in {time.perf_counter() - started:.1f}s"
+          f" ({failed} failed)", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: shared JSON extraction vs the previous regex approach
+
+Usage:
+    python bench_json_extraction.py [--cards N] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from json_extraction import extract_json
+from mock_data_generator import MockDataGenerator
+
+
+def regex_extract_array(response_text: str) -> list:
+    """The block previously inlined in parse_capability_dimensions_response"""
+    if '```json' in response_text:
+        json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group(1).strip())
+    json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
+    if not json_match:
+        raise ValueError("No valid JSON found")
+    return json.loads(json_match.group(0))
+
+
+def build_cases(card_count: int) -> dict:
+    cards = MockDataGenerator().generate_capability_dimensions('', '')
+    cards = (cards * (card_count // len(cards) + 1))[:card_count]
+    payload = json.dumps(cards, ensure_ascii=False, indent=2)
+    return {
+        'pure': payload,
+        'fenced': f"Here are the dimensions:\n```json\n{payload}\n```\n",
+        'prose': f"Here are the dimensions:\n{payload}\nLet me know if you need more detail.",
+        'prose_brackets': f"Result [v2]:\n{payload}\nSee [1] for the rubric.",
+    }
+
+
+def run(card_count: int, repeat: int):
+    cases = build_cases(card_count)
+    print(f"{'case':<16}{'bytes':>10}{'regex (ms)':>14}{'extract (ms)':>14}")
+    for name, text in cases.items():
+        try:
+            regex_extract_array(text)
+            regex_ms = timeit.timeit(lambda: regex_extract_array(text), number=repeat) / repeat * 1000
+            regex_col = f"{regex_ms:>14.3f}"
+        except ValueError:
+            regex_col = f"{'fails':>14}"
+        extract_ms = timeit.timeit(lambda: extract_json(text, expect='array'), number=repeat) / repeat * 1000
+        print(f"{name:<16}{len(text):>10}{regex_col}{extract_ms:>14.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark JSON extraction strategies')
+    parser.add_argument('--cards', type=int, default=50, help='Capability cards per response')
+    parser.add_argument('--repeat', type=int, default=200, help='Iterations per case')
+    args = parser.parse_args()
+    run(args.cards, args.repeat)
@@ -0,0 +1,430 @@
+"""
+Blueprint Jobs Module
+Runs blueprint generation as background jobs: submitting returns a job id at once, a worker pool
+runs the pipeline, and status and results are persisted in SQLite for polling or streaming.
+Jobs are keyed by an input hash, so resubmitting the same product returns the existing job.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from batch_blueprints import BatchItem, error_record, success_record
+from metrics import metrics_registry
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+JOB_EVENTS = metrics_registry.counter(
+    'evalbridge_blueprint_jobs_total',
+    'Blueprint job submissions and outcomes',
+    ['outcome']
+)
+JOB_SECONDS = metrics_registry.histogram(
+    'evalbridge_blueprint_job_seconds',
+    'Time blueprint jobs spend queued and running',
+    ['phase'],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are waiting for a worker"""
+
+    def __init__(self, pending: int, retry_after: float):
+        super().__init__(f"{pending} blueprint jobs already queued")
+        self.pending = pending
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_seconds(self) -> int:
+        return max(1, math.ceil(self.retry_after))
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return None if timestamp is None else datetime.fromtimestamp(timestamp).isoformat()
+
+
+class BlueprintJobStore:
+    """
+    SQLite table of jobs, shared by every process that opens the same file
+
+    An empty db_path keeps jobs in memory only. Every update bumps the job's version, which
+    stream readers compare to detect changes made by this or another process. Each queued or
+    running job records the queue that owns it and when that queue last heartbeated, so a
+    job is only treated as abandoned once its owner stops heartbeating.
+    """
+
+    COLUMNS = ('id', 'key', 'status', 'input', 'result', 'error', 'created_at', 'started_at',
+               'finished_at', 'version', 'owner', 'heartbeat_at')
+
+    def __init__(self, db_path: str = 'blueprint_jobs.db'):
+        self.db_path = db_path or ':memory:'
+        self.lock = threading.Lock()
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS blueprint_jobs (
+                id TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                input TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                version INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                heartbeat_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_blueprint_jobs_key ON blueprint_jobs(key, created_at);
+            CREATE INDEX IF NOT EXISTS idx_blueprint_jobs_status ON blueprint_jobs(status, created_at);
+        ''')
+        # Databases created before jobs had owners
+        existing = {row[1] for row in self._conn.execute('PRAGMA table_info(blueprint_jobs)')}
+        for column, column_type in (('owner', 'TEXT'), ('heartbeat_at', 'REAL')):
+            if column not in existing:
+                self._conn.execute(f'ALTER TABLE blueprint_jobs ADD COLUMN {column} {column_type}')
+        self._conn.commit()
+
+    def _row(self, row: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        job['input'] = json.loads(job['input'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def create(self, job_id: str, key: str, job_input: Dict[str, Any], now: float,
+               owner: Optional[str] = None) -> Dict[str, Any]:
+        with self.lock:
+            self._conn.execute(
+                'INSERT INTO blueprint_jobs (id, key, status, input, created_at, owner, heartbeat_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, key, 'queued', json.dumps(job_input, ensure_ascii=False), now, owner, now)
+            )
+            self._conn.commit()
+        return self.get(job_id)
+
+    def claim(self, job_id: str, now: float) -> bool:
+        """Move a queued job to running; False if it is no longer queued (e.g. failed as stale)"""
+        with self.lock:
+            cursor = self._conn.execute(
+                "UPDATE blueprint_jobs SET status = 'running', started_at = ?, heartbeat_at = ?, "
+                "version = version + 1 WHERE id = ? AND status = 'queued'", (now, now, job_id)
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def heartbeat(self, owner: str, now: float) -> int:
+        """Mark an owner's queued/running jobs as alive (no version bump: nothing visible changed)"""
+        with self.lock:
+            cursor = self._conn.execute(
+                "UPDATE blueprint_jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (now, owner)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def update(self, job_id: str, **fields):
+        """Set columns (result is JSON-encoded) and bump the version"""
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False)
+        assignments = ', '.join(f'{column} = ?' for column in fields)
+        with self.lock:
+            self._conn.execute(f'UPDATE blueprint_jobs SET {assignments}, version = version + 1 WHERE id = ?',
+                               (*fields.values(), job_id))
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self._conn.execute(f'SELECT {", ".join(self.COLUMNS)} FROM blueprint_jobs WHERE id = ?',
+                                     (job_id,)).fetchone()
+        return self._row(row)
+
+    def find_reusable(self, key: str, active_since: float) -> Optional[Dict[str, Any]]:
+        """Newest job for an input that succeeded or is still live (queued/running, heartbeat since active_since)"""
+        with self.lock:
+            row = self._conn.execute(
+                f'SELECT {", ".join(self.COLUMNS)} FROM blueprint_jobs WHERE key = ? AND '
+                "(status = 'succeeded' OR (status IN ('queued', 'running') "
+                'AND COALESCE(heartbeat_at, created_at) >= ?)) '
+                'ORDER BY created_at DESC LIMIT 1', (key, active_since)
+            ).fetchone()
+        return self._row(row)
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = f'SELECT {", ".join(self.COLUMNS)} FROM blueprint_jobs'
+        params: Tuple = ()
+        if status:
+            query += ' WHERE status = ?'
+            params = (status,)
+        with self.lock:
+            rows = self._conn.execute(query + ' ORDER BY created_at DESC LIMIT ?', (*params, limit)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def status_counts(self) -> Dict[str, int]:
+        with self.lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM blueprint_jobs GROUP BY status').fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update(dict(rows))
+        return counts
+
+    def fail_stale(self, before: float, now: float, error: str) -> int:
+        """Fail queued/running jobs whose owner last heartbeated before a cutoff (their worker is gone)"""
+        with self.lock:
+            cursor = self._conn.execute(
+                "UPDATE blueprint_jobs SET status = 'failed', error = ?, finished_at = ?, version = version + 1 "
+                "WHERE status IN ('queued', 'running') AND COALESCE(heartbeat_at, created_at) < ?",
+                (error, now, before)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def prune(self, before: float) -> int:
+        """Delete finished jobs that completed before a cutoff"""
+        with self.lock:
+            cursor = self._conn.execute(
+                "DELETE FROM blueprint_jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (before,)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        with self.lock:
+            self._conn.close()
+
+
+class BlueprintJobQueue:
+    """
+    Background blueprint generation with idempotent submission
+
+    submit() stores a queued job and hands it to a thread pool; the HTTP request returns at once.
+    A resubmitted input (same whitespace-normalized fields) returns the newest job that succeeded
+    or is still in progress instead of starting another run; failed jobs, and submissions with
+    bypass_cache, always start a new one. A background thread heartbeats this queue's queued and
+    running jobs; jobs whose owner has not heartbeated for stale_seconds (e.g. its process was
+    restarted) are marked failed so they can be resubmitted, however long a live queue's backlog is.
+    """
+
+    def __init__(self, run_fn: Callable[[BatchItem, bool], Any], store: BlueprintJobStore,
+                 max_workers: int = 4, max_pending: int = 1000, retention_seconds: float = 86400,
+                 stale_seconds: float = 120, heartbeat_interval: float = 15, maintenance_interval: float = 60,
+                 poll_interval: float = 0.5):
+        """
+        Args:
+            run_fn: Runs the pipeline for one item: run_fn(item, bypass_cache) -> PipelineResult
+            store: Job persistence
+            max_workers: Pipelines run at once
+            max_pending: Jobs this process accepts while they wait for a worker
+            retention_seconds: Keep finished jobs (and reuse succeeded ones) for this long (0 = forever)
+            stale_seconds: Fail queued/running jobs whose owner has not heartbeated for this long
+            heartbeat_interval: Seconds between heartbeats for this queue's jobs (keep well below stale_seconds)
+            maintenance_interval: Seconds between retention / stale-job passes
+            poll_interval: Seconds between store reads while waiting for changes from other processes
+        """
+        self.run_fn = run_fn
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.stale_seconds = stale_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.maintenance_interval = maintenance_interval
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='blueprint-job')
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.pending = 0
+        self.running = 0
+        self.durations = deque(maxlen=50)
+        self._stats = {'submitted': 0, 'deduplicated': 0, 'rejected': 0, 'succeeded': 0, 'failed': 0}
+        self._last_maintenance = 0.0
+        self._maintain(time.time())
+        self._stopped = threading.Event()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name='blueprint-job-heartbeat',
+                                                  daemon=True)
+        self._heartbeat_thread.start()
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            now = time.time()
+            try:
+                self.store.heartbeat(self.owner, now)
+                with self.lock:
+                    self._maintain(now)
+            except Exception:
+                logger.exception("Blueprint job heartbeat failed")
+
+    def _maintain(self, now: float):
+        if now - self._last_maintenance < self.maintenance_interval:
+            return
+        self._last_maintenance = now
+        stale = self.store.fail_stale(now - self.stale_seconds, now, 'Job was interrupted before completing')
+        pruned = self.store.prune(now - self.retention_seconds) if self.retention_seconds else 0
+        if stale or pruned:
+            logger.info("Blueprint job maintenance", extra={'stale': stale, 'pruned': pruned})
+
+    def _retry_after(self) -> float:
+        """Rough time until a queue slot frees: average run time per worker"""
+        average = sum(self.durations) / len(self.durations) if self.durations else 30.0
+        return average * self.pending / self.max_workers
+
+    def submit(self, raw: Any, bypass_cache: bool = False) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queue a job for one input (a string or {'userInput'} / {'productInfo', 'idealFunctions'})
+
+        Returns:
+            (public job dict, created) - created is False when an existing job was reused
+
+        Raises:
+            ValueError: The input is invalid
+            JobQueueFull: max_pending jobs are already waiting
+        """
+        item = BatchItem.parse(0, raw)
+        now = time.time()
+        with self.lock:
+            self._maintain(now)
+            if not bypass_cache:
+                existing = self.store.find_reusable(item.key, now - self.stale_seconds)
+                if existing is not None:
+                    self._stats['deduplicated'] += 1
+                    JOB_EVENTS.inc(outcome='deduplicated')
+                    return self.public(existing), False
+            if self.pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                JOB_EVENTS.inc(outcome='rejected')
+                raise JobQueueFull(self.pending, self._retry_after())
+
+            job_input = {'userInput': item.user_input, 'productInfo': item.product_info,
+                         'idealFunctions': item.ideal_functions, 'bypassCache': bypass_cache}
+            job = self.store.create(f"job_{int(now)}_{uuid.uuid4().hex[:12]}", item.key, job_input, now,
+                                    owner=self.owner)
+            self.pending += 1
+            self._stats['submitted'] += 1
+        JOB_EVENTS.inc(outcome='submitted')
+        # Request-scoped values (request id, tenant) follow the job into its worker thread
+        self.executor.submit(contextvars.copy_context().run, self._run, job['id'], item, bypass_cache, now)
+        logger.info("Blueprint job queued", extra={'job_id': job['id'], 'key': item.key})
+        return self.public(job), True
+
+    def _set(self, job_id: str, **fields):
+        self.store.update(job_id, **fields)
+        with self.changed:
+            self.changed.notify_all()
+
+    def _run(self, job_id: str, item: BatchItem, bypass_cache: bool, queued_at: float):
+        started = time.time()
+        with self.lock:
+            self.pending -= 1
+        if not self.store.claim(job_id, started):
+            logger.warning("Blueprint job no longer queued, not running it", extra={'job_id': job_id})
+            return
+        with self.changed:
+            self.running += 1
+            self.changed.notify_all()
+        JOB_SECONDS.observe(started - queued_at, phase='queue')
+        try:
+            outcome = success_record(self.run_fn(item, bypass_cache))
+        except Exception as e:
+            logger.exception("Blueprint job failed", extra={'job_id': job_id})
+            outcome = error_record(e)
+        finished = time.time()
+        succeeded = outcome.pop('status') == 'success'
+        with self.lock:
+            self.running -= 1
+            self.durations.append(finished - started)
+            self._stats['succeeded' if succeeded else 'failed'] += 1
+        JOB_SECONDS.observe(finished - started, phase='run')
+        JOB_EVENTS.inc(outcome='succeeded' if succeeded else 'failed')
+        if succeeded:
+            self._set(job_id, status='succeeded', result=outcome, finished_at=finished)
+        else:
+            self._set(job_id, status='failed', error=outcome['error'], finished_at=finished)
+        logger.info("Blueprint job finished", extra={'job_id': job_id, 'succeeded': succeeded,
+                                                     'elapsed_ms': round((finished - started) * 1000, 1)})
+
+    @staticmethod
+    def public(job: Dict[str, Any]) -> Dict[str, Any]:
+        """API shape of a stored job"""
+        finished = job['finished_at']
+        return {
+            'jobId': job['id'],
+            'key': job['key'],
+            'status': job['status'],
+            'input': job['input'],
+            'result': job['result'],
+            'error': job['error'],
+            'createdAt': _iso(job['created_at']),
+            'startedAt': _iso(job['started_at']),
+            'finishedAt': _iso(finished),
+            'queueMs': round((job['started_at'] - job['created_at']) * 1000, 1) if job['started_at'] else None,
+            'runMs': round((finished - job['started_at']) * 1000, 1) if finished and job['started_at'] else None,
+            'version': job['version'],
+        }
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        return self.public(job) if job else None
+
+    def wait_for_update(self, job_id: str, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Block until the job's version differs from version (or timeout); returns the job as it is then
+
+        Changes made in this process wake waiters immediately; changes from other processes sharing
+        the store are picked up within poll_interval.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['version'] != version or remaining <= 0:
+                return job
+            with self.changed:
+                self.changed.wait(min(self.poll_interval, remaining))
+
+    async def aget(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """get() for the event loop: the SQLite read runs on a worker thread"""
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def await_update(self, job_id: str, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """wait_for_update() for the event loop: polls the store without holding a thread between reads"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.aget(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['version'] != version or remaining <= 0:
+                return job
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest jobs first, without their results"""
+        return [{field: value for field, value in self.public(job).items() if field not in ('result', 'input')}
+                for job in self.store.list(status, limit)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self._stats, pending=self.pending, running=self.running, workers=self.max_workers)
+        stats['stored'] = self.store.status_counts()
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        self._stopped.set()
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,549 @@
+"""
+Call Policy Module
+Timeouts, per-stage deadlines, jittered retries, per-model circuit breaking and optional
+hedging for model API calls
+"""
+
+import asyncio
+import contextvars
+import inspect
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, Optional
+
+from metrics import metrics_registry
+
+try:
+    import httpx
+    TRANSIENT_ERRORS = (TimeoutError, ConnectionError, httpx.TimeoutException, httpx.TransportError)
+except ImportError:  # pragma: no cover - httpx ships with google-genai
+    TRANSIENT_ERRORS = (TimeoutError, ConnectionError)
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: timeouts, rate limits and transient server errors
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+LLM_RETRIES = metrics_registry.counter(
+    'evalbridge_llm_retries_total',
+    'Model call attempts retried after a retryable error',
+    ['model', 'stage', 'reason']
+)
+LLM_HEDGES = metrics_registry.counter(
+    'evalbridge_llm_hedges_total',
+    'Hedged model requests (fired after the hedge delay, won when the hedge answered first)',
+    ['model', 'outcome']
+)
+LLM_POLICY_REJECTIONS = metrics_registry.counter(
+    'evalbridge_llm_policy_rejections_total',
+    'Model calls failed fast by the call policy (open circuit, exhausted deadline)',
+    ['model', 'reason']
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the model while its circuit breaker is open"""
+
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(f"Circuit open for {model}; retry in {retry_after:.1f}s")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a call's stage deadline runs out before an attempt succeeds"""
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status carried by a provider error (google-genai APIError.code or a status_code)"""
+    for attribute in ('code', 'status_code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection failures, 408/429 and 5xx gateway errors are worth another attempt"""
+    if isinstance(error, (CircuitOpenError, DeadlineExceededError)):
+        return False
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    return error_status(error) in RETRYABLE_STATUS_CODES
+
+
+def _retry_reason(error: BaseException) -> str:
+    status = error_status(error)
+    if status is not None:
+        return str(status)
+    return 'timeout' if isinstance(error, TimeoutError) or 'Timeout' in type(error).__name__ else 'connection'
+
+
+def http_timeout_config(config: Optional[Dict[str, Any]], timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Merge a per-attempt timeout (seconds) into a generate_content config as http_options"""
+    if timeout is None:
+        return config
+    merged = dict(config or {})
+    merged['http_options'] = {'timeout': max(1, int(timeout * 1000))}
+    return merged
+
+
+def parse_stage_seconds(spec: str) -> Dict[str, float]:
+    """Parse 'extract=20,expert=90' into {'extract': 20.0, 'expert': 90.0}"""
+    seconds = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            stage, value = item.split('=', 1)
+            seconds[stage.strip()] = float(value)
+    return seconds
+
+
+class CallPolicy:
+    """Limits for one stage of model calls"""
+
+    def __init__(self, timeout_seconds: float = 60.0, deadline_seconds: float = 120.0,
+                 max_attempts: int = 3, backoff_base_seconds: float = 0.5,
+                 backoff_max_seconds: float = 8.0, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_delay_seconds: float = 1.0,
+                 hedge_min_samples: int = 20):
+        """
+        Args:
+            timeout_seconds: Limit for a single attempt
+            deadline_seconds: Limit for the whole call including retries and backoff
+            max_attempts: Attempts including the first
+            backoff_base_seconds: First retry backoff cap; doubles per retry (full jitter)
+            backoff_max_seconds: Upper bound on any backoff
+            hedge: Fire a second request when the first is slower than the hedge delay
+            hedge_quantile: Latency quantile of recent successful calls used as hedge delay
+            hedge_min_delay_seconds: Floor for the hedge delay
+            hedge_min_samples: Successful calls observed before hedging starts
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.timeout_seconds = timeout_seconds
+        self.deadline_seconds = deadline_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay_seconds = hedge_min_delay_seconds
+        self.hedge_min_samples = hedge_min_samples
+
+    def backoff(self, retry: int, rng: random.Random) -> float:
+        """Full-jitter exponential backoff before retry number `retry` (0-based)"""
+        cap = min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** retry))
+        return rng.uniform(0, cap)
+
+    def replace(self, **overrides) -> 'CallPolicy':
+        values = dict(vars(self))
+        values.update(overrides)
+        return CallPolicy(**values)
+
+    def describe(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one model
+
+    Closed: calls pass. Open: calls fail fast until the cooldown elapses. Half-open: one probe
+    call is let through; its success closes the circuit, its failure re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def acquire(self, model: str = ''):
+        """Admit one call or raise CircuitOpenError"""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_timeout_seconds - self.clock()
+                if remaining > 0:
+                    raise CircuitOpenError(model, remaining)
+                self.state = self.HALF_OPEN
+                logger.info("Circuit half-open", extra={'model': model})
+            if self.state == self.HALF_OPEN:
+                if self.probing:
+                    raise CircuitOpenError(model, self.reset_timeout_seconds)
+                self.probing = True
+
+    def release(self, success: Optional[bool], model: str = ''):
+        """
+        Record the outcome of an admitted call
+
+        success is None for outcomes that say nothing about the model's health (a rejected
+        request, an abandoned stream); they only free a half-open probe slot.
+        """
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self.probing = False
+            if success is None:
+                return
+            if success:
+                if self.state != self.CLOSED:
+                    logger.info("Circuit closed", extra={'model': model})
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit opened", extra={'model': model, 'failures': self.failures})
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+class LatencyWindow:
+    """Rolling window of successful call latencies for one model"""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class CallPolicyEngine:
+    """
+    Applies stage policies to model calls
+
+    Callables receive the attempt timeout in seconds and should pass it to the client
+    (see http_timeout_config) so a stuck request is abandoned by the HTTP layer. Async calls
+    are additionally bounded with asyncio.wait_for. Streams are retried only until the first
+    chunk arrives; after that an error propagates to the consumer.
+    """
+
+    def __init__(self, policies: Optional[Dict[str, CallPolicy]] = None,
+                 default: Optional[CallPolicy] = None, failure_threshold: int = 5,
+                 reset_timeout_seconds: float = 30.0, hedge_workers: int = 16,
+                 seed: Optional[int] = None, sleep: Callable[[float], None] = time.sleep):
+        self.policies = dict(policies or {})
+        self.default = default or CallPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.hedge_workers = hedge_workers
+        self.sleep = sleep
+        self._rng = random.Random(seed)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyWindow] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def policy_for(self, stage: Optional[str]) -> CallPolicy:
+        return self.policies.get(stage, self.default) if stage else self.default
+
+    def breaker_for(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(self.failure_threshold,
+                                                                 self.reset_timeout_seconds)
+            return breaker
+
+    def _latency(self, model: str) -> LatencyWindow:
+        with self._lock:
+            window = self._latencies.get(model)
+            if window is None:
+                window = self._latencies[model] = LatencyWindow()
+            return window
+
+    def _backoff(self, policy: CallPolicy, retry: int) -> float:
+        with self._lock:
+            return policy.backoff(retry, self._rng)
+
+    def hedge_delay(self, model: str, policy: CallPolicy) -> Optional[float]:
+        """Delay before a hedged request, or None when hedging is off or latency data is thin"""
+        if not policy.hedge:
+            return None
+        window = self._latency(model)
+        if len(window) < policy.hedge_min_samples:
+            return None
+        return max(policy.hedge_min_delay_seconds, window.quantile(policy.hedge_quantile))
+
+    def _attempt_timeout(self, model: str, policy: CallPolicy, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            LLM_POLICY_REJECTIONS.inc(model=model, reason='deadline')
+            raise DeadlineExceededError(f"Deadline of {policy.deadline_seconds}s exceeded for {model}")
+        return min(policy.timeout_seconds, remaining)
+
+    def _next_backoff(self, model: str, stage: Optional[str], policy: CallPolicy, retry: int,
+                      deadline: float, error: BaseException) -> Optional[float]:
+        """Backoff before the next attempt, or None when the error should propagate"""
+        if not is_retryable(error) or retry + 1 >= policy.max_attempts:
+            return None
+        delay = self._backoff(policy, retry)
+        if time.monotonic() + delay >= deadline:
+            return None
+        LLM_RETRIES.inc(model=model, stage=stage or 'default', reason=_retry_reason(error))
+        logger.warning("Retrying model call", extra={
+            'model': model, 'stage': stage, 'attempt': retry + 1, 'backoff_seconds': round(delay, 3),
+            'error': str(error)[:200]
+        })
+        return delay
+
+    def _settle(self, breaker: CircuitBreaker, model: str, error: Optional[BaseException]):
+        """Report an attempt outcome to the breaker: only retryable errors count as failures"""
+        if error is None:
+            breaker.release(True, model)
+        else:
+            breaker.release(False if is_retryable(error) else None, model)
+
+    # ------------------------------------------------------------------ sync
+
+    def call(self, model: str, fn: Callable[[float], Any], stage: Optional[str] = None) -> Any:
+        """Run fn(timeout) under the stage policy, retrying retryable errors"""
+        policy = self.policy_for(stage)
+        breaker = self.breaker_for(model)
+        deadline = time.monotonic() + policy.deadline_seconds
+        retry = 0
+        while True:
+            timeout = self._attempt_timeout(model, policy, deadline)
+            self._admit(breaker, model)
+            started = time.monotonic()
+            try:
+                result = self._hedged(model, fn, timeout, policy)
+            except Exception as e:
+                self._settle(breaker, model, e)
+                delay = self._next_backoff(model, stage, policy, retry, deadline, e)
+                if delay is None:
+                    raise
+                self.sleep(delay)
+                retry += 1
+                continue
+            self._latency(model).add(time.monotonic() - started)
+            self._settle(breaker, model, None)
+            return result
+
+    def _admit(self, breaker: CircuitBreaker, model: str):
+        try:
+            breaker.acquire(model)
+        except CircuitOpenError:
+            LLM_POLICY_REJECTIONS.inc(model=model, reason='circuit_open')
+            raise
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers,
+                                                    thread_name_prefix='llm-hedge')
+            return self._executor
+
+    def _hedged(self, model: str, fn: Callable[[float], Any], timeout: float, policy: CallPolicy) -> Any:
+        """
+        One attempt, duplicated after the hedge delay when enabled
+
+        Sync HTTP calls cannot be interrupted, so a losing request is left to finish on its
+        pool thread (bounded by its own timeout); its result is discarded. Each attempt runs
+        in its own copy of the caller's context so priority and request id reach admission.
+        """
+        delay = self.hedge_delay(model, policy)
+        if delay is None or delay >= timeout:
+            return fn(timeout)
+
+        executor = self._hedge_executor()
+        primary = executor.submit(contextvars.copy_context().run, fn, timeout)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        LLM_HEDGES.inc(model=model, outcome='fired')
+        hedge = executor.submit(contextvars.copy_context().run, fn, timeout - delay)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is hedge:
+                        LLM_HEDGES.inc(model=model, outcome='won')
+                    return future.result()
+                error = future.exception()
+        raise error or TimeoutError(f"Hedged call to {model} timed out after {timeout:.1f}s")
+
+    def stream(self, model: str, open_stream: Callable[[float], Iterable], stage: Optional[str] = None) -> Iterator:
+        """Yield items from open_stream(timeout), retrying failures that happen before the first item"""
+        policy = self.policy_for(stage)
+        breaker = self.breaker_for(model)
+        deadline = time.monotonic() + policy.deadline_seconds
+        retry = 0
+        while True:
+            timeout = self._attempt_timeout(model, policy, deadline)
+            self._admit(breaker, model)
+            started = False
+            outcome = None
+            try:
+                for item in open_stream(timeout):
+                    started = True
+                    yield item
+                outcome = True
+                return
+            except Exception as e:
+                outcome = False if is_retryable(e) else None
+                delay = None if started else self._next_backoff(model, stage, policy, retry, deadline, e)
+                if delay is None:
+                    raise
+            finally:
+                breaker.release(outcome, model)
+            self.sleep(delay)
+            retry += 1
+
+    # ----------------------------------------------------------------- async
+
+    async def acall(self, model: str, fn: Callable[[float], Awaitable], stage: Optional[str] = None) -> Any:
+        """Async variant of call(); attempts are also bounded with asyncio.wait_for"""
+        policy = self.policy_for(stage)
+        breaker = self.breaker_for(model)
+        deadline = time.monotonic() + policy.deadline_seconds
+        retry = 0
+        while True:
+            timeout = self._attempt_timeout(model, policy, deadline)
+            self._admit(breaker, model)
+            started = time.monotonic()
+            try:
+                result = await self._ahedged(model, fn, timeout, policy)
+            except asyncio.CancelledError:
+                breaker.release(None, model)
+                raise
+            except Exception as e:
+                self._settle(breaker, model, e)
+                delay = self._next_backoff(model, stage, policy, retry, deadline, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                retry += 1
+                continue
+            self._latency(model).add(time.monotonic() - started)
+            self._settle(breaker, model, None)
+            return result
+
+    async def _ahedged(self, model: str, fn: Callable[[float], Awaitable], timeout: float,
+                       policy: CallPolicy) -> Any:
+        """One async attempt, hedged when enabled; the losing request is cancelled"""
+        delay = self.hedge_delay(model, policy)
+        if delay is None or delay >= timeout:
+            return await asyncio.wait_for(fn(timeout), timeout)
+
+        primary = asyncio.ensure_future(asyncio.wait_for(fn(timeout), timeout))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        LLM_HEDGES.inc(model=model, outcome='fired')
+        hedge = asyncio.ensure_future(asyncio.wait_for(fn(timeout - delay), timeout - delay))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            LLM_HEDGES.inc(model=model, outcome='won')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def astream(self, model: str, open_stream: Callable[[float], Any],
+                      stage: Optional[str] = None) -> AsyncIterator:
+        """
+        Async variant of stream()
+
+        open_stream(timeout) returns an async iterator, or an awaitable resolving to one (the
+        shape of the client's aio generate_content_stream); the wait for the first item is
+        bounded by the attempt timeout.
+        """
+        policy = self.policy_for(stage)
+        breaker = self.breaker_for(model)
+        deadline = time.monotonic() + policy.deadline_seconds
+        retry = 0
+        while True:
+            timeout = self._attempt_timeout(model, policy, deadline)
+            self._admit(breaker, model)
+            started = False
+            outcome = None
+            try:
+                async def first_item():
+                    stream = open_stream(timeout)
+                    if inspect.isawaitable(stream):
+                        stream = await stream
+                    iterator = stream.__aiter__()
+                    try:
+                        return iterator, await iterator.__anext__()
+                    except StopAsyncIteration:
+                        return iterator, _EMPTY
+
+                iterator, item = await asyncio.wait_for(first_item(), timeout)
+                started = True
+                if item is not _EMPTY:
+                    yield item
+                    async for item in iterator:
+                        yield item
+                outcome = True
+                return
+            except Exception as e:
+                outcome = False if is_retryable(e) else None
+                delay = None if started else self._next_backoff(model, stage, policy, retry, deadline, e)
+                if delay is None:
+                    raise
+            finally:
+                breaker.release(outcome, model)
+            await asyncio.sleep(delay)
+            retry += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = dict(self._breakers)
+            latencies = dict(self._latencies)
+        return {
+            'default': self.default.describe(),
+            'stages': {stage: policy.describe() for stage, policy in self.policies.items()},
+            'circuits': {model: breaker.get_stats() for model, breaker in breakers.items()},
+            'p95_seconds': {model: window.quantile(0.95) for model, window in latencies.items()},
+        }
+
+
+_EMPTY = object()
@@ -0,0 +1,286 @@
+"""
+Chat History Module
+Token-budget-aware compaction of chat history into recent turns plus a rolling per-conversation summary
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Leading text of the synthetic message carrying the summary of compacted turns
+SUMMARY_HEADER = "[Summary of earlier conversation]"
+
+Message = Dict[str, Any]
+Summarizer = Callable[[Optional[str], List[Message], int], str]
+
+
+def _is_wide(char: str) -> bool:
+    """CJK and other wide scripts tokenize at roughly one token per character"""
+    code = ord(char)
+    return (0x2E80 <= code <= 0x9FFF or 0xAC00 <= code <= 0xD7AF or 0xF900 <= code <= 0xFAFF
+            or 0xFF00 <= code <= 0xFFEF)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate (no tokenizer round-trip)
+
+    About four characters per token for Latin text and one per CJK character, which is
+    close enough to Gemini's tokenizer for budgeting.
+    """
+    if not text:
+        return 0
+    if text.isascii():
+        return (len(text) + 3) // 4
+    wide = sum(1 for char in text if _is_wide(char))
+    return wide + (len(text) - wide + 3) // 4
+
+
+def _content(message: Any) -> str:
+    return (message.get('content') or '') if isinstance(message, dict) else ''
+
+
+def message_tokens(message: Message) -> int:
+    """Estimated tokens of one history message, including a small per-message overhead"""
+    return estimate_tokens(_content(message)) + 4
+
+
+def clip_text(text: str, max_tokens: int) -> str:
+    """Shorten text to roughly max_tokens, keeping its head and tail"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Work in characters using the text's own chars-per-token ratio
+    ratio = len(text) / max(estimate_tokens(text), 1)
+    keep = max(int(max_tokens * ratio) - 5, 2)
+    head = keep * 2 // 3
+    return f"{text[:head]} … {text[len(text) - (keep - head):]}"
+
+
+def extractive_summary(previous: Optional[str], messages: List[Message], max_tokens: int) -> str:
+    """
+    Fold messages into the running summary without a model call
+
+    Each message becomes one clipped line; when the summary outgrows its budget the oldest
+    lines go first.
+    """
+    line_tokens = max(max_tokens // 8, 16)
+    lines = previous.split('\n') if previous else []
+    for message in messages:
+        text = ' '.join(_content(message).split())
+        if text:
+            lines.append(f"{message.get('role', 'user')}: {clip_text(text, line_tokens)}")
+    total = sum(estimate_tokens(line) + 1 for line in lines)
+    while len(lines) > 1 and total > max_tokens:
+        total -= estimate_tokens(lines.pop(0)) + 1
+    return '\n'.join(lines)
+
+
+def _chain(digest: str, message: Message) -> str:
+    """Extend a rolling hash of the history by one message"""
+    role = message.get('role', '') if isinstance(message, dict) else ''
+    return hashlib.sha256(f"{digest}\x00{role}\x00{_content(message)}".encode('utf-8')).hexdigest()
+
+
+class CompactedHistory:
+    """History that fits a token budget: an optional summary of older turns plus recent turns"""
+
+    def __init__(self, summary: Optional[str], messages: List[Message], tokens: int, compacted: int):
+        self.summary = summary
+        self.messages = messages
+        self.tokens = tokens
+        self.compacted = compacted  # number of leading messages folded into the summary
+
+    def as_messages(self) -> List[Message]:
+        """Recent turns, preceded by the summary as a user message when there is one"""
+        if not self.summary:
+            return list(self.messages)
+        return [{'role': 'user', 'content': f"{SUMMARY_HEADER}\n{self.summary}"}] + self.messages
+
+
+class _RollingSummary:
+    """Summary of the first `covered` messages of a conversation"""
+
+    def __init__(self, covered: int, digest: str, text: str):
+        self.covered = covered
+        self.digest = digest
+        self.text = text
+
+
+class ChatHistoryManager:
+    """
+    Keeps chat history within a per-model token budget
+
+    The newest messages are kept verbatim while they fit (a single oversized message is
+    clipped); everything older is folded into a rolling summary. Summaries are cached per
+    conversation and budget together with a hash of the messages they cover, so the next turn
+    only summarizes the messages that newly fell out of the window, and alternating between
+    models with different budgets doesn't evict each other's summary. A turn with no summary
+    for its budget yet extends the conversation's longest summary that still covers a prefix
+    of its cut. If the client's history no longer matches (edited or truncated), the summary
+    is rebuilt from scratch.
+    """
+
+    def __init__(self, token_budgets: Optional[Dict[str, int]] = None, default_budget: int = 4000,
+                 summary_tokens: int = 500, summarizer: Optional[Summarizer] = None,
+                 max_conversations: int = 1000):
+        """
+        Args:
+            token_budgets: History token budget per model name
+            default_budget: Budget for models not listed
+            summary_tokens: Part of the budget reserved for the summary of older turns
+            summarizer: Callable(previous_summary, new_messages, max_tokens) -> summary;
+                defaults to extractive_summary (no model call)
+            max_conversations: Conversations whose rolling summaries are kept; least recently used are dropped
+        """
+        self.token_budgets = dict(token_budgets or {})
+        self.default_budget = default_budget
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer or extractive_summary
+        self.max_conversations = max_conversations
+        self.lock = threading.Lock()
+        self._summaries: 'OrderedDict[str, Dict[int, _RollingSummary]]' = OrderedDict()
+        self._stats = {'compactions': 0, 'incremental': 0, 'rebuilt': 0, 'reused': 0,
+                       'clipped': 0, 'summarizer_errors': 0}
+
+    def budget_for(self, model: str) -> int:
+        """History token budget for a model"""
+        return self.token_budgets.get(model, self.default_budget)
+
+    def compact(self, history: List[Message], model: str, conversation_id: Optional[str] = None) -> CompactedHistory:
+        """
+        Fit history into the model's budget
+
+        Args:
+            history: Messages shaped like {'role': ..., 'content': ...}, oldest first
+            model: Model the history is sent to (selects the budget)
+            conversation_id: Enables the cached rolling summary for this conversation
+
+        Returns:
+            CompactedHistory whose as_messages() fits the budget
+        """
+        history = [message for message in history or [] if _content(message)]
+        budget = self.budget_for(model)
+        total = sum(message_tokens(message) for message in history)
+        if total <= budget:
+            return CompactedHistory(None, history, total, 0)
+
+        # Keep the newest messages that fit next to the summary
+        recent_budget = max(budget - self.summary_tokens, budget // 2)
+        kept: List[Message] = []
+        used = 0
+        for message in reversed(history):
+            tokens = message_tokens(message)
+            if used + tokens > recent_budget:
+                if not kept:
+                    # The newest message alone is over budget: keep a clipped copy
+                    message = dict(message, content=clip_text(_content(message), recent_budget - 4))
+                    kept.append(message)
+                    used += message_tokens(message)
+                    with self.lock:
+                        self._stats['clipped'] += 1
+                break
+            kept.append(message)
+            used += tokens
+        kept.reverse()
+        cut = len(history) - len(kept)
+
+        summary = self._summarize(conversation_id, history, cut, budget)
+        summary_tokens = estimate_tokens(summary) + 8 if summary else 0
+        with self.lock:
+            self._stats['compactions'] += 1
+        return CompactedHistory(summary, kept, used + summary_tokens, cut)
+
+    def _summarize(self, conversation_id: Optional[str], history: List[Message], cut: int,
+                   budget: int) -> Optional[str]:
+        """Summary of history[:cut], reusing and extending a cached one where it still applies"""
+        if cut == 0:
+            return None
+
+        with self.lock:
+            cached = list(self._summaries.get(conversation_id, {}).values()) if conversation_id else []
+
+        # Longest cached summary of a prefix of history[:cut]; prefixes are hashed once, shortest first
+        previous, start, digest = None, 0, ''
+        prefix_digest, hashed = '', 0
+        for entry in sorted((entry for entry in cached if entry.covered <= cut), key=lambda entry: entry.covered):
+            for message in history[hashed:entry.covered]:
+                prefix_digest = _chain(prefix_digest, message)
+            hashed = entry.covered
+            if prefix_digest == entry.digest:
+                previous, start, digest = entry.text, entry.covered, entry.digest
+
+        if previous is not None and start == cut:
+            with self.lock:
+                self._stats['reused'] += 1
+                self._remember(conversation_id, budget, _RollingSummary(cut, digest, previous))
+            return previous
+
+        new_messages = history[start:cut]
+        try:
+            text = self.summarizer(previous, new_messages, self.summary_tokens)
+        except Exception:
+            logger.exception("History summarizer error")
+            with self.lock:
+                self._stats['summarizer_errors'] += 1
+            text = extractive_summary(previous, new_messages, self.summary_tokens)
+        text = clip_text(text, self.summary_tokens)
+
+        for message in new_messages:
+            digest = _chain(digest, message)
+        with self.lock:
+            self._stats['incremental' if previous is not None else 'rebuilt'] += 1
+            if conversation_id:
+                self._remember(conversation_id, budget, _RollingSummary(cut, digest, text))
+        return text
+
+    def _remember(self, conversation_id: str, budget: int, summary: _RollingSummary):
+        """Cache a conversation's summary for a budget (lock held)"""
+        self._summaries.setdefault(conversation_id, {})[budget] = summary
+        self._summaries.move_to_end(conversation_id)
+        while len(self._summaries) > self.max_conversations:
+            self._summaries.popitem(last=False)
+
+    def forget(self, conversation_id: str):
+        """Drop a conversation's rolling summary"""
+        with self.lock:
+            self._summaries.pop(conversation_id, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get compaction counters and the number of cached summaries"""
+        with self.lock:
+            stats = dict(self._stats)
+            stats['conversations'] = len(self._summaries)
+        return stats
+
+
+def parse_token_budgets(spec: str) -> Dict[str, int]:
+    """Parse 'model=tokens,model=tokens' (as in CHAT_HISTORY_MODEL_BUDGETS)"""
+    budgets = {}
+    for item in (spec or '').split(','):
+        model, _, tokens = item.partition('=')
+        if model.strip() and tokens.strip():
+            budgets[model.strip()] = int(tokens)
+    return budgets
+
+
+def model_summarizer(generate: Callable[[str], str]) -> Summarizer:
+    """
+    Build a summarizer that asks a (fast) model to update the running summary
+
+    Args:
+        generate: Callable(prompt) -> text, e.g. a gateway call on a Flash model
+    """
+    def summarize(previous: Optional[str], messages: List[Message], max_tokens: int) -> str:
+        transcript = '\n'.join(f"{message.get('role', 'user')}: {_content(message)}" for message in messages)
+        prompt = (
+            "You maintain a running summary of a conversation between an AI product manager and an "
+            "evaluation consultant. Update the summary with the new messages, keeping decisions, "
+            f"capabilities discussed and open questions. Reply with the summary only, under {max_tokens} tokens.\n\n"
+            f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"
+        )
+        return generate(prompt).strip()
+    return summarize
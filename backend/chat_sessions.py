@@ -0,0 +1,175 @@
+"""
+Chat Session Store Module
+Keeps live model chat sessions per conversation so each new message costs a single streamed call
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+
+def history_to_contents(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Convert frontend chat history into Gemini content dicts
+
+    Args:
+        history: Messages shaped like {'role': 'user' | 'assistant', 'content': str}
+
+    Returns:
+        Content dicts usable as the `history` of a new chat session
+    """
+    contents = []
+    for msg in history or []:
+        text = msg.get('content') if isinstance(msg, dict) else None
+        if not text:
+            continue
+        role = 'user' if msg.get('role') == 'user' else 'model'
+        contents.append({'role': role, 'parts': [{'text': text}]})
+    return contents
+
+
+def prompt_fingerprint(system_prompt: str) -> str:
+    """Short hash identifying the system prompt a session was created with"""
+    return hashlib.sha256((system_prompt or '').encode('utf-8')).hexdigest()[:16]
+
+
+class ChatSession:
+    """A live chat session bound to one conversation"""
+
+    def __init__(self, conversation_id: str, chat: Any, fingerprint: str, lock: Any = None):
+        self.conversation_id = conversation_id
+        self.chat = chat
+        self.fingerprint = fingerprint
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.turns = 0
+        self.tokens = 0  # estimated tokens of the history held by the live session
+        # Serializes messages within one conversation so the session history stays ordered
+        self.lock = lock if lock is not None else threading.Lock()
+
+
+class ChatSessionStore:
+    """LRU store of live chat sessions with idle eviction and a max-session cap"""
+
+    def __init__(self, factory: Callable[[str, List[Dict[str, Any]]], Any],
+                 max_sessions: int = 500, idle_ttl_seconds: float = 1800,
+                 lock_factory: Callable[[], Any] = threading.Lock):
+        """
+        Args:
+            factory: Callable(system_prompt, history_contents) returning a new chat session
+            max_sessions: Upper bound on live sessions; least recently used ones are reclaimed
+            idle_ttl_seconds: Sessions unused for longer than this are evicted
+            lock_factory: Per-session lock type (asyncio.Lock for async chat sessions)
+        """
+        self.factory = factory
+        self.lock_factory = lock_factory
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._sessions: 'OrderedDict[str, ChatSession]' = OrderedDict()
+        self.lock = threading.Lock()
+        self._stats = {'created': 0, 'reused': 0, 'evicted_idle': 0, 'evicted_lru': 0, 'rebuilt': 0}
+
+    def get_or_create(self, conversation_id: str, system_prompt: str,
+                      history: Union[List[Dict[str, Any]], Callable[[], List[Dict[str, Any]]], None] = None
+                      ) -> Tuple[ChatSession, bool]:
+        """
+        Return the live session for a conversation, creating it if needed
+
+        A new session is seeded from the client-provided history in one step (no replayed
+        round-trips). An existing session is reused as-is unless the system prompt changed,
+        in which case it is rebuilt from the client history. `history` may be a callable so
+        that preparing it (e.g. compaction) only happens when a session is actually created.
+
+        Returns:
+            (session, created)
+        """
+        fingerprint = prompt_fingerprint(system_prompt)
+        session = self._reuse(conversation_id, fingerprint)
+        if session is not None:
+            return session, False
+
+        # Creating the chat object does not call the API, but keep it outside the store lock anyway
+        if callable(history):
+            history = history()
+        return self._insert(conversation_id, system_prompt, fingerprint, history)
+
+    async def aget_or_create(self, conversation_id: str, system_prompt: str,
+                             history: Union[List[Dict[str, Any]], Callable[[], Awaitable[List[Dict[str, Any]]]],
+                                            None] = None) -> Tuple[ChatSession, bool]:
+        """Async variant of get_or_create; a callable `history` is a coroutine function, awaited only on creation"""
+        fingerprint = prompt_fingerprint(system_prompt)
+        session = self._reuse(conversation_id, fingerprint)
+        if session is not None:
+            return session, False
+
+        if callable(history):
+            history = await history()
+        return self._insert(conversation_id, system_prompt, fingerprint, history)
+
+    def _reuse(self, conversation_id: str, fingerprint: str) -> Optional[ChatSession]:
+        """The live session if its system prompt still matches; a stale one is discarded"""
+        with self.lock:
+            self._evict_idle(time.time())
+            session = self._sessions.get(conversation_id)
+            if session is not None and session.fingerprint == fingerprint:
+                self._sessions.move_to_end(conversation_id)
+                session.last_used = time.time()
+                self._stats['reused'] += 1
+                return session
+            if session is not None:
+                del self._sessions[conversation_id]
+                self._stats['rebuilt'] += 1
+        return None
+
+    def _insert(self, conversation_id: str, system_prompt: str, fingerprint: str,
+                history: Optional[List[Dict[str, Any]]]) -> Tuple[ChatSession, bool]:
+        chat = self.factory(system_prompt, history_to_contents(history))
+        session = ChatSession(conversation_id, chat, fingerprint, self.lock_factory())
+
+        with self.lock:
+            existing = self._sessions.get(conversation_id)
+            if existing is not None and existing.fingerprint == fingerprint:
+                # Another request for the same conversation won the race
+                self._sessions.move_to_end(conversation_id)
+                existing.last_used = time.time()
+                return existing, False
+            self._sessions[conversation_id] = session
+            self._stats['created'] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats['evicted_lru'] += 1
+
+        return session, True
+
+    def drop(self, conversation_id: str) -> bool:
+        """Forget a conversation's session (e.g. after an error left its history inconsistent)"""
+        with self.lock:
+            return self._sessions.pop(conversation_id, None) is not None
+
+    def evict_idle(self) -> int:
+        """Evict sessions idle for longer than the TTL; returns the number evicted"""
+        with self.lock:
+            return self._evict_idle(time.time())
+
+    def _evict_idle(self, now: float) -> int:
+        """Evict idle sessions (lock held); the LRU order means the oldest are at the front"""
+        evicted = 0
+        while self._sessions:
+            conversation_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.idle_ttl_seconds:
+                break
+            del self._sessions[conversation_id]
+            evicted += 1
+        self._stats['evicted_idle'] += evicted
+        return evicted
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get session counters"""
+        with self.lock:
+            stats = dict(self._stats)
+            stats['live_sessions'] = len(self._sessions)
+            stats['max_sessions'] = self.max_sessions
+            stats['idle_ttl_seconds'] = self.idle_ttl_seconds
+        return stats
@@ -0,0 +1,269 @@
+"""
+Context Cache Module
+Registers long, stable prompt prefixes as provider-side cached contents so each call only sends its variable suffix
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from single_flight import AsyncSingleFlight, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def prefix_key(model: str, prefix: str) -> str:
+    """Content address of a cached prefix (the provider cache is bound to one model)"""
+    digest = hashlib.sha256()
+    digest.update(model.encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(prefix.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _is_too_small(error: Exception) -> bool:
+    """Whether the provider rejected a cache because the content is below the model's minimum size"""
+    message = str(error).lower()
+    return 'min_total_token_count' in message or 'too small' in message
+
+
+class CachedPrefix:
+    """A prefix registered with the provider"""
+
+    def __init__(self, name: str, model: str, label: Optional[str], expires_at: float):
+        self.name = name
+        self.model = model
+        self.label = label
+        self.expires_at = expires_at
+
+
+class ContextCacheManager:
+    """
+    Keeps provider-side cached contents (client.caches) for prompt prefixes
+
+    Each distinct (model, prefix) pair is created once and reused by name until its TTL
+    runs low, at which point the TTL is extended (or the cache recreated if that fails).
+    A prefix registered under a label (e.g. a prompt template name) replaces the previous
+    cache for that label when its text changes, so editing a template rolls the cache over.
+
+    Everything here is best effort: when creation fails (model without caching support,
+    quota) the prefix is remembered as unavailable for `failure_backoff_seconds` and callers
+    send the full prompt instead. A prefix the provider rejects as below the model's minimum
+    size can never succeed, so it is not retried at all.
+    """
+
+    def __init__(self, client=None, ttl_seconds: float = 3600, refresh_margin_seconds: float = 300,
+                 failure_backoff_seconds: float = 600, min_chars: int = 4096, max_entries: int = 64,
+                 enabled: bool = True):
+        """
+        Args:
+            client: Gemini client (needs .caches, and .aio.caches for the async path)
+            ttl_seconds: TTL requested for each cached content
+            refresh_margin_seconds: Extend the TTL once less than this remains
+            failure_backoff_seconds: How long a prefix that failed to register is sent uncached
+            min_chars: Prefixes shorter than this are never registered (the default is the
+                smallest provider minimum, 1024 tokens, at ~4 chars per token)
+            max_entries: Live cached contents kept; the least recently used are deleted
+            enabled: Master switch
+        """
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.failure_backoff_seconds = failure_backoff_seconds
+        self.min_chars = min_chars
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self._entries: 'OrderedDict[str, CachedPrefix]' = OrderedDict()
+        self._labels: Dict[Tuple[str, str], str] = {}
+        self._failed_until: Dict[str, float] = {}
+        self.single_flight = SingleFlight()
+        self.async_single_flight = AsyncSingleFlight()
+        self._stats = {'hits': 0, 'created': 0, 'refreshed': 0, 'failures': 0, 'fallbacks': 0,
+                       'too_small': 0, 'invalidated': 0, 'deleted': 0}
+
+    def _ttl(self) -> str:
+        return f"{int(self.ttl_seconds)}s"
+
+    def _lookup(self, model: str, prefix: str) -> Tuple[Optional[str], Optional[str], Optional[CachedPrefix]]:
+        """
+        Classify a request for a prefix
+
+        Returns:
+            (name to use now, key needing a create/refresh, current entry) - at most one of
+            the first two is set; both None means send the full prompt
+        """
+        if not self.enabled or self.client is None or not prefix or len(prefix) < self.min_chars:
+            return None, None, None
+        key = prefix_key(model, prefix)
+        now = time.time()
+        with self.lock:
+            if self._failed_until.get(key, 0) > now:
+                self._stats['fallbacks'] += 1
+                return None, None, None
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at - now > self.refresh_margin_seconds:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry.name, None, entry
+        return None, key, entry
+
+    def _create_config(self, prefix: str, label: Optional[str]) -> Dict[str, Any]:
+        config = {
+            'contents': [{'role': 'user', 'parts': [{'text': prefix}]}],
+            'ttl': self._ttl()
+        }
+        if label:
+            config['display_name'] = label
+        return config
+
+    def _store(self, key: str, model: str, label: Optional[str], name: str, refreshed: bool) -> List[str]:
+        """Record a created/refreshed cache; returns names of caches that should now be deleted"""
+        stale = []
+        with self.lock:
+            self._failed_until.pop(key, None)
+            self._entries[key] = CachedPrefix(name, model, label, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            self._stats['refreshed' if refreshed else 'created'] += 1
+            if label:
+                previous = self._labels.get((model, label))
+                if previous is not None and previous != key:
+                    replaced = self._entries.pop(previous, None)
+                    if replaced is not None:
+                        stale.append(replaced.name)
+                self._labels[(model, label)] = key
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._labels.pop((evicted.model, evicted.label), None)
+                stale.append(evicted.name)
+        return stale
+
+    def _record_failure(self, key: str, error: Exception):
+        too_small = _is_too_small(error)
+        with self.lock:
+            self._entries.pop(key, None)
+            # The prefix for a key never changes, so a size rejection is permanent
+            self._failed_until[key] = float('inf') if too_small else time.time() + self.failure_backoff_seconds
+            self._stats['failures'] += 1
+            self._stats['fallbacks'] += 1
+            if too_small:
+                self._stats['too_small'] += 1
+        logger.warning("Context cache unavailable, sending full prompt",
+                       extra={'error': str(error), 'retry': not too_small})
+
+    def get(self, model: str, prefix: str, label: Optional[str] = None) -> Optional[str]:
+        """
+        Get the cached content name for a prefix, registering or refreshing it as needed
+
+        Args:
+            model: Model the cache is used with
+            prefix: Stable leading part of the prompt
+            label: Optional stable identity (e.g. template name) for rolling over on change
+
+        Returns:
+            Cached content name to pass as `cached_content`, or None to send the full prompt
+        """
+        name, key, entry = self._lookup(model, prefix)
+        if key is None:
+            return name
+        try:
+            name, _ = self.single_flight.do(key, lambda: self._register(key, model, prefix, label, entry))
+            return name
+        except Exception:
+            return None
+
+    def _register(self, key: str, model: str, prefix: str, label: Optional[str],
+                  entry: Optional[CachedPrefix]) -> str:
+        if entry is not None and entry.expires_at > time.time():
+            try:
+                self.client.caches.update(name=entry.name, config={'ttl': self._ttl()})
+                self._delete(self._store(key, model, label, entry.name, refreshed=True))
+                return entry.name
+            except Exception as e:
+                logger.info("Context cache refresh failed, recreating", extra={'error': str(e)})
+        try:
+            cached = self.client.caches.create(model=model, config=self._create_config(prefix, label))
+        except Exception as e:
+            self._record_failure(key, e)
+            raise
+        self._delete(self._store(key, model, label, cached.name, refreshed=False))
+        return cached.name
+
+    def _delete(self, names: List[str]):
+        for name in names:
+            try:
+                self.client.caches.delete(name=name)
+                with self.lock:
+                    self._stats['deleted'] += 1
+            except Exception as e:
+                logger.info("Context cache delete failed", extra={'cache': name, 'error': str(e)})
+
+    async def aget(self, model: str, prefix: str, label: Optional[str] = None) -> Optional[str]:
+        """Async variant of get() using the client's aio surface"""
+        name, key, entry = self._lookup(model, prefix)
+        if key is None:
+            return name
+        try:
+            name, _ = await self.async_single_flight.do(
+                key, lambda: self._aregister(key, model, prefix, label, entry)
+            )
+            return name
+        except Exception:
+            return None
+
+    async def _aregister(self, key: str, model: str, prefix: str, label: Optional[str],
+                         entry: Optional[CachedPrefix]) -> str:
+        caches = self.client.aio.caches
+        if entry is not None and entry.expires_at > time.time():
+            try:
+                await caches.update(name=entry.name, config={'ttl': self._ttl()})
+                await self._adelete(self._store(key, model, label, entry.name, refreshed=True))
+                return entry.name
+            except Exception as e:
+                logger.info("Context cache refresh failed, recreating", extra={'error': str(e)})
+        try:
+            cached = await caches.create(model=model, config=self._create_config(prefix, label))
+        except Exception as e:
+            self._record_failure(key, e)
+            raise
+        await self._adelete(self._store(key, model, label, cached.name, refreshed=False))
+        return cached.name
+
+    async def _adelete(self, names: List[str]):
+        for name in names:
+            try:
+                await self.client.aio.caches.delete(name=name)
+                with self.lock:
+                    self._stats['deleted'] += 1
+            except Exception as e:
+                logger.info("Context cache delete failed", extra={'cache': name, 'error': str(e)})
+
+    def invalidate(self, name: str):
+        """Forget a cached content the provider rejected (e.g. expired or deleted remotely)"""
+        with self.lock:
+            for key, entry in list(self._entries.items()):
+                if entry.name == name:
+                    del self._entries[key]
+                    self._labels.pop((entry.model, entry.label), None)
+                    self._stats['invalidated'] += 1
+
+    def clear(self):
+        """Delete every cached content this process registered"""
+        with self.lock:
+            names = [entry.name for entry in self._entries.values()]
+            self._entries.clear()
+            self._labels.clear()
+            self._failed_until.clear()
+        if self.client is not None:
+            self._delete(names)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get counters plus the number of live cached contents"""
+        with self.lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['enabled'] = self.enabled
+        return stats
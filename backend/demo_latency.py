@@ -0,0 +1,163 @@
+"""
+Demo Latency Module
+Simulated model latency for demo mode, awaited on the event loop (ASGI) or slept on the calling thread (WSGI)
+"""
+
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional
+
+# Operations the demo paths simulate, with defaults matching the previous hard-coded delays
+DEFAULT_LATENCY_SPECS: Dict[str, str] = {
+    'chat': 'fixed:0',
+    'extract': 'fixed:0',
+    'router': 'fixed:0',
+    'expert': 'fixed:1.0',
+    'stream_first': 'fixed:0',  # time to first streamed chunk
+    'stream_chunk': 'fixed:0.2',  # gap between streamed chunks
+}
+
+
+class LatencyModel:
+    """
+    A latency distribution parsed from a spec string
+
+    Specs (seconds):
+      - fixed:1.0 (or a bare number)
+      - normal:MEAN,STDDEV - clipped at zero
+      - lognormal:MEDIAN,SIGMA - right-skewed, like real model latency
+      - pareto:MINIMUM,ALPHA - heavy-tailed; alpha <= 2 gives occasional very slow calls
+    """
+
+    KINDS = ('fixed', 'normal', 'lognormal', 'pareto')
+
+    def __init__(self, kind: str, params: tuple):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        expected = 1 if kind == 'fixed' else 2
+        if len(params) != expected or any(value < 0 for value in params):
+            raise ValueError(f"{kind} latency takes {expected} non-negative parameter(s), got {params}")
+        if kind == 'pareto' and params[1] == 0:
+            raise ValueError("pareto latency needs alpha > 0")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> 'LatencyModel':
+        kind, sep, args = spec.strip().partition(':')
+        if not sep:
+            kind, args = 'fixed', kind
+        try:
+            params = tuple(float(value) for value in args.split(',') if value.strip())
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        return cls(kind.strip().lower(), params)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == 'fixed':
+            return self.params[0]
+        if self.kind == 'normal':
+            return max(rng.gauss(*self.params), 0.0)
+        if self.kind == 'lognormal':
+            median, sigma = self.params
+            return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        minimum, alpha = self.params
+        return minimum * rng.paretovariate(alpha)
+
+    def __repr__(self):
+        return f"{self.kind}:{','.join(f'{value:g}' for value in self.params)}"
+
+
+class DemoLatency:
+    """
+    Per-operation latency distributions for the demo paths
+
+    Delays are sampled here and waited out by the caller: `asleep` on the event loop (the
+    ASGI app), `sleep` on the calling thread (the Flask app). Only the ASGI app models
+    non-blocking waits; under Flask a simulated call holds its request or pipeline thread
+    for the whole delay, just as a blocking model call would.
+    """
+
+    def __init__(self, specs: Optional[Dict[str, str]] = None, scale: float = 1.0,
+                 max_seconds: float = 30.0, seed: Optional[int] = None):
+        """
+        Args:
+            specs: Spec per operation (see LatencyModel); missing operations use DEFAULT_LATENCY_SPECS
+            scale: Multiplier on every delay; 0 turns simulated latency off (e.g. for tests)
+            max_seconds: Cap on a single delay so heavy tails stay bounded
+            seed: Seed for reproducible delay sequences
+        """
+        merged = dict(DEFAULT_LATENCY_SPECS)
+        merged.update(specs or {})
+        self.models = {operation: LatencyModel.parse(spec) for operation, spec in merged.items()}
+        self.scale = scale
+        self.max_seconds = max_seconds
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()  # random.Random is not safe to share across threads
+
+    @classmethod
+    def from_env(cls) -> 'DemoLatency':
+        """Build from DEMO_LATENCY_<OPERATION> plus DEMO_LATENCY_SCALE/_MAX_SECONDS/_SEED"""
+        specs = {}
+        for operation in DEFAULT_LATENCY_SPECS:
+            spec = os.getenv(f"DEMO_LATENCY_{operation.upper()}")
+            if spec:
+                specs[operation] = spec
+        seed = os.getenv('DEMO_LATENCY_SEED')
+        return cls(
+            specs,
+            scale=float(os.getenv('DEMO_LATENCY_SCALE', '1.0')),
+            max_seconds=float(os.getenv('DEMO_LATENCY_MAX_SECONDS', '30')),
+            seed=int(seed) if seed else None
+        )
+
+    def sample(self, operation: str) -> float:
+        """Draw one delay (seconds) for an operation"""
+        model = self.models[operation]
+        if self.scale <= 0:
+            return 0.0
+        with self.lock:
+            delay = model.sample(self.rng)
+        return min(delay * self.scale, self.max_seconds)
+
+    async def asleep(self, operation: str) -> float:
+        """Wait out a sampled delay without blocking the event loop; returns the delay"""
+        delay = self.sample(operation)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def sleep(self, operation: str) -> float:
+        """Blocking variant of asleep(): holds the calling thread for the delay"""
+        delay = self.sample(operation)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def astream(self, items: Iterable[Any]) -> AsyncIterator[Any]:
+        """Yield items with simulated time-to-first-chunk and inter-chunk gaps"""
+        operation = 'stream_first'
+        for item in items:
+            await self.asleep(operation)
+            operation = 'stream_chunk'
+            yield item
+
+    def stream(self, items: Iterable[Any]) -> Iterator[Any]:
+        """Blocking variant of astream() for WSGI streaming generators"""
+        operation = 'stream_first'
+        for item in items:
+            self.sleep(operation)
+            operation = 'stream_chunk'
+            yield item
+
+    def describe(self) -> Dict[str, Any]:
+        """Active configuration, for status endpoints"""
+        return {
+            'distributions': {operation: repr(model) for operation, model in self.models.items()},
+            'scale': self.scale,
+            'max_seconds': self.max_seconds
+        }
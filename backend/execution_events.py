@@ -0,0 +1,139 @@
+"""
+Execution Events Module
+Live feed of execution lifecycle events with resumable ids and a bounded replay buffer
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Lifecycle event types pushed to dashboard clients
+EVENT_TYPES = ('start', 'step', 'complete', 'fail')
+
+Event = Tuple[int, str, Dict[str, Any]]
+
+
+class ExecutionEventFeed:
+    """
+    Fan-out of execution events to any number of live subscribers
+
+    Every event gets a monotonically increasing id. Subscribers block in wait() for events
+    after the last id they saw, so a reconnecting client (SSE Last-Event-ID) receives only the
+    deltas it missed, served from the in-memory replay buffer. If the client is further behind
+    than the buffer reaches, wait() returns None and the client should reload a full snapshot.
+
+    Events are either published in-process (publish) or tailed from a shared event source,
+    e.g. SQLiteExecutionStore, whose ids are global across processes. Tailing runs in a
+    single background thread per feed no matter how many clients are connected.
+    """
+
+    def __init__(self, replay_size: int = 1000, source=None, poll_interval: float = 0.5):
+        """
+        Args:
+            replay_size: Events kept for reconnecting clients
+            source: Optional object with last_event_id() and read_events(after_id, limit)
+            poll_interval: Seconds between reads of the source once tailing has started
+        """
+        self.replay_size = replay_size
+        self.source = source
+        self.poll_interval = poll_interval
+        self.condition = threading.Condition()
+        self._buffer: "deque[Event]" = deque(maxlen=replay_size)
+        self._last_id = 0
+        self._subscribers = 0
+        self._tailer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def last_id(self) -> int:
+        """Id of the most recent event (0 if none yet)"""
+        self._ensure_tailing()
+        with self.condition:
+            return self._last_id
+
+    def publish(self, event_type: str, data: Dict[str, Any], event_id: int = None) -> int:
+        """
+        Append an event and wake subscribers
+
+        Args:
+            event_type: One of EVENT_TYPES
+            data: JSON-serialisable payload
+            event_id: Id assigned by the source; defaults to the next local id
+
+        Returns:
+            The event id
+        """
+        with self.condition:
+            if event_id is None:
+                event_id = self._last_id + 1
+            self._last_id = event_id
+            self._buffer.append((event_id, event_type, data))
+            self.condition.notify_all()
+        return event_id
+
+    def _events_after(self, last_id: int) -> Optional[List[Event]]:
+        """Buffered events newer than last_id, or None if some were already dropped (lock held)"""
+        if last_id >= self._last_id:
+            return []
+        if not self._buffer or self._buffer[0][0] > last_id + 1:
+            return None
+        return [event for event in self._buffer if event[0] > last_id]
+
+    def wait(self, last_id: int, timeout: float) -> Optional[List[Event]]:
+        """
+        Block until there are events after last_id or the timeout passes
+
+        Returns:
+            The new events (possibly empty on timeout), or None if the client fell too far
+            behind the replay buffer and must resynchronise from a snapshot
+        """
+        self._ensure_tailing()
+        with self.condition:
+            self._subscribers += 1
+            try:
+                self.condition.wait_for(lambda: self._last_id > last_id, timeout)
+                return self._events_after(last_id)
+            finally:
+                self._subscribers -= 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get buffer and subscriber counters"""
+        with self.condition:
+            return {
+                'last_event_id': self._last_id,
+                'buffered': len(self._buffer),
+                'subscribers': self._subscribers
+            }
+
+    def _ensure_tailing(self):
+        """Start the source tailer on first use"""
+        if self.source is None or self._tailer is not None:
+            return
+        with self.condition:
+            if self._tailer is not None:
+                return
+            # Start at the head: older events are only reachable through a snapshot
+            self._last_id = self.source.last_event_id()
+            self._tailer = threading.Thread(target=self._tail, name='execution-event-tail', daemon=True)
+            self._tailer.start()
+
+    def close(self):
+        """Stop tailing the source"""
+        self._stop.set()
+        if self._tailer is not None:
+            self._tailer.join(timeout=5)
+
+    def _tail(self):
+        while not self._stop.wait(self.poll_interval):
+            with self.condition:
+                after_id = self._last_id
+            try:
+                events = self.source.read_events(after_id, self.replay_size)
+            except Exception as e:
+                logger.exception("Execution event tail error")
+                continue
+            for event_id, event_type, data in events:
+                self.publish(event_type, data, event_id)
@@ -0,0 +1,478 @@
+"""
+Execution Store Module
+Durable SQLite storage for workflow executions, shared between processes
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _dump(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _load(value: Optional[str]) -> Any:
+    return None if value is None else json.loads(value)
+
+
+class SQLiteExecutionStore:
+    """
+    Persistent execution store backed by SQLite in WAL mode
+
+    The main app and the dashboard run as separate processes; both open the same database
+    file, so executions recorded by one are visible to the other and survive restarts.
+    Writes are only queued on the calling thread; a background writer drains the queue and
+    commits each batch in a single transaction, so recording steps never blocks on disk I/O.
+    Reads flush this process's pending writes first (only if any are queued), so a process
+    always sees its own writes without idle reads paying for a writer round trip.
+
+    Each running execution records the store that owns it; the writer heartbeats its own
+    running executions, and running rows whose owner stopped heartbeating (its process
+    crashed or was killed) are marked 'interrupted' on open and at every retention pass.
+    """
+
+    def __init__(self, db_path: str = 'workflow_executions.db', max_executions: int = 1000,
+                 retention_seconds: float = 86400, flush_interval: float = 0.05,
+                 batch_size: int = 500, prune_interval: float = 30, max_events: int = 10000,
+                 heartbeat_interval: float = 15, stale_seconds: float = 120):
+        """
+        Args:
+            db_path: SQLite database file shared by every process
+            max_executions: Executions retained before the oldest are pruned (0 = unbounded)
+            retention_seconds: Prune executions that started longer ago than this (0 = forever)
+            flush_interval: Max seconds a write waits in the queue before being committed
+            batch_size: Max writes committed per transaction
+            prune_interval: Seconds between retention passes in the writer
+            max_events: Lifecycle events kept in the event log for live feeds
+            heartbeat_interval: Seconds between heartbeats for this store's running executions
+            stale_seconds: Mark running executions interrupted once their owner has not
+                heartbeated for this long (keep well above heartbeat_interval)
+        """
+        self.db_path = db_path
+        self.max_executions = max_executions
+        self.retention_seconds = retention_seconds
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.prune_interval = prune_interval
+        self.max_events = max_events
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_seconds = stale_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lock = threading.Lock()
+        self._stats = {'writes': 0, 'batches': 0, 'evicted': 0, 'interrupted': 0, 'retried': 0, 'errors': 0}
+        self._last_prune = 0.0
+        self._last_heartbeat = 0.0
+        self._pending = 0  # writes queued but not yet applied by the writer
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = self._connect()
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS executions (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                end_time TEXT,
+                input TEXT,
+                output TEXT,
+                error TEXT,
+                step_count INTEGER NOT NULL DEFAULT 0,
+                last_step TEXT,
+                owner TEXT,
+                heartbeat_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_executions_started ON executions(started_at);
+            CREATE INDEX IF NOT EXISTS idx_executions_status ON executions(status, started_at);
+            CREATE TABLE IF NOT EXISTS execution_steps (
+                execution_id TEXT NOT NULL REFERENCES executions(id) ON DELETE CASCADE,
+                seq INTEGER NOT NULL,
+                name TEXT,
+                timestamp TEXT NOT NULL,
+                data TEXT,
+                PRIMARY KEY (execution_id, seq)
+            );
+            CREATE TABLE IF NOT EXISTS execution_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+        ''')
+        # Databases created before executions had owners
+        existing = {row[1] for row in self._conn.execute('PRAGMA table_info(executions)')}
+        for column, column_type in (('owner', 'TEXT'), ('heartbeat_at', 'REAL')):
+            if column not in existing:
+                self._conn.execute(f'ALTER TABLE executions ADD COLUMN {column} {column_type}')
+        self._conn.commit()
+        with self._conn:
+            self._interrupt_stale(self._conn, time.time())
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='execution-store-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    # Writes (queued, applied by the writer thread)
+
+    def record_start(self, execution: Dict[str, Any]):
+        """Queue a new running execution"""
+        self._enqueue(('start', (execution['id'], execution['status'], execution['start_time'],
+                                   execution['_started_at'], execution['input'])))
+
+    def record_step(self, execution_id: str, seq: int, step: Dict[str, Any]):
+        """Queue a step; seq is the step's index within its execution"""
+        self._enqueue(('step', (execution_id, seq, step['name'], step['timestamp'], step['data'])))
+
+    def record_appended_step(self, execution_id: str, step: Dict[str, Any]):
+        """Queue a step after the execution's stored steps (for executions owned by another process)"""
+        self._enqueue(('append_step', (execution_id, step['name'], step['timestamp'], step['data'])))
+
+    def record_complete(self, execution: Dict[str, Any]):
+        """Queue the final status, output and error of an execution"""
+        self._enqueue(('complete', (execution['status'], execution['end_time'], execution['output'],
+                                      execution['error'], execution['id'])))
+
+    def record_input(self, execution_id: str, input_data: Dict[str, Any]):
+        """Queue a replacement input for an execution"""
+        self._enqueue(('input', (_dump(input_data), execution_id)))
+
+    def record_event(self, event_type: str, data: Dict[str, Any]):
+        """Queue a lifecycle event; ids are assigned on commit and are global across processes"""
+        self._enqueue(('event', (event_type, data)))
+
+    def _enqueue(self, write: tuple):
+        with self.lock:
+            self._pending += 1
+        self._queue.put(write)
+
+    def flush(self, timeout: float = 5) -> bool:
+        """Block until every write queued so far is committed"""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def _flush_pending(self):
+        """Flush before a read only if this process has writes the writer hasn't applied"""
+        with self.lock:
+            pending = self._pending
+        if pending:
+            self.flush()
+
+    def close(self):
+        """Commit pending writes and stop the writer"""
+        if self._writer.is_alive():
+            self._queue.put((_STOP, None))
+            self._writer.join(timeout=5)
+        with self.lock:
+            self._conn.close()
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                try:
+                    batch = [self._queue.get(timeout=self.heartbeat_interval)]
+                except queue.Empty:
+                    # Idle: still heartbeat and apply retention
+                    self._apply(conn, [])
+                    continue
+                deadline = time.monotonic() + self.flush_interval
+                # A flush ends the batch at once: a reader is waiting on it
+                while len(batch) < self.batch_size and batch[-1][0] != 'flush':
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+                stop = self._apply(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _apply(self, conn: sqlite3.Connection, batch: list) -> bool:
+        """
+        Commit one batch in a single transaction; returns True if the writer should stop
+
+        If the transaction fails, its writes are retried one per transaction, so a bad write
+        (or a transient lock) only costs that write rather than the whole batch.
+        """
+        waiters = [args for op, args in batch if op == 'flush']
+        stop = any(op is _STOP for op, _ in batch)
+        writes = [(op, args) for op, args in batch if op != 'flush' and op is not _STOP]
+        applied = 0
+        try:
+            try:
+                with conn:
+                    for op, args in writes:
+                        self._write(conn, op, args)
+                    self._maintain(conn)
+                applied = len(writes)
+            except sqlite3.Error:
+                logger.warning("Execution store batch failed, retrying writes one by one",
+                               extra={'writes': len(writes)}, exc_info=True)
+                with self.lock:
+                    self._stats['retried'] += 1
+                for op, args in writes:
+                    try:
+                        with conn:
+                            self._write(conn, op, args)
+                        applied += 1
+                    except sqlite3.Error:
+                        logger.exception("Execution store write dropped", extra={'op': op})
+                        with self.lock:
+                            self._stats['errors'] += 1
+            if writes:
+                with self.lock:
+                    self._stats['writes'] += applied
+                    self._stats['batches'] += 1
+        finally:
+            with self.lock:
+                self._pending -= len(writes)
+            for done in waiters:
+                done.set()
+        return stop
+
+    def _write(self, conn: sqlite3.Connection, op: str, args: tuple):
+        """Apply one queued write (inside the caller's transaction)"""
+        if op == 'start':
+            execution_id, status, start_time, started_at, input_data = args
+            conn.execute(
+                'INSERT OR REPLACE INTO executions (id, status, start_time, started_at, input, owner, heartbeat_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (execution_id, status, start_time, started_at, _dump(input_data), self.owner, time.time())
+            )
+        elif op == 'step':
+            execution_id, seq, name, timestamp, data = args
+            conn.execute(
+                'INSERT OR REPLACE INTO execution_steps (execution_id, seq, name, timestamp, data) '
+                'SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM executions WHERE id = ?)',
+                (execution_id, seq, name, timestamp, _dump(data), execution_id)
+            )
+            conn.execute(
+                'UPDATE executions SET step_count = MAX(step_count, ?), last_step = ? WHERE id = ?',
+                (seq + 1, name, execution_id)
+            )
+        elif op == 'append_step':
+            execution_id, name, timestamp, data = args
+            conn.execute(
+                'INSERT OR REPLACE INTO execution_steps (execution_id, seq, name, timestamp, data) '
+                'SELECT id, step_count, ?, ?, ? FROM executions WHERE id = ?',
+                (name, timestamp, _dump(data), execution_id)
+            )
+            conn.execute(
+                'UPDATE executions SET step_count = step_count + 1, last_step = ? WHERE id = ?',
+                (name, execution_id)
+            )
+        elif op == 'complete':
+            status, end_time, output, error, execution_id = args
+            conn.execute(
+                'UPDATE executions SET status = ?, end_time = ?, output = ?, error = ? '
+                "WHERE id = ? AND status = 'running'",
+                (status, end_time, _dump(output), error, execution_id)
+            )
+        elif op == 'input':
+            conn.execute('UPDATE executions SET input = ? WHERE id = ?', args)
+        elif op == 'event':
+            event_type, data = args
+            conn.execute(
+                'INSERT INTO execution_events (type, payload, created_at) VALUES (?, ?, ?)',
+                (event_type, _dump(data), time.time())
+            )
+
+    def _maintain(self, conn: sqlite3.Connection):
+        """Heartbeat this store's running executions and apply retention when due (inside a transaction)"""
+        now = time.time()
+        if now - self._last_heartbeat >= self.heartbeat_interval:
+            conn.execute("UPDATE executions SET heartbeat_at = ? WHERE owner = ? AND status = 'running'",
+                         (now, self.owner))
+            self._last_heartbeat = now
+        if now - self._last_prune >= self.prune_interval:
+            self._interrupt_stale(conn, now)
+            self._prune(conn, now)
+            self._last_prune = now
+
+    def _interrupt_stale(self, conn: sqlite3.Connection, now: float):
+        """Mark running executions whose owner stopped heartbeating as interrupted (inside a transaction)"""
+        rows = conn.execute(
+            'SELECT id, status, start_time, end_time, step_count, last_step, error FROM executions '
+            "WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < ? AND owner IS NOT ?",
+            (now - self.stale_seconds, self.owner)
+        ).fetchall()
+        if not rows:
+            return
+        end_time = datetime.now().isoformat()
+        error = 'Execution was interrupted before completing'
+        conn.executemany(
+            "UPDATE executions SET status = 'interrupted', end_time = ?, error = ? WHERE id = ? AND status = 'running'",
+            [(end_time, error, row[0]) for row in rows]
+        )
+        # Live feeds treat the interruption like any other failure
+        conn.executemany(
+            'INSERT INTO execution_events (type, payload, created_at) VALUES (?, ?, ?)',
+            [('fail', _dump(dict(self._summary(row), status='interrupted', end_time=end_time, error=error)), now)
+             for row in rows]
+        )
+        logger.warning("Marked orphaned executions interrupted", extra={'count': len(rows)})
+        with self.lock:
+            self._stats['interrupted'] += len(rows)
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        """Apply age and capacity retention (inside the writer's transaction)"""
+        evicted = 0
+        if self.retention_seconds:
+            evicted += conn.execute('DELETE FROM executions WHERE started_at < ?',
+                                    (now - self.retention_seconds,)).rowcount
+        if self.max_executions:
+            evicted += conn.execute(
+                'DELETE FROM executions WHERE id IN '
+                '(SELECT id FROM executions ORDER BY started_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_executions,)
+            ).rowcount
+        if self.max_events:
+            conn.execute('DELETE FROM execution_events WHERE id <= '
+                         '(SELECT MAX(id) FROM execution_events) - ?', (self.max_events,))
+        with self.lock:
+            self._stats['evicted'] += evicted
+
+    # Reads
+
+    @staticmethod
+    def _summary(row: tuple) -> Dict[str, Any]:
+        execution_id, status, start_time, end_time, step_count, last_step, error = row
+        return {
+            'id': execution_id,
+            'status': status,
+            'start_time': start_time,
+            'end_time': end_time,
+            'step_count': step_count,
+            'last_step': last_step,
+            'error': error
+        }
+
+    def get_execution(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        """Get one execution with its steps, or None if unknown or pruned"""
+        self._flush_pending()
+        return self._fetch_execution(execution_id)
+
+    def _fetch_execution(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self._conn.execute(
+                'SELECT id, status, start_time, end_time, input, output, error FROM executions WHERE id = ?',
+                (execution_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            steps = self._conn.execute(
+                'SELECT name, timestamp, data FROM execution_steps WHERE execution_id = ? ORDER BY seq',
+                (execution_id,)
+            ).fetchall()
+
+        return {
+            'id': row[0],
+            'status': row[1],
+            'start_time': row[2],
+            'end_time': row[3],
+            'input': _load(row[4]),
+            'output': _load(row[5]),
+            'error': row[6],
+            'steps': [{'name': name, 'timestamp': timestamp, 'data': _load(data)}
+                      for name, timestamp, data in steps]
+        }
+
+    def _status_counts(self) -> Dict[str, int]:
+        counts = {'running': 0, 'completed': 0, 'failed': 0, 'interrupted': 0}
+        counts.update(self._conn.execute('SELECT status, COUNT(*) FROM executions GROUP BY status').fetchall())
+        return counts
+
+    def list_executions(self, status: str = None, since: float = None, until: float = None,
+                        limit: int = 50, offset: int = 0, summary: bool = True) -> Dict[str, Any]:
+        """Page through executions, newest first (same shape as WorkflowMonitor.list_executions)"""
+        self._flush_pending()
+        clauses, params = [], []
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if since is not None:
+            clauses.append('started_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('started_at < ?')
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        with self.lock:
+            matched = self._conn.execute(f'SELECT COUNT(*) FROM executions {where}', params).fetchone()[0]
+            rows = self._conn.execute(
+                'SELECT id, status, start_time, end_time, step_count, last_step, error FROM executions '
+                f'{where} ORDER BY started_at DESC, rowid DESC LIMIT ? OFFSET ?',
+                params + [limit, offset]
+            ).fetchall()
+            total = self._conn.execute('SELECT COUNT(*) FROM executions').fetchone()[0]
+            counts = self._status_counts()
+
+        if summary:
+            page = [self._summary(row) for row in rows]
+        else:
+            page = [execution for execution in (self._fetch_execution(row[0]) for row in rows) if execution]
+
+        result = {'executions': page, 'matched': matched, 'total': total}
+        result.update(counts)
+        return result
+
+    def last_event_id(self) -> int:
+        """Id of the newest committed lifecycle event (0 if none)"""
+        with self.lock:
+            return self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM execution_events').fetchone()[0]
+
+    def read_events(self, after_id: int, limit: int = 1000) -> List[tuple]:
+        """Committed lifecycle events newer than after_id, as (id, type, payload) tuples"""
+        with self.lock:
+            rows = self._conn.execute(
+                'SELECT id, type, payload FROM execution_events WHERE id > ? ORDER BY id LIMIT ?',
+                (after_id, limit)
+            ).fetchall()
+        return [(event_id, event_type, _load(payload)) for event_id, event_type, payload in rows]
+
+    def get_running_executions(self) -> List[Dict[str, Any]]:
+        """Summaries of running executions from every process, newest first"""
+        self._flush_pending()
+        with self.lock:
+            rows = self._conn.execute(
+                'SELECT id, status, start_time, end_time, step_count, last_step, error FROM executions '
+                "WHERE status = 'running' ORDER BY started_at DESC"
+            ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get stored/evicted counts, per-status counts and writer counters"""
+        self._flush_pending()
+        with self.lock:
+            stats = {'total': self._conn.execute('SELECT COUNT(*) FROM executions').fetchone()[0]}
+            stats.update(self._status_counts())
+            stats.update(self._stats)
+            stats['queued'] = self._queue.qsize()
+        return stats
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Fake Gemini Server
+Local stand-in for the Gemini REST API (generateContent, streamGenerateContent, cachedContents)
+for offline load tests. Point the backend at it with GEMINI_BASE_URL.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from chat_history import estimate_tokens
+from demo_latency import LatencyModel
+from mock_data_generator import MockDataGenerator
+
+MODEL_PATH = re.compile(r'^/v1\w*/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)$')
+CACHE_PATH = re.compile(r'^/v1\w*/cachedContents(?:/(?P<id>[^/]+))?$')
+
+# Markers identifying which backend prompt a request carries
+EXTRACTION_MARKER = '产品需求信息提取专家'
+ROUTER_MARKER = '首席系统架构师'
+EXPERT_MARKER = 'Eval Bridge'
+
+ERROR_STATUSES = {429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL', 503: 'UNAVAILABLE', 504: 'DEADLINE_EXCEEDED'}
+
+
+def request_text(body: Dict[str, Any]) -> str:
+    """All text of a generateContent request body (system instruction and contents)"""
+    texts = []
+    system = body.get('systemInstruction') or {}
+    for part in system.get('parts', []):
+        texts.append(part.get('text') or '')
+    for content in body.get('contents', []):
+        for part in content.get('parts', []):
+            texts.append(part.get('text') or '')
+    return '\n'.join(texts)
+
+
+class FakeGeminiServer:
+    """
+    Threaded HTTP server answering like Gemini with canned, schema-valid responses
+
+    Each response waits a sampled `latency` (time to first token), then streams its text at
+    `tokens_per_second` in chunks of `chunk_tokens`; non-streaming calls wait for the whole
+    generation. A fraction `error_rate` of model calls fail with `error_status` instead.
+    Responses are derived from a hash of the prompt, so identical prompts get identical text.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: str = 'lognormal:0.8,0.4',
+                 tokens_per_second: float = 80.0, chunk_tokens: int = 8, error_rate: float = 0.0,
+                 error_status: int = 429, seed: Optional[int] = None):
+        """
+        Args:
+            host, port: Bind address; port 0 picks a free port
+            latency: Time-to-first-token distribution (see demo_latency.LatencyModel)
+            tokens_per_second: Output token rate; 0 returns the whole text after the latency
+            chunk_tokens: Tokens per streamed chunk
+            error_rate: Fraction of model calls answered with error_status
+            error_status: HTTP status of injected errors (429, 500, 503 or 504)
+            seed: Seed for latency sampling and error injection
+        """
+        self.latency = LatencyModel.parse(latency)
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = max(chunk_tokens, 1)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.mock = MockDataGenerator()
+        self._cache_ids = itertools.count(1)
+        self._caches: Dict[str, str] = {}
+        self._stats: Dict[str, Any] = {'requests': {}, 'errors_injected': 0, 'streams': 0,
+                                       'cache_creates': 0, 'cached_calls': 0}
+
+        handler = type('FakeGeminiHandler', (_Handler,), {'fake': self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeGeminiServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='fake-gemini', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'FakeGeminiServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self._stats, requests=dict(self._stats['requests']))
+            stats['live_caches'] = len(self._caches)
+        return stats
+
+    # --- behaviour -------------------------------------------------------------------------
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self._stats[key] += amount
+
+    def record_request(self, model: str, method: str):
+        with self.lock:
+            key = f"{model}:{method}"
+            self._stats['requests'][key] = self._stats['requests'].get(key, 0) + 1
+
+    def sample_latency(self) -> float:
+        with self.lock:
+            return self.latency.sample(self.rng)
+
+    def inject_error(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self.lock:
+            failed = self.rng.random() < self.error_rate
+            if failed:
+                self._stats['errors_injected'] += 1
+        return failed
+
+    def error_body(self) -> Dict[str, Any]:
+        return {'error': {'code': self.error_status, 'message': 'Injected failure (fake Gemini server)',
+                          'status': ERROR_STATUSES.get(self.error_status, 'UNKNOWN')}}
+
+    def create_cache(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        name = f"cachedContents/{next(self._cache_ids)}"
+        with self.lock:
+            self._caches[name] = request_text(body)
+            self._stats['cache_creates'] += 1
+        return self.cache_resource(name, body.get('model', ''), body.get('ttl', '3600s'))
+
+    def cache_resource(self, name: str, model: str = '', ttl: str = '3600s') -> Dict[str, Any]:
+        seconds = float(str(ttl).rstrip('s') or 0)
+        expires = datetime.now(timezone.utc) + timedelta(seconds=seconds)
+        return {'name': name, 'model': model, 'expireTime': expires.isoformat().replace('+00:00', 'Z')}
+
+    def has_cache(self, name: str) -> bool:
+        with self.lock:
+            return name in self._caches
+
+    def delete_cache(self, name: str):
+        with self.lock:
+            self._caches.pop(name, None)
+
+    def prompt_for(self, body: Dict[str, Any]) -> Tuple[str, int]:
+        """Full prompt text (cached prefix + request) and the number of cached tokens"""
+        prompt = request_text(body)
+        cached_name = body.get('cachedContent')
+        if not cached_name:
+            return prompt, 0
+        with self.lock:
+            cached = self._caches.get(cached_name)
+        if cached is None:
+            return prompt, -1
+        self.count('cached_calls')
+        return cached + prompt, estimate_tokens(cached)
+
+    def respond(self, prompt: str) -> str:
+        """Canned response matching the prompt's expected output format"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+        if EXTRACTION_MARKER in prompt:
+            return json.dumps({
+                'productInfo': f"Load-test product {digest}",
+                'idealFunctions': f"Load-test functions {digest}"
+            }, ensure_ascii=False)
+        if ROUTER_MARKER in prompt:
+            return json.dumps({
+                'professionalDomain': {'domainName': 'Load Testing', 'knowledgeDescription': digest},
+                'technicalDomain': {'domainName': 'Distributed Systems', 'knowledgeDescription': digest},
+                'userDomain': {'domainName': 'Product Manager', 'knowledgeDescription': digest}
+            }, ensure_ascii=False)
+        if EXPERT_MARKER in prompt:
+            cards = self.mock.generate_capability_dimensions(digest, '', seed=digest)
+            return f"```json\n{json.dumps(cards, ensure_ascii=False, indent=2)}\n```"
+        return self.mock.generate_chat_response(f"request {digest}", seed=digest)
+
+    def chunks(self, text: str) -> List[str]:
+        size = self.chunk_tokens * 4
+        return [text[i:i + size] for i in range(0, len(text), size)] or ['']
+
+    def chunk_delay(self) -> float:
+        return self.chunk_tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def response_body(self, text: str, prompt_tokens: int, cached_tokens: int, final: bool,
+                      output_tokens: int) -> Dict[str, Any]:
+        candidate = {'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}
+        body = {'candidates': [candidate]}
+        if final:
+            candidate['finishReason'] = 'STOP'
+            body['usageMetadata'] = {
+                'promptTokenCount': prompt_tokens,
+                'candidatesTokenCount': output_tokens,
+                'totalTokenCount': prompt_tokens + output_tokens,
+                'cachedContentTokenCount': cached_tokens
+            }
+        return body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fake: FakeGeminiServer = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        return json.loads(raw) if raw else {}
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        match = MODEL_PATH.match(path)
+        if match:
+            return self._generate(match.group('model'), match.group('method'), self._read_json())
+        match = CACHE_PATH.match(path)
+        if match and not match.group('id'):
+            return self._send_json(200, self.fake.create_cache(self._read_json()))
+        self._send_json(404, {'error': {'code': 404, 'message': f'Unknown path {path}', 'status': 'NOT_FOUND'}})
+
+    def do_PATCH(self):
+        match = CACHE_PATH.match(self.path.split('?', 1)[0])
+        body = self._read_json()
+        name = f"cachedContents/{match.group('id')}" if match and match.group('id') else ''
+        if not self.fake.has_cache(name):
+            return self._send_json(404, {'error': {'code': 404, 'message': 'Cache not found', 'status': 'NOT_FOUND'}})
+        self._send_json(200, self.fake.cache_resource(name, ttl=body.get('ttl', '3600s')))
+
+    def do_DELETE(self):
+        match = CACHE_PATH.match(self.path.split('?', 1)[0])
+        if match and match.group('id'):
+            self.fake.delete_cache(f"cachedContents/{match.group('id')}")
+        self._send_json(200, {})
+
+    def _generate(self, model: str, method: str, body: Dict[str, Any]):
+        fake = self.fake
+        fake.record_request(model, method)
+        prompt, cached_tokens = fake.prompt_for(body)
+        if cached_tokens < 0:
+            return self._send_json(404, {'error': {'code': 404, 'message': 'CachedContent not found',
+                                                   'status': 'NOT_FOUND'}})
+
+        time.sleep(fake.sample_latency())
+        if fake.inject_error():
+            return self._send_json(fake.error_status, fake.error_body())
+
+        text = fake.respond(prompt)
+        prompt_tokens = estimate_tokens(prompt)
+        output_tokens = estimate_tokens(text)
+        chunks = fake.chunks(text)
+
+        if method == 'generateContent':
+            time.sleep(fake.chunk_delay() * (len(chunks) - 1))
+            return self._send_json(200, fake.response_body(text, prompt_tokens, cached_tokens, True, output_tokens))
+
+        fake.count('streams')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for index, chunk in enumerate(chunks):
+                if index:
+                    time.sleep(fake.chunk_delay())
+                final = index == len(chunks) - 1
+                payload = fake.response_body(chunk, prompt_tokens, cached_tokens, final, output_tokens)
+                self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\r\n\r\n".encode('utf-8'))
+            self._write_chunk(b'')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Gemini API server for offline load tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', default='lognormal:0.8,0.4', help='Time to first token, e.g. fixed:0.5')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--chunk-tokens', type=int, default=8)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=429, choices=sorted(ERROR_STATUSES))
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(args.host, args.port, args.latency, args.tokens_per_second,
+                              args.chunk_tokens, args.error_rate, args.error_status, args.seed)
+    print(f"🧪 Fake Gemini server on {server.base_url} (set GEMINI_BASE_URL to this)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.get_stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,401 @@
+"""
+JSON Extraction Module
+Linear-time extraction of JSON values from model output, on complete text or chunk by chunk
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_OPENERS = {'object': '{', 'array': '[', None: '{['}
+_EXPECTED_TYPES = {'object': dict, 'array': list}
+_ANY_OPENER = re.compile(r'[{\[]')
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_CLOSERS = {'}': '{', ']': '['}
+_INVALID = object()
+_SCHEMA_TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'number': (int, float),
+    'integer': int,
+    'boolean': bool,
+    'null': type(None),
+}
+
+
+class JSONExtractionError(ValueError):
+    """No JSON value of the expected kind could be extracted from the text"""
+
+
+class JSONSchemaError(JSONExtractionError):
+    """An extracted JSON value does not match the expected schema"""
+
+
+def validate_schema(value: Any, schema: Dict[str, Any], path: str = '$') -> None:
+    """
+    Validate a value against a small JSON Schema subset
+
+    Supported keywords: type, required, properties, items, minItems.
+
+    Raises:
+        JSONSchemaError: On the first mismatch, naming the offending path
+    """
+    expected = schema.get('type')
+    if expected is not None:
+        python_type = _SCHEMA_TYPES[expected]
+        # bool is a subclass of int; don't let True pass as a number
+        if not isinstance(value, python_type) or (isinstance(value, bool) and expected != 'boolean'):
+            raise JSONSchemaError(f"{path}: expected {expected}, got {type(value).__name__}")
+
+    if isinstance(value, dict):
+        for key in schema.get('required', ()):
+            if key not in value:
+                raise JSONSchemaError(f"{path}: missing required property '{key}'")
+        for key, sub_schema in schema.get('properties', {}).items():
+            if key in value:
+                validate_schema(value[key], sub_schema, f"{path}.{key}")
+
+    if isinstance(value, list):
+        if len(value) < schema.get('minItems', 0):
+            raise JSONSchemaError(f"{path}: expected at least {schema['minItems']} items, got {len(value)}")
+        item_schema = schema.get('items')
+        if item_schema is not None:
+            for index, item in enumerate(value):
+                validate_schema(item, item_schema, f"{path}[{index}]")
+
+
+def _find_fenced_block(text: str) -> Optional[str]:
+    """Return the body of the first ``` code fence (optionally tagged json), if closed"""
+    fence = text.find('```')
+    if fence < 0:
+        return None
+    body_start = text.find('\n', fence + 3)
+    if body_start < 0:
+        return None
+    tag = text[fence + 3:body_start].strip().lower()
+    if tag not in ('', 'json'):
+        return None
+    body_end = text.find('```', body_start + 1)
+    if body_end < 0:
+        return None
+    return text[body_start + 1:body_end].strip()
+
+
+def _try_load(text: str, expect: Optional[str]) -> Any:
+    """Parse text directly if it looks like a bare JSON value of the expected kind"""
+    if not text or text[0] not in _OPENERS[expect] or text[-1] not in '}]':
+        return None
+    value = _loads(text)
+    if value is _INVALID or (expect is not None and not isinstance(value, _EXPECTED_TYPES[expect])):
+        return None
+    return value
+
+
+def _loads(text: str) -> Any:
+    """json.loads, returning _INVALID for malformed text"""
+    try:
+        return json.loads(text)
+    except RecursionError:
+        raise JSONExtractionError("JSON value is nested too deeply to parse") from None
+    except ValueError:
+        return _INVALID
+
+
+def extract_json(text: str, expect: Optional[str] = None, schema: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Extract the first JSON value from model output
+
+    Tries, in order: the whole text as pure JSON (fast path), the body of a ```json fence,
+    then a single bracket-balancing scan over the text.
+
+    Args:
+        text: Complete model response
+        expect: 'object', 'array' or None (either)
+        schema: Optional JSON Schema subset to validate the value against
+
+    Raises:
+        JSONExtractionError: If no value of the expected kind is found, or it is nested too deeply
+        JSONSchemaError: If the value does not match schema
+    """
+    text = text.strip()
+    value = _try_load(text, expect)
+
+    if value is None and '```' in text:
+        fenced = _find_fenced_block(text)
+        if fenced is not None:
+            value = _try_load(fenced, expect)
+
+    if value is None:
+        scanner = JSONValueScanner(expect)
+        values = scanner.feed(text) or scanner.finish()
+        value = values[0] if values else None
+
+    if value is None:
+        kind = expect or 'value'
+        raise JSONExtractionError(f"No valid JSON {kind} found in response")
+
+    if schema is not None:
+        validate_schema(value, schema)
+    return value
+
+
+class JSONValueScanner:
+    """
+    Single-pass bracket-balancing scanner that finds complete top-level JSON values in text
+
+    Text can be fed all at once (extract_json) or chunk by chunk; each character is examined
+    once, jumping between structural characters with precompiled patterns. String contents
+    (including escaped quotes and brackets) never affect nesting, and json.loads only runs on
+    a balanced span. A span that is not valid JSON (e.g. "[see below]" in prose) falls back to
+    the outermost balanced spans inside it; a valid value of the wrong kind is skipped whole,
+    so values nested in it never match.
+    """
+
+    def __init__(self, expect: Optional[str] = None):
+        """
+        Args:
+            expect: 'object', 'array' or None (either) - which values to return
+        """
+        self._expect = _EXPECTED_TYPES.get(expect)
+        self._buffer = ''
+        self._pos = 0         # next unscanned index in _buffer
+        self._start = -1      # buffer index where the current candidate value began
+        self._openers: List[int] = []  # buffer indexes of the candidate's unclosed brackets
+        self._spans: List[Tuple[int, int]] = []  # outermost balanced spans inside the candidate
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume a chunk of text
+
+        Returns:
+            Values completed by this chunk, in order
+
+        Raises:
+            JSONExtractionError: If a balanced span is nested too deeply to parse
+        """
+        if not chunk:
+            return []
+
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+        i = self._pos
+
+        while i < len(buffer):
+            if self._start < 0:
+                match = _ANY_OPENER.search(buffer, i)
+                if match is None:
+                    i = len(buffer)
+                    break
+                i = self._start = match.start()
+                self._openers = [i]
+                self._spans = []
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                match = _STRING_SPECIAL.search(buffer, i)
+                if match is None:
+                    i = len(buffer)
+                    break
+                i = match.start()
+                if buffer[i] == '\\':
+                    self._escape = True
+                else:
+                    self._in_string = False
+                i += 1
+                continue
+
+            match = _STRUCTURAL.search(buffer, i)
+            if match is None:
+                i = len(buffer)
+                break
+            i = match.start()
+            ch = buffer[i]
+            if ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._openers.append(i)
+            else:
+                opener = self._openers.pop()
+                if buffer[opener] != _CLOSERS[ch]:
+                    # Mismatched brackets: prose, not JSON. Keep what balanced inside it.
+                    completed.extend(self._recover())
+                elif not self._openers:
+                    value = _loads(buffer[self._start:i + 1])
+                    if value is _INVALID:
+                        completed.extend(self._recover())
+                    else:
+                        if self._matches(value):
+                            completed.append(value)
+                        self._start = -1
+                else:
+                    # A span closing later with an earlier start encloses the ones before it
+                    while self._spans and self._spans[-1][0] > opener:
+                        self._spans.pop()
+                    self._spans.append((opener, i + 1))
+            i += 1
+
+        # Drop text that can no longer be part of a pending value
+        keep_from = self._start if self._start >= 0 else i
+        if keep_from > 0:
+            self._buffer = buffer[keep_from:]
+            if self._start >= 0:
+                self._start -= keep_from
+                self._openers = [index - keep_from for index in self._openers]
+                self._spans = [(begin - keep_from, end - keep_from) for begin, end in self._spans]
+            i -= keep_from
+        self._pos = i
+
+        return completed
+
+    def finish(self) -> List[Any]:
+        """
+        End of text: values balanced inside a candidate that never closed
+
+        E.g. '{ unclosed: {"a": 1}' yields {"a": 1}.
+        """
+        values = self._recover() if self._start >= 0 else []
+        self._buffer = ''
+        self._pos = 0
+        return values
+
+    def pending(self) -> str:
+        """Text of an unfinished candidate value, or '' if none is open"""
+        return self._buffer if self._start >= 0 else ''
+
+    def _matches(self, value: Any) -> bool:
+        return self._expect is None or isinstance(value, self._expect)
+
+    def _recover(self) -> List[Any]:
+        """Close the current candidate, returning valid values among its outermost inner spans"""
+        values = []
+        for begin, end in self._spans:
+            value = _loads(self._buffer[begin:end])
+            if value is not _INVALID and self._matches(value):
+                values.append(value)
+        self._start = -1
+        self._openers = []
+        self._spans = []
+        self._in_string = False
+        self._escape = False
+        return values
+
+
+class JSONArrayStreamParser:
+    """
+    Incrementally parse a top-level JSON array of objects from text chunks
+
+    Each object is emitted as soon as its closing brace arrives, so callers can forward
+    array elements before the rest of the response has been generated. Leading prose or
+    a ```json fence before the array is skipped; string contents (including escaped quotes
+    and brackets) never affect nesting. An element that is not valid JSON is skipped and its
+    position recorded in `skipped`, so callers can recover it from the full text afterwards.
+    """
+
+    def __init__(self):
+        self.elements = 0        # top-level elements closed so far, valid or not
+        self.skipped: List[int] = []  # positions of elements that were not valid JSON
+        self._buffer = ''
+        self._pos = 0            # next unscanned index in _buffer
+        self._started = False    # inside the top-level array
+        self._finished = False   # top-level array closed
+        self._depth = 0          # nesting depth relative to the top-level array
+        self._in_string = False
+        self._escape = False
+        self._object_start = -1  # buffer index where the current element object began
+        self._candidate = -1     # index of a '[' that may open the array
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume a chunk of text
+
+        Returns:
+            Objects completed by this chunk, in order
+        """
+        if self._finished or not chunk:
+            return []
+
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+        i = self._pos
+
+        while i < len(buffer):
+            ch = buffer[i]
+
+            if not self._started:
+                if self._candidate >= 0:
+                    if ch in ' \t\r\n':
+                        i += 1
+                        continue
+                    if ch == '{':
+                        self._started = True
+                        self._depth = 1
+                        continue  # re-scan '{' as the first element
+                    if ch == ']':
+                        self._finished = True
+                        break
+                    self._candidate = -1
+                if ch == '[':
+                    self._candidate = i
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                if self._depth == 1 and ch == '{':
+                    self._object_start = i
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 1 and ch == '}' and self._object_start >= 0:
+                    try:
+                        completed.append(json.loads(buffer[self._object_start:i + 1]))
+                    except ValueError:
+                        self.skipped.append(self.elements)
+                    self.elements += 1
+                    self._object_start = -1
+                elif self._depth == 0:
+                    self._finished = True
+                    i += 1
+                    break
+            i += 1
+
+        # Drop text that can no longer be part of a pending element
+        keep_from = self._object_start if self._object_start >= 0 else i
+        if not self._started and self._candidate >= 0:
+            keep_from = self._candidate
+        if keep_from > 0:
+            self._buffer = buffer[keep_from:]
+            if self._object_start >= 0:
+                self._object_start -= keep_from
+            if self._candidate >= 0:
+                self._candidate -= keep_from
+            i -= keep_from
+        self._pos = i
+
+        return completed
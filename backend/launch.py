@@ -49,10 +49,10 @@ def check_dependencies():
         print("Please install requirements: pip install -r requirements.txt")
         return False
 
-def start_system(mode='demo', port=8080, dashboard_port=5001):
+def start_system(mode='demo', port=8080, dashboard_port=5001, server='wsgi'):
     """Start the dual mode system"""
     
-    print(f"🚀 Starting AI PM Evaluation System in {mode.upper()} mode")
+    print(f"🚀 Starting AI PM Evaluation System in {mode.upper()} mode ({server.upper()} server)")
     print(f"📊 Main app: http://localhost:{port}")
     print(f"📈 Dashboard: http://localhost:{dashboard_port}")
     print("-" * 50)
@@ -67,8 +67,9 @@ def start_system(mode='demo', port=8080, dashboard_port=5001):
     try:
         # Start main application
         print("🔄 Starting main application...")
+        main_script = 'asgi_app.py' if server == 'asgi' else 'app.py'
         main_process = subprocess.Popen([
-            sys.executable, 'app.py'
+            sys.executable, main_script
         ], cwd=Path(__file__).parent)
         
         # Start workflow dashboard
@@ -133,6 +134,12 @@ def main():
         default=5001,
         help='Dashboard port (default: 5001)'
     )
+    parser.add_argument(
+        '--server',
+        choices=['wsgi', 'asgi'],
+        default='wsgi',
+        help='Serving mode: wsgi (Flask, thread per request) or asgi (async, awaits the Gemini client)'
+    )
     
     args = parser.parse_args()
     
@@ -141,7 +148,7 @@ def main():
     os.chdir(backend_dir)
     
     # Start the system
-    success = start_system(args.mode, args.port, args.dashboard_port)
+    success = start_system(args.mode, args.port, args.dashboard_port, args.server)
     
     if not success:
         sys.exit(1)
@@ -0,0 +1,345 @@
+"""
+LLM Response Cache Module
+Content-addressed caching of model responses with an in-memory LRU tier and an on-disk SQLite tier
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(model: str, prompt: str) -> str:
+    """
+    Build the content address for a model call
+
+    Args:
+        model: Model name the prompt is sent to
+        prompt: Fully formatted prompt text
+
+    Returns:
+        Hex SHA-256 digest of model name + prompt
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(prompt.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CacheTier:
+    """Interface for a single cache tier"""
+
+    name = 'tier'
+    # Tiers doing file or network I/O; async callers reach them from a worker thread
+    blocking = False
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, model: str = ''):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def size(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCacheTier(CacheTier):
+    """Bounded in-process LRU tier with per-entry TTL"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, model: str = ''):
+        with self.lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        with self.lock:
+            return len(self._entries)
+
+
+class SQLiteCacheTier(CacheTier):
+    """
+    Persistent SQLite tier with TTL, entry-count and byte-size eviction
+
+    Entry count and total bytes are tracked in memory (seeded from the table on open), so a
+    write only scans the table when it has to evict. Hits record their access time in memory
+    and the batch is written with the next set() or once touch_batch hits accumulate.
+    """
+
+    name = 'disk'
+    blocking = True
+
+    def __init__(self, db_path: str = 'llm_cache.db', ttl_seconds: float = 86400,
+                 max_entries: int = 5000, max_bytes: int = 200 * 1024 * 1024,
+                 touch_batch: int = 100, purge_interval_seconds: float = 60):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.touch_batch = touch_batch
+        self.purge_interval_seconds = purge_interval_seconds
+        self.lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # key -> last access not yet written
+        self._next_purge = 0.0
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)')
+        self._conn.commit()
+        self._entries, self._bytes = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache'
+        ).fetchone()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            row = self._conn.execute(
+                'SELECT value, size, created_at FROM llm_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, size, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                self._forget(key, size)
+                self._conn.commit()
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touches()
+                self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str, model: str = ''):
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            # Never let a single oversized response flush the whole tier
+            return
+        with self.lock:
+            row = self._conn.execute('SELECT size FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self._forget(key, row[0])
+            self._conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, model, value, size, created_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, model, value, size, now, now)
+            )
+            self._entries += 1
+            self._bytes += size
+            self._flush_touches()
+            self._evict(now)
+            self._conn.commit()
+
+    def _forget(self, key: str, size: int):
+        """Account for a row that is being removed (lock held)"""
+        self._entries -= 1
+        self._bytes -= size
+        self._touched.pop(key, None)
+
+    def _flush_touches(self):
+        """Write buffered access times (lock held; caller commits)"""
+        if self._touched:
+            self._conn.executemany('UPDATE llm_cache SET last_access = ? WHERE key = ?',
+                                   [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self, now: float):
+        """Drop expired rows now and then, then least recently used rows until within limits (lock held)"""
+        if self.ttl_seconds and now >= self._next_purge:
+            self._next_purge = now + self.purge_interval_seconds
+            cutoff = now - self.ttl_seconds
+            expired, expired_bytes = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache WHERE created_at < ?', (cutoff,)
+            ).fetchone()
+            if expired:
+                self._conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (cutoff,))
+                self._entries -= expired
+                self._bytes -= expired_bytes
+
+        if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+
+        # Walk the access index only as far as needed
+        victims = []
+        for key, size in self._conn.execute('SELECT key, size FROM llm_cache ORDER BY last_access ASC, rowid ASC'):
+            if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+                break
+            victims.append((key,))
+            self._forget(key, size)
+        self._conn.executemany('DELETE FROM llm_cache WHERE key = ?', victims)
+
+    def delete(self, key: str):
+        with self.lock:
+            row = self._conn.execute('SELECT size FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return
+            self._conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            self._forget(key, row[0])
+            self._conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self._conn.execute('DELETE FROM llm_cache')
+            self._conn.commit()
+            self._entries = self._bytes = 0
+            self._touched.clear()
+
+    def size(self) -> int:
+        with self.lock:
+            return self._entries
+
+
+class LLMResponseCache:
+    """Tiered response cache keyed by hash(model + prompt)"""
+
+    def __init__(self, tiers: List[CacheTier] = None, enabled: bool = True):
+        self.tiers = tiers if tiers is not None else [MemoryCacheTier()]
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'bypassed': 0, 'errors': 0}
+        self._tier_hits = {tier.name: 0 for tier in self.tiers}
+
+    def _count(self, counter: str, tier_name: str = None):
+        with self.lock:
+            self._stats[counter] += 1
+            if tier_name:
+                self._tier_hits[tier_name] += 1
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """
+        Look up a cached response, promoting disk hits into faster tiers
+
+        Returns:
+            The cached response text, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        key = make_cache_key(model, prompt)
+        for index, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception:
+                logger.exception("LLM cache read error", extra={'tier': tier.name})
+                self._count('errors')
+                continue
+            if value is not None:
+                for faster_tier in self.tiers[:index]:
+                    faster_tier.set(key, value, model)
+                self._count('hits', tier.name)
+                return value
+
+        self._count('misses')
+        return None
+
+    def set(self, model: str, prompt: str, value: str):
+        """Store a response in every tier"""
+        if not self.enabled or value is None:
+            return
+
+        key = make_cache_key(model, prompt)
+        for tier in self.tiers:
+            try:
+                tier.set(key, value, model)
+            except Exception:
+                logger.exception("LLM cache write error", extra={'tier': tier.name})
+                self._count('errors')
+        self._count('writes')
+
+    @property
+    def blocking(self) -> bool:
+        return any(tier.blocking for tier in self.tiers)
+
+    async def aget(self, model: str, prompt: str) -> Optional[str]:
+        """get() for the event loop: blocking tiers are read on a worker thread"""
+        if self.enabled and self.blocking:
+            return await asyncio.to_thread(self.get, model, prompt)
+        return self.get(model, prompt)
+
+    async def aset(self, model: str, prompt: str, value: str):
+        """set() for the event loop: blocking tiers are written on a worker thread"""
+        if self.enabled and self.blocking:
+            await asyncio.to_thread(self.set, model, prompt, value)
+        else:
+            self.set(model, prompt, value)
+
+    def record_bypass(self):
+        """Count a request that explicitly skipped the cache"""
+        self._count('bypassed')
+
+    def clear(self):
+        """Clear every tier"""
+        for tier in self.tiers:
+            tier.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and tier sizes"""
+        with self.lock:
+            stats = dict(self._stats)
+            tier_hits = dict(self._tier_hits)
+
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['enabled'] = self.enabled
+        stats['tiers'] = [
+            {'name': tier.name, 'entries': tier.size(), 'hits': tier_hits.get(tier.name, 0)}
+            for tier in self.tiers
+        ]
+        return stats
@@ -0,0 +1,435 @@
+"""
+LLM Gateway Module
+Single entry point for model calls so cross-cutting concerns (caching, deduplication) live in one place
+"""
+
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from admission import AdmissionController
+from call_policy import CallPolicyEngine, http_timeout_config
+from chat_history import estimate_tokens
+from context_cache import ContextCacheManager
+from llm_cache import LLMResponseCache, make_cache_key
+from metrics import metrics_registry
+from single_flight import AsyncSingleFlight, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUESTS = metrics_registry.counter(
+    'evalbridge_llm_requests_total',
+    'LLM gateway requests by how they were served (cache, shared in-flight call, model, error)',
+    ['model', 'source']
+)
+LLM_REQUEST_SECONDS = metrics_registry.histogram(
+    'evalbridge_llm_request_seconds',
+    'End-to-end gateway latency including cache lookups and single-flight waits',
+    ['model', 'source']
+)
+LLM_CALL_SECONDS = metrics_registry.histogram(
+    'evalbridge_llm_call_seconds',
+    'Latency of model API calls (full response or complete stream)',
+    ['model', 'outcome']
+)
+LLM_TOKENS = metrics_registry.counter(
+    'evalbridge_llm_tokens_total',
+    'Tokens reported in model usage metadata',
+    ['model', 'kind']
+)
+LLM_CALLS_IN_FLIGHT = metrics_registry.gauge(
+    'evalbridge_llm_calls_in_flight',
+    'Model API calls currently in progress',
+    ['model']
+)
+
+
+def record_usage(model: str, response) -> None:
+    """Count prompt/completion tokens from a response or final stream chunk, if reported"""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    for kind, attribute in (('prompt', 'prompt_token_count'), ('completion', 'candidates_token_count'),
+                            ('cached', 'cached_content_token_count')):
+        count = getattr(usage, attribute, None)
+        if count:
+            LLM_TOKENS.inc(count, model=model, kind=kind)
+
+
+class _ModelCall:
+    """Times one model API call and tracks it as in flight"""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def __enter__(self):
+        LLM_CALLS_IN_FLIGHT.inc(model=self.model)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        LLM_CALLS_IN_FLIGHT.dec(model=self.model)
+        LLM_CALL_SECONDS.observe(time.perf_counter() - self.started, model=self.model,
+                                 outcome='error' if exc_type else 'ok')
+        return False
+
+
+def _served(result: 'LLMResult') -> 'LLMResult':
+    """Record how a gateway request was served"""
+    source = 'cache' if result.cache_hit else 'shared' if result.shared else 'model'
+    LLM_REQUESTS.inc(model=result.model, source=source)
+    LLM_REQUEST_SECONDS.observe(result.latency, model=result.model, source=source)
+    return result
+
+
+class LLMResult:
+    """Text response from a model call plus call metadata"""
+
+    def __init__(self, text: str, model: str, cache_hit: bool = False, latency: float = 0.0,
+                 shared: bool = False):
+        self.text = text
+        self.model = model
+        self.cache_hit = cache_hit
+        self.latency = latency
+        self.shared = shared
+
+
+# (contents, config) for one model call attempt
+Attempt = Tuple[str, Optional[Dict[str, Any]]]
+
+
+class LLMGateway:
+    """
+    Wraps the Gemini client's generate_content with a response cache and single-flight deduplication
+
+    When a call policy is configured, every model call (including each cached-prefix fallback
+    attempt) runs under it: attempt timeouts, stage deadlines, retries and circuit breaking.
+    With admission control, each attempt first waits for a slot in the model's priority queue
+    (streams hold theirs until consumed); a shed call raises AdmissionRejected.
+    """
+
+    def __init__(self, client=None, cache: Optional[LLMResponseCache] = None,
+                 single_flight: Optional[SingleFlight] = None,
+                 context_cache: Optional[ContextCacheManager] = None,
+                 policy: Optional[CallPolicyEngine] = None,
+                 admission: Optional[AdmissionController] = None):
+        self.client = client
+        self.cache = cache
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
+        self.async_single_flight = AsyncSingleFlight()
+        self.context_cache = context_cache
+        self.policy = policy
+        self.admission = admission
+
+    @staticmethod
+    def _attempts(contents: str, prefix: str, cached_name: Optional[str]) -> List[Attempt]:
+        """
+        Model call attempts for a prompt: the suffix against the cached prefix when one is
+        registered, then (or only) the full prompt
+        """
+        full = (prefix or '') + contents
+        if cached_name is None:
+            return [(full, None)]
+        return [(contents, {'cached_content': cached_name}), (full, None)]
+
+    def _fall_back(self, attempt: Attempt, error: Exception):
+        """Forget a cached prefix the provider rejected before retrying with the full prompt"""
+        name = attempt[1]['cached_content']
+        self.context_cache.invalidate(name)
+        logger.warning("Cached content rejected, retrying with full prompt",
+                       extra={'cache': name, 'error': str(error)})
+
+    def _reserve(self, contents: str) -> int:
+        return self.admission.reserve_tokens(estimate_tokens(contents))
+
+    def _generate_once(self, model: str, contents: str, config: Optional[Dict[str, Any]],
+                       stage: Optional[str]):
+        """One generate_content call, admitted and run under the call policy when configured"""
+        def call(timeout: Optional[float] = None):
+            merged = http_timeout_config(config, timeout)
+            if self.admission is None:
+                return self.client.models.generate_content(
+                    model=model, contents=contents, **({'config': merged} if merged else {}))
+            with self.admission.acquire(model, self._reserve(contents), max_wait=timeout) as permit:
+                response = self.client.models.generate_content(
+                    model=model, contents=contents, **({'config': merged} if merged else {}))
+                permit.record_usage(response)
+                return response
+
+        return self.policy.call(model, call, stage=stage) if self.policy else call()
+
+    def _open_stream(self, model: str, contents: str, config: Optional[Dict[str, Any]],
+                     stage: Optional[str]) -> Iterator:
+        def open_stream(timeout: Optional[float] = None):
+            merged = http_timeout_config(config, timeout)
+            stream = lambda: self.client.models.generate_content_stream(
+                model=model, contents=contents, **({'config': merged} if merged else {}))
+            if self.admission is None:
+                return stream()
+            return self.admission.iterate(model, stream, self._reserve(contents), max_wait=timeout)
+
+        return self.policy.stream(model, open_stream, stage=stage) if self.policy else open_stream()
+
+    async def _agenerate_once(self, model: str, contents: str, config: Optional[Dict[str, Any]],
+                              stage: Optional[str]):
+        async def call(timeout: Optional[float] = None):
+            merged = http_timeout_config(config, timeout)
+            if self.admission is None:
+                return await self.client.aio.models.generate_content(
+                    model=model, contents=contents, **({'config': merged} if merged else {}))
+            async with await self.admission.aacquire(model, self._reserve(contents), max_wait=timeout) as permit:
+                response = await self.client.aio.models.generate_content(
+                    model=model, contents=contents, **({'config': merged} if merged else {}))
+                permit.record_usage(response)
+                return response
+
+        return await (self.policy.acall(model, call, stage=stage) if self.policy else call())
+
+    async def _aopen_stream(self, model: str, contents: str, config: Optional[Dict[str, Any]],
+                            stage: Optional[str]) -> AsyncIterator:
+        async def open_stream(timeout: Optional[float] = None):
+            merged = http_timeout_config(config, timeout)
+            stream = lambda: self.client.aio.models.generate_content_stream(
+                model=model, contents=contents, **({'config': merged} if merged else {}))
+            if self.admission is None:
+                return await stream()
+            return self.admission.aiterate(model, stream, self._reserve(contents), max_wait=timeout)
+
+        if self.policy:
+            return self.policy.astream(model, open_stream, stage=stage)
+        return await open_stream()
+
+    def generate(self, model: str, contents: str, bypass_cache: bool = False,
+                 prefix: str = '', prefix_label: str = None, stage: str = None) -> LLMResult:
+        """
+        Generate a text response, serving identical model+prompt pairs from cache
+
+        Concurrent identical calls that miss the cache share one in-flight request;
+        every waiter receives the same text (or the same exception).
+
+        Args:
+            model: Model name
+            contents: Fully formatted prompt, or its variable suffix when prefix is given
+            bypass_cache: Skip the cache lookup for this call (the fresh result is still stored)
+            prefix: Stable leading part of the prompt, sent as provider-side cached content
+                when a context cache is configured and otherwise prepended to contents
+            prefix_label: Stable identity of the prefix (e.g. template name)
+            stage: Pipeline stage (extract, router, expert, chat, ...) selecting the call
+                policy's timeout, deadline and retry settings
+
+        Returns:
+            LLMResult with the response text
+        """
+        started = time.perf_counter()
+        prompt = prefix + contents
+
+        if self.cache is not None:
+            if bypass_cache:
+                self.cache.record_bypass()
+            else:
+                cached = self.cache.get(model, prompt)
+                if cached is not None:
+                    return _served(LLMResult(cached, model, cache_hit=True,
+                                             latency=time.perf_counter() - started))
+
+        if not self.client:
+            raise ValueError("AI client not initialized for production mode")
+
+        try:
+            text, shared = self.single_flight.do(
+                make_cache_key(model, prompt),
+                lambda: self._call_model(model, contents, prefix, prefix_label, stage)
+            )
+        except Exception:
+            LLM_REQUESTS.inc(model=model, source='error')
+            raise
+
+        return _served(LLMResult(text, model, cache_hit=False, latency=time.perf_counter() - started,
+                                 shared=shared))
+
+    def _cached_prefix(self, model: str, prefix: str, prefix_label: str) -> Optional[str]:
+        if not prefix or self.context_cache is None:
+            return None
+        return self.context_cache.get(model, prefix, label=prefix_label)
+
+    async def _acached_prefix(self, model: str, prefix: str, prefix_label: str) -> Optional[str]:
+        if not prefix or self.context_cache is None:
+            return None
+        return await self.context_cache.aget(model, prefix, label=prefix_label)
+
+    def _call_model(self, model: str, contents: str, prefix: str = '', prefix_label: str = None,
+                    stage: str = None) -> str:
+        """Perform the actual API call and populate the cache (runs once per in-flight key)"""
+        attempts = self._attempts(contents, prefix, self._cached_prefix(model, prefix, prefix_label))
+        with _ModelCall(model):
+            for index, attempt in enumerate(attempts):
+                request_contents, config = attempt
+                try:
+                    response = self._generate_once(model, request_contents, config, stage)
+                    break
+                except Exception as e:
+                    if index == len(attempts) - 1:
+                        raise
+                    self._fall_back(attempt, e)
+        record_usage(model, response)
+        text = response.text
+
+        if self.cache is not None and text:
+            self.cache.set(model, prefix + contents, text)
+
+        return text
+
+    def generate_text(self, model: str, contents: str, bypass_cache: bool = False,
+                      prefix: str = '', prefix_label: str = None, stage: str = None) -> str:
+        """Convenience wrapper returning only the response text"""
+        return self.generate(model, contents, bypass_cache=bypass_cache, prefix=prefix,
+                             prefix_label=prefix_label, stage=stage).text
+
+    def generate_stream(self, model: str, contents: str, bypass_cache: bool = False,
+                        prefix: str = '', prefix_label: str = None, stage: str = None) -> Iterator[str]:
+        """
+        Stream response text chunks
+
+        A cache hit is replayed as a single chunk; a completed live stream is stored in the
+        cache so later non-streaming and streaming calls can reuse it. Streams are not
+        deduplicated by single-flight (each caller consumes its own stream). A rejected
+        cached prefix falls back to the full prompt only if nothing was streamed yet.
+        """
+        prompt = prefix + contents
+        if self.cache is not None:
+            if bypass_cache:
+                self.cache.record_bypass()
+            else:
+                cached = self.cache.get(model, prompt)
+                if cached is not None:
+                    LLM_REQUESTS.inc(model=model, source='cache')
+                    yield cached
+                    return
+
+        if not self.client:
+            raise ValueError("AI client not initialized for production mode")
+
+        LLM_REQUESTS.inc(model=model, source='model')
+        attempts = self._attempts(contents, prefix, self._cached_prefix(model, prefix, prefix_label))
+        parts = []
+        with _ModelCall(model):
+            chunk = None
+            for index, attempt in enumerate(attempts):
+                request_contents, config = attempt
+                try:
+                    for chunk in self._open_stream(model, request_contents, config, stage):
+                        if chunk.text:
+                            parts.append(chunk.text)
+                            yield chunk.text
+                    break
+                except Exception as e:
+                    if parts or index == len(attempts) - 1:
+                        raise
+                    self._fall_back(attempt, e)
+        record_usage(model, chunk)
+
+        if self.cache is not None and parts:
+            self.cache.set(model, prompt, ''.join(parts))
+
+    async def agenerate(self, model: str, contents: str, bypass_cache: bool = False,
+                        prefix: str = '', prefix_label: str = None, stage: str = None) -> LLMResult:
+        """
+        Async variant of generate() using the client's aio surface
+
+        Shares the response cache with the sync path (disk tiers are read and written on a worker
+        thread so a slow or locked database never stalls the loop); in-flight deduplication is per
+        event loop.
+        """
+        started = time.perf_counter()
+        prompt = prefix + contents
+
+        if self.cache is not None:
+            if bypass_cache:
+                self.cache.record_bypass()
+            else:
+                cached = await self.cache.aget(model, prompt)
+                if cached is not None:
+                    return _served(LLMResult(cached, model, cache_hit=True,
+                                             latency=time.perf_counter() - started))
+
+        if not self.client:
+            raise ValueError("AI client not initialized for production mode")
+
+        try:
+            text, shared = await self.async_single_flight.do(
+                make_cache_key(model, prompt),
+                lambda: self._acall_model(model, contents, prefix, prefix_label, stage)
+            )
+        except Exception:
+            LLM_REQUESTS.inc(model=model, source='error')
+            raise
+
+        return _served(LLMResult(text, model, cache_hit=False, latency=time.perf_counter() - started,
+                                 shared=shared))
+
+    async def _acall_model(self, model: str, contents: str, prefix: str = '', prefix_label: str = None,
+                           stage: str = None) -> str:
+        """Perform the actual async API call and populate the cache"""
+        attempts = self._attempts(contents, prefix, await self._acached_prefix(model, prefix, prefix_label))
+        with _ModelCall(model):
+            for index, attempt in enumerate(attempts):
+                request_contents, config = attempt
+                try:
+                    response = await self._agenerate_once(model, request_contents, config, stage)
+                    break
+                except Exception as e:
+                    if index == len(attempts) - 1:
+                        raise
+                    self._fall_back(attempt, e)
+        record_usage(model, response)
+        text = response.text
+
+        if self.cache is not None and text:
+            await self.cache.aset(model, prefix + contents, text)
+
+        return text
+
+    async def agenerate_text(self, model: str, contents: str, bypass_cache: bool = False,
+                             prefix: str = '', prefix_label: str = None, stage: str = None) -> str:
+        """Async convenience wrapper returning only the response text"""
+        return (await self.agenerate(model, contents, bypass_cache=bypass_cache, prefix=prefix,
+                                     prefix_label=prefix_label, stage=stage)).text
+
+    async def agenerate_stream(self, model: str, contents: str, bypass_cache: bool = False,
+                               prefix: str = '', prefix_label: str = None, stage: str = None) -> AsyncIterator[str]:
+        """Async variant of generate_stream()"""
+        prompt = prefix + contents
+        if self.cache is not None:
+            if bypass_cache:
+                self.cache.record_bypass()
+            else:
+                cached = await self.cache.aget(model, prompt)
+                if cached is not None:
+                    LLM_REQUESTS.inc(model=model, source='cache')
+                    yield cached
+                    return
+
+        if not self.client:
+            raise ValueError("AI client not initialized for production mode")
+
+        LLM_REQUESTS.inc(model=model, source='model')
+        attempts = self._attempts(contents, prefix, await self._acached_prefix(model, prefix, prefix_label))
+        parts = []
+        with _ModelCall(model):
+            chunk = None
+            for index, attempt in enumerate(attempts):
+                request_contents, config = attempt
+                try:
+                    async for chunk in await self._aopen_stream(model, request_contents, config, stage):
+                        if chunk.text:
+                            parts.append(chunk.text)
+                            yield chunk.text
+                    break
+                except Exception as e:
+                    if parts or index == len(attempts) - 1:
+                        raise
+                    self._fall_back(attempt, e)
+        record_usage(model, chunk)
+
+        if self.cache is not None and parts:
+            await self.cache.aset(model, prompt, ''.join(parts))
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Offline Load Test Harness
+Boots the backend in production mode against fake_gemini_server.py, drives /api/chat,
+/api/chat/stream and /api/generate-blueprint at a configurable concurrency and arrival
+rate, and writes throughput / latency percentiles / error rates to a JSON report.
+
+Examples:
+    python load_test.py --duration 30 --concurrency 32 --rate 20 --output report.json
+    python load_test.py --server asgi --mix chat=1,blueprint=1 --baseline report.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from fake_gemini_server import FakeGeminiServer
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = ('chat', 'chat_stream', 'blueprint')
+PERCENTILES = (50, 90, 95, 99)
+
+SAMPLE_INPUTS = (
+    "我想创建一个3D模型生成器，用户上传照片就能生成卡通版3D手办，用于社交媒体分享。",
+    "An AI meeting assistant that transcribes calls, extracts action items and drafts follow-up emails.",
+    "一个面向电商卖家的商品图生成工具，自动生成白底图、场景图和多语言文案。",
+    "A tutoring chatbot for high-school math that explains steps and adapts difficulty to the student.",
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse 'chat=3,chat_stream=2,blueprint=1' into scenario weights"""
+    mix = {}
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if not name:
+            continue
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r} (expected one of {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("The scenario mix needs at least one positive weight")
+    return mix
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    values = sorted(seconds)
+    summary = {f"p{pct}": round(percentile(values, pct) * 1000, 1) for pct in PERCENTILES}
+    summary['mean'] = round(sum(values) / len(values) * 1000, 1) if values else 0.0
+    summary['max'] = round(values[-1] * 1000, 1) if values else 0.0
+    return summary
+
+
+class Sample:
+    """Outcome of one request"""
+
+    def __init__(self, scenario: str, started: float, latency: float, ok: bool, status: int,
+                 ttfb: Optional[float] = None, error: Optional[str] = None):
+        self.scenario = scenario
+        self.started = started
+        self.latency = latency
+        self.ok = ok
+        self.status = status
+        self.ttfb = ttfb
+        self.error = error
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    """Per-scenario and overall throughput, latency percentiles (ms) and error rates"""
+    groups: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        groups[sample.scenario].append(sample)
+    groups['total'] = list(samples)
+
+    report = {}
+    for name, group in groups.items():
+        ok = [sample for sample in group if sample.ok]
+        statuses: Dict[str, int] = defaultdict(int)
+        errors: Dict[str, int] = defaultdict(int)
+        for sample in group:
+            statuses[str(sample.status)] += 1
+            if not sample.ok:
+                errors[(sample.error or f"HTTP {sample.status}")[:120]] += 1
+        entry = {
+            'requests': len(group),
+            'succeeded': len(ok),
+            'errors': len(group) - len(ok),
+            'error_rate': round((len(group) - len(ok)) / len(group), 4) if group else 0.0,
+            'throughput_rps': round(len(ok) / elapsed, 2) if elapsed > 0 else 0.0,
+            'latency_ms': latency_summary([sample.latency for sample in ok]),
+            'status_codes': dict(statuses),
+            'top_errors': dict(sorted(errors.items(), key=lambda item: -item[1])[:5])
+        }
+        ttfbs = [sample.ttfb for sample in ok if sample.ttfb is not None]
+        if ttfbs:
+            entry['ttfb_ms'] = latency_summary(ttfbs)
+        report[name] = entry
+    return report
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """
+    Compare a report against a baseline report
+
+    Returns:
+        Human-readable regressions: p95 latency up or throughput down by more than
+        max_regression (a fraction), or error rate up by more than one point
+    """
+    regressions = []
+    for name, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or not previous['succeeded'] or not current['succeeded']:
+            continue
+        p95, base_p95 = current['latency_ms']['p95'], previous['latency_ms']['p95']
+        if base_p95 and p95 > base_p95 * (1 + max_regression):
+            regressions.append(f"{name}: p95 {base_p95}ms -> {p95}ms")
+        rps, base_rps = current['throughput_rps'], previous['throughput_rps']
+        if base_rps and rps < base_rps * (1 - max_regression):
+            regressions.append(f"{name}: throughput {base_rps} -> {rps} req/s")
+        if current['error_rate'] > previous['error_rate'] + 0.01:
+            regressions.append(f"{name}: error rate {previous['error_rate']:.2%} -> {current['error_rate']:.2%}")
+    return regressions
+
+
+class LoadTest:
+    """Drives a running backend with a weighted scenario mix"""
+
+    def __init__(self, base_url: str, mix: Dict[str, float], concurrency: int, rate: float,
+                 duration: float, requests: int, distinct_inputs: int, timeout: float,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            base_url: Backend URL, e.g. http://127.0.0.1:8080
+            mix: Scenario weights
+            concurrency: Max requests in flight
+            rate: Open-loop arrival rate (req/s, Poisson); 0 runs closed-loop at full concurrency
+            duration: Seconds to keep issuing requests
+            requests: Stop after this many requests (0 = no limit)
+            distinct_inputs: Number of distinct prompts cycled through (0 = every request unique,
+                so the backend's response cache never hits)
+            timeout: Per-request timeout (seconds)
+        """
+        self.base_url = base_url
+        self.scenarios = list(mix)
+        self.weights = [mix[name] for name in self.scenarios]
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.max_requests = requests
+        self.distinct_inputs = distinct_inputs
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.samples: List[Sample] = []
+        self._issued = 0
+
+    def _next(self):
+        index = self._issued
+        self._issued += 1
+        scenario = self.rng.choices(self.scenarios, self.weights)[0]
+        variant = index % self.distinct_inputs if self.distinct_inputs else index
+        text = f"{SAMPLE_INPUTS[variant % len(SAMPLE_INPUTS)]} (#{variant})"
+        return scenario, text, index
+
+    def _more(self, deadline: float) -> bool:
+        if self.max_requests and self._issued >= self.max_requests:
+            return False
+        return time.perf_counter() < deadline
+
+    async def _request(self, http: httpx.AsyncClient, scenario: str, text: str, index: int,
+                       scheduled: float) -> Sample:
+        # Latency is measured from the scheduled arrival, so client-side queueing counts
+        # (avoids coordinated omission in open-loop runs)
+        try:
+            if scenario == 'blueprint':
+                response = await http.post('/api/generate-blueprint', json={'userInput': text})
+                ok = response.status_code == 200 and bool(response.json().get('blueprintCards'))
+                return Sample(scenario, scheduled, time.perf_counter() - scheduled, ok, response.status_code,
+                              error=None if ok else response.text[:200])
+
+            payload = {'message': text, 'history': [], 'context': {}, 'conversationId': f"load-{index}"}
+            if scenario == 'chat':
+                response = await http.post('/api/chat', json=payload)
+                ok = response.status_code == 200 and bool(response.json().get('response'))
+                return Sample(scenario, scheduled, time.perf_counter() - scheduled, ok, response.status_code,
+                              error=None if ok else response.text[:200])
+
+            ttfb, error, completed = None, None, False
+            async with http.stream('POST', '/api/chat/stream', json=payload) as response:
+                async for line in response.aiter_lines():
+                    if not line.startswith('data: '):
+                        continue
+                    event = json.loads(line[6:])
+                    if event.get('type') == 'chunk' and ttfb is None:
+                        ttfb = time.perf_counter() - scheduled
+                    elif event.get('type') == 'complete':
+                        completed = True
+                    elif event.get('type') == 'error' or 'error' in event:
+                        error = event.get('error')
+                status = response.status_code
+            ok = status == 200 and completed and error is None
+            return Sample(scenario, scheduled, time.perf_counter() - scheduled, ok, status, ttfb, error)
+        except Exception as e:
+            return Sample(scenario, scheduled, time.perf_counter() - scheduled, False, 0,
+                          error=f"{type(e).__name__}: {e}")
+
+    async def run(self) -> float:
+        """Issue requests until the duration or request limit is reached; returns elapsed seconds"""
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as http:
+            started = time.perf_counter()
+            deadline = started + self.duration
+            if self.rate > 0:
+                await self._open_loop(http, deadline)
+            else:
+                await asyncio.gather(*[self._closed_loop(http, deadline) for _ in range(self.concurrency)])
+            return time.perf_counter() - started
+
+    async def _open_loop(self, http: httpx.AsyncClient, deadline: float):
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = []
+
+        async def issue(scenario, text, index, scheduled):
+            async with slots:
+                self.samples.append(await self._request(http, scenario, text, index, scheduled))
+
+        next_arrival = time.perf_counter()
+        while self._more(deadline):
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(issue(*self._next(), next_arrival)))
+            next_arrival += self.rng.expovariate(self.rate)
+        await asyncio.gather(*tasks)
+
+    async def _closed_loop(self, http: httpx.AsyncClient, deadline: float):
+        while self._more(deadline):
+            scenario, text, index = self._next()
+            self.samples.append(await self._request(http, scenario, text, index, time.perf_counter()))
+
+
+SERVER_COMMANDS = {
+    'flask': lambda port: [sys.executable, 'app.py'],
+    'asgi': lambda port: [sys.executable, '-m', 'hypercorn', 'asgi_app:app', '--bind', f'127.0.0.1:{port}'],
+    'gunicorn': lambda port: [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+                              '--worker-class', 'gthread', '--threads', '64'],
+}
+
+
+def start_backend(server: str, port: int, gemini_url: str, workdir: str, extra_env: Dict[str, str],
+                  log_file) -> subprocess.Popen:
+    """Start the backend in production mode against the fake Gemini server"""
+    env = dict(os.environ)
+    env.update({
+        'APP_MODE': 'production',
+        'GEMINI_API_KEY': 'load-test',
+        'GEMINI_BASE_URL': gemini_url,
+        'MAIN_APP_PORT': str(port),
+        'FLASK_DEBUG': 'false',
+        'LOG_LEVEL': 'WARNING',
+        # Keep load-test state out of the working databases
+        'LLM_CACHE_DB_PATH': os.path.join(workdir, 'llm_cache.db'),
+        'WORKFLOW_DB_PATH': os.path.join(workdir, 'workflow_executions.db'),
+    })
+    env.update(extra_env)
+    return subprocess.Popen(SERVER_COMMANDS[server](port), cwd=BACKEND_DIR, env=env,
+                            stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def wait_until_healthy(base_url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode} during startup")
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Backend did not become healthy within {timeout:.0f}s")
+
+
+def run_load_test(args) -> Dict[str, Any]:
+    """Boot fake Gemini + backend, run the load, and build the report"""
+    mix = parse_mix(args.mix)
+    extra_env = dict(item.split('=', 1) for item in args.env)
+    fake = FakeGeminiServer(latency=args.fake_latency, tokens_per_second=args.tokens_per_second,
+                            chunk_tokens=args.chunk_tokens, error_rate=args.error_rate,
+                            error_status=args.error_status, seed=args.seed).start()
+    port = args.port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory(prefix='load-test-') as workdir:
+        log_path = os.path.join(workdir, 'backend.log')
+        with open(log_path, 'w') as log_file:
+            process = start_backend(args.server, port, fake.base_url, workdir, extra_env, log_file)
+            try:
+                wait_until_healthy(base_url, process)
+                load = LoadTest(base_url, mix, args.concurrency, args.rate, args.duration, args.requests,
+                                args.distinct_inputs, args.timeout, args.seed)
+                started_at = datetime.now().isoformat()
+                elapsed = asyncio.run(load.run())
+            except Exception:
+                with open(log_path) as log:
+                    sys.stderr.write(log.read()[-4000:])
+                raise
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                fake.stop()
+
+    return {
+        'started_at': started_at,
+        'elapsed_seconds': round(elapsed, 2),
+        'config': {
+            'server': args.server,
+            'mix': mix,
+            'concurrency': args.concurrency,
+            'rate': args.rate,
+            'duration': args.duration,
+            'requests': args.requests,
+            'distinct_inputs': args.distinct_inputs,
+            'fake_latency': args.fake_latency,
+            'tokens_per_second': args.tokens_per_second,
+            'error_rate': args.error_rate,
+            'error_status': args.error_status,
+            'env': extra_env
+        },
+        'scenarios': summarize(load.samples, elapsed),
+        'fake_gemini': fake.get_stats()
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n📊 Load test ({report['config']['server']}, {report['elapsed_seconds']}s)")
+    print(f"{'scenario':<12} {'reqs':>6} {'err%':>7} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'ttfb p95':>9}")
+    for name, entry in report['scenarios'].items():
+        latency = entry['latency_ms']
+        ttfb = entry.get('ttfb_ms', {}).get('p95', '-')
+        print(f"{name:<12} {entry['requests']:>6} {entry['error_rate']:>7.2%} {entry['throughput_rps']:>8} "
+              f"{latency['p50']:>9} {latency['p95']:>9} {latency['p99']:>9} {ttfb:>9}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Offline load test against a fake Gemini server')
+    parser.add_argument('--server', choices=sorted(SERVER_COMMANDS), default='flask')
+    parser.add_argument('--port', type=int, default=0, help='Backend port (default: a free port)')
+    parser.add_argument('--mix', default='chat=3,chat_stream=3,blueprint=1',
+                        help='Scenario weights, e.g. chat=1,blueprint=1')
+    parser.add_argument('--concurrency', type=int, default=16, help='Max requests in flight')
+    parser.add_argument('--rate', type=float, default=0.0, help='Arrivals per second (0 = closed loop)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to issue requests')
+    parser.add_argument('--requests', type=int, default=0, help='Stop after this many requests')
+    parser.add_argument('--distinct-inputs', type=int, default=0,
+                        help='Distinct prompts to cycle through (0 = all unique, no response-cache hits)')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Per-request timeout (seconds)')
+    parser.add_argument('--fake-latency', default='lognormal:0.8,0.4', help='Fake Gemini time to first token')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--chunk-tokens', type=int, default=8)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=429)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra backend environment, e.g. --env PIPELINE_MAX_WORKERS=32')
+    parser.add_argument('--output', default='load_test_report.json')
+    parser.add_argument('--baseline', help='Previous report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Allowed p95 / throughput change vs. the baseline (fraction)')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    report = run_load_test(args)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print_report(report)
+    print(f"\n💾 Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print("\n❌ Regressions vs. baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\n✅ No regressions vs. baseline")
+
+
+if __name__ == '__main__':
+    main()
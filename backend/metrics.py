@@ -0,0 +1,333 @@
+"""
+Metrics Module
+Low-overhead counters, gauges and histograms rendered in the Prometheus text format
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds) spanning cache hits to long Gemini Pro generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ShardedMetric:
+    """
+    Base for metrics whose hot path takes no lock
+
+    Each thread writes into its own shard (a dict keyed by label values), so concurrent
+    updates never contend; collection merges the shards. Shards of threads that have exited
+    (e.g. finished request threads) are folded into a retired total on collection.
+    """
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._lock = threading.Lock()  # only taken when a thread creates its shard and on collect
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _merge(self, into: dict, shard: dict):
+        raise NotImplementedError
+
+    def _collect(self) -> dict:
+        """Merge all shards into {label values: value}"""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = live
+            merged: dict = {}
+            self._merge(merged, self._retired)
+            for _, shard in live:
+                self._merge(merged, dict(shard))
+        return merged
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_ShardedMetric):
+    """Monotonically increasing count"""
+
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def _merge(self, into: dict, shard: dict):
+        for key, value in shard.items():
+            into[key] = into.get(key, 0) + value
+
+    def get(self, **labels) -> float:
+        return self._collect().get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._collect().items())]
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    type_name = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """Increment for the duration of a with-block"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_ShardedMetric):
+    """Distribution of observations in cumulative buckets, with quantile estimates"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            state = shard[key] = [[0] * len(self.buckets), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of a with-block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _merge(self, into: dict, shard: dict):
+        for key, (counts, total, count) in shard.items():
+            merged = into.get(key)
+            if merged is None:
+                into[key] = [list(counts), total, count]
+            else:
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estimate a quantile by linear interpolation within buckets (as histogram_quantile does)"""
+        state = self._collect().get(self._key(labels))
+        return self._quantile(state, q) if state else None
+
+    def _quantile(self, state: list, q: float) -> Optional[float]:
+        counts, _, count = state
+        if not count:
+            return None
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                upper = self.buckets[index]
+                lower = self.buckets[index - 1] if index else 0.0
+                if upper == float('inf'):
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-2]
+
+    def summary(self, quantiles: Iterable[float] = (0.5, 0.95, 0.99)) -> List[dict]:
+        """Per label set: count, mean and estimated quantiles"""
+        rows = []
+        for key, state in sorted(self._collect().items()):
+            row = dict(zip(self.labelnames, key))
+            row['count'] = state[2]
+            row['mean'] = state[1] / state[2] if state[2] else None
+            for q in quantiles:
+                row[f"p{int(q * 100)}"] = self._quantile(state, q)
+            rows.append(row)
+        return rows
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._collect().items()):
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(upper)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics plus callbacks for values owned elsewhere (e.g. cache stats)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._metrics: Dict[str, _ShardedMetric] = {}
+        self._callbacks: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = []
+
+    def _register(self, metric: _ShardedMetric) -> _ShardedMetric:
+        with self.lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_callback(self, callback: Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]):
+        """
+        Add values computed at scrape time
+
+        The callback returns (name, type, documentation, labels, value) tuples.
+        """
+        with self.lock:
+            self._callbacks.append(callback)
+
+    def get(self, name: str) -> Optional[_ShardedMetric]:
+        with self.lock:
+            return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self.lock:
+            metrics = list(self._metrics.values())
+            callbacks = list(self._callbacks)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+
+        described = set()
+        for callback in callbacks:
+            try:
+                samples = list(callback())
+            except Exception as e:
+                logger.exception("Metrics callback error")
+                continue
+            for name, type_name, documentation, labels, value in samples:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {documentation}")
+                    lines.append(f"# TYPE {name} {type_name}")
+                labels = labels or {}
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> Dict[str, List[dict]]:
+        """p50/p95/p99 for every histogram, for dashboards and capacity planning"""
+        with self.lock:
+            histograms = [metric for metric in self._metrics.values() if isinstance(metric, Histogram)]
+        return {histogram.name: histogram.summary() for histogram in histograms}
+
+
+def instrument_stream(chunks: Iterator, interval: Histogram, open_streams: Gauge, **labels) -> Iterator:
+    """
+    Pass chunks through while counting the stream as open and observing inter-arrival times
+
+    The first observation is the time to the first chunk.
+    """
+    with open_streams.track_inprogress(**labels):
+        last = time.perf_counter()
+        try:
+            for chunk in chunks:
+                now = time.perf_counter()
+                interval.observe(now - last, **labels)
+                last = now
+                yield chunk
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+
+async def ainstrument_stream(chunks: AsyncIterator, interval: Histogram, open_streams: Gauge,
+                             **labels) -> AsyncIterator:
+    """Async variant of instrument_stream()"""
+    with open_streams.track_inprogress(**labels):
+        last = time.perf_counter()
+        try:
+            async for chunk in chunks:
+                now = time.perf_counter()
+                interval.observe(now - last, **labels)
+                last = now
+                yield chunk
+        finally:
+            aclose = getattr(chunks, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+
+
+# Process-wide registry
+metrics_registry = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
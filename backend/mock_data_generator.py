@@ -3,16 +3,76 @@ Mock Data Generator for Demo Mode
 Generates realistic mock data for demonstration purposes
 """
 
-import json
+import os
 import random
+from contextvars import ContextVar
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import Any, Dict, List, Optional, Union
+
+Seed = Union[int, str]
+
+# Per-request seed (e.g. from the X-Mock-Seed header); requests with the same seed and
+# inputs get byte-identical mock responses
+MOCK_SEED_HEADER = 'X-Mock-Seed'
+mock_seed: ContextVar[Optional[Seed]] = ContextVar('mock_seed', default=None)
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict for shared template data
+
+    Still a dict, so json.dumps and jsonify serialize it as-is; copies are unnecessary
+    (copy/deepcopy return the same object) and dict(frozen) gives a mutable shallow copy.
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(value: Any) -> Any:
+    """Recursively convert dicts to FrozenDict and lists to tuples"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+CHAT_RESPONSE_TEMPLATES = (
+    "I understand you're asking about: '{message}'. In demo mode, I can provide insights about capability dimensions and evaluation strategies. Here are some key points to consider...",
+    "Great question about '{message}'! For this type of evaluation, I'd recommend focusing on user experience metrics, technical performance indicators, and business impact measures. Would you like me to elaborate on any specific aspect?",
+    "Regarding '{message}', this is a common challenge in AI model evaluation. In our demo system, we typically see success rates of 85-95% for well-configured capability dimensions. The key is balancing technical accuracy with user satisfaction.",
+    "Excellent point about '{message}'! This relates directly to our capability framework. In demo mode, I can show you how different evaluation strategies impact model performance. Would you like to see some examples?"
+)
+
 
 class MockDataGenerator:
-    """Generate mock data for demo mode"""
+    """
+    Generate mock data for demo mode
+
+    Templates are frozen once at construction and shared by every call and thread; outputs
+    are shallow dicts over them, so a caller editing a returned card never changes the
+    templates. Randomness comes from a generator seeded per call (explicit seed, then the
+    request's mock_seed, then MOCK_DATA_SEED); without any seed the module RNG is used.
+    """
     
-    def __init__(self):
-        self.capability_templates = [
+    def __init__(self, seed: Optional[Seed] = None):
+        self.seed = seed
+        self.capability_templates = freeze([
             {
                 "id": "identity-preservation",
                 "priority": "Critical",
@@ -103,9 +163,9 @@ class MockDataGenerator:
                 },
                 "order": 5
             }
-        ]
+        ])
         
-        self.test_case_templates = {
+        self.test_case_templates = freeze({
             "Easy": [
                 {
                     "name": "Basic Portrait Recognition",
@@ -160,51 +220,69 @@ class MockDataGenerator:
                     ]
                 }
             ]
+        })
+        
+        # Output cards per product type, built once: 3D products keep the template wording
+        self._cards_by_kind = {
+            True: self.capability_templates,
+            False: tuple(FrozenDict(template, description=self._generic_description(template["description"]))
+                         for template in self.capability_templates)
         }
     
-    def generate_capability_dimensions(self, product_info: str, ideal_functions: str) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _generic_description(description: str) -> str:
+        """Adapt 3D-specific wording for other product types"""
+        return description.replace("3D model", "output").replace("3D figurine", "result")
+    
+    def _rng(self, seed: Optional[Seed], *parts: str):
+        """Random source for one call: derived from the seed and the call's inputs, or the module RNG"""
+        if seed is None:
+            seed = mock_seed.get()
+        if seed is None:
+            seed = self.seed
+        if seed is None:
+            return random
+        return random.Random('\x00'.join([str(seed), *parts]))
+    
+    def generate_capability_dimensions(self, product_info: str, ideal_functions: str,
+                                       seed: Optional[Seed] = None) -> List[Dict[str, Any]]:
         """Generate mock capability dimensions"""
-        # Add some randomization to make it feel more realistic
-        dimensions = self.capability_templates.copy()
-        
-        # Randomly shuffle priorities for some dimensions
-        if random.random() < 0.3:
-            random.shuffle(dimensions)
-            for i, dim in enumerate(dimensions):
-                dim["order"] = i + 1
+        rng = self._rng(seed, 'capability_dimensions', product_info, ideal_functions)
+        is_3d = "3D" in product_info or "figurine" in product_info.lower()
+        cards = self._cards_by_kind[is_3d]
         
-        # Add some variation to descriptions based on input
-        for dim in dimensions:
-            if "3D" in product_info or "figurine" in product_info.lower():
-                # Keep 3D-related content
-                pass
-            else:
-                # Adapt for other product types
-                dim["description"] = dim["description"].replace("3D model", "output")
-                dim["description"] = dim["description"].replace("3D figurine", "result")
+        # Add some randomization to make it feel more realistic: occasionally reorder priorities
+        if rng.random() < 0.3:
+            order = list(range(len(cards)))
+            rng.shuffle(order)
+            return [dict(cards[index], order=position + 1) for position, index in enumerate(order)]
         
-        return dimensions
+        return [dict(card) for card in cards]
     
-    def generate_test_cases(self, capability_id: str) -> List[Dict[str, Any]]:
+    def generate_test_cases(self, capability_id: str, seed: Optional[Seed] = None) -> List[Dict[str, Any]]:
         """Generate mock test cases for a capability"""
+        rng = self._rng(seed, 'test_cases', capability_id)
         test_cases = []
         
         for tier in ["Easy", "Medium", "Hard"]:
-            template = random.choice(self.test_case_templates[tier])
+            template = rng.choice(self.test_case_templates[tier])
             test_case = {
-                "id": f"{capability_id}-{tier.lower()}-{random.randint(1, 100)}",
+                "id": f"{capability_id}-{tier.lower()}-{rng.randint(1, 100)}",
                 "tier": tier,
                 "name": template["name"],
                 "rationale": template["rationale"],
-                "showcases": template["showcases"].copy()
+                "showcases": list(template["showcases"])
             }
             test_cases.append(test_case)
         
         return test_cases
     
-    def generate_execution_data(self, execution_id: str) -> Dict[str, Any]:
-        """Generate mock execution data for monitoring"""
-        start_time = datetime.now() - timedelta(seconds=random.randint(5, 30))
+    def generate_execution_data(self, execution_id: str, seed: Optional[Seed] = None,
+                                now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Generate mock execution data for monitoring (pass `now` as well for reproducible timestamps)"""
+        rng = self._rng(seed, 'execution_data', execution_id)
+        now = now or datetime.now()
+        start_time = now - timedelta(seconds=rng.randint(5, 30))
         
         steps = [
             {
@@ -221,7 +299,7 @@ class MockDataGenerator:
                 "data": {
                     "action": "Calling Gemini 2.5 Pro model",
                     "model": "gemini-2.5-pro",
-                    "prompt_length": random.randint(3000, 5000)
+                    "prompt_length": rng.randint(3000, 5000)
                 }
             },
             {
@@ -229,7 +307,7 @@ class MockDataGenerator:
                 "timestamp": (start_time + timedelta(seconds=8)).isoformat(),
                 "data": {
                     "action": "Extracting JSON from AI response",
-                    "response_length": random.randint(2000, 4000)
+                    "response_length": rng.randint(2000, 4000)
                 }
             },
             {
@@ -237,7 +315,7 @@ class MockDataGenerator:
                 "timestamp": (start_time + timedelta(seconds=10)).isoformat(),
                 "data": {
                     "action": "Validating generated capability dimensions",
-                    "dimensions_count": random.randint(4, 6),
+                    "dimensions_count": rng.randint(4, 6),
                     "dimensions": [
                         {"id": "identity-preservation", "title": "Identity Preservation"},
                         {"id": "artistic-appeal", "title": "Artistic Appeal"},
@@ -257,27 +335,25 @@ class MockDataGenerator:
             },
             "steps": steps,
             "output": {
-                "capability_dimensions": self.generate_capability_dimensions("", ""),
-                "total_dimensions": random.randint(4, 6),
-                "execution_time": datetime.now().isoformat()
+                "capability_dimensions": self.generate_capability_dimensions("", "", seed=seed),
+                "total_dimensions": rng.randint(4, 6),
+                "execution_time": now.isoformat()
             },
             "error": None,
             "end_time": (start_time + timedelta(seconds=12)).isoformat()
         }
     
-    def generate_chat_response(self, user_message: str) -> str:
+    def generate_chat_response(self, user_message: str, seed: Optional[Seed] = None) -> str:
         """Generate mock chat responses"""
-        responses = [
-            f"I understand you're asking about: '{user_message}'. In demo mode, I can provide insights about capability dimensions and evaluation strategies. Here are some key points to consider...",
-            
-            f"Great question about '{user_message}'! For this type of evaluation, I'd recommend focusing on user experience metrics, technical performance indicators, and business impact measures. Would you like me to elaborate on any specific aspect?",
-            
-            f"Regarding '{user_message}', this is a common challenge in AI model evaluation. In our demo system, we typically see success rates of 85-95% for well-configured capability dimensions. The key is balancing technical accuracy with user satisfaction.",
-            
-            f"Excellent point about '{user_message}'! This relates directly to our capability framework. In demo mode, I can show you how different evaluation strategies impact model performance. Would you like to see some examples?"
-        ]
-        
-        return random.choice(responses)
+        template = self._rng(seed, 'chat', user_message).choice(CHAT_RESPONSE_TEMPLATES)
+        return template.format(message=user_message)
+    
+    def generate_chat_chunks(self, user_message: str, words_per_chunk: int = 4,
+                             seed: Optional[Seed] = None) -> List[str]:
+        """Split a mock chat response into stream chunks (joined they give the full response)"""
+        words = self.generate_chat_response(user_message, seed).split(' ')
+        return [' '.join(words[i:i + words_per_chunk]) + (' ' if i + words_per_chunk < len(words) else '')
+                for i in range(0, len(words), words_per_chunk)]
 
 # Global mock data generator instance
-mock_generator = MockDataGenerator()
+mock_generator = MockDataGenerator(seed=os.getenv('MOCK_DATA_SEED') or None)
@@ -0,0 +1,186 @@
+"""
+Model Router Module
+Chooses the model for each call from a configurable policy (stage, input size, tenant, latency SLO)
+and escalates to a stronger model when a fast model's output fails validation
+"""
+
+import json
+import logging
+import os
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from metrics import metrics_registry
+
+logger = logging.getLogger(__name__)
+
+TENANT_HEADER = 'X-Tenant-Id'
+LATENCY_SLO_HEADER = 'X-Latency-SLO-Ms'
+
+# Routing inputs bound per request from the headers above
+current_tenant: ContextVar[Optional[str]] = ContextVar('current_tenant', default=None)
+latency_slo_ms: ContextVar[Optional[float]] = ContextVar('latency_slo_ms', default=None)
+
+MODEL_ROUTES = metrics_registry.counter(
+    'evalbridge_model_routes_total',
+    'Model choices by stage and the rule that made them',
+    ['stage', 'model', 'rule']
+)
+MODEL_ESCALATIONS = metrics_registry.counter(
+    'evalbridge_model_escalations_total',
+    'Calls retried on a stronger model after the routed model failed validation',
+    ['stage', 'from_model', 'to_model']
+)
+
+
+class RoutingRule:
+    """
+    Sends calls matching every given condition to a model
+
+    Conditions left as None match anything. max_slo_ms matches requests whose latency SLO is
+    at most this tight, so tight-SLO traffic can be pinned to a fast model.
+    """
+
+    FIELDS = ('model', 'stage', 'tenant', 'min_input_tokens', 'max_input_tokens', 'max_slo_ms',
+              'escalate_to', 'name')
+
+    def __init__(self, model: str, stage: Optional[str] = None, tenant: Optional[str] = None,
+                 min_input_tokens: Optional[int] = None, max_input_tokens: Optional[int] = None,
+                 max_slo_ms: Optional[float] = None, escalate_to: Optional[str] = None,
+                 name: Optional[str] = None):
+        self.model = model
+        self.stage = stage
+        self.tenant = tenant
+        self.min_input_tokens = min_input_tokens
+        self.max_input_tokens = max_input_tokens
+        self.max_slo_ms = max_slo_ms
+        self.escalate_to = escalate_to
+        self.name = name
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RoutingRule':
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown or 'model' not in data:
+            raise ValueError(f"Invalid routing rule {data}: needs 'model', unknown keys {sorted(unknown)}")
+        return cls(**data)
+
+    def matches(self, stage: str, input_tokens: int, tenant: Optional[str], slo_ms: Optional[float]) -> bool:
+        if self.stage is not None and self.stage != stage:
+            return False
+        if self.tenant is not None and self.tenant != tenant:
+            return False
+        if self.min_input_tokens is not None and input_tokens < self.min_input_tokens:
+            return False
+        if self.max_input_tokens is not None and input_tokens > self.max_input_tokens:
+            return False
+        if self.max_slo_ms is not None and (slo_ms is None or slo_ms > self.max_slo_ms):
+            return False
+        return True
+
+
+class ModelRoute:
+    """The model chosen for one call, and where to go if its output is unusable"""
+
+    def __init__(self, stage: str, model: str, rule: str, escalate_to: Optional[str] = None):
+        self.stage = stage
+        self.model = model
+        self.rule = rule
+        self.escalate_to = escalate_to if escalate_to != model else None
+
+    @property
+    def can_escalate(self) -> bool:
+        return self.escalate_to is not None
+
+    def describe(self) -> Dict[str, Any]:
+        return {'model': self.model, 'rule': self.rule, 'escalate_to': self.escalate_to}
+
+
+def parse_stage_models(spec: str) -> Dict[str, str]:
+    """Parse 'stage=model,stage=model' (as in MODEL_STAGE_DEFAULTS)"""
+    models = {}
+    for item in (spec or '').split(','):
+        stage, _, model = item.partition('=')
+        if stage.strip() and model.strip():
+            models[stage.strip()] = model.strip()
+    return models
+
+
+def load_routing_rules(spec: str) -> List[RoutingRule]:
+    """Rules from a JSON list, given inline or as a path to a .json file"""
+    spec = (spec or '').strip()
+    if not spec:
+        return []
+    if not spec.startswith('['):
+        with open(os.path.expanduser(spec), encoding='utf-8') as f:
+            spec = f.read()
+    return [RoutingRule.from_dict(rule) for rule in json.loads(spec)]
+
+
+class ModelRouter:
+    """
+    Picks a model per call
+
+    Rules are checked in order and the first match wins; otherwise the stage default applies.
+    A route carries an escalation model (the rule's escalate_to, else the stage's escalation
+    default) that callers switch to when the routed model's output fails validation.
+    """
+
+    def __init__(self, defaults: Dict[str, str], rules: Optional[List[RoutingRule]] = None,
+                 escalation: Optional[Dict[str, str]] = None, fallback_model: str = 'gemini-2.5-pro'):
+        """
+        Args:
+            defaults: Model per stage when no rule matches
+            rules: Ordered routing rules
+            escalation: Stronger model per stage for failed validations
+            fallback_model: Model for stages without a default
+        """
+        self.defaults = dict(defaults)
+        self.rules = list(rules or [])
+        self.escalation = dict(escalation or {})
+        self.fallback_model = fallback_model
+
+    def default_for(self, stage: str) -> str:
+        return self.defaults.get(stage, self.fallback_model)
+
+    def route(self, stage: str, input_tokens: int = 0, tenant: Optional[str] = None,
+              slo_ms: Optional[float] = None) -> ModelRoute:
+        """
+        Choose the model for one call
+
+        Args:
+            stage: Pipeline stage (extract, router, expert, chat, ...)
+            input_tokens: Estimated size of the variable input
+            tenant: Tenant id; defaults to the request's current_tenant
+            slo_ms: Latency SLO; defaults to the request's latency_slo_ms
+        """
+        tenant = current_tenant.get() if tenant is None else tenant
+        slo_ms = latency_slo_ms.get() if slo_ms is None else slo_ms
+        escalate_to = self.escalation.get(stage)
+
+        route = None
+        for index, rule in enumerate(self.rules):
+            if rule.matches(stage, input_tokens, tenant, slo_ms):
+                route = ModelRoute(stage, rule.model, rule.name or f'rule-{index}', rule.escalate_to or escalate_to)
+                break
+        if route is None:
+            route = ModelRoute(stage, self.default_for(stage), 'default', escalate_to)
+
+        MODEL_ROUTES.inc(stage=stage, model=route.model, rule=route.rule)
+        return route
+
+    def escalate(self, route: ModelRoute, error: Exception) -> ModelRoute:
+        """The route to retry on after route.model's output failed validation"""
+        MODEL_ESCALATIONS.inc(stage=route.stage, from_model=route.model, to_model=route.escalate_to)
+        logger.warning("Escalating to a stronger model after invalid output", extra={
+            'stage': route.stage, 'from_model': route.model, 'to_model': route.escalate_to,
+            'error': str(error)[:200]
+        })
+        return ModelRoute(route.stage, route.escalate_to, f'escalated:{route.rule}')
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'defaults': dict(self.defaults),
+            'escalation': dict(self.escalation),
+            'rules': [{field: getattr(rule, field) for field in RoutingRule.FIELDS
+                       if getattr(rule, field) is not None} for rule in self.rules],
+        }
@@ -0,0 +1,209 @@
+"""
+Blueprint Pipeline Executor
+Runs the extract -> domain router -> dynamic expert chain with independent stages overlapped
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PendingDomainContext(dict):
+    """
+    Placeholder handed to the expert stage while the domain router is still running
+
+    The expert prompt is built from product info + ideal functions only, so it never waits on
+    the domain context. Stages that record the context (e.g. on a workflow execution) register
+    on_resolve() callbacks, which run with the router's output once the pipeline has it.
+    """
+
+    def __init__(self):
+        super().__init__(status='pending', note='Resolved concurrently by the domain router')
+        self.resolved: Optional[Dict[str, Any]] = None
+        self.router_input: Optional[str] = None
+        self._callbacks: List[Callable[[Dict[str, Any], str], None]] = []
+        self._lock = threading.Lock()
+
+    def on_resolve(self, callback: Callable[[Dict[str, Any], str], None]):
+        """Call callback(domain_context, router_input) once resolved (at once if it already is)"""
+        with self._lock:
+            if self.resolved is None:
+                self._callbacks.append(callback)
+                return
+        callback(self.resolved, self.router_input)
+
+    def resolve(self, domain_context: Dict[str, Any], router_input: str):
+        with self._lock:
+            self.resolved, self.router_input = domain_context, router_input
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(domain_context, router_input)
+            except Exception:
+                logger.exception("Domain context callback failed")
+
+
+class PipelineResult:
+    """Outputs of one pipeline run plus per-stage wall-clock timings (seconds)"""
+
+    def __init__(self, product_info: str, ideal_functions: str, domain_context: Dict[str, Any],
+                 blueprint_cards: list, timings: Dict[str, float], extracted: bool,
+                 router_input: str = 'structured'):
+        self.product_info = product_info
+        self.ideal_functions = ideal_functions
+        self.domain_context = domain_context
+        self.blueprint_cards = blueprint_cards
+        self.timings = timings
+        self.extracted = extracted
+        self.router_input = router_input
+
+    def timings_ms(self) -> Dict[str, float]:
+        """Stage timings in milliseconds, for API responses"""
+        return {stage: round(seconds * 1000, 1) for stage, seconds in self.timings.items()}
+
+
+class BlueprintPipeline:
+    """
+    Overlaps the blueprint stages instead of running them strictly in sequence
+
+    Dependency graph:
+      - the dynamic expert needs product info + ideal functions (from input or extraction)
+      - the domain router needs the same, but also works on the raw user input, so with
+        speculative_router it starts alongside extraction instead of after it
+    End-to-end latency becomes max(extract + expert, router) rather than the sum of all three.
+
+    With speculative_router the domain context describes the raw user input rather than the
+    extracted fields; PipelineResult.router_input ('user_input' or 'structured') says which one
+    the router saw. Disable it to always route on the extracted product info.
+    """
+
+    def __init__(self, extract_fn: Callable, router_fn: Callable, expert_fn: Callable,
+                 executor: Optional[ThreadPoolExecutor] = None, speculative_router: bool = True,
+                 observer: Optional[Callable[[str, float], None]] = None):
+        """
+        Args:
+            extract_fn: (user_input, bypass_cache) -> {'productInfo', 'idealFunctions'}
+            router_fn: (product_info, ideal_functions, bypass_cache) -> domain context dict
+            expert_fn: (domain_context, product_info, ideal_functions, bypass_cache) -> list of cards
+            executor: Thread pool for the sync path (run); unused by arun
+            speculative_router: Route on the raw user input in parallel with extraction
+            observer: Called with (stage, seconds) as each stage finishes, e.g. to feed a histogram
+        """
+        self.extract_fn = extract_fn
+        self.router_fn = router_fn
+        self.expert_fn = expert_fn
+        self.executor = executor
+        self.speculative_router = speculative_router
+        self.observer = observer
+
+    def _record(self, timings: Dict[str, float], stage: str, seconds: float):
+        timings[stage] = seconds
+        if self.observer is not None:
+            self.observer(stage, seconds)
+
+    def _timed(self, timings: Dict[str, float], stage: str, fn: Callable, *args) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._record(timings, stage, time.perf_counter() - started)
+
+    async def _atimed(self, timings: Dict[str, float], stage: str, fn: Callable, *args) -> Any:
+        started = time.perf_counter()
+        try:
+            return await fn(*args)
+        finally:
+            self._record(timings, stage, time.perf_counter() - started)
+
+    def run(self, product_info: str = '', ideal_functions: str = '', user_input: str = '',
+            bypass_cache: bool = False) -> PipelineResult:
+        """
+        Run the pipeline on worker threads; the calling thread executes the critical path
+
+        Raises:
+            Any stage exception (the router future is always awaited so its errors surface)
+        """
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        needs_extraction = not product_info or not ideal_functions
+        executor = self.executor or ThreadPoolExecutor(max_workers=1)
+
+        try:
+            router_future, router_input = None, 'structured'
+            pending = PendingDomainContext()
+            if needs_extraction and self.speculative_router:
+                router_input = 'user_input'
+                # The router thread runs in a copy of the caller's context (tenant, SLO, priority, request id)
+                router_future = executor.submit(contextvars.copy_context().run, self._timed, timings,
+                                                'domain_router', self.router_fn, user_input, user_input,
+                                                bypass_cache)
+
+            if needs_extraction:
+                extracted_info = self._timed(timings, 'extract', self.extract_fn, user_input, bypass_cache)
+                product_info = extracted_info.get('productInfo', user_input)
+                ideal_functions = extracted_info.get('idealFunctions', user_input)
+
+            if router_future is None:
+                router_future = executor.submit(contextvars.copy_context().run, self._timed, timings,
+                                                'domain_router', self.router_fn, product_info, ideal_functions,
+                                                bypass_cache)
+
+            try:
+                blueprint_cards = self._timed(timings, 'dynamic_expert', self.expert_fn,
+                                              pending, product_info, ideal_functions, bypass_cache)
+            except Exception:
+                router_future.cancel()
+                raise
+
+            domain_context = router_future.result()
+            pending.resolve(domain_context, router_input)
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=False)
+
+        self._record(timings, 'total', time.perf_counter() - started)
+        return PipelineResult(product_info, ideal_functions, domain_context, blueprint_cards,
+                              timings, needs_extraction, router_input)
+
+    async def arun(self, product_info: str = '', ideal_functions: str = '', user_input: str = '',
+                   bypass_cache: bool = False) -> PipelineResult:
+        """Async variant of run(); stage callables must be coroutine functions"""
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        needs_extraction = not product_info or not ideal_functions
+
+        router_task, router_input = None, 'structured'
+        pending = PendingDomainContext()
+        if needs_extraction and self.speculative_router:
+            router_input = 'user_input'
+            router_task = asyncio.ensure_future(self._atimed(timings, 'domain_router', self.router_fn,
+                                                             user_input, user_input, bypass_cache))
+
+        try:
+            if needs_extraction:
+                extracted_info = await self._atimed(timings, 'extract', self.extract_fn, user_input, bypass_cache)
+                product_info = extracted_info.get('productInfo', user_input)
+                ideal_functions = extracted_info.get('idealFunctions', user_input)
+
+            if router_task is None:
+                router_task = asyncio.ensure_future(self._atimed(timings, 'domain_router', self.router_fn,
+                                                                 product_info, ideal_functions, bypass_cache))
+
+            blueprint_cards = await self._atimed(timings, 'dynamic_expert', self.expert_fn,
+                                                 pending, product_info, ideal_functions, bypass_cache)
+            domain_context = await router_task
+            pending.resolve(domain_context, router_input)
+        except BaseException:
+            if router_task is not None:
+                router_task.cancel()
+            raise
+
+        self._record(timings, 'total', time.perf_counter() - started)
+        return PipelineResult(product_info, ideal_functions, domain_context, blueprint_cards,
+                              timings, needs_extraction, router_input)
@@ -3,61 +3,294 @@ Prompt Management Module
 Handles loading and formatting of system prompts for different AI tasks
 """
 
+import hashlib
+import logging
 import os
-from typing import Dict, Any
+import threading
+import time
+from string import Formatter
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Placeholders each known prompt must define (validated on every load and reload)
+PROMPT_PLACEHOLDERS: Dict[str, Set[str]] = {
+    'capability_dimensions_prompt': {'product_info', 'ideal_functions'},
+}
+
+# (literal text, placeholder name or None, conversion, format spec)
+Segment = Tuple[str, Optional[str], Optional[str], str]
+
+
+class PromptValidationError(ValueError):
+    """A prompt template is malformed or does not define the expected placeholders"""
+
+
+class CompiledPrompt:
+    """
+    A prompt template parsed once into literal/placeholder segments
+
+    Rendering joins the segments directly instead of re-parsing the template with
+    str.format on every call. Instances are immutable; a reload produces a new one.
+    """
+
+    def __init__(self, name: str, template: str, mtime: float = 0.0, size: int = 0):
+        self.name = name
+        self.template = template
+        self.mtime = mtime
+        self.size = size
+        self.loaded_at = time.time()
+        self.version = hashlib.sha256(template.encode('utf-8')).hexdigest()[:12]
+        self.segments: List[Segment] = self._compile(template)
+        self.placeholders = {field for _, field, _, _ in self.segments if field is not None}
+        # Static text before the first placeholder (the whole text if there is none)
+        self.prefix = self.segments[0][0] if self.segments else ''
+
+    @property
+    def prompt_id(self) -> str:
+        """Versioned id, e.g. capability_dimensions_prompt@3f2a9c1b7d20"""
+        return f"{self.name}@{self.version}"
+
+    def _compile(self, template: str) -> List[Segment]:
+        try:
+            parsed = list(Formatter().parse(template))
+        except ValueError as e:
+            raise PromptValidationError(f"Prompt {self.name} is malformed: {str(e)}")
+
+        segments = []
+        for literal, field, spec, conversion in parsed:
+            if field is not None and not field.isidentifier():
+                raise PromptValidationError(
+                    f"Prompt {self.name} has an unsupported placeholder {{{field}}} (use named placeholders)"
+                )
+            segments.append((literal, field, conversion, spec or ''))
+        return segments
+
+    def validate(self, expected: Optional[Set[str]]):
+        """Check the template defines exactly the expected placeholders"""
+        if expected is None:
+            return
+        missing = expected - self.placeholders
+        unexpected = self.placeholders - expected
+        if missing or unexpected:
+            raise PromptValidationError(
+                f"Prompt {self.name} placeholders do not match: "
+                f"missing {sorted(missing)}, unexpected {sorted(unexpected)}"
+            )
+
+    def _render(self, segments: List[Segment], values: Dict[str, Any]) -> str:
+        parts = []
+        for literal, field, conversion, spec in segments:
+            parts.append(literal)
+            if field is None:
+                continue
+            value = values[field]
+            if conversion == 'r':
+                value = repr(value)
+            elif conversion == 'a':
+                value = ascii(value)
+            parts.append(format(value, spec) if spec or not isinstance(value, str) else value)
+        return ''.join(parts)
+
+    def render(self, **values: Any) -> str:
+        """
+        Fill in the placeholders
+
+        Raises:
+            KeyError: If a placeholder has no value
+        """
+        missing = self.placeholders - values.keys()
+        if missing:
+            raise KeyError(f"Prompt {self.name} is missing values for {sorted(missing)}")
+        return self._render(self.segments, values)
+
+    def render_parts(self, **values: Any) -> Tuple[str, str]:
+        """
+        Render as (static prefix, request-specific suffix); prefix + suffix == render(...)
+
+        The prefix is identical for every request, so it can be sent as provider-side cached content.
+        """
+        missing = self.placeholders - values.keys()
+        if missing:
+            raise KeyError(f"Prompt {self.name} is missing values for {sorted(missing)}")
+        if not self.placeholders:
+            return self._render(self.segments, values), ''
+        first = self.segments[0]
+        return self.prefix, self._render([('',) + first[1:]] + self.segments[1:], values)
+
 
 class PromptManager:
-    """Manages system prompts for different AI tasks"""
-    
-    def __init__(self, prompts_dir: str = "prompts"):
-        self.prompts_dir = prompts_dir
-        self._prompt_cache: Dict[str, str] = {}
-    
-    def load_prompt(self, prompt_name: str) -> str:
+    """
+    Registry of compiled prompt templates that reloads edited files without a restart
+
+    Each file is checked at most once per `reload_interval` seconds (a stat call on
+    access). A changed file is compiled and validated off to the side and swapped in
+    atomically; callers holding the previous CompiledPrompt (e.g. an in-flight stream)
+    keep using it. A template that fails validation is rejected and the last good
+    version stays active.
+    """
+
+    def __init__(self, prompts_dir: str = "prompts", reload_interval: float = 2.0,
+                 placeholders: Optional[Dict[str, Set[str]]] = None):
         """
-        Load a prompt template from file
-        
         Args:
-            prompt_name: Name of the prompt file (without extension)
-            
-        Returns:
-            The prompt template content
+            prompts_dir: Directory containing <name>.txt templates
+            reload_interval: Seconds between mtime checks per prompt; 0 disables reloading
+            placeholders: Expected placeholders per prompt name (defaults to PROMPT_PLACEHOLDERS)
         """
-        if prompt_name in self._prompt_cache:
-            return self._prompt_cache[prompt_name]
-        
-        prompt_file = os.path.join(self.prompts_dir, f"{prompt_name}.txt")
-        
+        self.prompts_dir = prompts_dir
+        self.reload_interval = reload_interval
+        self.placeholders = dict(PROMPT_PLACEHOLDERS if placeholders is None else placeholders)
+        self.lock = threading.Lock()
+        self._prompts: Dict[str, CompiledPrompt] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._rejected: Dict[str, Tuple[float, int]] = {}  # file stamps that failed validation
+        self._stats = {'loads': 0, 'reloads': 0, 'rejected': 0}
+
+    def _path(self, prompt_name: str) -> str:
+        return os.path.join(self.prompts_dir, f"{prompt_name}.txt")
+
+    def _compile_file(self, prompt_name: str) -> CompiledPrompt:
+        prompt_file = self._path(prompt_name)
         try:
             with open(prompt_file, 'r', encoding='utf-8') as f:
+                stat = os.fstat(f.fileno())
                 content = f.read()
-                self._prompt_cache[prompt_name] = content
-                return content
         except FileNotFoundError:
             raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
         except Exception as e:
             raise Exception(f"Error loading prompt {prompt_name}: {str(e)}")
-    
+
+        compiled = CompiledPrompt(prompt_name, content, stat.st_mtime, stat.st_size)
+        compiled.validate(self.placeholders.get(prompt_name))
+        return compiled
+
+    def get(self, prompt_name: str) -> CompiledPrompt:
+        """
+        Get the current compiled version of a prompt, reloading it if its file changed
+
+        Args:
+            prompt_name: Name of the prompt file (without extension)
+
+        Returns:
+            The active CompiledPrompt
+        """
+        current = self._prompts.get(prompt_name)
+        if current is None:
+            with self.lock:
+                current = self._prompts.get(prompt_name)
+                if current is None:
+                    current = self._compile_file(prompt_name)
+                    self._prompts[prompt_name] = current
+                    self._checked_at[prompt_name] = time.monotonic()
+                    self._stats['loads'] += 1
+                    logger.debug("Prompt loaded", extra={'prompt': current.prompt_id,
+                                                         'chars': len(current.template)})
+            return current
+
+        if self.reload_interval and time.monotonic() - self._checked_at.get(prompt_name, 0) >= self.reload_interval:
+            return self._maybe_reload(prompt_name, current)
+        return current
+
+    def _maybe_reload(self, prompt_name: str, current: CompiledPrompt) -> CompiledPrompt:
+        with self.lock:
+            now = time.monotonic()
+            if now - self._checked_at.get(prompt_name, 0) < self.reload_interval:
+                return self._prompts[prompt_name]
+            self._checked_at[prompt_name] = now
+            current = self._prompts[prompt_name]
+            try:
+                stat = os.stat(self._path(prompt_name))
+            except OSError:
+                # Deleted or mid-replace: keep serving the last good version
+                return current
+            stamp = (stat.st_mtime, stat.st_size)
+            if stamp == (current.mtime, current.size) or stamp == self._rejected.get(prompt_name):
+                return current
+            try:
+                compiled = self._compile_file(prompt_name)
+            except Exception as e:
+                self._stats['rejected'] += 1
+                # Remember the bad file's stamp so it is not re-validated on every check
+                self._rejected[prompt_name] = stamp
+                logger.error("Prompt reload rejected, keeping previous version",
+                             extra={'prompt': current.prompt_id, 'error': str(e)})
+                return current
+            if compiled.version != current.version:
+                self._stats['reloads'] += 1
+                logger.info("Prompt reloaded", extra={'prompt': compiled.prompt_id,
+                                                      'previous': current.prompt_id})
+            self._rejected.pop(prompt_name, None)
+            self._prompts[prompt_name] = compiled
+            return compiled
+
+    def load_prompt(self, prompt_name: str) -> str:
+        """
+        Load a prompt template from file
+
+        Args:
+            prompt_name: Name of the prompt file (without extension)
+
+        Returns:
+            The prompt template content
+        """
+        return self.get(prompt_name).template
+
+    def prompt_id(self, prompt_name: str) -> str:
+        """Versioned id of the active template, e.g. for keying cached responses or logs"""
+        return self.get(prompt_name).prompt_id
+
+    def format_capability_dimensions_prompt_parts(self, product_info: str, ideal_functions: str) -> Tuple[str, str]:
+        """
+        Format the capability dimensions prompt as (static prefix, request-specific suffix)
+
+        The prefix is identical for every request, so it can be sent as provider-side cached content.
+        """
+        return self.get("capability_dimensions_prompt").render_parts(
+            product_info=product_info,
+            ideal_functions=ideal_functions
+        )
+
     def format_capability_dimensions_prompt(self, product_info: str, ideal_functions: str) -> str:
         """
         Format the capability dimensions prompt with user input
-        
+
         Args:
             product_info: Product information from user
             ideal_functions: Ideal functions description from user
-            
+
         Returns:
             Formatted prompt ready for AI processing
         """
-        template = self.load_prompt("capability_dimensions_prompt")
-        return template.format(
+        return self.get("capability_dimensions_prompt").render(
             product_info=product_info,
             ideal_functions=ideal_functions
         )
-    
+
+    def list_prompts(self) -> List[Dict[str, Any]]:
+        """Describe every loaded prompt: versioned id, placeholders and load time"""
+        with self.lock:
+            prompts = list(self._prompts.values())
+        return [{
+            'name': prompt.name,
+            'id': prompt.prompt_id,
+            'version': prompt.version,
+            'placeholders': sorted(prompt.placeholders),
+            'chars': len(prompt.template),
+            'loaded_at': prompt.loaded_at
+        } for prompt in prompts]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get load/reload counters"""
+        with self.lock:
+            return dict(self._stats)
+
     def clear_cache(self):
         """Clear the prompt cache"""
-        self._prompt_cache.clear()
+        with self.lock:
+            self._prompts.clear()
+            self._checked_at.clear()
+            self._rejected.clear()
 
 # Global prompt manager instance
-prompt_manager = PromptManager()
+prompt_manager = PromptManager(reload_interval=float(os.getenv('PROMPT_RELOAD_INTERVAL_SECONDS', '2')))
@@ -0,0 +1,57 @@
+"""
+Serving Core
+Transport-independent pieces shared by the Flask (app.py) and Quart (asgi_app.py) entry points
+
+Agents are written once as step generators: each yields the keyword arguments of a gateway call
+(LLMGateway.generate / agenerate), receives the response back (or the call's exception thrown
+in), and returns its result. run_steps drives them with blocking calls, arun_steps awaits them,
+so each app only supplies the transport.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Generator
+
+Steps = Generator[Dict[str, Any], Any, Any]
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'Access-Control-Allow-Origin': '*',
+}
+
+
+def run_steps(steps: Steps, call: Callable[..., Any]) -> Any:
+    """Drive an agent's step generator with a blocking model call; returns the agent's result"""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                response = call(**request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as done:
+        return done.value
+
+
+async def arun_steps(steps: Steps, call: Callable[..., Awaitable[Any]]) -> Any:
+    """Drive an agent's step generator with an awaited model call; returns the agent's result"""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                response = await call(**request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as done:
+        return done.value
+
+
+def sse_event(payload: Dict[str, Any]) -> str:
+    """One timestamped server-sent event"""
+    payload['timestamp'] = datetime.now().isoformat()
+    return f"data: {json.dumps(payload)}\n\n"
@@ -0,0 +1,143 @@
+"""
+Single-Flight Module
+Collapses concurrent identical calls into one in-flight execution shared by every waiter
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _InFlightCall:
+    """State of one in-flight call and the threads waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; duplicates wait for and share its outcome"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+        self._stats = {'leaders': 0, 'shared': 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Execute fn once for all concurrent callers using the same key
+
+        Args:
+            key: Identity of the call (e.g. hash of model + prompt)
+            fn: Zero-argument callable performing the work
+
+        Returns:
+            (result, shared) where shared is True if this caller joined another caller's call
+
+        Raises:
+            Whatever fn raised, re-raised in every waiter
+        """
+        with self.lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats['shared'] += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self._stats['leaders'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running"""
+        with self.lock:
+            return len(self._calls)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get leader/shared counters"""
+        with self.lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight for use inside a single event loop
+
+    The shared call runs as its own task, so cancelling any caller (including the one that
+    started it) only stops that caller's wait; the call is cancelled once no caller is left.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats = {'leaders': 0, 'shared': 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await fn once for all concurrent callers using the same key
+
+        Returns:
+            (result, shared) where shared is True if this caller joined another caller's call
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self._stats['shared'] += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            self._stats['leaders'] += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if self._calls.get(key) is task and self._waiters[key] == 1:
+                task.cancel()  # the last caller left; nobody needs the result
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved in case every caller was cancelled
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running"""
+        return len(self._calls)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get leader/shared counters"""
+        stats = dict(self._stats)
+        stats['in_flight'] = len(self._calls)
+        return stats
@@ -0,0 +1,213 @@
+"""
+Structured Logging Module
+Level-gated JSON-lines logging with request/execution id correlation and an async queue handler
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Correlation id of the HTTP request being served (set by the app's before_request hook)
+current_request_id: ContextVar[Optional[str]] = ContextVar('current_request_id', default=None)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# Attributes every LogRecord has; anything else on a record came from extra={...}
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id', 'execution_id'
+}
+
+# Context variables stamped onto every record, by output field name
+_context_vars: Dict[str, ContextVar] = {'request_id': current_request_id}
+
+
+def register_context_var(field: str, var: ContextVar):
+    """Stamp the value of a context variable onto every log record as `field`"""
+    _context_vars[field] = var
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """Reuse a client-supplied request id (bounded) or mint a new one"""
+    if incoming:
+        return incoming.strip()[:128]
+    return uuid.uuid4().hex
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copy correlation ids from context variables onto the record
+
+    Runs on the producing thread, before the record is queued, so the ids are those of the
+    request/execution that logged it rather than of the listener thread.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for field, var in _context_vars.items():
+            if not hasattr(record, field):
+                setattr(record, field, var.get())
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, correlation ids, extra fields, exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for field in _context_vars:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and key not in entry and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, with the request id when there is one"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s%(correlation)s: %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        ids = [f"{field}={getattr(record, field)}" for field in _context_vars
+               if getattr(record, field, None) is not None]
+        record.correlation = f" [{' '.join(ids)}]" if ids else ''
+        return super().format(record)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hand records to a background listener so logging never blocks on stdout/file I/O
+
+    Unlike the stock QueueHandler, prepare() keeps the record structured: the message is
+    interpolated and the traceback rendered to text (neither survives the thread hop safely),
+    but extra fields stay as attributes for the JSON formatter.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_running = False  # QueueListener.stop() fails unless start() ran; it exposes no public state
+_queue_handler: Optional[AsyncQueueHandler] = None
+
+
+def _start_listener():
+    global _listener_running
+    _listener.start()
+    _listener_running = True
+
+
+def _stop_listener():
+    """Stop the listener if it is running, draining queued records"""
+    global _listener_running
+    if _listener_running:
+        _listener_running = False
+        _listener.stop()
+
+
+def configure_logging(level: str = None, fmt: str = None, stream=None) -> logging.Logger:
+    """
+    Route the root logger through the async queue handler
+
+    Safe to call more than once (app.py and workflow_dashboard.py both do); the previous
+    listener is flushed and replaced.
+
+    Args:
+        level: Minimum level, defaults to LOG_LEVEL (INFO)
+        fmt: 'json' or 'text', defaults to LOG_FORMAT (json)
+        stream: Output stream, defaults to stdout
+    """
+    global _listener, _queue_handler
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    fmt = (fmt or os.getenv('LOG_FORMAT', 'json')).lower()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(TextFormatter() if fmt == 'text' else JSONFormatter())
+
+    root = logging.getLogger()
+    if _queue_handler is not None:
+        root.removeHandler(_queue_handler)
+    _stop_listener()
+
+    _queue_handler = AsyncQueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(ContextFilter())
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+    _start_listener()
+
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    return root
+
+
+def flush_logging():
+    """Drain queued records (restarts the listener); used at shutdown and in tests"""
+    if _listener_running:
+        _stop_listener()
+        _start_listener()
+
+
+atexit.register(_stop_listener)
+
+
+# Verbose payloads (raw model responses, prompts) are sampled and truncated even at DEBUG
+PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0.01'))
+PAYLOAD_MAX_CHARS = int(os.getenv('LOG_PAYLOAD_MAX_CHARS', '2000'))
+
+
+def log_payload(logger: logging.Logger, label: str, payload: str, sample_rate: float = None,
+                max_chars: int = None, **fields):
+    """
+    Log a large payload at DEBUG for a sample of calls
+
+    The level check comes first, so with DEBUG off this costs one method call and the payload
+    is never sliced or serialised.
+
+    Args:
+        logger: Logger to write to
+        label: Message text, e.g. 'domain router response'
+        payload: The verbose text
+        sample_rate: Fraction of calls logged, defaults to LOG_PAYLOAD_SAMPLE_RATE
+        max_chars: Truncation limit, defaults to LOG_PAYLOAD_MAX_CHARS
+        **fields: Extra structured fields
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    rate = PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1 and random.random() >= rate:
+        return
+    limit = PAYLOAD_MAX_CHARS if max_chars is None else max_chars
+    text = payload or ''
+    logger.debug(label, extra={
+        'payload': text[:limit],
+        'payload_chars': len(text),
+        'truncated': len(text) > limit,
+        **fields
+    })
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Test script for LLM admission control (concurrency, RPM/TPM budgets, priorities, load shedding)
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from admission import (AdmissionController, AdmissionRejected, BATCH, INTERACTIVE, ModelLimits, TokenBucket,
+                       llm_priority, parse_model_limits)
+from llm_gateway import LLMGateway
+
+
+def hold_slot(controller, model='pro'):
+    """Take the only slot and return its permit"""
+    return controller.acquire(model, priority=BATCH)
+
+
+def queue_in_background(controller, results, name, priority, model='pro', max_wait=5):
+    def run():
+        try:
+            with controller.acquire(model, priority=priority, max_wait=max_wait):
+                results.append(name)
+        except AdmissionRejected as e:
+            results.append(f"{name}:{e.reason}")
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for_queue(controller, depth, model='pro'):
+    for _ in range(200):
+        if controller.get_stats()['models'][model]['queued'] == depth:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"queue never reached {depth}")
+
+
+def test_buckets_and_config():
+    """Token buckets refill per minute; model limit specs merge"""
+    now = [0.0]
+    bucket = TokenBucket(60, clock=lambda: now[0])
+    bucket.take(60)
+    assert bucket.wait_time(1) == 1.0
+    now[0] = 0.5
+    assert bucket.wait_time(1) == 0.5
+    bucket.give(10)
+    assert bucket.wait_time(5) == 0.0
+    assert parse_model_limits('pro=4', 'pro=150,flash=1000', 'flash=1000000') == {
+        'pro': {'max_concurrency': 4.0, 'rpm': 150.0}, 'flash': {'rpm': 1000.0, 'tpm': 1000000.0}}
+    print("✅ Token buckets and limit specs work")
+
+
+def test_concurrency_limit():
+    """No more than max_concurrency calls hold a slot at once"""
+    controller = AdmissionController(default_limits=ModelLimits(max_concurrency=2))
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call(_):
+        with controller.acquire('pro', max_wait=5):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(call, range(8)))
+    assert peak[0] == 2
+    assert controller.get_stats()['models']['pro']['in_flight'] == 0
+    print("✅ Per-model concurrency is enforced")
+
+
+def test_interactive_first():
+    """Queued chat calls are admitted before earlier queued blueprint calls"""
+    controller = AdmissionController(default_limits=ModelLimits(max_concurrency=1))
+    permit = hold_slot(controller)
+    results = []
+    threads = [queue_in_background(controller, results, 'batch-1', BATCH)]
+    wait_for_queue(controller, 1)
+    threads.append(queue_in_background(controller, results, 'batch-2', BATCH))
+    wait_for_queue(controller, 2)
+    threads.append(queue_in_background(controller, results, 'chat', INTERACTIVE))
+    wait_for_queue(controller, 3)
+    permit.release()
+    for thread in threads:
+        thread.join(5)
+    assert results == ['chat', 'batch-1', 'batch-2']
+    print("✅ Interactive calls jump the queue")
+
+
+def test_load_shedding():
+    """A full queue rejects new batch work, lets chat displace queued batch work, and waits are bounded"""
+    controller = AdmissionController(default_limits=ModelLimits(max_concurrency=1), max_queue=1)
+    permit = hold_slot(controller)
+    results = []
+    batch = queue_in_background(controller, results, 'batch', BATCH)
+    wait_for_queue(controller, 1)
+
+    try:
+        controller.acquire('pro', priority=BATCH)
+        assert False, "full queue should shed batch work"
+    except AdmissionRejected as e:
+        assert e.reason == 'queue_full' and e.retry_after_seconds >= 1
+
+    chat = queue_in_background(controller, results, 'chat', INTERACTIVE)
+    batch.join(5)
+    assert results == ['batch:preempted']
+    permit.release()
+    chat.join(5)
+    assert results == ['batch:preempted', 'chat']
+
+    permit = hold_slot(controller)
+    started = time.perf_counter()
+    try:
+        controller.acquire('pro', priority=INTERACTIVE, max_wait=0.2)
+        assert False, "wait should be bounded"
+    except AdmissionRejected as e:
+        assert e.reason == 'timeout'
+    assert 0.2 <= time.perf_counter() - started < 1.0
+    assert controller.get_stats()['models']['pro']['queued'] == 0
+    permit.release()
+    print("✅ Excess load is shed predictably")
+
+
+def test_rate_budgets():
+    """RPM and TPM budgets hold calls back and report when capacity returns"""
+    controller = AdmissionController(limits={'flash': ModelLimits(rpm=2, tpm=1000)})
+    controller.acquire('flash', tokens=100).release()
+    controller.acquire('flash', tokens=100).release()
+    try:
+        controller.acquire('flash', tokens=100, max_wait=0.1)
+        assert False, "RPM budget should be exhausted"
+    except AdmissionRejected as e:
+        assert e.reason == 'timeout' and 20 <= e.retry_after <= 31
+
+    controller = AdmissionController(limits={'flash': ModelLimits(tpm=1000)})
+    with controller.acquire('flash', tokens=900) as permit:
+        permit.used_tokens = 100  # the actual usage refunds most of the reservation
+    controller.acquire('flash', tokens=900).release()
+    print("✅ RPM/TPM budgets are enforced and corrected by actual usage")
+
+
+def test_async_waiters():
+    """Async callers queue alongside threads; cancelled waiters leave the queue"""
+    controller = AdmissionController(default_limits=ModelLimits(max_concurrency=1))
+
+    async def run():
+        permit = await controller.aacquire('pro')
+        waiter = asyncio.ensure_future(controller.aacquire('pro'))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        assert controller.get_stats()['models']['pro']['queued'] == 0
+
+        second = asyncio.ensure_future(controller.aacquire('pro'))
+        await asyncio.sleep(0.05)
+        threading.Timer(0.05, permit.release).start()  # released from another thread
+        async with await second:
+            pass
+        return controller.get_stats()['models']['pro']['in_flight']
+
+    assert asyncio.run(run()) == 0
+    print("✅ Async waiters are admitted and cancelled cleanly")
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModels:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, model, contents, config=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return FakeResponse(contents)
+
+
+class FakeClient:
+    def __init__(self):
+        self.models = FakeModels()
+
+
+def test_gateway_and_http_status():
+    """Gateway calls go through admission; shed requests become 429 with Retry-After"""
+    client = FakeClient()
+    gateway = LLMGateway(client=client, admission=AdmissionController(default_limits=ModelLimits(max_concurrency=3)))
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        assert sorted(pool.map(lambda i: gateway.generate_text('flash', f"q{i}"), range(10))) == \
+            sorted(f"q{i}" for i in range(10))
+    assert client.models.peak == 3
+
+    assert llm_priority.get() == BATCH
+    import app
+
+    with app.app.test_request_context('/api/chat'):
+        app.bind_llm_priority()
+        assert llm_priority.get() == INTERACTIVE
+        response, status = app.handle_admission_rejected(AdmissionRejected('pro', 'queue_full', 2.2))
+        assert status == 429 and response.headers['Retry-After'] == '3'
+        assert response.get_json()['retryAfter'] == 3
+    llm_priority.set(BATCH)
+    print("✅ Gateway calls are admitted and shed requests return 429")
+
+
+def test_expert_agent_propagates_rejection():
+    """A shed expert call reaches the 429 handler instead of being logged as an agent crash"""
+    import app
+
+    def reject(**kwargs):
+        raise AdmissionRejected('pro', 'queue_full', 1.0)
+
+    logged = []
+    original = (app.APP_MODE, app.llm_gateway.generate, app.logger.exception)
+    app.APP_MODE = 'production'
+    app.llm_gateway.generate = reject
+    app.logger.exception = lambda *args, **kwargs: logged.append(args)
+    try:
+        app.call_dynamic_expert_agent({}, "figurine app", "trading")
+        assert False, "expected AdmissionRejected"
+    except AdmissionRejected as e:
+        assert e.reason == 'queue_full'
+    finally:
+        app.APP_MODE, app.llm_gateway.generate, app.logger.exception = original
+    assert logged == []
+    print("✅ Expert agent lets admission rejections propagate")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Admission Control")
+    print("=" * 50)
+
+    try:
+        test_buckets_and_config()
+        test_concurrency_limit()
+        test_interactive_first()
+        test_load_shedding()
+        test_rate_budgets()
+        test_async_waiters()
+        test_gateway_and_http_status()
+        test_expert_agent_propagates_rejection()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Admission control is working correctly.")
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test script for the ASGI app's native routes and its Flask fallback
+"""
+
+import sys
+import os
+import asyncio
+import json
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, Response
+from quart import Quart
+
+import app as wsgi_app
+import asgi_app
+from asgi_app import FlaskFallback
+from chat_sessions import ChatSessionStore
+from llm_gateway import LLMGateway
+from model_router import ModelRouter, RoutingRule
+
+
+def test_chat_sessions_are_native():
+    """Session stats and release act on the async session store, not the WSGI one"""
+    saved = asgi_app.async_chat_sessions
+    store = asgi_app.async_chat_sessions = ChatSessionStore(factory=lambda system_prompt, history: object(),
+                                                           lock_factory=asyncio.Lock)
+    store.get_or_create('conv-1', 'system prompt')
+
+    async def run():
+        client = asgi_app.app.test_client()
+        stats = await (await client.get('/api/chat/sessions')).get_json()
+        released = await (await client.delete('/api/chat/sessions/conv-1')).get_json()
+        return stats, released
+
+    try:
+        stats, released = asyncio.run(run())
+    finally:
+        asgi_app.async_chat_sessions = saved
+    assert stats['live_sessions'] == 1 and 'history' in stats
+    assert released == {'conversationId': 'conv-1', 'released': True}
+    assert store.get_stats()['live_sessions'] == 0
+    print("✅ ASGI chat session routes use the async session store")
+
+
+CARDS = [{'id': 'quality', 'title': 'Output quality'}]
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeAsyncModels:
+    """The fast model answers with prose; the pro model with valid cards"""
+
+    def __init__(self):
+        self.calls = []
+
+    def _text(self, model):
+        self.calls.append(model)
+        return json.dumps(CARDS) if model == 'pro' else "Sure! Here are some ideas: quality, speed."
+
+    async def generate_content(self, model, contents, config=None):
+        return FakeResponse(self._text(model))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        async def chunks():
+            yield FakeResponse(self._text(model))
+        return chunks()
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.models = None
+        self.aio = type('Aio', (), {'models': FakeAsyncModels()})()
+
+
+def test_async_expert_shares_escalation():
+    """The awaited expert agents run the same steps as the WSGI ones, escalating invalid output"""
+    client = FakeAsyncClient()
+    saved = asgi_app.APP_MODE, asgi_app.llm_gateway, wsgi_app.model_router
+    asgi_app.APP_MODE = 'production'
+    asgi_app.llm_gateway = LLMGateway(client=client)
+    wsgi_app.model_router = ModelRouter({'expert': 'pro'}, escalation={'expert': 'pro'},
+                                        rules=[RoutingRule(model='flash', stage='expert', max_input_tokens=1500)])
+
+    async def run():
+        cards = await asgi_app.call_dynamic_expert_agent_async({}, "Photo app", "edits photos")
+        streamed = [card async for card in asgi_app.stream_dynamic_expert_agent_async("Photo app", "crops photos")]
+        return cards, streamed
+
+    try:
+        cards, streamed = asyncio.run(run())
+    finally:
+        asgi_app.APP_MODE, asgi_app.llm_gateway, wsgi_app.model_router = saved
+    assert cards == CARDS and streamed == CARDS
+    assert client.aio.models.calls == ['flash', 'pro', 'flash', 'pro']
+    print("✅ Async expert agents escalate through the shared steps")
+
+
+def test_flask_fallback_streams():
+    """Paths without a Quart route are served by Flask, chunk by chunk"""
+    flask_app = Flask('fallback-test')
+
+    @flask_app.route('/slow')
+    def slow():
+        def generate():
+            for index in range(3):
+                yield f"chunk {index}\n"
+                time.sleep(0.1)
+        return Response(generate(), content_type='text/plain')
+
+    @flask_app.route('/echo', methods=['POST'])
+    def echo():
+        from flask import request
+        return request.get_data()
+
+    quart_app = Quart('native-test')
+
+    @quart_app.route('/native')
+    async def native():
+        return 'native'
+
+    quart_app.asgi_app = FlaskFallback(quart_app.asgi_app, flask_app, quart_app.url_map)
+
+    async def call(path, method='GET', body=b''):
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+        started = time.perf_counter()
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append((time.perf_counter() - started, message))
+
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+                 'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+                 'root_path': '', 'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 1),
+                 'server': ('localhost', 80), 'extensions': {}}
+        await quart_app(scope, receive, send)
+        return [(at, message) for at, message in sent if message.get('body')]
+
+    async def run():
+        return await call('/slow'), await call('/echo', 'POST', b'payload'), await call('/native')
+
+    slow_chunks, echoed, native_body = asyncio.run(run())
+    assert [message['body'] for _, message in slow_chunks] == [b'chunk 0\n', b'chunk 1\n', b'chunk 2\n']
+    assert slow_chunks[0][0] < 0.1 and slow_chunks[-1][0] >= 0.2  # the first chunk did not wait for the rest
+    assert echoed[0][1]['body'] == b'payload'
+    assert b''.join(message['body'] for _, message in native_body) == b'native'
+    print("✅ Flask fallback streams responses without buffering")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing ASGI App")
+    print("=" * 50)
+
+    try:
+        test_chat_sessions_are_native()
+        test_async_expert_shares_escalation()
+        test_flask_fallback_streams()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! ASGI routing is working correctly.")
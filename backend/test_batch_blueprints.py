@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test script for batch blueprint generation (bounded parallelism, dedupe, streamed results)
+"""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+import threading
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import batch_blueprints
+from batch_blueprints import BatchItem, BlueprintBatch, completed_keys, read_inputs, remaining_inputs
+from pipeline_executor import PipelineResult
+
+
+def fake_result(item: BatchItem) -> PipelineResult:
+    text = item.user_input or item.product_info
+    return PipelineResult(text, text, {'domain': 'test'}, [{'id': text}], {'total': 0.01}, bool(item.user_input))
+
+
+def test_parse_and_dedupe():
+    """Identical inputs run once and fan out to every item; invalid items are rejected"""
+    raw = ['Photo app', {'userInput': '  Photo   app '}, {'productInfo': 'Chat bot', 'idealFunctions': 'answers',
+                                                          'id': 'sku-1'}, 'Photo app']
+    batch = BlueprintBatch(raw)
+    assert len(batch.groups) == 2
+    calls = []
+    records = sorted(batch.run(lambda item: calls.append(item.index) or fake_result(item)),
+                     key=lambda record: record['index'])
+    assert sorted(calls) == [0, 2]
+    assert [record.get('duplicateOf') for record in records] == [None, 0, None, 0]
+    assert records[2]['id'] == 'sku-1' and records[2]['blueprintCards'] == [{'id': 'Chat bot'}]
+    assert batch.summary()['total'] == 4 and batch.summary()['unique'] == 2 and batch.summary()['succeeded'] == 4
+
+    for bad, limit in (([], 10), ([{'productInfo': 'only info'}], 10), ([42], 10), (['a', 'b'], 1)):
+        try:
+            BlueprintBatch(bad, max_items=limit)
+            assert False, f"{bad} should be rejected"
+        except ValueError:
+            pass
+    print("✅ Duplicate inputs run once and invalid batches are rejected")
+
+
+def test_bounded_parallelism_and_order():
+    """At most max_parallel items run at once and results arrive in completion order"""
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def run(item):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.2 if item.index == 0 else 0.02)
+        with lock:
+            active[0] -= 1
+        if item.index == 3:
+            raise RuntimeError("model unavailable")
+        return fake_result(item)
+
+    batch = BlueprintBatch([f"product {i}" for i in range(8)], max_parallel=3)
+    records = list(batch.run(run))
+    assert peak[0] == 3
+    assert records[-1]['index'] == 0  # the slow first item finishes last
+    failed = [record for record in records if record['status'] == 'error']
+    assert len(failed) == 1 and failed[0]['index'] == 3 and 'model unavailable' in failed[0]['error']
+    assert batch.summary()['failed'] == 1 and batch.summary()['succeeded'] == 7
+    print("✅ Parallelism is bounded, results stream as they complete and errors stay per item")
+
+
+def test_async_batch():
+    """The async variant bounds concurrent pipelines with a semaphore"""
+    active, peak = [0], [0]
+
+    async def arun(item):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        active[0] -= 1
+        return fake_result(item)
+
+    async def collect():
+        batch = BlueprintBatch([f"product {i}" for i in range(6)] + ['product 0'], max_parallel=2)
+        return [record async for record in batch.arun(arun)]
+
+    records = asyncio.run(collect())
+    assert peak[0] == 2 and len(records) == 7
+    assert all(record['status'] == 'success' for record in records)
+    print("✅ Async batches are bounded and deduplicated")
+
+
+def test_cli_inputs_and_resume():
+    """Inputs load from text and JSONL; --resume skips inputs that already succeeded"""
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = os.path.join(tmp, 'products.txt')
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write("Photo app\n\nChat bot\n")
+        assert read_inputs(text_path) == ['Photo app', 'Chat bot']
+
+        jsonl_path = os.path.join(tmp, 'products.jsonl')
+        with open(jsonl_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'userInput': 'Photo app', 'id': 'a'}) + '\n')
+        assert read_inputs(jsonl_path) == [{'userInput': 'Photo app', 'id': 'a'}]
+
+        output = os.path.join(tmp, 'results.jsonl')
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'key': BatchItem.parse(0, 'Photo app').key, 'status': 'success'}) + '\n')
+            f.write(json.dumps({'key': BatchItem.parse(1, 'Chat bot').key, 'status': 'error'}) + '\n')
+            f.write('{truncated\n')
+        assert completed_keys(output) == {BatchItem.parse(0, 'Photo app').key}
+        assert completed_keys(os.path.join(tmp, 'missing.jsonl')) == set()
+        assert remaining_inputs(['Photo app', 'Chat bot', 'Photo app', 'Map app'], completed_keys(output)) == \
+            [(1, 'Chat bot'), (3, 'Map app')]
+
+        # A resumed run keeps the input file's numbering in its records
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write("Photo app\nChat bot\nMap app\nChat bot\n")
+        saved = sys.argv, batch_blueprints.run_local
+        sys.argv = ['batch_blueprints.py', text_path, '-o', output, '--resume']
+        batch_blueprints.run_local = lambda raw_items, parallel, bypass_cache: BlueprintBatch(raw_items).run(fake_result)
+        try:
+            batch_blueprints.main()
+        finally:
+            sys.argv, batch_blueprints.run_local = saved
+        with open(output, encoding='utf-8') as f:
+            appended = [json.loads(line) for line in f.readlines()[3:]]
+        assert sorted((record['index'], record.get('duplicateOf')) for record in appended) == \
+            [(1, None), (2, None), (3, 1)]
+    print("✅ CLI inputs load and resume skips completed items")
+
+
+def test_batch_endpoint():
+    """The batch endpoint streams per-item SSE events or JSONL lines (demo mode)"""
+    import app
+
+    if app.APP_MODE != 'demo':
+        print("⏭️  Skipped (not in demo mode)")
+        return
+
+    scale, app.demo_latency.scale = app.demo_latency.scale, 0
+    try:
+        client = app.app.test_client()
+        items = ['AI photo editor', 'AI photo editor', {'productInfo': 'Support bot', 'idealFunctions': 'answers'}]
+
+        response = client.post('/api/generate-blueprint/batch', json={'items': items, 'maxParallel': 2})
+        assert response.content_type.startswith('text/event-stream')
+        events = [json.loads(line[len('data: '):]) for line in response.get_data(as_text=True).split('\n')
+                  if line.startswith('data: ')]
+        assert [event['type'] for event in events] == ['item', 'item', 'item', 'complete']
+        assert sorted(event['index'] for event in events[:3]) == [0, 1, 2]
+        assert all(event['status'] == 'success' and event['blueprintCards'] for event in events[:3])
+        assert events[-1]['unique'] == 2 and events[-1]['succeeded'] == 3
+
+        response = client.post('/api/generate-blueprint/batch', json={'items': items, 'format': 'jsonl'})
+        assert response.content_type == 'application/x-ndjson'
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert len(lines) == 4 and lines[-1]['type'] == 'complete'
+        assert all('type' not in line for line in lines[:3])
+
+        assert client.post('/api/generate-blueprint/batch', json={'items': []}).status_code == 400
+    finally:
+        app.demo_latency.scale = scale
+    print("✅ Batch endpoint streams per-item results")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Batch Blueprint Generation")
+    print("=" * 50)
+
+    try:
+        test_parse_and_dedupe()
+        test_bounded_parallelism_and_order()
+        test_async_batch()
+        test_cli_inputs_and_resume()
+        test_batch_endpoint()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Batch blueprint generation is working correctly.")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Test script for background blueprint jobs (async submission, persistence, idempotency)
+"""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+import threading
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from blueprint_jobs import BlueprintJobQueue, BlueprintJobStore, JobQueueFull
+from pipeline_executor import PipelineResult
+
+
+class GatedPipeline:
+    """Fake pipeline that blocks until released and fails for inputs containing 'broken'"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, item, bypass_cache):
+        self.calls.append(item.user_input)
+        self.release.wait(5)
+        if 'broken' in item.user_input:
+            raise RuntimeError("model unavailable")
+        return PipelineResult(item.user_input, item.user_input, {'domain': 'test'}, [{'id': 'quality'}],
+                              {'total': 0.01}, True)
+
+
+def wait_for_status(queue, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    job = queue.get(job_id)
+    while job['status'] != status and time.monotonic() < deadline:
+        job = queue.wait_for_update(job_id, job['version'], deadline - time.monotonic())
+    assert job['status'] == status, f"{job_id} is {job['status']}, expected {status}"
+    return job
+
+
+def test_submit_and_persist():
+    """Submit returns at once; the result is persisted and visible to another process's queue"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'jobs.db')
+        pipeline = GatedPipeline()
+        queue = BlueprintJobQueue(pipeline, BlueprintJobStore(db_path), max_workers=2)
+
+        started = time.perf_counter()
+        job, created = queue.submit('AI photo editor')
+        assert created and job['status'] == 'queued' and time.perf_counter() - started < 0.5
+        wait_for_status(queue, job['jobId'], 'running')
+
+        pipeline.release.set()
+        done = wait_for_status(queue, job['jobId'], 'succeeded')
+        assert done['result']['blueprintCards'] == [{'id': 'quality'}] and done['runMs'] is not None
+
+        other = BlueprintJobQueue(GatedPipeline(), BlueprintJobStore(db_path))
+        assert other.get(job['jobId'])['result'] == done['result']
+        reused, created = other.submit('  AI   photo editor ')
+        assert not created and reused['jobId'] == job['jobId']
+        assert other.get('job_missing') is None
+        queue.shutdown()
+        other.shutdown()
+    print("✅ Jobs return immediately and results persist across processes")
+
+
+def test_idempotent_resubmits():
+    """Live and succeeded jobs are reused; failed jobs and bypassCache start a new run"""
+    pipeline = GatedPipeline()
+    queue = BlueprintJobQueue(pipeline, BlueprintJobStore(''), max_workers=2)
+
+    first, _ = queue.submit({'userInput': 'Support bot'})
+    again, created = queue.submit('Support bot')
+    assert not created and again['jobId'] == first['jobId']
+    fresh, created = queue.submit('Support bot', bypass_cache=True)
+    assert created and fresh['jobId'] != first['jobId']
+    broken, _ = queue.submit('broken bot')
+
+    pipeline.release.set()
+    wait_for_status(queue, first['jobId'], 'succeeded')
+    failed = wait_for_status(queue, broken['jobId'], 'failed')
+    assert 'model unavailable' in failed['error'] and failed['result'] is None
+    retry, created = queue.submit('broken bot')
+    assert created and retry['jobId'] != broken['jobId']
+    wait_for_status(queue, retry['jobId'], 'failed')
+
+    stats = queue.get_stats()
+    assert stats['deduplicated'] == 1 and stats['submitted'] == 4
+    assert stats['stored']['succeeded'] == 2 and stats['stored']['failed'] == 2
+
+    for bad in ({}, {'productInfo': 'only info'}):
+        try:
+            queue.submit(bad)
+            assert False, f"{bad} should be rejected"
+        except ValueError:
+            pass
+    queue.shutdown()
+    print("✅ Resubmits are idempotent by input hash")
+
+
+def test_backpressure_and_stale_jobs():
+    """A full queue rejects with a retry hint; jobs orphaned by a restart are failed"""
+    pipeline = GatedPipeline()
+    queue = BlueprintJobQueue(pipeline, BlueprintJobStore(''), max_workers=1, max_pending=1)
+    queue.submit('product 1')
+    wait_for_status(queue, queue.list_jobs()[0]['jobId'], 'running')
+    queue.submit('product 2')
+    try:
+        queue.submit('product 3')
+        assert False, "full queue should reject"
+    except JobQueueFull as e:
+        assert e.retry_after_seconds >= 1
+    pipeline.release.set()
+    queue.shutdown()
+
+    store = BlueprintJobStore('')
+    store.create('job_orphan', 'key', {'userInput': 'x'}, time.time() - 3600)
+    BlueprintJobQueue(pipeline, store, stale_seconds=600).shutdown()
+    assert store.get('job_orphan')['status'] == 'failed'
+    print("✅ Job backlog is bounded and orphaned jobs are failed")
+
+
+def test_live_backlog_is_not_stale():
+    """Only jobs whose owner stopped heartbeating fail; a failed job is never flipped back to running"""
+    pipeline = GatedPipeline()
+    store = BlueprintJobStore('')
+    queue = BlueprintJobQueue(pipeline, store, max_workers=1, stale_seconds=0.3, heartbeat_interval=0.05)
+    first, _ = queue.submit('product 1')
+    waiting, _ = queue.submit('product 2')
+    time.sleep(0.6)  # older than stale_seconds, but its queue is alive
+
+    # Another process's maintenance pass on the shared store
+    BlueprintJobQueue(GatedPipeline(), store, stale_seconds=0.3).shutdown()
+    assert store.get(waiting['jobId'])['status'] == 'queued'
+    assert store.get(waiting['jobId'])['owner'] == queue.owner
+    pipeline.release.set()
+    wait_for_status(queue, waiting['jobId'], 'succeeded')
+    queue.shutdown()
+
+    orphan = store.create('job_claimed', 'key', {'userInput': 'x'}, time.time())
+    assert store.fail_stale(time.time() + 1, time.time(), 'gone') == 1
+    assert not store.claim(orphan['id'], time.time())
+    assert store.get(orphan['id'])['status'] == 'failed'
+    print("✅ Live queues keep their backlog; stale jobs stay failed")
+
+
+def test_async_wait():
+    """await_update returns on change or after the timeout"""
+    pipeline = GatedPipeline()
+    queue = BlueprintJobQueue(pipeline, BlueprintJobStore(''), poll_interval=0.02)
+    job, _ = queue.submit('Async product')
+
+    async def watch():
+        current = await queue.await_update(job['jobId'], job['version'], 2)
+        unchanged = await queue.await_update(job['jobId'], current['version'], 0.05)
+        return current, unchanged
+
+    current, unchanged = asyncio.run(watch())
+    assert current['status'] == 'running' and unchanged['version'] == current['version']
+    pipeline.release.set()
+    queue.shutdown()
+    print("✅ Async waiters see job updates")
+
+
+def test_job_endpoints():
+    """Submit returns 202 with a job id; status polls and the event stream deliver the result (demo mode)"""
+    import app
+
+    if app.APP_MODE != 'demo':
+        print("⏭️  Skipped (not in demo mode)")
+        return
+
+    saved, scale = app.blueprint_jobs, app.demo_latency.scale
+    app.blueprint_jobs = BlueprintJobQueue(saved.run_fn, BlueprintJobStore(''))
+    app.demo_latency.scale = 0
+    try:
+        client = app.app.test_client()
+        response = client.post('/api/jobs/blueprint', json={'userInput': 'AI photo editor'})
+        assert response.status_code == 202
+        job = response.get_json()
+        assert response.headers['Location'] == f"/api/jobs/{job['jobId']}" and not job['deduplicated']
+
+        events = [json.loads(line[len('data: '):]) for line in
+                  client.get(job['eventsUrl']).get_data(as_text=True).split('\n') if line.startswith('data: ')]
+        assert events[-1]['type'] == 'complete' and events[-1]['result']['blueprintCards']
+
+        polled = client.get(job['statusUrl']).get_json()
+        assert polled['status'] == 'succeeded' and polled['result'] == events[-1]['result']
+        resubmitted = client.post('/api/jobs/blueprint', json={'userInput': 'AI photo editor'})
+        assert resubmitted.status_code == 200 and resubmitted.get_json()['jobId'] == job['jobId']
+
+        listing = client.get('/api/jobs?status=succeeded').get_json()
+        assert [entry['jobId'] for entry in listing['jobs']] == [job['jobId']]
+        assert client.get('/api/jobs/job_missing').status_code == 404
+        assert client.post('/api/jobs/blueprint', json={}).status_code == 400
+    finally:
+        app.blueprint_jobs.shutdown()
+        app.blueprint_jobs, app.demo_latency.scale = saved, scale
+    print("✅ Job endpoints accept, report and stream blueprint jobs")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Blueprint Jobs")
+    print("=" * 50)
+
+    try:
+        test_submit_and_persist()
+        test_idempotent_resubmits()
+        test_backpressure_and_stale_jobs()
+        test_live_backlog_is_not_stale()
+        test_async_wait()
+        test_job_endpoints()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Blueprint jobs are working correctly.")
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Test script for the model call policy (timeouts, retries, circuit breaking, hedging)
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from google.genai import errors
+
+from call_policy import (CallPolicy, CallPolicyEngine, CircuitBreaker, CircuitOpenError, DeadlineExceededError,
+                         is_retryable, parse_stage_seconds)
+from admission import BATCH, INTERACTIVE, llm_priority
+from llm_gateway import LLMGateway
+
+
+def server_error(code=503):
+    return (errors.ClientError if code < 500 else errors.ServerError)(code, {'error': {'message': 'test'}})
+
+
+def flaky(failures, result='ok'):
+    """fn(timeout) that raises the given errors in turn, then returns result"""
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+def test_classification_and_config():
+    """Rate limits, 5xx and timeouts are retried; bad requests are not"""
+    assert is_retryable(server_error(429)) and is_retryable(server_error(503)) and is_retryable(TimeoutError())
+    assert is_retryable(ConnectionResetError())
+    assert not is_retryable(server_error(400)) and not is_retryable(ValueError("bad json"))
+    assert not is_retryable(CircuitOpenError('m', 1)) and not is_retryable(DeadlineExceededError())
+    assert parse_stage_seconds('extract=20, expert=90') == {'extract': 20.0, 'expert': 90.0}
+    print("✅ Retryable errors are classified correctly")
+
+
+def test_retries_with_backoff():
+    """Transient errors are retried with jittered, growing backoff up to max_attempts"""
+    sleeps = []
+    engine = CallPolicyEngine(default=CallPolicy(max_attempts=4, backoff_base_seconds=1, backoff_max_seconds=3),
+                              seed=1, sleep=sleeps.append)
+
+    fn, calls = flaky([server_error(429), server_error(503)])
+    assert engine.call('gemini-2.5-pro', fn) == 'ok'
+    assert len(calls) == 3 and len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+
+    fn, calls = flaky([server_error(400)])
+    try:
+        engine.call('gemini-2.5-pro', fn)
+        assert False, "non-retryable error should propagate"
+    except errors.ClientError:
+        pass
+    assert len(calls) == 1
+
+    fn, calls = flaky([server_error(503)] * 10)
+    try:
+        engine.call('gemini-2.5-pro', fn)
+        assert False, "exhausted retries should propagate"
+    except errors.ServerError:
+        pass
+    assert len(calls) == 4
+    print("✅ Transient errors are retried with backoff, others fail fast")
+
+
+def test_stage_deadlines():
+    """Attempt timeouts shrink to the remaining deadline, which bounds the whole call"""
+    engine = CallPolicyEngine(policies={'extract': CallPolicy(timeout_seconds=0.2, deadline_seconds=0.5,
+                                                              max_attempts=10, backoff_base_seconds=0.01)})
+
+    def stuck(timeout):
+        time.sleep(timeout)  # the HTTP layer gives up after the attempt timeout
+        raise TimeoutError("read timed out")
+
+    started = time.perf_counter()
+    try:
+        engine.call('flash', stuck, stage='extract')
+        assert False, "deadline should be exceeded"
+    except TimeoutError:
+        pass
+    assert time.perf_counter() - started < 0.8
+
+    async def hang(timeout):
+        await asyncio.sleep(30)  # ignores its timeout; wait_for enforces it
+
+    started = time.perf_counter()
+    try:
+        asyncio.run(engine.acall('flash-lite', hang, stage='extract'))
+        assert False, "deadline should be exceeded"
+    except TimeoutError:
+        pass
+    assert time.perf_counter() - started < 0.8
+    print("✅ Stage deadlines bound sync and async calls")
+
+
+def test_circuit_breaker():
+    """Consecutive failures open the circuit; one half-open probe decides whether it closes"""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=10, clock=lambda: now[0])
+    for _ in range(2):
+        breaker.acquire('pro')
+        breaker.release(False, 'pro')
+    assert breaker.state == CircuitBreaker.OPEN
+    try:
+        breaker.acquire('pro')
+        assert False, "open circuit should reject"
+    except CircuitOpenError as e:
+        assert 9 < e.retry_after <= 10
+
+    now[0] = 11
+    breaker.acquire('pro')  # the probe
+    try:
+        breaker.acquire('pro')
+        assert False, "only one probe at a time"
+    except CircuitOpenError:
+        pass
+    breaker.release(True, 'pro')
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    engine = CallPolicyEngine(default=CallPolicy(max_attempts=1), failure_threshold=3)
+    fn, calls = flaky([server_error(503)] * 3 + [server_error(400)] * 3)
+    for _ in range(3):
+        try:
+            engine.call('pro', fn)
+        except errors.ServerError:
+            pass
+    try:
+        engine.call('pro', fn)
+        assert False, "circuit should be open"
+    except CircuitOpenError:
+        pass
+    assert len(calls) == 3 and engine.get_stats()['circuits']['pro']['state'] == 'open'
+    engine.call('flash', lambda timeout: 'ok')  # other models are unaffected
+    print("✅ Circuit breaker opens, fails fast and recovers through a probe")
+
+
+def test_hedging():
+    """A slow request is hedged after the p95 delay; the first answer wins"""
+    policy = CallPolicy(hedge=True, hedge_min_delay_seconds=0.05, hedge_min_samples=5, timeout_seconds=5)
+    engine = CallPolicyEngine(default=policy)
+    for _ in range(5):
+        engine.call('pro', lambda timeout: 'warm')
+    assert engine.hedge_delay('pro', policy) == 0.05
+
+    calls = []
+    priorities = []
+    lock = threading.Lock()
+
+    def slow_then_fast(timeout):
+        with lock:
+            calls.append(timeout)
+            priorities.append(llm_priority.get())
+            first = len(calls) == 1
+        time.sleep(1.0 if first else 0.01)
+        return 'slow' if first else 'fast'
+
+    token = llm_priority.set(INTERACTIVE)
+    started = time.perf_counter()
+    try:
+        assert engine.call('pro', slow_then_fast) == 'fast'
+    finally:
+        llm_priority.reset(token)
+    assert time.perf_counter() - started < 0.5 and len(calls) == 2
+    # Both pool attempts keep the caller's priority rather than the BATCH default
+    assert priorities == [INTERACTIVE, INTERACTIVE] and llm_priority.get() == BATCH
+
+    calls.clear()
+    cancelled = []
+
+    async def aslow_then_fast(timeout):
+        first = not calls
+        calls.append(timeout)
+        try:
+            await asyncio.sleep(1.0 if first else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return 'slow' if first else 'fast'
+
+    async def run():
+        result = await engine.acall('pro', aslow_then_fast)
+        await asyncio.sleep(0)
+        return result
+
+    started = time.perf_counter()
+    assert asyncio.run(run()) == 'fast'
+    assert time.perf_counter() - started < 0.5 and cancelled == [True]
+    print("✅ Hedged requests cut the tail and the async loser is cancelled")
+
+
+def test_streams_retry_before_first_chunk():
+    """Streams are retried until the first chunk; later errors reach the consumer"""
+    engine = CallPolicyEngine(default=CallPolicy(backoff_base_seconds=0), sleep=lambda _: None)
+    opened = []
+
+    def open_stream(timeout):
+        opened.append(timeout)
+        if len(opened) == 1:
+            raise server_error(503)
+        yield 'a'
+        yield 'b'
+        if len(opened) == 2:
+            raise server_error(503)
+
+    chunks = []
+    try:
+        for chunk in engine.stream('flash', open_stream):
+            chunks.append(chunk)
+        assert False, "mid-stream error should propagate"
+    except errors.ServerError:
+        pass
+    assert chunks == ['a', 'b'] and len(opened) == 2
+
+    async def aopen_stream(timeout):
+        opened.append(timeout)
+        if len(opened) == 3:
+            raise server_error(429)
+
+        async def items():
+            yield 'x'
+            yield 'y'
+        return items()
+
+    async def collect():
+        return [chunk async for chunk in engine.astream('flash', aopen_stream)]
+
+    assert asyncio.run(collect()) == ['x', 'y'] and len(opened) == 4
+    print("✅ Streams retry before the first chunk only")
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModels:
+    def __init__(self):
+        self.configs = []
+
+    def generate_content(self, model, contents, config=None):
+        self.configs.append(config)
+        if len(self.configs) == 1:
+            raise server_error(503)
+        return FakeResponse(f"answer to {contents}")
+
+
+class FakeClient:
+    def __init__(self):
+        self.models = FakeModels()
+
+
+def test_gateway_applies_policy():
+    """The gateway retries through the policy and passes the attempt timeout to the client"""
+    client = FakeClient()
+    engine = CallPolicyEngine(policies={'router': CallPolicy(timeout_seconds=7, deadline_seconds=20)},
+                              sleep=lambda _: None)
+    gateway = LLMGateway(client=client, policy=engine)
+    assert gateway.generate_text('flash', 'q', stage='router') == 'answer to q'
+    assert len(client.models.configs) == 2
+    assert client.models.configs[-1] == {'http_options': {'timeout': 7000}}
+    print("✅ Gateway calls run under the stage policy")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Call Policy")
+    print("=" * 50)
+
+    try:
+        test_classification_and_config()
+        test_retries_with_backoff()
+        test_stage_deadlines()
+        test_circuit_breaker()
+        test_hedging()
+        test_streams_retry_before_first_chunk()
+        test_gateway_applies_policy()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! The call policy is working correctly.")
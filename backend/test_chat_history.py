@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test script for token-budget-aware chat history compaction
+"""
+
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from chat_history import ChatHistoryManager, estimate_tokens, extractive_summary, parse_token_budgets
+from chat_sessions import ChatSessionStore
+
+
+def make_history(turns, size=200):
+    history = []
+    for i in range(turns):
+        history.append({'role': 'user', 'content': f"question {i} " + 'q' * size})
+        history.append({'role': 'assistant', 'content': f"answer {i} " + 'a' * size})
+    return history
+
+
+class CountingSummarizer:
+    """Extractive summarizer that records which messages it was asked to fold in"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous, messages, max_tokens):
+        self.calls.append(len(messages))
+        return extractive_summary(previous, messages, max_tokens)
+
+
+def test_token_estimate():
+    """Latin text is ~4 chars per token, CJK ~1 char per token"""
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('a' * 400) == 100
+    assert estimate_tokens('能力维度' * 25) == 100
+    print("✅ Token estimates are in the expected range")
+
+
+def test_short_history_untouched():
+    """History within budget is returned as-is without a summary"""
+    manager = ChatHistoryManager(default_budget=4000)
+    history = make_history(3)
+    compacted = manager.compact(history, 'flash')
+    assert compacted.summary is None and compacted.messages == history
+    assert compacted.as_messages() == history
+    print("✅ Short history is left untouched")
+
+
+def test_compaction_respects_budget():
+    """Long history keeps recent turns verbatim and summarizes the rest within budget"""
+    manager = ChatHistoryManager(token_budgets={'pro': 1000}, default_budget=600, summary_tokens=150)
+    history = make_history(30)
+    compacted = manager.compact(history, 'flash', 'conv-1')
+    assert compacted.summary and compacted.compacted > 0
+    assert compacted.messages == history[compacted.compacted:]
+    assert compacted.tokens <= 600
+    assert manager.budget_for('pro') == 1000
+    assert len(manager.compact(history, 'pro').messages) > len(compacted.messages)
+
+    # A single pasted dump is clipped instead of blowing the budget
+    dump = [{'role': 'user', 'content': 'feedback ' * 5000}]
+    clipped = manager.compact(dump, 'flash')
+    assert clipped.tokens <= 600 and '…' in clipped.messages[0]['content']
+    print("✅ Compaction keeps prompts within the token budget")
+
+
+def test_summary_is_incremental():
+    """Only messages that newly fell out of the window are summarized on the next turn"""
+    summarizer = CountingSummarizer()
+    manager = ChatHistoryManager(default_budget=600, summary_tokens=150, summarizer=summarizer)
+    history = make_history(20)
+
+    first = manager.compact(history, 'flash', 'conv-1')
+    assert summarizer.calls == [first.compacted]
+
+    manager.compact(history, 'flash', 'conv-1')
+    assert len(summarizer.calls) == 1  # unchanged history reuses the cached summary
+
+    history += make_history(1)
+    second = manager.compact(history, 'flash', 'conv-1')
+    assert summarizer.calls[-1] == second.compacted - first.compacted
+
+    # An edited history no longer matches the cached summary and is rebuilt
+    history[0] = {'role': 'user', 'content': 'edited'}
+    third = manager.compact(history, 'flash', 'conv-1')
+    assert summarizer.calls[-1] == third.compacted
+    stats = manager.get_stats()
+    assert stats['incremental'] == 1 and stats['rebuilt'] == 2 and stats['reused'] == 1
+    print("✅ Rolling summaries are extended incrementally")
+
+
+def test_alternating_models_keep_their_summaries():
+    """Switching between models with different budgets reuses each budget's summary"""
+    summarizer = CountingSummarizer()
+    manager = ChatHistoryManager(token_budgets={'pro': 1200, 'flash': 600}, summary_tokens=150,
+                                 summarizer=summarizer)
+    history = make_history(20)
+
+    pro = manager.compact(history, 'pro', 'conv-1')
+    flash = manager.compact(history, 'flash', 'conv-1')
+    assert pro.compacted < flash.compacted
+    # flash extends pro's summary of the shorter prefix instead of starting over
+    assert summarizer.calls == [pro.compacted, flash.compacted - pro.compacted]
+
+    for _ in range(3):
+        assert manager.compact(history, 'pro', 'conv-1').summary == pro.summary
+        assert manager.compact(history, 'flash', 'conv-1').summary == flash.summary
+    assert len(summarizer.calls) == 2
+    stats = manager.get_stats()
+    assert stats['reused'] == 6 and stats['conversations'] == 1
+
+    manager.forget('conv-1')
+    manager.compact(history, 'flash', 'conv-1')
+    assert summarizer.calls[-1] == flash.compacted
+    print("✅ Alternating models don't thrash the summary cache")
+
+
+def test_summarizer_failure_falls_back():
+    """A failing summarizer (e.g. model error) falls back to the extractive summary"""
+    def failing(previous, messages, max_tokens):
+        raise RuntimeError("model unavailable")
+
+    manager = ChatHistoryManager(default_budget=600, summary_tokens=150, summarizer=failing)
+    compacted = manager.compact(make_history(20), 'flash', 'conv-1')
+    assert 'user: question' in compacted.summary
+    assert manager.get_stats()['summarizer_errors'] == 1
+    assert parse_token_budgets('gemini-2.5-pro=8000, flash=2000') == {'gemini-2.5-pro': 8000, 'flash': 2000}
+    print("✅ Summarizer failures fall back to extractive summaries")
+
+
+def test_session_seeded_lazily():
+    """Session stores only prepare (compact) history when a session is created"""
+    prepared = []
+
+    def seed():
+        prepared.append(True)
+        return [{'role': 'user', 'content': 'hi'}]
+
+    store = ChatSessionStore(factory=lambda system_prompt, history: history)
+    session, created = store.get_or_create('conv-1', 'prompt', seed)
+    assert created and session.chat == [{'role': 'user', 'parts': [{'text': 'hi'}]}]
+    store.get_or_create('conv-1', 'prompt', seed)
+    assert len(prepared) == 1
+    print("✅ Session history is only compacted when a session is created")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Chat History Compaction")
+    print("=" * 50)
+
+    try:
+        test_token_estimate()
+        test_short_history_untouched()
+        test_compaction_respects_budget()
+        test_summary_is_incremental()
+        test_alternating_models_keep_their_summaries()
+        test_summarizer_failure_falls_back()
+        test_session_seeded_lazily()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Chat history compaction is working correctly.")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent chat session store
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from chat_sessions import ChatSessionStore, history_to_contents
+
+
+class FakeChat:
+    def __init__(self, system_prompt, history):
+        self.system_prompt = system_prompt
+        self.history = list(history)
+        self.sent = []
+
+    def send_message_stream(self, message):
+        self.sent.append(message)
+        yield type("Chunk", (), {"text": f"reply to {message}"})()
+
+
+def make_store(**kwargs):
+    created = []
+
+    def factory(system_prompt, history):
+        chat = FakeChat(system_prompt, history)
+        created.append(chat)
+        return chat
+
+    return ChatSessionStore(factory=factory, **kwargs), created
+
+
+def test_history_conversion():
+    """Frontend history maps onto user/model content turns"""
+    contents = history_to_contents([
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": ""},
+    ])
+    assert contents == [
+        {"role": "user", "parts": [{"text": "hi"}]},
+        {"role": "model", "parts": [{"text": "hello"}]},
+    ]
+    print("✅ History converts to chat contents")
+
+
+def test_session_reuse():
+    """The same conversation reuses one live session; history is only used to seed it"""
+    store, created = make_store()
+    history = [{"role": "user", "content": "earlier question"}]
+
+    session, is_new = store.get_or_create("conv-1", "system", history)
+    assert is_new and len(created[0].history) == 1
+
+    again, is_new = store.get_or_create("conv-1", "system", history + [{"role": "user", "content": "x"}])
+    assert not is_new and again is session and len(created) == 1
+
+    _, is_new = store.get_or_create("conv-1", "different system prompt", history)
+    assert is_new and len(created) == 2
+    print("✅ Sessions are reused and rebuilt when the system prompt changes")
+
+
+def test_async_seed_only_on_creation():
+    """The async store awaits the history factory only when it creates a session"""
+    store, created = make_store(lock_factory=asyncio.Lock)
+    seeded = []
+
+    async def seed_history():
+        seeded.append(True)
+        return [{"role": "user", "content": "earlier question"}]
+
+    async def run():
+        first = await store.aget_or_create("conv-1", "system", seed_history)
+        second = await store.aget_or_create("conv-1", "system", seed_history)
+        return first, second
+
+    (session, is_new), (again, again_new) = asyncio.run(run())
+    assert is_new and not again_new and again is session
+    assert len(seeded) == 1 and len(created[0].history) == 1
+    print("✅ Async sessions compact history only when created")
+
+
+def test_lru_cap_and_idle_eviction():
+    """Sessions beyond the cap and idle sessions are reclaimed"""
+    store, _ = make_store(max_sessions=2, idle_ttl_seconds=0.05)
+    store.get_or_create("a", "s")
+    store.get_or_create("b", "s")
+    store.get_or_create("a", "s")  # "b" is now least recently used
+    store.get_or_create("c", "s")
+    stats = store.get_stats()
+    assert stats["live_sessions"] == 2 and stats["evicted_lru"] == 1
+    _, is_new = store.get_or_create("b", "s")
+    assert is_new
+
+    time.sleep(0.06)
+    assert store.evict_idle() == 2
+    assert store.get_stats()["live_sessions"] == 0
+    print("✅ LRU cap and idle eviction work")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Chat Session Store")
+    print("=" * 50)
+
+    try:
+        test_history_conversion()
+        test_session_reuse()
+        test_async_seed_only_on_creation()
+        test_lru_cap_and_idle_eviction()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Chat session store is working correctly.")
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test script for provider-side context caching of prompt prefixes
+"""
+
+import sys
+import os
+import asyncio
+import itertools
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from context_cache import ContextCacheManager
+from llm_gateway import LLMGateway
+from prompt_manager import prompt_manager
+
+PREFIX = "# ROLE: static instructions\n" * 200
+
+
+class FakeCached:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeCaches:
+    """Records caches.create/update/delete calls like the Gemini client's caches surface"""
+
+    def __init__(self, fail_create=False):
+        self.fail_create = fail_create
+        self.live = {}
+        self.calls = []
+        self._ids = itertools.count(1)
+
+    def create(self, model, config):
+        self.calls.append(('create', model))
+        if self.fail_create:
+            raise RuntimeError(self.fail_create if isinstance(self.fail_create, str) else "Cached content is too small")
+        name = f"cachedContents/{next(self._ids)}"
+        self.live[name] = config['contents'][0]['parts'][0]['text']
+        return FakeCached(name)
+
+    def update(self, name, config):
+        self.calls.append(('update', name))
+        if name not in self.live:
+            raise RuntimeError("not found")
+
+    def delete(self, name):
+        self.calls.append(('delete', name))
+        self.live.pop(name, None)
+
+
+class FakeAsyncCaches:
+    def __init__(self, caches):
+        self.caches = caches
+
+    async def create(self, model, config):
+        return self.caches.create(model, config)
+
+    async def update(self, name, config):
+        return self.caches.update(name, config)
+
+    async def delete(self, name):
+        return self.caches.delete(name)
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+class FakeModels:
+    def __init__(self, caches):
+        self.caches = caches
+        self.requests = []
+
+    def generate_content(self, model, contents, config=None):
+        self.requests.append((contents, config))
+        if config:
+            name = config['cached_content']
+            if name not in self.caches.live:
+                raise RuntimeError("CachedContent not found")
+            return FakeResponse(f"cached[{len(self.caches.live[name])}] + {contents}")
+        return FakeResponse(f"full: {contents}")
+
+
+class FakeAsyncModels:
+    def __init__(self, models):
+        self.models = models
+
+    async def generate_content(self, model, contents, config=None):
+        return self.models.generate_content(model, contents, config)
+
+
+class FakeAio:
+    def __init__(self, client):
+        self.caches = FakeAsyncCaches(client.caches)
+        self.models = FakeAsyncModels(client.models)
+
+
+class FakeClient:
+    def __init__(self, fail_create=False):
+        self.caches = FakeCaches(fail_create)
+        self.models = FakeModels(self.caches)
+        self.aio = FakeAio(self)
+
+
+def test_prefix_created_once_and_reused():
+    """The first call registers the prefix; later calls only send the suffix"""
+    client = FakeClient()
+    gateway = LLMGateway(client=client, context_cache=ContextCacheManager(client=client))
+
+    first = gateway.generate("gemini-2.5-pro", "request one", prefix=PREFIX, prefix_label='tpl')
+    second = gateway.generate("gemini-2.5-pro", "request two", prefix=PREFIX, prefix_label='tpl')
+
+    assert first.text == f"cached[{len(PREFIX)}] + request one"
+    assert second.text.endswith("request two")
+    assert [call[0] for call in client.caches.calls] == ['create']
+    assert all(contents.startswith('request') for contents, _ in client.models.requests)
+    stats = gateway.context_cache.get_stats()
+    assert stats['created'] == 1 and stats['hits'] == 1 and stats['entries'] == 1
+    print("✅ Prefix is registered once and only suffixes are sent")
+
+
+def test_ttl_refresh_and_template_change():
+    """A cache close to expiry gets its TTL extended; a changed prefix replaces the old cache"""
+    client = FakeClient()
+    manager = ContextCacheManager(client=client, ttl_seconds=60, refresh_margin_seconds=30)
+
+    name = manager.get("gemini-2.5-pro", PREFIX, label='tpl')
+    manager._entries[next(iter(manager._entries))].expires_at -= 40  # 20s left
+    assert manager.get("gemini-2.5-pro", PREFIX, label='tpl') == name
+    assert client.caches.calls[-1] == ('update', name)
+
+    changed = manager.get("gemini-2.5-pro", PREFIX + "new rule\n", label='tpl')
+    assert changed != name
+    assert client.caches.calls[-1] == ('delete', name)
+    assert list(client.caches.live) == [changed]
+    assert manager.get_stats()['refreshed'] == 1
+    print("✅ TTL is refreshed and template changes roll the cache over")
+
+
+def test_fallback_when_unavailable():
+    """Failed registration sends the full prompt and is not retried during the backoff"""
+    client = FakeClient(fail_create=True)
+    gateway = LLMGateway(client=client, context_cache=ContextCacheManager(client=client))
+
+    for suffix in ("a", "b", "c"):
+        result = gateway.generate("gemini-2.5-pro", suffix, prefix=PREFIX)
+        assert result.text == f"full: {PREFIX}{suffix}"
+    assert client.caches.calls == [('create', 'gemini-2.5-pro')]
+    assert gateway.context_cache.get_stats()['fallbacks'] == 3
+
+    # Prefixes below the minimum size are never registered
+    small = ContextCacheManager(client=FakeClient(), min_chars=10000)
+    assert small.get("gemini-2.5-pro", PREFIX) is None
+    print("✅ Unavailable caching falls back to the full prompt")
+
+
+def test_size_rejection_is_not_retried():
+    """A prefix rejected as too small stays uncached; other failures are retried after the backoff"""
+    for error, retried in (("Cached content is too small. min_total_token_count=4096", False),
+                           ("429 RESOURCE_EXHAUSTED", True)):
+        client = FakeClient(fail_create=error)
+        manager = ContextCacheManager(client=client, failure_backoff_seconds=0)
+        assert manager.get("gemini-2.5-pro", PREFIX) is None
+        assert manager.get("gemini-2.5-pro", PREFIX) is None
+        assert len(client.caches.calls) == (2 if retried else 1), error
+        assert manager.get_stats()['too_small'] == (0 if retried else 1)
+    print("✅ Size rejections are permanent, other failures back off")
+
+
+def test_rejected_cache_is_invalidated():
+    """A cache deleted on the provider side is dropped and the call retried in full"""
+    client = FakeClient()
+    gateway = LLMGateway(client=client, context_cache=ContextCacheManager(client=client))
+    gateway.generate("gemini-2.5-pro", "one", prefix=PREFIX)
+    client.caches.live.clear()
+
+    result = gateway.generate("gemini-2.5-pro", "two", prefix=PREFIX)
+    assert result.text == f"full: {PREFIX}two"
+    assert gateway.context_cache.get_stats()['invalidated'] == 1
+    # The next call registers a fresh cache
+    assert gateway.generate("gemini-2.5-pro", "three", prefix=PREFIX).text.startswith("cached[")
+    print("✅ Rejected caches are invalidated and recreated")
+
+
+def test_async_path_and_prompt_split():
+    """The aio surface shares the bookkeeping; template prefix + suffix equals the full prompt"""
+    client = FakeClient()
+    gateway = LLMGateway(client=client, context_cache=ContextCacheManager(client=client))
+
+    async def burst():
+        return await asyncio.gather(*[
+            gateway.agenerate("gemini-2.5-pro", f"q{i}", prefix=PREFIX) for i in range(5)
+        ])
+
+    results = asyncio.run(burst())
+    assert all(result.text.startswith("cached[") for result in results)
+    assert [call[0] for call in client.caches.calls] == ['create']
+
+    prefix, suffix = prompt_manager.format_capability_dimensions_prompt_parts("P {x}", "I")
+    template = prompt_manager.load_prompt("capability_dimensions_prompt")
+    assert prefix + suffix == template.format(product_info="P {x}", ideal_functions="I")
+    assert "{product_info}" not in prefix and "P {x}" in suffix
+    print("✅ Async path and template splitting work")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Context Cache")
+    print("=" * 50)
+
+    try:
+        test_prefix_created_once_and_reused()
+        test_ttl_refresh_and_template_change()
+        test_fallback_when_unavailable()
+        test_size_rejection_is_not_retried()
+        test_rejected_cache_is_invalidated()
+        test_async_path_and_prompt_split()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Context caching is working correctly.")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for simulated demo-mode latency
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from demo_latency import DemoLatency, LatencyModel
+
+
+def test_distributions():
+    """Specs parse into distributions that stay non-negative and within the cap"""
+    latency = DemoLatency({
+        'chat': '0.25',
+        'extract': 'normal:0.1,0.5',
+        'router': 'lognormal:0.2,0.8',
+        'expert': 'pareto:0.5,1.2',
+    }, max_seconds=5, seed=7)
+
+    assert latency.sample('chat') == 0.25
+    for operation in ('extract', 'router', 'expert'):
+        samples = [latency.sample(operation) for _ in range(2000)]
+        assert all(0 <= sample <= 5 for sample in samples)
+    experts = sorted(latency.sample('expert') for _ in range(2000))
+    assert experts[0] >= 0.5 and experts[-1] > 4 * experts[len(experts) // 2]  # heavy tail
+
+    for bad in ('gamma:1', 'normal:1', 'fixed:-1', 'pareto:1,0', 'fixed:abc'):
+        try:
+            LatencyModel.parse(bad)
+            assert False, f"{bad} should be rejected"
+        except ValueError:
+            pass
+    print("✅ Fixed, normal, lognormal and pareto latencies are sampled within bounds")
+
+
+def test_seed_and_scale():
+    """A seed makes delay sequences reproducible; scale 0 disables latency"""
+    first = DemoLatency({'expert': 'lognormal:1,0.5'}, seed=42)
+    second = DemoLatency({'expert': 'lognormal:1,0.5'}, seed=42)
+    assert [first.sample('expert') for _ in range(5)] == [second.sample('expert') for _ in range(5)]
+
+    off = DemoLatency({'expert': 'fixed:10'}, scale=0)
+    started = time.perf_counter()
+    assert off.sleep('expert') == 0.0
+    assert time.perf_counter() - started < 0.1
+    assert DemoLatency(scale=0.5).sample('expert') == 0.5
+    print("✅ Seeded sequences repeat and scale adjusts every delay")
+
+
+def test_async_waits_overlap():
+    """Simulated calls wait on timers, so many concurrent calls take about one delay"""
+    latency = DemoLatency({'expert': 'fixed:0.2'})
+
+    async def burst():
+        return await asyncio.gather(*[latency.asleep('expert') for _ in range(200)])
+
+    started = time.perf_counter()
+    asyncio.run(burst())
+    assert time.perf_counter() - started < 1.0
+    print("✅ 200 concurrent simulated calls finish in about one delay")
+
+
+def test_stream_chunk_timing():
+    """Streams wait the first-chunk delay once, then the chunk gap between items"""
+    latency = DemoLatency({'stream_first': 'fixed:0.15', 'stream_chunk': 'fixed:0.05'})
+
+    async def collect():
+        arrivals = []
+        started = time.perf_counter()
+        async for item in latency.astream(['a', 'b', 'c']):
+            arrivals.append((item, time.perf_counter() - started))
+        return arrivals
+
+    arrivals = asyncio.run(collect())
+    assert [item for item, _ in arrivals] == ['a', 'b', 'c']
+    assert 0.15 <= arrivals[0][1] < 0.3
+    assert 0.25 <= arrivals[2][1] < 0.5
+    assert list(DemoLatency(scale=0).stream(['x', 'y'])) == ['x', 'y']
+    print("✅ Streamed chunks follow the simulated first-chunk and inter-chunk timing")
+
+
+def test_demo_pipelines_wait_honestly():
+    """Flask demo stages sleep on their own threads; ASGI demo pipelines overlap on one event loop"""
+    import app
+    import asgi_app
+
+    if app.APP_MODE != 'demo':
+        print("⏭️  Skipped (not in demo mode)")
+        return
+
+    original = app.demo_latency.models
+    app.demo_latency.models = dict(original, expert=LatencyModel.parse('fixed:0.3'),
+                                   router=LatencyModel.parse('fixed:0.2'))
+    try:
+        result = app.run_blueprint_pipeline(user_input="product")
+        assert result.blueprint_cards and result.domain_context
+        assert result.timings['dynamic_expert'] >= 0.3  # slept on a pipeline thread
+
+        async def burst():
+            return await asyncio.gather(*[asgi_app.async_blueprint_pipeline.arun(user_input=f"product {i}")
+                                          for i in range(40)])
+
+        started = time.perf_counter()
+        results = asyncio.run(burst())
+        elapsed = time.perf_counter() - started
+    finally:
+        app.demo_latency.models = original
+
+    assert all(result.blueprint_cards and result.domain_context for result in results)
+    assert elapsed < 2.0, f"40 ASGI demo pipelines took {elapsed:.2f}s"
+    print(f"✅ Flask demo stages block honestly; 40 ASGI demo pipelines finished in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Demo Latency Simulation")
+    print("=" * 50)
+
+    try:
+        test_distributions()
+        test_seed_and_scale()
+        test_async_waits_overlap()
+        test_stream_chunk_timing()
+        test_demo_pipelines_wait_honestly()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Demo latency simulation is working correctly.")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for the live execution event feed
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from execution_events import ExecutionEventFeed
+from execution_store import SQLiteExecutionStore
+from workflow_dashboard import WorkflowMonitor
+import workflow_dashboard
+
+
+def test_feed_resume_and_gap():
+    """Clients resume after their last id; falling behind the buffer asks for a reset"""
+    feed = ExecutionEventFeed(replay_size=3)
+    for index in range(5):
+        feed.publish('step', {'index': index})
+
+    assert [event[0] for event in feed.wait(3, timeout=0)] == [4, 5]
+    assert feed.wait(5, timeout=0) == []
+    assert feed.wait(1, timeout=0) is None  # event 2 already dropped from the buffer
+    print("✅ Feed resumes from the last event id and detects gaps")
+
+
+def test_feed_wakes_waiters():
+    """Subscribers blocked in wait() receive new events immediately"""
+    feed = ExecutionEventFeed()
+    received = []
+
+    def subscriber():
+        received.extend(feed.wait(0, timeout=2))
+
+    threads = [threading.Thread(target=subscriber) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    feed.publish('start', {'id': 'exec_1'})
+    for thread in threads:
+        thread.join()
+
+    assert time.perf_counter() - started < 0.5
+    assert [event[1] for event in received] == ['start'] * 3
+    print("✅ Waiting subscribers are woken by publish")
+
+
+def test_monitor_emits_lifecycle_deltas():
+    """The monitor publishes start/step/complete/fail deltas without step payloads"""
+    monitor = WorkflowMonitor()
+    monitor.start_execution('exec_ok', {'product_info': 'x'})
+    monitor.add_step('Call AI Model', {'prompt': 'y' * 1000})
+    monitor.complete_execution({'done': True})
+    monitor.start_execution('exec_bad', {})
+    monitor.complete_execution(None, 'boom')
+
+    events = monitor.events.wait(0, timeout=0)
+    assert [(event[1], event[2]['id']) for event in events] == [
+        ('start', 'exec_ok'), ('step', 'exec_ok'), ('complete', 'exec_ok'), ('start', 'exec_bad'), ('fail', 'exec_bad')
+    ]
+    assert events[1][2] == {'id': 'exec_ok', 'step_count': 1, 'last_step': 'Call AI Model',
+                            'timestamp': events[1][2]['timestamp']}
+    assert events[4][2]['error'] == 'boom'
+    print("✅ Monitor emits lifecycle deltas")
+
+
+def test_feed_tails_shared_store():
+    """A feed on another monitor sharing the store sees events with global ids"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'executions.db')
+        app_monitor = WorkflowMonitor(store=SQLiteExecutionStore(db_path))
+        dashboard_store = SQLiteExecutionStore(db_path)
+        dashboard_monitor = WorkflowMonitor(store=dashboard_store)
+        dashboard_monitor.events.poll_interval = 0.02
+
+        head = dashboard_monitor.events.last_id
+        app_monitor.start_execution('exec_remote', {})
+        app_monitor.add_step('Load Prompt Template', {})
+        app_monitor.complete_execution({'ok': True})
+
+        events = []
+        deadline = time.time() + 3
+        while len(events) < 3 and time.time() < deadline:
+            events += dashboard_monitor.events.wait(events[-1][0] if events else head, timeout=0.5) or []
+
+        assert [event[1] for event in events] == ['start', 'step', 'complete']
+        assert [event[0] for event in events] == [head + 1, head + 2, head + 3]
+        dashboard_monitor.events.close()
+        app_monitor.store.close()
+        dashboard_store.close()
+    print("✅ Feed tails events recorded by another process's monitor")
+
+
+def test_sse_endpoint():
+    """/api/events sends a hello, then deltas, and resumes from Last-Event-ID"""
+    original = workflow_dashboard.workflow_monitor
+    workflow_dashboard.workflow_monitor = WorkflowMonitor()
+    try:
+        client = workflow_dashboard.app.test_client()
+        response = client.get('/api/events', buffered=False)
+        chunks = iter(response.response)
+        assert next(chunks).decode().startswith('id: 0\nevent: hello')
+
+        workflow_dashboard.workflow_monitor.start_execution('exec_live', {})
+        message = next(chunks).decode()
+        assert message.startswith('id: 1\nevent: start\n')
+        assert json.loads(message.split('data: ', 1)[1])['id'] == 'exec_live'
+        response.close()
+
+        workflow_dashboard.workflow_monitor.complete_execution({})
+        resumed = client.get('/api/events', headers={'Last-Event-ID': '1'}, buffered=False)
+        assert next(iter(resumed.response)).decode().startswith('id: 2\nevent: complete\n')
+        resumed.close()
+
+        assert client.get('/api/events?lastEventId=abc').status_code == 400
+    finally:
+        workflow_dashboard.workflow_monitor = original
+    print("✅ SSE endpoint streams and resumes")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Execution Event Feed")
+    print("=" * 50)
+
+    try:
+        test_feed_resume_and_gap()
+        test_feed_wakes_waiters()
+        test_monitor_emits_lifecycle_deltas()
+        test_feed_tails_shared_store()
+        test_sse_endpoint()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Execution event feed is working correctly.")
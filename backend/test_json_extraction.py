@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental JSON extraction from streamed model output
+"""
+
+import sys
+import os
+import json
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from json_extraction import (JSONArrayStreamParser, JSONExtractionError, JSONSchemaError, JSONValueScanner,
+                             extract_json)
+
+CARDS = [
+    {"id": "identity-preservation", "title": "Identity {Preservation}", "examples": {"good": "a \"quoted\" [x]", "bad": "b"}},
+    {"id": "artistic-appeal", "title": "Artistic Appeal", "keyTechnicalFactors": [{"name": "Style"}, {"name": "Color"}]},
+    {"id": "technical-quality", "title": "Technical Quality \\ backslash"},
+]
+
+RESPONSE = "Sure [see below]:\n```json\n" + json.dumps(CARDS, indent=2) + "\n```\nLet me know [if] you need more."
+
+
+def _feed_in_chunks(text, size):
+    parser = JSONArrayStreamParser()
+    emitted = []
+    for start in range(0, len(text), size):
+        emitted.extend(parser.feed(text[start:start + size]))
+    return parser, emitted
+
+
+def test_stream_parser_emits_each_object():
+    """Objects come out one by one regardless of chunk boundaries"""
+    for size in (1, 3, 7, 64, len(RESPONSE)):
+        parser, emitted = _feed_in_chunks(RESPONSE, size)
+        assert emitted == CARDS, f"chunk size {size}"
+        assert parser.finished
+    print("✅ Stream parser emits every card for all chunk sizes")
+
+
+def test_stream_parser_emits_before_array_closes():
+    """The first card is available as soon as its closing brace arrives"""
+    parser = JSONArrayStreamParser()
+    first_end = RESPONSE.index('"bad": "b"') + len('"bad": "b"\n    }\n  }')
+    emitted = parser.feed(RESPONSE[:first_end])
+    assert emitted == CARDS[:1]
+    assert not parser.finished
+    print("✅ First card emitted before the rest of the response")
+
+
+def test_stream_parser_ignores_trailing_prose():
+    """Text after the array is ignored"""
+    parser = JSONArrayStreamParser()
+    parser.feed('[{"id": "a"}] and then [{"id": "b"}]')
+    assert parser.finished
+    assert parser.feed('[{"id": "c"}]') == []
+    print("✅ Trailing prose after the array is ignored")
+
+
+def test_stream_parser_skips_malformed_elements():
+    """A malformed element is skipped and recorded; later elements still stream"""
+    parser, emitted = _feed_in_chunks('[{"id": "a"}, {"id": "b",}, {"id": "c"}]', 4)
+    assert emitted == [{'id': 'a'}, {'id': 'c'}]
+    assert parser.skipped == [1] and parser.elements == 3 and parser.finished
+    print("✅ Malformed stream elements are skipped, not fatal")
+
+
+def test_skipped_cards_recovered_from_full_text():
+    """Skipped positions are filled from the whole response when it parses"""
+    from app import recover_skipped_cards
+
+    parser = JSONArrayStreamParser()
+    parser.feed('[{"id": "a"}, {"id": "b",}]')
+    assert recover_skipped_cards(parser, '[{"id": "a"}, {"id": "b",}]') == []
+
+    parser.skipped, parser.elements = [1], 2
+    full_text = '[{"id": "a", "title": "A"}, {"id": "b", "title": "B"}]'
+    assert recover_skipped_cards(parser, full_text) == [{'id': 'b', 'title': 'B'}]
+    assert recover_skipped_cards(JSONArrayStreamParser(), 'anything') == []
+    print("✅ Skipped cards are recovered from the full response when possible")
+
+
+def test_extract_json_pure_and_fenced():
+    """Pure JSON takes the fast path; fenced blocks are unwrapped"""
+    assert extract_json(json.dumps(CARDS), expect='array') == CARDS
+    assert extract_json(RESPONSE, expect='array') == CARDS
+    assert extract_json('```\n{"a": 1}\n```', expect='object') == {"a": 1}
+    print("✅ Pure JSON and fenced blocks extracted")
+
+
+def test_extract_json_ignores_prose_brackets():
+    """Brackets in surrounding prose don't break extraction (the greedy regex did)"""
+    text = 'Result [draft]:\n[{"id": "x", "title": "a ] b"}]\nNote: see [1] and {ref}.'
+    assert extract_json(text, expect='array') == [{"id": "x", "title": "a ] b"}]
+    assert extract_json('Here is one { unclosed:\n{"a": "\\"}"}', expect='object') == {"a": '"}'}
+    print("✅ Prose brackets around the payload are ignored")
+
+
+def test_extract_json_expect_and_missing():
+    """expect selects the value kind; no match raises JSONExtractionError"""
+    text = '{"meta": true} then [1, 2]'
+    assert extract_json(text, expect='array') == [1, 2]
+    assert extract_json(text) == {"meta": True}
+    try:
+        extract_json('no json here', expect='object')
+        assert False, "expected JSONExtractionError"
+    except JSONExtractionError:
+        pass
+    print("✅ Expected kind honoured, missing JSON raises")
+
+
+def test_extract_json_schema_validation():
+    """Schema mismatches raise JSONSchemaError naming the path"""
+    schema = {'type': 'array', 'items': {'type': 'object', 'required': ['id', 'title']}}
+    assert extract_json(RESPONSE, expect='array', schema=schema) == CARDS
+    try:
+        extract_json('[{"id": "x"}]', expect='array', schema=schema)
+        assert False, "expected JSONSchemaError"
+    except JSONSchemaError as e:
+        assert "$[0]" in str(e) and "title" in str(e)
+    print("✅ Schema validation reports the offending path")
+
+
+def test_value_scanner_streams_values():
+    """The incremental scanner emits each top-level value once it closes, across chunk boundaries"""
+    text = 'a [note] {"a": "}"} then [1, [2]] and { unclosed {"b": 2}'
+    for size in (1, 5, len(text)):
+        scanner = JSONValueScanner()
+        emitted = []
+        for start in range(0, len(text), size):
+            emitted.extend(scanner.feed(text[start:start + size]))
+        assert emitted == [{"a": "}"}, [1, [2]]], f"chunk size {size}"
+        assert scanner.pending().startswith('{ unclosed')
+        assert scanner.finish() == [{"b": 2}]
+    print("✅ Value scanner streams complete values and recovers from unclosed prose")
+
+
+def test_extract_json_deep_nesting():
+    """Deeply nested or unclosed input raises JSONExtractionError, never RecursionError"""
+    for text in ('["[", ' * 2000, '[' * 5000 + ']' * 5000, 'x ' + '[' * 5000 + ']' * 5000 + ' y'):
+        try:
+            extract_json(text, expect='array')
+            assert False, "expected JSONExtractionError"
+        except JSONExtractionError:
+            pass
+    print("✅ Deep nesting is reported as an extraction error")
+
+
+def test_extract_json_linear_on_bracket_prose():
+    """Prose full of brackets is scanned once, not re-decoded from every opener"""
+    cases = [
+        ('see [1, ' * 20000 + '{"a": 1}', {"a": 1}),
+        ('[x] {y} ' * 20000 + '{"a": 1}', {"a": 1}),
+        ('{"skip": [' + '[1], ' * 20000 + '[]]} {"a": 1}', {"skip": [[1]] * 20000 + [[]]}),
+    ]
+    for text, expected in cases:
+        started = time.perf_counter()
+        assert extract_json(text, expect='object') == expected
+        assert time.perf_counter() - started < 1.0
+    print("✅ Bracket-heavy prose is extracted in linear time")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing JSON Extraction")
+    print("=" * 50)
+
+    try:
+        test_stream_parser_emits_each_object()
+        test_stream_parser_emits_before_array_closes()
+        test_stream_parser_ignores_trailing_prose()
+        test_stream_parser_skips_malformed_elements()
+        test_skipped_cards_recovered_from_full_text()
+        test_extract_json_pure_and_fenced()
+        test_extract_json_ignores_prose_brackets()
+        test_extract_json_expect_and_missing()
+        test_extract_json_schema_validation()
+        test_value_scanner_streams_values()
+        test_extract_json_deep_nesting()
+        test_extract_json_linear_on_bracket_prose()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! JSON extraction is working correctly.")
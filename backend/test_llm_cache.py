@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test script for the LLM response cache and gateway
+"""
+
+import sys
+import asyncio
+import threading
+import os
+import tempfile
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from llm_cache import LLMResponseCache, MemoryCacheTier, SQLiteCacheTier, make_cache_key
+from llm_gateway import LLMGateway
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModels:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, model, contents):
+        self.calls += 1
+        return FakeResponse(f"{model} says: {contents[::-1]}")
+
+
+class FakeClient:
+    def __init__(self):
+        self.models = FakeModels()
+
+
+def test_cache_key():
+    """Keys depend on both model and prompt"""
+    assert make_cache_key("gemini-2.5-pro", "hello") == make_cache_key("gemini-2.5-pro", "hello")
+    assert make_cache_key("gemini-2.5-pro", "hello") != make_cache_key("gemini-2.0-flash-exp", "hello")
+    assert make_cache_key("gemini-2.5-pro", "hello") != make_cache_key("gemini-2.5-pro", "hello ")
+    print("✅ Cache keys are content addressed")
+
+
+def test_memory_tier_lru_and_ttl():
+    """Memory tier evicts least recently used entries and expires old ones"""
+    tier = MemoryCacheTier(max_entries=2, ttl_seconds=0.05)
+    tier.set("a", "1")
+    tier.set("b", "2")
+    assert tier.get("a") == "1"  # refresh "a"
+    tier.set("c", "3")
+    assert tier.get("b") is None
+    assert tier.get("a") == "1"
+    time.sleep(0.06)
+    assert tier.get("a") is None
+    print("✅ Memory tier LRU and TTL eviction work")
+
+
+def test_sqlite_tier_eviction():
+    """Disk tier persists entries and enforces entry and byte limits"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        tier = SQLiteCacheTier(db_path=db_path, ttl_seconds=60, max_entries=3, max_bytes=1024)
+        for i in range(5):
+            tier.set(f"k{i}", f"value-{i}")
+        assert tier.size() == 3
+        assert tier.get("k0") is None
+        assert tier.get("k4") == "value-4"
+
+        tier.set("big", "x" * 2000)
+        assert tier.get("big") is None  # larger than max_bytes on its own
+
+        reopened = SQLiteCacheTier(db_path=db_path, ttl_seconds=60, max_entries=3, max_bytes=1024)
+        assert reopened.get("k4") == "value-4"
+    print("✅ SQLite tier persists and evicts by size")
+
+
+def test_sqlite_tier_batches_access_writes():
+    """Hits don't write until a batch fills or the next set; sizes are tracked without rescanning"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        tier = SQLiteCacheTier(db_path=db_path, max_entries=3, touch_batch=10)
+        for i in range(3):
+            tier.set(f"k{i}", f"value-{i}")
+        written = tier._conn.execute("SELECT last_access FROM llm_cache WHERE key = 'k0'").fetchone()[0]
+        assert tier.get("k0") == "value-0"
+        assert tier._conn.execute("SELECT last_access FROM llm_cache WHERE key = 'k0'").fetchone()[0] == written
+
+        # The buffered hit still counts for eviction: k1 is now the least recently used
+        tier.set("k3", "value-3")
+        assert tier.get("k0") == "value-0" and tier.get("k1") is None
+
+        tier.set("k3", "longer value")
+        tier.delete("k2")
+        tier.delete("missing")
+        count, total = tier._conn.execute("SELECT COUNT(*), SUM(size) FROM llm_cache").fetchone()
+        assert tier.size() == count == 2 and tier._bytes == total
+        assert SQLiteCacheTier(db_path=db_path).size() == 2
+    print("✅ SQLite tier batches access-time writes and tracks size incrementally")
+
+
+def test_gateway_hits_and_bypass():
+    """Gateway serves repeats from cache and honours the bypass flag"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(tiers=[
+            MemoryCacheTier(max_entries=10),
+            SQLiteCacheTier(db_path=os.path.join(tmp, "cache.db"))
+        ])
+        client = FakeClient()
+        gateway = LLMGateway(client=client, cache=cache)
+
+        first = gateway.generate("gemini-2.5-pro", "prompt")
+        second = gateway.generate("gemini-2.5-pro", "prompt")
+        assert not first.cache_hit and second.cache_hit
+        assert first.text == second.text
+        assert client.models.calls == 1
+
+        gateway.generate("gemini-2.5-pro", "prompt", bypass_cache=True)
+        assert client.models.calls == 2
+
+        # A cold memory tier is refilled from disk
+        cache.tiers[0].clear()
+        assert gateway.generate("gemini-2.5-pro", "prompt").cache_hit
+        assert cache.tiers[0].size() == 1
+
+        stats = cache.get_stats()
+        assert stats['hits'] == 2 and stats['misses'] == 1 and stats['bypassed'] == 1
+        print(f"✅ Gateway cache stats: {stats}")
+
+
+def test_async_disk_access_off_loop():
+    """Async lookups read and write the disk tier on a worker thread, not the event loop"""
+    with tempfile.TemporaryDirectory() as tmp:
+        threads = []
+
+        class RecordingTier(SQLiteCacheTier):
+            def get(self, key):
+                threads.append(threading.current_thread())
+                return super().get(key)
+
+        cache = LLMResponseCache(tiers=[RecordingTier(db_path=os.path.join(tmp, "cache.db"))])
+
+        async def run():
+            await cache.aset("gemini-2.5-pro", "prompt", "answer")
+            return await cache.aget("gemini-2.5-pro", "prompt"), threading.current_thread()
+
+        value, loop_thread = asyncio.run(run())
+        assert value == "answer" and threads and loop_thread not in threads
+        assert not LLMResponseCache(tiers=[MemoryCacheTier()]).blocking
+    print("✅ Async cache access keeps SQLite off the event loop")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing LLM Response Cache")
+    print("=" * 50)
+
+    try:
+        test_cache_key()
+        test_memory_tier_lru_and_ttl()
+        test_sqlite_tier_eviction()
+        test_sqlite_tier_batches_access_writes()
+        test_gateway_hits_and_bypass()
+        test_async_disk_access_off_loop()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! LLM response cache is working correctly.")
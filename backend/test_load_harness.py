@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the fake Gemini server and the offline load test harness
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from google import genai
+
+from fake_gemini_server import FakeGeminiServer
+from load_test import Sample, build_parser, compare, parse_mix, percentile, run_load_test, summarize
+
+
+def fake_client(server: FakeGeminiServer):
+    return genai.Client(api_key='test', http_options={'base_url': server.base_url})
+
+
+def test_fake_server_speaks_gemini():
+    """The real google-genai client works against the fake: calls, streams, caches, async"""
+    with FakeGeminiServer(latency='fixed:0', tokens_per_second=0) as server:
+        client = fake_client(server)
+
+        text = client.models.generate_content(model='gemini-2.5-pro', contents='hello').text
+        streamed = ''.join(chunk.text or '' for chunk in
+                           client.models.generate_content_stream(model='gemini-2.5-pro', contents='hello'))
+        assert text and streamed == text  # identical prompts get identical text
+
+        cached = client.caches.create(model='gemini-2.5-pro', config={
+            'contents': [{'role': 'user', 'parts': [{'text': '# ROLE: You are Eval Bridge\n'}]}], 'ttl': '60s'})
+        response = client.models.generate_content(model='gemini-2.5-pro', contents='product: x',
+                                                  config={'cached_content': cached.name})
+        assert response.text.startswith('```json')  # expert prompt recognised through the cached prefix
+        assert response.usage_metadata.cached_content_token_count > 0
+        client.caches.delete(name=cached.name)
+
+        async def aio_call():
+            return (await client.aio.models.generate_content(model='gemini-2.0-flash-exp', contents='hi')).text
+
+        assert asyncio.run(aio_call())
+        stats = server.get_stats()
+        assert stats['cache_creates'] == 1 and stats['cached_calls'] == 1 and stats['live_caches'] == 0
+    print("✅ Fake server answers the google-genai client")
+
+
+def test_latency_streaming_and_errors():
+    """Latency, token rate and error injection follow the configuration"""
+    with FakeGeminiServer(latency='fixed:0.2', tokens_per_second=200, chunk_tokens=8) as server:
+        client = fake_client(server)
+        started = time.perf_counter()
+        arrivals = [time.perf_counter() - started for _ in
+                    client.models.generate_content_stream(model='gemini-2.0-flash-exp', contents='hi')]
+        assert 0.2 <= arrivals[0] < 0.4
+        assert len(arrivals) > 3 and arrivals[-1] - arrivals[0] >= 0.04 * (len(arrivals) - 1) * 0.8
+
+    with FakeGeminiServer(latency='fixed:0', error_rate=1.0, error_status=503) as server:
+        client = fake_client(server)
+        try:
+            client.models.generate_content(model='gemini-2.5-pro', contents='hi')
+            assert False, "injected error should surface"
+        except Exception as e:
+            assert '503' in str(e)
+        assert server.get_stats()['errors_injected'] >= 1
+    print("✅ Latency, token streaming and error injection work")
+
+
+def test_report_math():
+    """Percentiles, per-scenario summaries and baseline comparison"""
+    values = [i / 100 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.5 and percentile(values, 99) == 0.99 and percentile([], 95) == 0.0
+    assert parse_mix('chat=3, blueprint') == {'chat': 3.0, 'blueprint': 1.0}
+
+    samples = [Sample('chat', 0, 0.1 * (i + 1), True, 200) for i in range(10)]
+    samples.append(Sample('chat', 0, 5.0, False, 500, error='boom'))
+    samples.append(Sample('chat_stream', 0, 0.4, True, 200, ttfb=0.1))
+    report = {'scenarios': summarize(samples, elapsed=2.0)}
+    chat = report['scenarios']['chat']
+    assert chat['requests'] == 11 and chat['errors'] == 1 and chat['throughput_rps'] == 5.0
+    assert chat['latency_ms']['p50'] == 500.0 and chat['top_errors'] == {'boom': 1}
+    assert report['scenarios']['chat_stream']['ttfb_ms']['p95'] == 100.0
+    assert report['scenarios']['total']['requests'] == 12
+
+    assert compare(report, report, 0.2) == []
+    slower = {'scenarios': summarize([Sample('chat', 0, 2.0, True, 200)] * 10, elapsed=2.0)}
+    assert any('p95' in line for line in compare(slower, report, 0.2))
+    print("✅ Report statistics and baseline comparison are correct")
+
+
+def test_end_to_end_run():
+    """A short run boots the backend in production mode against the fake server"""
+    args = build_parser().parse_args([
+        '--requests', '12', '--duration', '30', '--concurrency', '4', '--mix', 'chat=1,chat_stream=1,blueprint=1',
+        '--fake-latency', 'fixed:0.01', '--tokens-per-second', '0', '--seed', '1'
+    ])
+    report = run_load_test(args)
+    total = report['scenarios']['total']
+    assert total['requests'] == 12 and total['error_rate'] == 0.0, report['scenarios']
+    assert sum(report['fake_gemini']['requests'].values()) >= 12
+    print(f"✅ End-to-end run: {total['throughput_rps']} req/s, p95 {total['latency_ms']['p95']}ms")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Load Test Harness")
+    print("=" * 50)
+
+    try:
+        test_fake_server_speaks_gemini()
+        test_latency_streaming_and_errors()
+        test_report_math()
+        test_end_to_end_run()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! The load test harness is working correctly.")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test script for the metrics registry and /metrics endpoint
+"""
+
+import sys
+import os
+import threading
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import MetricsRegistry, instrument_stream
+from llm_cache import LLMResponseCache, MemoryCacheTier
+from llm_gateway import LLMGateway, LLM_TOKENS, LLM_REQUESTS
+
+
+class FakeUsage:
+    prompt_token_count = 12
+    candidates_token_count = 34
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = FakeUsage()
+
+
+class FakeModels:
+    def generate_content(self, model, contents):
+        return FakeResponse(f"echo: {contents}")
+
+
+class FakeClient:
+    def __init__(self):
+        self.models = FakeModels()
+
+
+def test_counter_sums_thread_shards():
+    """Per-thread shards (including exited threads) add up on collection"""
+    registry = MetricsRegistry()
+    counter = registry.counter('test_total', 'Test counter', ['kind'])
+
+    def worker():
+        for _ in range(1000):
+            counter.inc(kind='a')
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(5, kind='b')
+
+    assert counter.get(kind='a') == 8000
+    assert counter.get(kind='b') == 5
+    assert len(counter._shards) == 1  # exited threads were folded into the retired total
+    assert counter.get(kind='a') == 8000
+    print("✅ Sharded counters add up across threads")
+
+
+def test_histogram_buckets_and_quantiles():
+    """Histograms render cumulative buckets and estimate quantiles"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram('test_seconds', 'Test histogram', ['stage'], buckets=(0.1, 1, 10))
+    for value in [0.05] * 50 + [0.5] * 45 + [5] * 5:
+        histogram.observe(value, stage='extract')
+
+    text = registry.render()
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{stage="extract",le="0.1"} 50' in text
+    assert 'test_seconds_bucket{stage="extract",le="1"} 95' in text
+    assert 'test_seconds_bucket{stage="extract",le="+Inf"} 100' in text
+    assert 'test_seconds_count{stage="extract"} 100' in text
+
+    assert abs(histogram.quantile(0.5, stage='extract') - 0.1) < 1e-9
+    assert 0.1 < histogram.quantile(0.9, stage='extract') <= 1
+    assert 1 < histogram.quantile(0.99, stage='extract') <= 10
+    row = registry.summary()['test_seconds'][0]
+    assert row['stage'] == 'extract' and row['count'] == 100 and set(row) >= {'p50', 'p95', 'p99'}
+    print("✅ Histograms render buckets and estimate quantiles")
+
+
+def test_stream_instrumentation():
+    """Streams count as open while iterating and record inter-arrival times"""
+    registry = MetricsRegistry()
+    interval = registry.histogram('test_interval_seconds', 'Interval', ['endpoint'])
+    open_streams = registry.gauge('test_streams_open', 'Open', ['endpoint'])
+
+    stream = instrument_stream(iter(['a', 'b', 'c']), interval, open_streams, endpoint='chat')
+    assert next(stream) == 'a'
+    assert open_streams.get(endpoint='chat') == 1
+    assert list(stream) == ['b', 'c']
+    assert open_streams.get(endpoint='chat') == 0
+    assert interval.summary()[0]['count'] == 3
+    print("✅ Stream instrumentation tracks open streams and intervals")
+
+
+def test_gateway_records_tokens_and_sources():
+    """The gateway counts tokens from usage metadata and how each request was served"""
+    gateway = LLMGateway(client=FakeClient(), cache=LLMResponseCache([MemoryCacheTier()]))
+    tokens_before = LLM_TOKENS.get(model='metrics-test', kind='completion')
+    gateway.generate('metrics-test', 'hello')
+    gateway.generate('metrics-test', 'hello')
+
+    assert LLM_TOKENS.get(model='metrics-test', kind='completion') - tokens_before == 34
+    assert LLM_REQUESTS.get(model='metrics-test', source='model') >= 1
+    assert LLM_REQUESTS.get(model='metrics-test', source='cache') >= 1
+    print("✅ Gateway records token counts and cache hits")
+
+
+def test_metrics_endpoint():
+    """The app exposes Prometheus text and a percentile summary"""
+    os.environ.setdefault('LLM_CACHE_DB_PATH', '')
+    import app as app_module
+
+    client = app_module.app.test_client()
+    client.post('/api/generate-capability-dimensions',
+                json={'productInfo': 'Demo product', 'idealFunctions': 'Demo functions'})
+    response = client.get('/metrics')
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200 and response.content_type.startswith('text/plain')
+    assert 'evalbridge_pipeline_stage_seconds_count{stage="dynamic_expert"}' in text
+    assert 'evalbridge_http_request_seconds_count{endpoint="generate_capability_dimensions"' in text
+    assert 'evalbridge_llm_cache_hit_ratio' in text
+
+    summary = client.get('/api/metrics/summary').get_json()
+    stages = {row['stage'] for row in summary['evalbridge_pipeline_stage_seconds']}
+    assert {'dynamic_expert', 'domain_router', 'total'} <= stages
+    print("✅ /metrics and /api/metrics/summary are served")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Metrics")
+    print("=" * 50)
+
+    try:
+        test_counter_sums_thread_shards()
+        test_histogram_buckets_and_quantiles()
+        test_stream_instrumentation()
+        test_gateway_records_tokens_and_sources()
+        test_metrics_endpoint()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Metrics are working correctly.")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for the deterministic mock data generator
+"""
+
+import sys
+import os
+import copy
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_data_generator import FrozenDict, MockDataGenerator, freeze, mock_seed
+
+
+def dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def test_templates_are_immutable():
+    """Generated cards can be edited freely without degrading the shared templates"""
+    generator = MockDataGenerator()
+    before = dumps(generator.capability_templates)
+
+    for i in range(50):
+        cards = generator.generate_capability_dimensions(f"Chat app {i}", "answers questions")
+        cards[0]['description'] = 'edited'
+        cards[0]['order'] = 99
+    assert dumps(generator.capability_templates) == before
+
+    # Non-3D wording is adapted in the output only
+    generic = generator.generate_capability_dimensions("Chat app", "", seed=1)
+    assert all('3D model' not in card['description'] for card in generic)
+    assert any('3D model' in card['description'] for card in generator.generate_capability_dimensions("3D figurine app", "", seed=1))
+
+    frozen = freeze({'a': [1, {'b': 2}]})
+    assert isinstance(frozen, FrozenDict) and frozen['a'] == (1, {'b': 2})
+    for mutate in (lambda: frozen.__setitem__('a', 1), lambda: frozen.update(a=1), lambda: frozen['a'][1].pop('b')):
+        try:
+            mutate()
+            assert False, "frozen data should be read-only"
+        except TypeError:
+            pass
+    assert copy.deepcopy(frozen) is frozen and json.loads(json.dumps(frozen)) == {'a': [1, {'b': 2}]}
+    print("✅ Templates stay intact across calls and edits")
+
+
+def test_seeded_output_is_byte_identical():
+    """The same seed and inputs give byte-identical output, independent of call order or instance"""
+    first = MockDataGenerator()
+    second = MockDataGenerator()
+
+    baseline = dumps(first.generate_capability_dimensions("Photo app", "edits photos", seed=7))
+    first.generate_capability_dimensions("Other app", "", seed=3)  # unrelated call in between
+    assert dumps(second.generate_capability_dimensions("Photo app", "edits photos", seed=7)) == baseline
+    assert len({dumps(first.generate_capability_dimensions("Photo app", "edits photos", seed=s))
+                for s in range(40)}) > 1  # different seeds still vary (occasional reordering)
+
+    assert first.generate_test_cases("identity", seed='golden') == second.generate_test_cases("identity", seed='golden')
+    assert first.generate_chat_response("hi", seed=5) == second.generate_chat_response("hi", seed=5)
+    assert ''.join(first.generate_chat_chunks("hi", seed=5)) == first.generate_chat_response("hi", seed=5)
+
+    now = datetime(2025, 1, 1, 12, 0, 0)
+    assert dumps(first.generate_execution_data("exec-1", seed=9, now=now)) == \
+        dumps(second.generate_execution_data("exec-1", seed=9, now=now))
+    print("✅ Seeded outputs are byte-identical")
+
+
+def test_request_seed_and_threads():
+    """The per-request context seed applies, and concurrent seeded calls agree"""
+    generator = MockDataGenerator(seed='instance')
+    expected = dumps(generator.generate_capability_dimensions("Photo app", "", seed='request'))
+
+    token = mock_seed.set('request')
+    try:
+        assert dumps(generator.generate_capability_dimensions("Photo app", "")) == expected
+    finally:
+        mock_seed.reset(token)
+    assert dumps(generator.generate_capability_dimensions("Photo app", "")) == \
+        dumps(generator.generate_capability_dimensions("Photo app", "", seed='instance'))
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = set(pool.map(
+            lambda _: dumps(generator.generate_capability_dimensions("Photo app", "", seed='request')),
+            range(200)
+        ))
+    assert results == {expected}
+    print("✅ Request seeds apply and concurrent calls are consistent")
+
+
+def test_seed_header():
+    """Demo endpoints honour the X-Mock-Seed header"""
+    import app
+
+    if app.APP_MODE != 'demo':
+        print("⏭️  Skipped (not in demo mode)")
+        return
+
+    client = app.app.test_client()
+    responses = {
+        client.post('/api/chat', json={'message': 'How do I evaluate this?'},
+                    headers={'X-Mock-Seed': 'golden'}).get_json()['response']
+        for _ in range(5)
+    }
+    assert len(responses) == 1
+    print("✅ X-Mock-Seed makes demo responses reproducible")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Mock Data Generator")
+    print("=" * 50)
+
+    try:
+        test_templates_are_immutable()
+        test_seeded_output_is_byte_identical()
+        test_request_seed_and_threads()
+        test_seed_header()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Mock data generation is deterministic.")
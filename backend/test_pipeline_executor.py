@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test script for the overlapped blueprint pipeline executor
+"""
+
+import sys
+import os
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline_executor import BlueprintPipeline, PendingDomainContext
+
+STAGE_SECONDS = 0.1
+
+
+def extract(user_input, bypass_cache):
+    time.sleep(STAGE_SECONDS)
+    return {'productInfo': f"product: {user_input}", 'idealFunctions': f"functions: {user_input}"}
+
+
+def router(product_info, ideal_functions, bypass_cache):
+    time.sleep(STAGE_SECONDS)
+    return {'professionalDomain': {'domainName': product_info}}
+
+
+def expert(domain_context, product_info, ideal_functions, bypass_cache):
+    assert isinstance(domain_context, PendingDomainContext)
+    time.sleep(STAGE_SECONDS)
+    return [{'id': 'card', 'title': product_info}]
+
+
+def failing_router(product_info, ideal_functions, bypass_cache):
+    raise ValueError("No valid JSON found in domain router response")
+
+
+async def aextract(user_input, bypass_cache):
+    await asyncio.sleep(STAGE_SECONDS)
+    return {'productInfo': f"product: {user_input}", 'idealFunctions': f"functions: {user_input}"}
+
+
+async def arouter(product_info, ideal_functions, bypass_cache):
+    await asyncio.sleep(STAGE_SECONDS)
+    return {'professionalDomain': {'domainName': product_info}}
+
+
+async def aexpert(domain_context, product_info, ideal_functions, bypass_cache):
+    await asyncio.sleep(STAGE_SECONDS)
+    return [{'id': 'card', 'title': product_info}]
+
+
+def test_structured_input_overlaps_router_and_expert():
+    """With structured input, router and expert run concurrently"""
+    pipeline = BlueprintPipeline(extract, router, expert, executor=ThreadPoolExecutor(4))
+    result = pipeline.run("figurine app", "looks like me")
+    assert not result.extracted and result.router_input == 'structured'
+    assert result.domain_context == {'professionalDomain': {'domainName': 'figurine app'}}
+    assert result.timings['total'] < 2 * STAGE_SECONDS
+    assert set(result.timings) == {'domain_router', 'dynamic_expert', 'total'}
+    print(f"✅ Structured run: {result.timings_ms()}")
+
+
+def test_speculative_router_overlaps_extraction():
+    """With raw input, the router runs alongside extraction -> expert"""
+    pipeline = BlueprintPipeline(extract, router, expert, executor=ThreadPoolExecutor(4))
+    result = pipeline.run(user_input="figurine app")
+    assert result.extracted and result.router_input == 'user_input'
+    assert result.blueprint_cards[0]['title'] == "product: figurine app"
+    assert result.timings['total'] < 3 * STAGE_SECONDS
+    print(f"✅ Speculative run: {result.timings_ms()}")
+
+
+def test_pending_context_resolves():
+    """Callbacks registered by the expert stage receive the router's output and input kind"""
+    resolved = []
+
+    def recording_expert(domain_context, product_info, ideal_functions, bypass_cache):
+        domain_context.on_resolve(lambda context, router_input: resolved.append((context, router_input)))
+        return expert(domain_context, product_info, ideal_functions, bypass_cache)
+
+    for speculative, router_input in ((True, 'user_input'), (False, 'structured')):
+        pipeline = BlueprintPipeline(extract, router, recording_expert, executor=ThreadPoolExecutor(4),
+                                     speculative_router=speculative)
+        result = pipeline.run(user_input="figurine app")
+        assert resolved.pop() == (result.domain_context, router_input)
+    assert result.domain_context['professionalDomain']['domainName'] == "product: figurine app"
+
+    late = PendingDomainContext()
+    late.resolve({'domain': 'x'}, 'structured')
+    late.on_resolve(lambda context, router_input: resolved.append(context))
+    assert resolved == [{'domain': 'x'}]
+    print("✅ Pending domain context resolves to the router output")
+
+
+def test_router_sees_request_context():
+    """The router thread inherits the caller's context variables (tenant, priority, request id...)"""
+    tenant = contextvars.ContextVar('tenant', default=None)
+    seen = []
+
+    def context_router(product_info, ideal_functions, bypass_cache):
+        seen.append(tenant.get())
+        return router(product_info, ideal_functions, bypass_cache)
+
+    tenant.set('acme')
+    pipeline = BlueprintPipeline(extract, context_router, expert, executor=ThreadPoolExecutor(4))
+    pipeline.run(user_input="figurine app")
+    pipeline.speculative_router = False
+    pipeline.run(user_input="figurine app")
+    assert seen == ['acme', 'acme']
+    print("✅ Router stage runs in the caller's context")
+
+
+def test_router_errors_surface():
+    """A failing stage still fails the whole pipeline"""
+    pipeline = BlueprintPipeline(extract, failing_router, expert, executor=ThreadPoolExecutor(4))
+    try:
+        pipeline.run("figurine app", "looks like me")
+    except ValueError as e:
+        assert "domain router" in str(e)
+        print("✅ Router errors propagate")
+    else:
+        raise AssertionError("expected the router error to propagate")
+
+
+def test_async_pipeline():
+    """arun overlaps the same stages on the event loop"""
+    pipeline = BlueprintPipeline(aextract, arouter, aexpert)
+    result = asyncio.run(pipeline.arun(user_input="figurine app"))
+    assert result.domain_context['professionalDomain']['domainName'] == "figurine app"
+    assert result.timings['total'] < 3 * STAGE_SECONDS
+    print(f"✅ Async run: {result.timings_ms()}")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Blueprint Pipeline Executor")
+    print("=" * 50)
+
+    try:
+        test_structured_input_overlaps_router_and_expert()
+        test_speculative_router_overlaps_extraction()
+        test_pending_context_resolves()
+        test_router_sees_request_context()
+        test_router_errors_surface()
+        test_async_pipeline()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Blueprint pipeline executor is working correctly.")
@@ -5,11 +5,14 @@ Test script for the new prompt management system
 
 import sys
 import os
+import tempfile
+import threading
+import time
 
 # Add the backend directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from prompt_manager import prompt_manager
+from prompt_manager import prompt_manager, PromptManager, PromptValidationError
 
 def test_prompt_loading():
     """Test loading the capability dimensions prompt"""
@@ -76,6 +79,83 @@ def test_prompt_structure():
         print(f"❌ Error testing prompt structure: {str(e)}")
         return False
 
+def write_prompt(directory, name, text, bump=0):
+    path = os.path.join(directory, f"{name}.txt")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    # Make the change visible even on filesystems with coarse mtime resolution
+    stamp = time.time() + bump
+    os.utime(path, (stamp, stamp))
+
+def test_compiled_rendering_matches_format():
+    """Compiled templates render exactly like str.format, whole and split into prefix/suffix"""
+    template = prompt_manager.load_prompt("capability_dimensions_prompt")
+    values = {'product_info': "Selfie to {figurine}", 'ideal_functions': "Looks like me"}
+    expected = template.format(**values)
+    assert prompt_manager.format_capability_dimensions_prompt(**values) == expected
+    prefix, suffix = prompt_manager.format_capability_dimensions_prompt_parts(**values)
+    assert prefix + suffix == expected and "Selfie" not in prefix
+    assert prompt_manager.prompt_id("capability_dimensions_prompt").startswith("capability_dimensions_prompt@")
+    print("✅ Compiled templates match str.format output")
+
+def test_placeholder_validation():
+    """Templates must define exactly the registered placeholders"""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = PromptManager(directory, placeholders={'expert': {'product_info'}})
+        write_prompt(directory, 'expert', "Analyse {product_info} and {typo}")
+        try:
+            manager.get('expert')
+            assert False, "unexpected placeholder accepted"
+        except PromptValidationError as e:
+            assert 'typo' in str(e)
+        write_prompt(directory, 'positional', "Analyse {}")
+        try:
+            manager.get('positional')
+            assert False, "positional placeholder accepted"
+        except PromptValidationError:
+            pass
+        try:
+            PromptManager(directory).get('missing')
+            assert False, "missing file accepted"
+        except FileNotFoundError:
+            pass
+    print("✅ Placeholder validation rejects bad templates")
+
+def test_hot_reload():
+    """Edited files are picked up without a restart; invalid edits keep the last good version"""
+    with tempfile.TemporaryDirectory() as directory:
+        manager = PromptManager(directory, reload_interval=0.01, placeholders={'expert': {'product_info'}})
+        write_prompt(directory, 'expert', "v1 {product_info}")
+        first = manager.get('expert')
+        assert first.render(product_info='x') == "v1 x"
+
+        write_prompt(directory, 'expert', "version two {product_info}", bump=1)
+        time.sleep(0.02)
+        second = manager.get('expert')
+        assert second.render(product_info='x') == "version two x"
+        assert second.prompt_id != first.prompt_id
+        # The previous object is untouched for callers still holding it
+        assert first.render(product_info='x') == "v1 x"
+
+        write_prompt(directory, 'expert', "broken {product}", bump=2)
+        time.sleep(0.02)
+        assert manager.get('expert') is second
+        assert manager.get_stats() == {'loads': 1, 'reloads': 1, 'rejected': 1}
+
+        # Concurrent readers always see a complete version
+        seen = set()
+        def read():
+            for _ in range(200):
+                seen.add(manager.get('expert').render(product_info='x'))
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        write_prompt(directory, 'expert', "v3 {product_info}", bump=3)
+        for thread in threads:
+            thread.join()
+        assert seen <= {"version two x", "v3 x"}
+    print("✅ Prompts hot-reload atomically")
+
 if __name__ == "__main__":
     print("🧪 Testing Prompt Management System")
     print("=" * 50)
@@ -88,8 +168,18 @@ if __name__ == "__main__":
     test2_passed = test_prompt_structure()
     print()
     
+    try:
+        test_compiled_rendering_matches_format()
+        test_placeholder_validation()
+        test_hot_reload()
+        test3_passed = True
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        test3_passed = False
+    print()
+    
     # Summary
-    if test1_passed and test2_passed:
+    if test1_passed and test2_passed and test3_passed:
         print("🎉 All tests passed! Prompt management system is working correctly.")
     else:
         print("❌ Some tests failed. Please check the implementation.")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for the agent step drivers shared by the WSGI and ASGI apps
+"""
+
+import sys
+import os
+import asyncio
+import json
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from serving_core import arun_steps, run_steps, sse_event
+
+
+def retrying_steps(log):
+    """Asks twice when the first call fails, then returns both responses' text"""
+    try:
+        first = yield {'model': 'flash', 'contents': 'q1'}
+    except RuntimeError as e:
+        log.append(str(e))
+        first = yield {'model': 'pro', 'contents': 'q1'}
+    second = yield {'model': 'pro', 'contents': 'q2'}
+    return [first, second]
+
+
+def call(model, contents):
+    if model == 'flash':
+        raise RuntimeError("flash unavailable")
+    return f"{model}:{contents}"
+
+
+async def acall(model, contents):
+    await asyncio.sleep(0)
+    return call(model, contents)
+
+
+def test_drivers_send_and_throw():
+    """Both drivers feed responses back and throw call errors into the steps"""
+    sync_log, async_log = [], []
+    assert run_steps(retrying_steps(sync_log), call) == ['pro:q1', 'pro:q2']
+    assert asyncio.run(arun_steps(retrying_steps(async_log), acall)) == ['pro:q1', 'pro:q2']
+    assert sync_log == async_log == ['flash unavailable']
+    print("✅ Sync and async drivers run the same agent steps")
+
+
+def test_unhandled_call_error_propagates():
+    """An error the steps don't handle reaches the caller unchanged"""
+    def steps():
+        yield {'model': 'flash', 'contents': 'q'}
+
+    for run in (lambda: run_steps(steps(), call), lambda: asyncio.run(arun_steps(steps(), acall))):
+        try:
+            run()
+            assert False, "expected RuntimeError"
+        except RuntimeError as e:
+            assert str(e) == "flash unavailable"
+    print("✅ Unhandled call errors propagate from both drivers")
+
+
+def test_sse_event():
+    event = sse_event({'type': 'card', 'index': 0})
+    assert event.startswith('data: ') and event.endswith('\n\n')
+    payload = json.loads(event[len('data: '):])
+    assert payload['type'] == 'card' and 'timestamp' in payload
+    print("✅ SSE events are timestamped data lines")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Serving Core")
+    print("=" * 50)
+
+    try:
+        test_drivers_send_and_throw()
+        test_unhandled_call_error_propagates()
+        test_sse_event()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Serving core is working correctly.")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test script for single-flight deduplication of concurrent LLM calls
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from single_flight import AsyncSingleFlight, SingleFlight
+from llm_gateway import LLMGateway
+
+
+class SlowModels:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def generate_content(self, model, contents):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.1)
+        if self.fail:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        return type("Response", (), {"text": f"answer to {contents}"})()
+
+
+class SlowClient:
+    def __init__(self, fail=False):
+        self.models = SlowModels(fail)
+
+
+class AsyncSlowModels:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content(self, model, contents):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return type("Response", (), {"text": f"answer to {contents}"})()
+
+
+class AsyncSlowClient:
+    def __init__(self):
+        self.aio = type("Aio", (), {"models": AsyncSlowModels()})()
+
+
+def _run_concurrently(fn, count):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_identical_calls_share_result():
+    """N concurrent identical requests produce one model call"""
+    client = SlowClient()
+    gateway = LLMGateway(client=client, cache=None)
+
+    results, errors = _run_concurrently(lambda: gateway.generate("gemini-2.5-pro", "same prompt"), 8)
+
+    assert not errors
+    assert client.models.calls == 1
+    assert len({r.text for r in results}) == 1
+    assert sum(1 for r in results if r.shared) == 7
+    assert gateway.single_flight.in_flight() == 0
+    print("✅ 8 concurrent identical calls made 1 model call")
+
+
+def test_waiters_receive_same_error():
+    """Every waiter sees the leader's exception"""
+    client = SlowClient(fail=True)
+    gateway = LLMGateway(client=client, cache=None)
+
+    results, errors = _run_concurrently(lambda: gateway.generate("gemini-2.5-pro", "same prompt"), 5)
+
+    assert not results
+    assert len(errors) == 5
+    assert all("RESOURCE_EXHAUSTED" in str(e) for e in errors)
+    assert client.models.calls == 1
+    print("✅ All waiters received the shared error")
+
+
+def test_distinct_keys_run_independently():
+    """Different keys are not serialized behind each other"""
+    flight = SingleFlight()
+    started = time.perf_counter()
+    _run_concurrently(lambda: flight.do(str(threading.get_ident()), lambda: time.sleep(0.1)), 4)
+    assert time.perf_counter() - started < 0.35
+    assert flight.get_stats()['leaders'] == 4
+    print("✅ Distinct keys execute in parallel")
+
+
+def test_async_gateway_deduplicates():
+    """Concurrent identical awaits share one async model call"""
+    client = AsyncSlowClient()
+    gateway = LLMGateway(client=client, cache=None)
+
+    async def burst():
+        return await asyncio.gather(*[gateway.agenerate("gemini-2.5-pro", "same prompt") for _ in range(6)])
+
+    results = asyncio.run(burst())
+    assert client.aio.models.calls == 1
+    assert sum(1 for r in results if r.shared) == 5
+    assert gateway.async_single_flight.in_flight() == 0
+    print("✅ 6 concurrent async calls made 1 model call")
+
+
+def test_async_leader_cancellation():
+    """Cancelling the caller that started a call leaves it running for the others"""
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await waiter
+        assert leader.cancelled()
+
+        # With every caller gone the shared call itself is cancelled
+        lone = asyncio.ensure_future(flight.do("other", slow))
+        await asyncio.sleep(0.01)
+        lone.cancel()
+        await asyncio.sleep(0.01)
+        return result
+
+    assert asyncio.run(run()) == ("answer", True)
+    assert len(calls) == 2 and flight.in_flight() == 0
+    print("✅ A cancelled leader does not cancel the shared async call")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Single-Flight Deduplication")
+    print("=" * 50)
+
+    try:
+        test_concurrent_identical_calls_share_result()
+        test_waiters_receive_same_error()
+        test_distinct_keys_run_independently()
+        test_async_gateway_deduplicates()
+        test_async_leader_cancellation()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Single-flight deduplication is working correctly.")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for structured logging (JSON lines, correlation ids, payload sampling)
+"""
+
+import sys
+import os
+import io
+import json
+import logging
+import threading
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from structured_logging import configure_logging, flush_logging, log_payload, current_request_id
+from workflow_dashboard import WorkflowMonitor, make_execution_id
+
+
+def capture(level='DEBUG'):
+    """Route logging into a buffer; returns a function reading back the parsed lines"""
+    buffer = io.StringIO()
+    configure_logging(level=level, fmt='json', stream=buffer)
+
+    def read():
+        flush_logging()
+        return [json.loads(line) for line in buffer.getvalue().splitlines() if line]
+    return read
+
+
+def test_json_lines_with_correlation_ids():
+    """Records carry the request id and execution id of the context that logged them"""
+    read = capture()
+    logger = logging.getLogger('test.correlation')
+    monitor = WorkflowMonitor()
+
+    def handle(request_id):
+        current_request_id.set(request_id)
+        monitor.start_execution(make_execution_id(request_id), {})
+        logger.info("Handling request", extra={'stage': 'extract'})
+        monitor.complete_execution({'ok': True})
+
+    threads = [threading.Thread(target=handle, args=(f"req{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    entries = [entry for entry in read() if entry['logger'] == 'test.correlation']
+    assert len(entries) == 8
+    for entry in entries:
+        assert entry['level'] == 'INFO' and entry['msg'] == 'Handling request'
+        assert entry['stage'] == 'extract'
+        assert entry['execution_id'].startswith(entry['request_id'] + '_')
+    completed = [entry for entry in read() if entry['msg'] == 'Execution completed']
+    assert len(completed) == 8
+    print("✅ JSON lines carry request and execution ids across threads")
+
+
+def test_level_gating_and_exceptions():
+    """Records below the level are dropped; tracebacks survive the queue hop"""
+    read = capture(level='INFO')
+    logger = logging.getLogger('test.levels')
+    logger.debug("hidden %s", 'value')
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        logger.exception("Chat error")
+
+    entries = [entry for entry in read() if entry['logger'] == 'test.levels']
+    assert [entry['msg'] for entry in entries] == ['Chat error']
+    assert 'RuntimeError: boom' in entries[0]['exc']
+    print("✅ Level gating and exception tracebacks work")
+
+
+def test_payload_sampling():
+    """Verbose payloads are only logged at DEBUG, sampled and truncated"""
+    logger = logging.getLogger('test.payload')
+
+    read = capture(level='INFO')
+    log_payload(logger, 'raw response', 'x' * 100, sample_rate=1)
+    assert not [entry for entry in read() if entry['logger'] == 'test.payload']
+
+    read = capture(level='DEBUG')
+    log_payload(logger, 'raw response', 'x' * 100, sample_rate=1, max_chars=10, model='flash')
+    log_payload(logger, 'raw response', 'y' * 100, sample_rate=0)
+    entries = [entry for entry in read() if entry['logger'] == 'test.payload']
+    assert len(entries) == 1
+    assert entries[0]['payload'] == 'x' * 10 and entries[0]['payload_chars'] == 100
+    assert entries[0]['truncated'] is True and entries[0]['model'] == 'flash'
+    print("✅ Payload logging is level-gated, sampled and truncated")
+
+
+def test_listener_stop_and_restart():
+    """Flushing after shutdown and reconfiguring after a stop are both safe"""
+    import structured_logging
+
+    read = capture()
+    logging.getLogger('test').info("before stop")
+    structured_logging._stop_listener()  # as at interpreter exit
+    flush_logging()
+    structured_logging._stop_listener()
+    assert [line['msg'] for line in read()] == ["before stop"]
+
+    read = capture()
+    logging.getLogger('test').info("after restart")
+    assert [line['msg'] for line in read()] == ["after restart"]
+    configure_logging()
+    print("✅ Listener stop, flush and restart are idempotent")
+
+
+def test_request_id_header():
+    """The app echoes a client request id and mints one otherwise"""
+    from app import app
+
+    read = capture()
+    with app.test_client() as client:
+        response = client.get('/api/health', headers={'X-Request-ID': 'abc123'})
+        assert response.headers['X-Request-ID'] == 'abc123'
+        response = client.get('/api/health')
+        assert len(response.headers['X-Request-ID']) == 32
+    read()
+    configure_logging()
+    print("✅ X-Request-ID is echoed or generated")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Structured Logging")
+    print("=" * 50)
+
+    try:
+        test_json_lines_with_correlation_ids()
+        test_level_gating_and_exceptions()
+        test_payload_sampling()
+        test_listener_stop_and_restart()
+        test_request_id_header()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Structured logging is working correctly.")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for the precompiled / memoized EvaluationConsultant system prompts
+"""
+
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import consultant, build_chat_prompt, DEFAULT_EXPERTS
+
+
+def test_expert_prompts_are_memoized():
+    """Any ordering or duplication of the same experts returns the same prompt object"""
+    first = consultant.get_multi_expert_prompt(['user_experience', 'medical_ai'])
+    second = consultant.get_multi_expert_prompt(['medical_ai', 'user_experience', 'medical_ai', 'unknown'])
+    assert first is second
+    assert 'with 2 expert perspectives' in first
+    assert first.index('Medical Imaging') < first.index('Product Experience')
+    assert consultant.get_multi_expert_prompt() is consultant.get_multi_expert_prompt(list(DEFAULT_EXPERTS))
+    info = consultant._expert_prompts.cache_info()
+    assert info.hits >= 3
+    print("✅ Expert combinations are rendered once and shared")
+
+
+def test_legacy_prompts_are_precompiled():
+    """Role config prompts are built up front; unknown keys fall back to the default config"""
+    prompt = consultant.get_system_prompt('autonomous_driving')
+    assert prompt is consultant.get_system_prompt('autonomous_driving')
+    assert 'CURRENT DOMAIN: Autonomous Vehicle Perception and Control' in prompt
+    assert consultant.get_system_prompt('nope') is consultant.get_system_prompt('q_figurine_3d')
+    print("✅ Legacy role config prompts are precompiled")
+
+
+def test_chat_prompt_shares_prefix():
+    """Request-specific parts follow the shared system prompt"""
+    context = {'domain_config': 'medical_diagnosis'}
+    history = [{'role': 'user', 'content': 'hi'}, {'role': 'assistant', 'content': 'hello'}]
+    prompt = build_chat_prompt('What matters most?', history, context)
+    system_prompt = consultant.get_system_prompt('medical_diagnosis', context)
+    assert prompt.startswith(system_prompt + "\n\nPrevious conversation:\nuser: hi\nassistant: hello\n\n")
+    assert prompt.endswith("User question: What matters most?\n\nPlease respond as the AI evaluation consultant:")
+    assert '"domain_config": "medical_diagnosis"' in prompt
+    print("✅ Chat prompts start with the memoized system prompt")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing System Prompts")
+    print("=" * 50)
+
+    try:
+        test_expert_prompts_are_memoized()
+        test_legacy_prompts_are_precompiled()
+        test_chat_prompt_shares_prefix()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! System prompts are working correctly.")
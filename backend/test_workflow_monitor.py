@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Test script for the bounded WorkflowMonitor execution store
+"""
+
+import sys
+import os
+import time
+import asyncio
+import tempfile
+import threading
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from execution_store import SQLiteExecutionStore
+from workflow_dashboard import WorkflowMonitor, current_execution_id, make_execution_id, app as dashboard_app
+
+
+def _run(monitor, execution_id, error=None, steps=1):
+    monitor.start_execution(execution_id, {'product_info': execution_id})
+    for index in range(steps):
+        monitor.add_step(f"Step {index}", {'payload': 'x' * 100})
+    monitor.complete_execution({'done': True}, error)
+
+
+def test_capacity_eviction_and_lookup():
+    """Oldest executions are evicted past capacity; lookups are by id"""
+    monitor = WorkflowMonitor(max_executions=3, retention_seconds=0)
+    for index in range(5):
+        _run(monitor, f"exec_{index}", error='boom' if index == 4 else None)
+
+    assert monitor.get_execution('exec_0') is None
+    assert monitor.get_execution('exec_4')['error'] == 'boom'
+    assert monitor.get_stats() == {'total': 3, 'evicted': 2, 'running': 0, 'completed': 2, 'failed': 1,
+                                   'interrupted': 0}
+    print("✅ Capacity eviction keeps the newest executions")
+
+
+def test_age_retention():
+    """Executions older than the retention window are dropped"""
+    monitor = WorkflowMonitor(max_executions=0, retention_seconds=0.05)
+    _run(monitor, 'old')
+    time.sleep(0.08)
+    _run(monitor, 'new')
+    assert monitor.get_execution('old') is None
+    assert monitor.get_execution('new') is not None
+    print("✅ Age-based retention drops stale executions")
+
+
+def test_listing_filters_and_pagination():
+    """Listing is newest first, filterable and paginated, with summaries by default"""
+    monitor = WorkflowMonitor()
+    for index in range(6):
+        _run(monitor, f"exec_{index}", error='boom' if index % 2 else None, steps=2)
+    cutoff = time.time()
+    time.sleep(0.01)
+    monitor.start_execution('exec_running', {})
+
+    page = monitor.list_executions(limit=2, offset=1)
+    assert [e['id'] for e in page['executions']] == ['exec_5', 'exec_4']
+    assert page['matched'] == 7 and page['running'] == 1 and page['failed'] == 3
+    assert 'steps' not in page['executions'][0] and page['executions'][0]['step_count'] == 2
+
+    failed = monitor.list_executions(status='failed')
+    assert [e['id'] for e in failed['executions']] == ['exec_5', 'exec_3', 'exec_1']
+
+    recent = monitor.list_executions(since=cutoff)
+    assert [e['id'] for e in recent['executions']] == ['exec_running']
+    older = monitor.list_executions(until=cutoff, limit=1, summary=False)
+    assert older['executions'][0]['id'] == 'exec_5' and len(older['executions'][0]['steps']) == 2
+    print("✅ Listing filters by status and time range and paginates")
+
+
+def test_dashboard_api():
+    """The dashboard endpoints validate parameters and return pages"""
+    client = dashboard_app.test_client()
+    client.post('/api/start', json={'product_info': 'api'})
+    client.post('/api/complete', json={'output': {}})
+
+    data = client.get('/api/executions?limit=1').get_json()
+    assert len(data['executions']) == 1 and data['limit'] == 1
+    assert client.get(f"/api/execution/{data['executions'][0]['id']}").status_code == 200
+    assert client.get('/api/executions?status=bogus').status_code == 400
+    assert client.get('/api/executions?since=yesterday').status_code == 400
+    print("✅ Dashboard API pages executions")
+
+
+def test_concurrent_threads_record_into_own_executions():
+    """Interleaved threads never write steps into each other's executions"""
+    monitor = WorkflowMonitor()
+    barrier = threading.Barrier(8)
+
+    def worker(index):
+        monitor.start_execution(f"thread_{index}", {})
+        barrier.wait()
+        for step in range(5):
+            monitor.add_step(f"thread_{index}_step_{step}", {})
+            time.sleep(0.001)
+        barrier.wait()
+        monitor.complete_execution({'index': index})
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for index in range(8):
+        execution = monitor.get_execution(f"thread_{index}")
+        assert execution['status'] == 'completed' and execution['output'] == {'index': index}
+        assert [step['name'] for step in execution['steps']] == [f"thread_{index}_step_{step}" for step in range(5)]
+    assert monitor.get_stats()['running'] == 0
+    print("✅ Concurrent threads keep separate executions")
+
+
+def test_concurrent_tasks_and_handles():
+    """asyncio tasks get their own current execution; handles fail on exceptions"""
+    monitor = WorkflowMonitor()
+
+    async def task(index):
+        execution = monitor.start_execution(f"task_{index}", {})
+        await asyncio.sleep(0.01)
+        monitor.add_step(f"task_{index}", {})
+        await asyncio.sleep(0.01)
+        execution.complete({'index': index})
+
+    async def main():
+        await asyncio.gather(*(task(index) for index in range(5)))
+        running = monitor.get_running_executions()
+        assert running == []
+
+    asyncio.run(main())
+    for index in range(5):
+        assert [step['name'] for step in monitor.get_execution(f"task_{index}")['steps']] == [f"task_{index}"]
+
+    try:
+        with monitor.start_execution('handled', {}) as execution:
+            execution.add_step('work', {})
+            raise RuntimeError('boom')
+    except RuntimeError:
+        pass
+    assert monitor.get_execution('handled')['status'] == 'failed'
+    assert monitor.get_execution('handled')['error'] == 'boom'
+    print("✅ Async tasks and handles track executions independently")
+
+
+def test_execution_ids_are_unique():
+    """Ids created in the same second don't collide"""
+    ids = {make_execution_id('capability_gen') for _ in range(1000)}
+    assert len(ids) == 1000
+    print("✅ Execution ids are unique")
+
+
+def test_store_shared_between_monitors():
+    """A second monitor on the same database (as in the dashboard process) sees the app's executions"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'executions.db')
+        app_monitor = WorkflowMonitor(store=SQLiteExecutionStore(db_path))
+        dashboard_monitor = WorkflowMonitor(store=SQLiteExecutionStore(db_path))
+
+        _run(app_monitor, 'exec_ok', steps=3)
+        _run(app_monitor, 'exec_failed', error='boom')
+        app_monitor.start_execution('exec_running', {'product_info': 'live'})
+        app_monitor.add_step('Call AI Model', {'model': 'gemini-2.5-pro'})
+        app_monitor.store.flush()
+
+        page = dashboard_monitor.list_executions()
+        assert [e['id'] for e in page['executions']] == ['exec_running', 'exec_failed', 'exec_ok']
+        assert page['running'] == 1 and page['failed'] == 1 and page['completed'] == 1
+        assert page['executions'][0]['last_step'] == 'Call AI Model'
+        assert [e['id'] for e in dashboard_monitor.get_running_executions()] == ['exec_running']
+
+        execution = dashboard_monitor.get_execution('exec_ok')
+        assert execution['input'] == {'product_info': 'exec_ok'} and execution['output'] == {'done': True}
+        assert [step['name'] for step in execution['steps']] == ['Step 0', 'Step 1', 'Step 2']
+        assert dashboard_monitor.list_executions(status='failed', summary=False)['executions'][0]['error'] == 'boom'
+
+        app_monitor.store.close()
+        dashboard_monitor.store.close()
+
+        # Executions survive a restart
+        reopened = SQLiteExecutionStore(db_path)
+        assert reopened.get_execution('exec_failed')['status'] == 'failed'
+        reopened.close()
+    print("✅ Durable store is shared across monitors and restarts")
+
+
+def test_dashboard_updates_stored_executions():
+    """The dashboard's monitor resolves, steps and completes executions another process started"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'executions.db')
+        app_monitor = WorkflowMonitor(store=SQLiteExecutionStore(db_path))
+        dashboard_monitor = WorkflowMonitor(store=SQLiteExecutionStore(db_path))
+
+        def start():
+            app_monitor.start_execution('exec_remote', {'product_info': 'remote'})
+            app_monitor.add_step('Step 0', {})
+        thread = threading.Thread(target=start)  # keeps the execution out of this context
+        thread.start()
+        thread.join()
+        app_monitor.store.flush()
+
+        current_execution_id.set(None)  # as in a fresh dashboard request
+        assert dashboard_monitor.get_current_execution()['id'] == 'exec_remote'
+        dashboard_monitor.add_step('Step 1', {'from': 'dashboard'}, execution_id='exec_remote')
+        dashboard_monitor.complete_execution({'done': True})
+        dashboard_monitor.store.flush()
+
+        execution = app_monitor.store.get_execution('exec_remote')
+        assert [step['name'] for step in execution['steps']] == ['Step 0', 'Step 1']
+        assert execution['status'] == 'completed' and execution['output'] == {'done': True}
+        assert dashboard_monitor.get_current_execution() is None
+        assert [event[1] for event in dashboard_monitor.store.read_events(0)][-2:] == ['step', 'complete']
+        app_monitor.store.close()
+        dashboard_monitor.store.close()
+    print("✅ Dashboard updates executions recorded by another process")
+
+
+def test_input_resolved_after_start():
+    """Inputs resolved after an execution started (e.g. the domain context) reach memory and the store"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'executions.db')
+        monitor = WorkflowMonitor(store=SQLiteExecutionStore(db_path))
+        _run(monitor, 'exec_ok')
+        monitor.update_input('exec_ok', {'domain_context': {'domain': 'photo'}})
+        monitor.update_input('exec_missing', {'domain_context': {}})
+        monitor.store.flush()
+
+        expected = {'product_info': 'exec_ok', 'domain_context': {'domain': 'photo'}}
+        assert monitor.get_execution('exec_ok')['input'] == expected
+        reopened = SQLiteExecutionStore(db_path)
+        assert reopened.get_execution('exec_ok')['input'] == expected
+        reopened.close()
+        monitor.store.close()
+    print("✅ Late inputs are merged into retained executions")
+
+
+def test_store_reads_skip_idle_flush():
+    """Reads wait for the writer only when this process has queued writes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteExecutionStore(os.path.join(tmp, 'executions.db'), flush_interval=0.5)
+        monitor = WorkflowMonitor(store=store)
+        _run(monitor, 'exec_ok')
+
+        started = time.perf_counter()
+        assert store.get_execution('exec_ok')['status'] == 'completed'  # pending writes are flushed
+        assert time.perf_counter() - started < 0.4  # the flush ends the writer's batch window early
+
+        started = time.perf_counter()
+        for _ in range(20):
+            store.list_executions()
+        assert time.perf_counter() - started < 0.2
+        store.close()
+    print("✅ Store reads only flush pending writes")
+
+
+def test_store_retention():
+    """The store prunes executions past capacity"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteExecutionStore(os.path.join(tmp, 'executions.db'), max_executions=2, prune_interval=0)
+        monitor = WorkflowMonitor(store=store)
+        for index in range(4):
+            _run(monitor, f"exec_{index}")
+        stats = monitor.get_stats()
+        assert stats['total'] == 2 and stats['evicted'] == 2
+        assert monitor.get_execution('exec_0') is None
+        assert monitor.get_execution('exec_3')['steps'][0]['name'] == 'Step 0'
+        store.close()
+    print("✅ Durable store applies retention")
+
+
+def test_orphaned_executions_interrupted():
+    """Running executions whose process stopped heartbeating are marked interrupted on open"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'executions.db')
+        crashed = WorkflowMonitor(store=SQLiteExecutionStore(db_path, heartbeat_interval=60))
+        thread = threading.Thread(target=crashed.start_execution, args=('exec_orphan', {'product_info': 'x'}))
+        thread.start()
+        thread.join()
+        crashed.store.close()  # the process dies without completing the execution
+
+        live = SQLiteExecutionStore(db_path, stale_seconds=60)
+        assert live.get_execution('exec_orphan')['status'] == 'running'  # owner not yet stale
+        live.close()
+
+        time.sleep(0.1)
+        current_execution_id.set(None)
+        dashboard = WorkflowMonitor(store=SQLiteExecutionStore(db_path, stale_seconds=0.05))
+        execution = dashboard.get_execution('exec_orphan')
+        assert execution['status'] == 'interrupted' and execution['end_time'] and 'interrupted' in execution['error']
+        assert dashboard.get_current_execution() is None and dashboard.get_running_executions() == []
+        assert dashboard.list_executions()['interrupted'] == 1
+        assert dashboard.get_stats()['interrupted'] == 1
+        event = dashboard.store.read_events(0)[-1]
+        assert event[1] == 'fail' and event[2]['id'] == 'exec_orphan' and event[2]['status'] == 'interrupted'
+        dashboard.store.close()
+    print("✅ Orphaned running executions are marked interrupted")
+
+
+def test_store_retries_failed_batch_row_by_row():
+    """One failing write costs only itself; the rest of its batch is still committed"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteExecutionStore(os.path.join(tmp, 'executions.db'), flush_interval=0.5)
+        monitor = WorkflowMonitor(store=store)
+        monitor.start_execution('exec_ok', {'product_info': 'ok'})
+        store._enqueue(('input', ('missing binding',)))  # fails inside the batch
+        monitor.add_step('Step 0', {})
+        monitor.complete_execution({'done': True})
+
+        execution = store.get_execution('exec_ok')
+        assert execution['status'] == 'completed' and [step['name'] for step in execution['steps']] == ['Step 0']
+        stats = store.get_stats()
+        assert stats['retried'] == 1 and stats['errors'] == 1 and stats['queued'] == 0
+        store.close()
+    print("✅ A failed batch is retried write by write")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Workflow Monitor Store")
+    print("=" * 50)
+
+    try:
+        test_capacity_eviction_and_lookup()
+        test_age_retention()
+        test_listing_filters_and_pagination()
+        test_dashboard_api()
+        test_concurrent_threads_record_into_own_executions()
+        test_concurrent_tasks_and_handles()
+        test_execution_ids_are_unique()
+        test_store_shared_between_monitors()
+        test_dashboard_updates_stored_executions()
+        test_input_resolved_after_start()
+        test_store_reads_skip_idle_flush()
+        test_store_retention()
+        test_orphaned_executions_interrupted()
+        test_store_retries_failed_batch_row_by_row()
+    except AssertionError as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+    print("\n🎉 All tests passed! Workflow monitor store is working correctly.")
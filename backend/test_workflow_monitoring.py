@@ -83,10 +83,10 @@ def test_workflow_monitoring():
             print(f"✅ Found {len(executions)} executions")
             
             if executions:
-                latest = executions[-1]
+                latest = executions[0]
                 print(f"   Latest execution: {latest['id']}")
                 print(f"   Status: {latest['status']}")
-                print(f"   Steps: {len(latest['steps'])}")
+                print(f"   Steps: {latest['step_count']}")
         else:
             print(f"❌ Failed to get executions: {response.status_code}")
         
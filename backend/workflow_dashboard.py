@@ -3,113 +3,535 @@ Workflow Visualization Dashboard
 A simple web interface to monitor and visualize workflow outputs
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_cors import CORS
 import json
+import logging
 import os
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+from contextvars import ContextVar
 import threading
 import time
+import uuid
+from execution_store import SQLiteExecutionStore
+from execution_events import ExecutionEventFeed
+from structured_logging import configure_logging, register_context_var
 
 app = Flask(__name__)
 CORS(app)
 
+EXECUTION_STATUSES = ('running', 'completed', 'failed', 'interrupted')
+
+# Execution the current request/task is recording into. Each thread and asyncio task has its
+# own context, so concurrent requests never write into each other's executions.
+current_execution_id: ContextVar[Optional[str]] = ContextVar('current_execution_id', default=None)
+register_context_var('execution_id', current_execution_id)
+
+logger = logging.getLogger(__name__)
+
+
+def make_execution_id(prefix: str = 'exec') -> str:
+    """Unique, time-sortable execution id (e.g. capability_gen_1718000000_3f9a2c1b)"""
+    return f"{prefix}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+
+class ExecutionHandle:
+    """
+    Handle to one tracked execution
+
+    start_execution() binds the execution to the calling context. Used as a context manager,
+    the handle also completes the execution as failed if the block raises:
+
+        with workflow_monitor.start_execution(make_execution_id('demo'), inputs) as execution:
+            execution.add_step('Load', {...})
+            execution.complete({'result': ...})
+    """
+
+    def __init__(self, monitor: 'WorkflowMonitor', execution_id: str):
+        self.monitor = monitor
+        self.id = execution_id
+
+    def add_step(self, step_name: str, step_data: Dict[str, Any]):
+        """Add a step to this execution"""
+        self.monitor.add_step(step_name, step_data, execution_id=self.id)
+
+    def complete(self, output_data: Dict[str, Any] = None, error: str = None):
+        """Mark this execution as completed (or failed if error is given)"""
+        self.monitor.complete_execution(output_data, error, execution_id=self.id)
+
+    def __enter__(self) -> 'ExecutionHandle':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.monitor.complete_execution(output_data=None, error=str(exc) or exc_type.__name__,
+                                            execution_id=self.id)
+        if current_execution_id.get() == self.id:
+            current_execution_id.set(None)
+        return False
+
+
 class WorkflowMonitor:
-    """Monitor and store workflow execution data"""
+    """
+    Monitor and store workflow execution data
+
+    Executions live in a bounded store: an OrderedDict keyed by id, kept in start order, so
+    lookups are O(1) and the oldest entries are dropped from the front once max_executions
+    is exceeded or they are older than retention_seconds. Status counts are maintained
+    incrementally so stats never require a scan.
+
+    With a store attached, every change is also queued to it and reads are served from it, so
+    the dashboard process sees executions recorded by the main app, including across restarts.
+
+    Lifecycle changes (start, step, complete, fail) are published as small delta events on
+    self.events; with a store they go through the store's event log so every process's
+    feed sees them in the same order.
+
+    Any number of executions can run at once. Steps and completion are routed by explicit
+    execution id, else by the current_execution_id context variable, else (for the manual
+    /api/step and /api/complete endpoints) to the most recently started running execution.
+    """
     
-    def __init__(self):
-        self.executions: List[Dict[str, Any]] = []
-        self.current_execution: Dict[str, Any] = None
+    def __init__(self, max_executions: int = 1000, retention_seconds: float = 86400,
+                 store: Optional[SQLiteExecutionStore] = None, event_replay_size: int = 1000):
+        """
+        Args:
+            max_executions: Executions retained before the oldest are evicted (0 = unbounded)
+            retention_seconds: Drop executions that started longer ago than this (0 = forever)
+            store: Optional durable store shared with other processes
+            event_replay_size: Lifecycle events buffered for reconnecting feed clients
+        """
+        self.executions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.running: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self.lock = threading.Lock()
+        self.max_executions = max_executions
+        self.retention_seconds = retention_seconds
+        self.status_counts = {status: 0 for status in EXECUTION_STATUSES}
+        self.evicted = 0
+        self.store = store
+        self.events = ExecutionEventFeed(replay_size=event_replay_size, source=store)
+
+    def _emit(self, event_type: str, data: Dict[str, Any]):
+        """Publish a lifecycle event; caller holds the lock so events stay in order"""
+        if self.store:
+            self.store.record_event(event_type, data)
+        else:
+            self.events.publish(event_type, data)
+
+    def _evict(self, now: float):
+        """Drop executions over capacity or past retention; caller holds the lock"""
+        while self.executions:
+            oldest = next(iter(self.executions.values()))
+            over_capacity = self.max_executions and len(self.executions) > self.max_executions
+            expired = self.retention_seconds and now - oldest['_started_at'] > self.retention_seconds
+            if not over_capacity and not expired:
+                break
+            self.executions.popitem(last=False)
+            self.status_counts[oldest['status']] -= 1
+            self.evicted += 1
+            self.running.pop(oldest['id'], None)
+
+    def _resolve(self, execution_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Find the running execution a step/completion belongs to; caller holds the lock"""
+        execution_id = execution_id or current_execution_id.get()
+        if execution_id is not None:
+            return self.running.get(execution_id)
+        if self.running:
+            return next(reversed(self.running.values()))
+        return None
+
+    def _resolve_stored(self, execution_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Find a running execution recorded by another process (e.g. the app, seen from the dashboard)
+
+        Same rules as _resolve, against the shared store; call without holding the lock.
+        """
+        if not self.store:
+            return None
+        execution_id = execution_id or current_execution_id.get()
+        if execution_id is None:
+            running = self.store.get_running_executions()
+            if not running:
+                return None
+            execution_id = running[0]['id']
+        execution = self.store.get_execution(execution_id)
+        if execution is None or execution['status'] != 'running':
+            return None
+        execution['_started_at'] = datetime.fromisoformat(execution['start_time']).timestamp()
+        return execution
     
-    def start_execution(self, execution_id: str, input_data: Dict[str, Any]):
-        """Start tracking a new workflow execution"""
+    def start_execution(self, execution_id: str, input_data: Dict[str, Any]) -> ExecutionHandle:
+        """
+        Start tracking a new workflow execution
+
+        The execution becomes the current one for the calling context until it completes.
+
+        Returns:
+            Handle for recording steps into this execution
+        """
         with self.lock:
+            now = time.time()
             execution = {
                 'id': execution_id,
-                'start_time': datetime.now().isoformat(),
+                'start_time': datetime.fromtimestamp(now).isoformat(),
                 'status': 'running',
                 'input': input_data,
                 'steps': [],
                 'output': None,
                 'error': None,
-                'end_time': None
+                'end_time': None,
+                '_started_at': now
             }
-            self.executions.append(execution)
-            self.current_execution = execution
+            previous = self.executions.pop(execution_id, None)
+            if previous is not None:
+                self.status_counts[previous['status']] -= 1
+            self.executions[execution_id] = execution
+            self.running.pop(execution_id, None)
+            self.running[execution_id] = execution
+            self.status_counts['running'] += 1
+            self._evict(now)
+            if self.store:
+                self.store.record_start(execution)
+            self._emit('start', self._summary(execution))
+
+        current_execution_id.set(execution_id)
+        logger.debug("Execution started", extra={'execution_id': execution_id})
+        return ExecutionHandle(self, execution_id)
     
-    def add_step(self, step_name: str, step_data: Dict[str, Any]):
-        """Add a step to the current execution"""
+    def add_step(self, step_name: str, step_data: Dict[str, Any], execution_id: str = None):
+        """Add a step to a running execution (the current one unless execution_id is given), here or in the store"""
         with self.lock:
-            if self.current_execution:
+            execution = self._resolve(execution_id)
+            if execution:
+                step = {
+                    'name': step_name,
+                    'timestamp': datetime.now().isoformat(),
+                    'data': step_data
+                }
+                execution['steps'].append(step)
+                if self.store:
+                    self.store.record_step(execution['id'], len(execution['steps']) - 1, step)
+                self._emit('step', {
+                    'id': execution['id'],
+                    'step_count': len(execution['steps']),
+                    'last_step': step_name,
+                    'timestamp': step['timestamp']
+                })
+
+        if execution is None:
+            execution = self._resolve_stored(execution_id)
+            if execution:
                 step = {
                     'name': step_name,
                     'timestamp': datetime.now().isoformat(),
                     'data': step_data
                 }
-                self.current_execution['steps'].append(step)
+                with self.lock:
+                    self.store.record_appended_step(execution['id'], step)
+                    self._emit('step', {
+                        'id': execution['id'],
+                        'step_count': len(execution['steps']) + 1,
+                        'last_step': step_name,
+                        'timestamp': step['timestamp']
+                    })
+
+        if execution is None:
+            logger.debug("Step dropped: no running execution", extra={'step': step_name,
+                                                                      'execution_id': execution_id})
     
-    def complete_execution(self, output_data: Dict[str, Any] = None, error: str = None):
-        """Mark the current execution as completed"""
+    def update_input(self, execution_id: str, fields: Dict[str, Any]):
+        """Merge fields into a retained execution's input (e.g. a value resolved after it started)"""
         with self.lock:
-            if self.current_execution:
-                self.current_execution['status'] = 'completed' if not error else 'failed'
-                self.current_execution['output'] = output_data
-                self.current_execution['error'] = error
-                self.current_execution['end_time'] = datetime.now().isoformat()
-                self.current_execution = None
+            execution = self.executions.get(execution_id)
+            if execution:
+                execution['input'] = {**(execution['input'] or {}), **fields}
+                if self.store:
+                    self.store.record_input(execution_id, execution['input'])
+
+        if execution is None:
+            logger.debug("Input update dropped: execution not retained", extra={'execution_id': execution_id})
+
+    def complete_execution(self, output_data: Dict[str, Any] = None, error: str = None,
+                           execution_id: str = None):
+        """Mark a running execution (the current one unless execution_id is given) as completed, here or in the store"""
+        with self.lock:
+            execution = self._resolve(execution_id)
+            if execution:
+                status = 'completed' if not error else 'failed'
+                self.status_counts[execution['status']] -= 1
+                self.status_counts[status] += 1
+                execution['status'] = status
+                execution['output'] = output_data
+                execution['error'] = error
+                execution['end_time'] = datetime.now().isoformat()
+                del self.running[execution['id']]
+                if self.store:
+                    self.store.record_complete(execution)
+                self._emit('complete' if status == 'completed' else 'fail', self._summary(execution))
+
+        if execution is None:
+            execution = self._resolve_stored(execution_id)
+            if execution:
+                execution.update(status='completed' if not error else 'failed', output=output_data, error=error,
+                                 end_time=datetime.now().isoformat())
+                with self.lock:
+                    self.store.record_complete(execution)
+                    self._emit('complete' if not error else 'fail', self._summary(execution))
+
+        if execution:
+            duration = time.time() - execution['_started_at']
+            if error:
+                logger.warning("Execution failed", extra={'execution_id': execution['id'], 'error': error,
+                                                          'duration_s': round(duration, 3)})
+            else:
+                logger.info("Execution completed", extra={'execution_id': execution['id'],
+                                                          'steps': len(execution['steps']),
+                                                          'duration_s': round(duration, 3)})
+            if current_execution_id.get() == execution['id']:
+                current_execution_id.set(None)
+
+    @staticmethod
+    def _public(execution: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of an execution without internal fields; steps list copied so it stays stable"""
+        copy = {key: value for key, value in execution.items() if not key.startswith('_')}
+        copy['steps'] = list(execution['steps'])
+        return copy
+
+    @staticmethod
+    def _summary(execution: Dict[str, Any]) -> Dict[str, Any]:
+        """Execution metadata without step data, input or output payloads"""
+        steps = execution['steps']
+        return {
+            'id': execution['id'],
+            'status': execution['status'],
+            'start_time': execution['start_time'],
+            'end_time': execution['end_time'],
+            'step_count': len(steps),
+            'last_step': steps[-1]['name'] if steps else None,
+            'error': execution['error']
+        }
     
     def get_executions(self) -> List[Dict[str, Any]]:
-        """Get all executions"""
+        """Get all retained executions, oldest first"""
+        with self.lock:
+            return [self._public(execution) for execution in self.executions.values()]
+
+    def get_execution(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        """Get one execution by id, or None if unknown or evicted"""
+        if self.store:
+            return self.store.get_execution(execution_id)
+        with self.lock:
+            execution = self.executions.get(execution_id)
+            return self._public(execution) if execution else None
+
+    def list_executions(self, status: str = None, since: float = None, until: float = None,
+                        limit: int = 50, offset: int = 0, summary: bool = True) -> Dict[str, Any]:
+        """
+        Page through executions, newest first
+
+        Args:
+            status: Only executions with this status
+            since: Only executions started at or after this epoch time
+            until: Only executions started before this epoch time
+            limit: Page size
+            offset: Matching executions to skip
+            summary: Return summaries instead of full executions
+
+        Returns:
+            {'executions': [...], 'matched': int, 'total': int, 'running': int, 'completed': int, 'failed': int,
+             'interrupted': int}
+        """
+        if self.store:
+            return self.store.list_executions(status, since, until, limit, offset, summary)
         with self.lock:
-            return self.executions.copy()
+            self._evict(time.time())
+            page = []
+            matched = 0
+            for execution in reversed(self.executions.values()):
+                started_at = execution['_started_at']
+                if until is not None and started_at >= until:
+                    continue
+                if since is not None and started_at < since:
+                    break  # store is in start order, nothing older can match
+                if status and execution['status'] != status:
+                    continue
+                if offset <= matched < offset + limit:
+                    page.append(self._summary(execution) if summary else self._public(execution))
+                matched += 1
+
+            result = {'executions': page, 'matched': matched, 'total': len(self.executions)}
+            result.update(self.status_counts)
+            return result
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get retained/evicted counts and per-status counts"""
+        if self.store:
+            return self.store.get_stats()
+        with self.lock:
+            stats = {'total': len(self.executions), 'evicted': self.evicted}
+            stats.update(self.status_counts)
+            return stats
     
     def get_current_execution(self) -> Dict[str, Any]:
-        """Get current execution"""
+        """Get the calling context's execution, else the most recently started running one (any process)"""
         with self.lock:
-            return self.current_execution.copy() if self.current_execution else None
+            execution = self._resolve(None)
+            if execution:
+                return self._public(execution)
+        execution = self._resolve_stored(None)
+        return self._public(execution) if execution else None
+
+    def get_running_executions(self) -> List[Dict[str, Any]]:
+        """Summaries of every running execution, newest first"""
+        if self.store:
+            return self.store.get_running_executions()
+        with self.lock:
+            return [self._summary(execution) for execution in reversed(self.running.values())]
 
 # Global workflow monitor
-workflow_monitor = WorkflowMonitor()
+WORKFLOW_MAX_EXECUTIONS = int(os.getenv('WORKFLOW_MAX_EXECUTIONS', '1000'))
+WORKFLOW_RETENTION_SECONDS = float(os.getenv('WORKFLOW_RETENTION_SECONDS', '86400'))
+WORKFLOW_DB_PATH = os.getenv('WORKFLOW_DB_PATH', 'workflow_executions.db')  # empty keeps executions in memory only
+workflow_monitor = WorkflowMonitor(
+    max_executions=WORKFLOW_MAX_EXECUTIONS,
+    retention_seconds=WORKFLOW_RETENTION_SECONDS,
+    event_replay_size=int(os.getenv('WORKFLOW_EVENT_REPLAY_SIZE', '1000')),
+    store=SQLiteExecutionStore(
+        db_path=WORKFLOW_DB_PATH,
+        max_executions=WORKFLOW_MAX_EXECUTIONS,
+        retention_seconds=WORKFLOW_RETENTION_SECONDS,
+        heartbeat_interval=float(os.getenv('WORKFLOW_HEARTBEAT_SECONDS', '15')),
+        stale_seconds=float(os.getenv('WORKFLOW_STALE_SECONDS', '120'))
+    ) if WORKFLOW_DB_PATH else None
+)
+
+EVENT_HEARTBEAT_SECONDS = 15
 
 @app.route('/')
 def dashboard():
     """Main dashboard page"""
     return render_template('dashboard.html')
 
+def _parse_time_param(value: str) -> Optional[float]:
+    """Accept epoch seconds or an ISO 8601 timestamp"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
 @app.route('/api/executions')
 def get_executions():
-    """Get all workflow executions"""
-    executions = workflow_monitor.get_executions()
-    return jsonify({
-        'executions': executions,
-        'total': len(executions),
-        'running': len([e for e in executions if e['status'] == 'running'])
-    })
+    """
+    List workflow executions, newest first
+
+    Query params: status, since, until (epoch seconds or ISO 8601), limit (default 50, max 500),
+    offset, view ('summary' (default) or 'full')
+    """
+    try:
+        since = _parse_time_param(request.args.get('since'))
+        until = _parse_time_param(request.args.get('until'))
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query parameter: {str(e)}'}), 400
+
+    status = request.args.get('status')
+    if status and status not in EXECUTION_STATUSES:
+        return jsonify({'error': f'Unknown status: {status}'}), 400
+
+    result = workflow_monitor.list_executions(
+        status=status,
+        since=since,
+        until=until,
+        limit=limit,
+        offset=offset,
+        summary=request.args.get('view', 'summary') != 'full'
+    )
+    result.update({'limit': limit, 'offset': offset})
+    return jsonify(result)
 
 @app.route('/api/execution/<execution_id>')
 def get_execution(execution_id: str):
     """Get specific execution details"""
-    executions = workflow_monitor.get_executions()
-    execution = next((e for e in executions if e['id'] == execution_id), None)
+    execution = workflow_monitor.get_execution(execution_id)
     
     if not execution:
         return jsonify({'error': 'Execution not found'}), 404
     
     return jsonify(execution)
 
+@app.route('/api/stats')
+def get_stats():
+    """Get execution store and live feed counters"""
+    stats = workflow_monitor.get_stats()
+    stats['events'] = workflow_monitor.events.get_stats()
+    return jsonify(stats)
+
+@app.route('/api/events')
+def stream_events():
+    """
+    Server-Sent Events feed of execution lifecycle deltas (start, step, complete, fail)
+
+    Each event carries its id; browsers resume with the Last-Event-ID header after a reconnect
+    (or pass ?lastEventId=). A 'reset' event means the client missed more than the replay
+    buffer holds and should reload /api/executions.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': f'Invalid event id: {last_event_id}'}), 400
+
+    feed = workflow_monitor.events
+
+    def sse(event_id: int, event_type: str, data: Dict[str, Any]) -> str:
+        return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+    def generate():
+        cursor = last_id
+        if cursor is None:
+            # New client: start at the head; it loads the current state from /api/executions
+            cursor = feed.last_id
+            yield sse(cursor, 'hello', {'lastEventId': cursor})
+
+        while True:
+            events = feed.wait(cursor, timeout=EVENT_HEARTBEAT_SECONDS)
+            if events is None:
+                cursor = feed.last_id
+                yield sse(cursor, 'reset', {'lastEventId': cursor})
+                continue
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for event_id, event_type, data in events:
+                yield sse(event_id, event_type, data)
+            cursor = events[-1][0]
+
+    return Response(
+        generate(),
+        content_type='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no',
+        }
+    )
+
 @app.route('/api/current')
 def get_current():
     """Get current execution"""
     current = workflow_monitor.get_current_execution()
-    return jsonify({'current': current})
+    return jsonify({'current': current, 'running': workflow_monitor.get_running_executions()})
 
 @app.route('/api/start', methods=['POST'])
 def start_execution():
     """Start a new workflow execution"""
     data = request.get_json()
-    execution_id = f"exec_{int(time.time())}"
+    execution_id = make_execution_id()
     
     workflow_monitor.start_execution(execution_id, data)
     
@@ -120,27 +542,29 @@ def start_execution():
 
 @app.route('/api/step', methods=['POST'])
 def add_step():
-    """Add a step to current execution"""
+    """Add a step to an execution (execution_id, else the most recently started running one)"""
     data = request.get_json()
     step_name = data.get('step_name')
     step_data = data.get('step_data', {})
     
-    workflow_monitor.add_step(step_name, step_data)
+    workflow_monitor.add_step(step_name, step_data, execution_id=data.get('execution_id'))
     
     return jsonify({'status': 'step_added'})
 
 @app.route('/api/complete', methods=['POST'])
 def complete_execution():
-    """Complete current execution"""
+    """Complete an execution (execution_id, else the most recently started running one)"""
     data = request.get_json()
     output_data = data.get('output')
     error = data.get('error')
     
-    workflow_monitor.complete_execution(output_data, error)
+    workflow_monitor.complete_execution(output_data, error, execution_id=data.get('execution_id'))
     
     return jsonify({'status': 'completed'})
 
 if __name__ == '__main__':
+    configure_logging()
+
     # Create templates directory if it doesn't exist
     os.makedirs('templates', exist_ok=True)
     